@@ -1,6 +1,7 @@
 from flask import Flask
 
 from modules.database import init_db
+from modules.jobs import ensure_monitor
 from handlers.routes import routes
 
 app = Flask(__name__)
@@ -9,6 +10,8 @@ app.secret_key = "secret-key"  # In production, use env variable
 app.register_blueprint(routes)
 
 init_db()
+# Jobs d'import restés en file ou abandonnés avant un redémarrage
+ensure_monitor()
 
 if __name__ == "__main__":
     app.run(debug=True, port=5001)
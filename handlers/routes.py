@@ -1,12 +1,16 @@
 import os
 from tempfile import NamedTemporaryFile
 from werkzeug.utils import secure_filename
-import sqlite3
 import re # Added for regex in convert_pptx_to_cpfr
 import json # Added for json.dumps
-from datetime import datetime # Added for data history timestamps
+import base64
+import csv
+import io
+import time
+import zlib
+from datetime import datetime, timedelta, timezone # Added for data history timestamps
 
-from flask import Blueprint, flash, redirect, render_template, request, jsonify
+from flask import Blueprint, Response, flash, g, redirect, render_template, request, jsonify, stream_with_context
 
 from modules.database import (
     insert_record, get_history, get_statistics, get_extraction_by_id,
@@ -15,10 +19,27 @@ from modules.database import (
     get_acquisition_channels, get_campaign_notes, get_latest_weekly_data,
     insert_weekly_summary, insert_offers_focus, insert_bookings_details,
     insert_acquisition_channel, insert_seo_detail, insert_campaign_note,
-    ingest_weekly_data
+    ingest_weekly_data, get_data_version,
+    # Événements (SSE)
+    get_events_since, get_last_event_id,
+    # Data History
+    get_data_history_values, format_pivot_value, save_data_history_cells, iter_export_rows, check_export_sections,
+    DATA_HISTORY_SECTIONS,
+    # Documents collaboratifs (journal des mises à jour)
+    append_document_update, get_document_updates_since,
+    get_document_history, get_document_version,
+    # Jobs d'import
+    get_job, list_jobs,
+    # Connexion par requête
+    get_db, release_db
 )
+from modules.history_engine import build_timeline
+from modules.response_cache import ENCODINGS, ResponseCache, negotiate
+from modules.xlsx_writer import Sheet, stream_xlsx
+from modules.tracing import TRACER
 
 routes = Blueprint('routes', __name__)
+routes.teardown_app_request(release_db)
 
 # Configuration pour les fichiers uploadés
 ALLOWED_EXTENSIONS = {'pptx'}
@@ -99,20 +120,23 @@ def upload():
                 file.save(tmp.name)
                 tmp_path = tmp.name
             
-            # Récupération des informations du fichier
+            # Chargement unique du deck (lecture sélective), partagé par toutes les extractions
+            from modules.pptx_deck import open_deck
             from modules.pptx_utils import get_slide_info, extract_pptx, extract_cpfr_pptx
-            file_info = get_slide_info(tmp_path)
+            # Zip fermé avant la suppression du fichier temporaire
+            with open_deck(tmp_path, lite=True) as deck:
+                file_info = get_slide_info(deck)
             
-            # Extraction des données avec preview structuré
-            try:
-                # Essayer d'abord l'extraction CPFR structurée
-                cpfr_data, table_data, structured_preview = extract_cpfr_pptx(tmp_path, slide_start, slide_end)
-                # Convertir les données CPFR en format KPI simple pour compatibilité
-                kpis = [f"{k}: {v}" for k, v in cpfr_data.items() if v is not None and k in ['sessions', 'revenue_b2c', 'average_basket_value', 'conversion_rate', 'nb_bookings']]
-            except:
-                # Fallback vers l'extraction simple
-                kpis, table_data = extract_pptx(tmp_path, slide_start, slide_end)
-                structured_preview = None
+                # Extraction des données avec preview structuré
+                try:
+                    # Essayer d'abord l'extraction CPFR structurée
+                    cpfr_data, table_data, structured_preview = extract_cpfr_pptx(deck, slide_start, slide_end)
+                    # Convertir les données CPFR en format KPI simple pour compatibilité
+                    kpis = [f"{k}: {v}" for k, v in cpfr_data.items() if v is not None and k in ['sessions', 'revenue_b2c', 'average_basket_value', 'conversion_rate', 'nb_bookings']]
+                except:
+                    # Fallback vers l'extraction simple
+                    kpis, table_data = extract_pptx(deck, slide_start, slide_end)
+                    structured_preview = None
             
             # Sauvegarde en base de données
             success = insert_record(filename, slide_start, slide_end, kpis, table_data, file_info)
@@ -151,9 +175,14 @@ def upload():
 def history():
     """Page d'historique des extractions"""
     try:
-        history_data = get_history(limit=100)
+        limit = max(1, min(request.args.get('limit', 100, type=int), 500))
+        before_id = request.args.get('before_id', type=int)
+        history_data = get_history(limit=limit, before_id=before_id)
         stats = get_statistics()
-        return render_template('history.html', history=history_data, stats=stats, active_page='history')
+        # Page suivante : curseur sur le plus ancien id affiché
+        next_before_id = history_data[-1]['id'] if history_data and len(history_data) == limit else None
+        return render_template('history.html', history=history_data, stats=stats, active_page='history',
+                               before_id=before_id, next_before_id=next_before_id, limit=limit)
     except Exception as e:
         flash(f'Erreur lors du chargement de l\'historique : {str(e)}', 'error')
         return redirect('/')
@@ -192,11 +221,18 @@ def api_stats():
 
 @routes.route('/api/history')
 def api_history():
-    """API pour récupérer l'historique"""
+    """
+    API pour récupérer l'historique (projection de liste, détail via /extraction/<id>).
+    Pagination par curseur : ?before_id=<id> ; la page suivante est indiquée dans l'en-tête Link.
+    """
     try:
-        limit = request.args.get('limit', 50, type=int)
-        history_data = get_history(limit=limit)
-        return jsonify(history_data)
+        limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+        before_id = request.args.get('before_id', type=int)
+        history_data = get_history(limit=limit, before_id=before_id)
+        response = jsonify(history_data)
+        if history_data and len(history_data) == limit:
+            response.headers['Link'] = f'</api/history?limit={limit}&before_id={history_data[-1]["id"]}>; rel="next"'
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -264,23 +300,12 @@ def cpfr_upload():
         
         slide_start, slide_end = result
         
-        # Traitement du fichier
+        # Traitement du fichier : mise en file, le parsing et l'ingestion tournent hors de la requête
         filename = secure_filename(file.filename)
-        tmp_path = None
         
         try:
-            # Sauvegarde temporaire du fichier
-            with NamedTemporaryFile(delete=False, suffix='.pptx') as tmp:
-                file.save(tmp.name)
-                tmp_path = tmp.name
-            
-            # Récupération des informations du fichier
-            from modules.pptx_utils import get_slide_info, extract_pptx
-            file_info = get_slide_info(tmp_path)
-            
-            # Extraction des données CPFR unifiées (slides 31 et 32)
-            from modules.cpfr_unified_parser import parse_and_validate_cpfr
-            from datetime import datetime, timedelta
+            from modules.jobs import enqueue_cpfr_job
+            from datetime import timedelta
             
             # Déterminer la semaine de reporting (par défaut: semaine courante)
             today = datetime.now()
@@ -289,34 +314,25 @@ def cpfr_upload():
             monday = today - timedelta(days=days_since_monday)
             week_start_date = monday.strftime('%Y-%m-%d')
             
-            result = parse_and_validate_cpfr(tmp_path, slide_start, slide_end, week_start_date)
+            job_id = enqueue_cpfr_job(file, filename, slide_start, slide_end, week_start_date)
+            if not job_id:
+                raise RuntimeError("impossible d'enregistrer le job d'import")
             
-            if result['success']:
-                # Insertion dans la base CPFR
-                success = ingest_weekly_data(result['db_payload'])
-                
-                if success['success']:
-                    validation = result['validation']
-                    msg = f'Données CPFR extraites avec succès ! {len(success["inserted"])} tables mises à jour.'
-                    if validation['errors']:
-                        msg += f' Avertissements: {", ".join(validation["errors"])}'
-                    flash(msg, 'success')
-                    return redirect('/cpfr')
-                else:
-                    flash(f'Erreur lors de l\'insertion des données CPFR: {", ".join(success.get("errors", []))}', 'error')
-            else:
-                flash(f'Erreur lors de l\'extraction CPFR: {result.get("error", "Erreur inconnue")}', 'error')
+            # Un deck déjà parsé (parse_cache) est signalé par result.cached du job, une fois terminé
+            status_url = f'/api/v1/jobs/{job_id}'
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify({
+                    'job_id': job_id,
+                    'status': 'queued',
+                    'status_url': status_url
+                }), 202
             
+            flash(f'Import CPFR mis en file (job {job_id}). Suivi : {status_url}', 'success')
             return redirect('/cpfr/upload')
             
         except Exception as e:
             flash(f'Erreur lors du traitement du fichier : {str(e)}', 'error')
             return redirect(request.url)
-        
-        finally:
-            # Nettoyage du fichier temporaire
-            if tmp_path and os.path.exists(tmp_path):
-                os.unlink(tmp_path)
     
     # Affichage de la page d'upload
     return render_template('cpfr_upload.html', active_page='upload')
@@ -513,6 +529,103 @@ def cpfr_import_page():
     return render_template('cpfr_import.html', active_page='import')
 
 
+# ============================================================================
+# GET CONDITIONNELS (ETag / Last-Modified)
+# ============================================================================
+
+# Les réponses JSON de ces préfixes ne dépendent que des tables CPFR : leur ETag
+# est la version de data_version, incrémentée par chaque écriture (mark_data_changed),
+# suffixée par le Content-Encoding (validateur fort distinct par variante)
+CONDITIONAL_PREFIXES = ('/api/v1/', '/cpfr/api/')
+# Endpoints dont le contenu évolue sans écriture des tables CPFR
+CONDITIONAL_EXCLUDED = {'routes.api_jobs', 'routes.api_job', 'routes.api_trace', 'routes.api_events'}
+# Autres endpoints déterministes pour une version donnée des données
+CONDITIONAL_ENDPOINTS = {'routes.api_data_history_initial'}
+
+# Réponses JSON encodées (et compressées) de ces mêmes endpoints, par version des données
+RESPONSE_CACHE = ResponseCache()
+
+
+def _conditional_get_applies():
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.endpoint in CONDITIONAL_ENDPOINTS:
+        return True
+    return request.path.startswith(CONDITIONAL_PREFIXES) and request.endpoint not in CONDITIONAL_EXCLUDED
+
+
+@routes.before_request
+def conditional_get():
+    """Répond 304 sans toucher aux tables si le client a déjà la version courante"""
+    if not _conditional_get_applies():
+        return None
+    version = get_data_version()
+    if version is None:
+        return None
+    g.data_version = version
+    changed_at = int(version[1])
+    
+    # Toute variante (brute, gzip, br) de la version courante est à jour
+    etag = _etag(version)
+    if request.if_none_match:
+        etag = next((tag for tag in (_etag(version, encoding) for encoding in (None, *ENCODINGS))
+                     if request.if_none_match.contains(tag)), None)
+        fresh = etag is not None
+    else:
+        since = request.if_modified_since
+        fresh = since is not None and changed_at <= since.timestamp()
+    if fresh:
+        response = Response(status=304)
+        _set_validators(response, etag, changed_at)
+        return response
+    
+    # Même version, même requête : corps déjà encodé, ni lecture des tables ni jsonify
+    cached = RESPONSE_CACHE.get(_response_cache_key(version))
+    if cached is not None:
+        g.response_cached = True
+        response = Response(mimetype=cached.mimetype)
+        _send_encoded(response, cached)
+        return response
+    return None
+
+
+@routes.after_request
+def add_validators(response):
+    version = g.pop('data_version', None)
+    if version is not None and response.status_code == 200:
+        if (not g.pop('response_cached', False) and response.mimetype == 'application/json'
+                and not response.is_streamed):
+            cached = RESPONSE_CACHE.put(_response_cache_key(version), response.get_data(), response.mimetype)
+            if cached is not None:
+                _send_encoded(response, cached)
+        _set_validators(response, _etag(version, response.headers.get('Content-Encoding')), int(version[1]))
+    return response
+
+
+def _etag(version, encoding=None):
+    return f"cpfr-{version[0]}-{encoding}" if encoding else f"cpfr-{version[0]}"
+
+
+def _response_cache_key(version):
+    return (version[0], request.path, tuple(sorted(request.args.items(multi=True))))
+
+
+def _send_encoded(response, cached):
+    """Variante du corps acceptée par le client (br, gzip ou brute)"""
+    encoding, body = negotiate(cached, request.accept_encodings)
+    response.set_data(body)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+
+
+def _set_validators(response, etag, changed_at):
+    response.set_etag(etag)
+    response.last_modified = datetime.fromtimestamp(changed_at, tz=timezone.utc)
+    # Revalidation systématique : le navigateur réutilise sa copie après un 304
+    response.headers['Cache-Control'] = 'no-cache'
+
+
 # ============================================================================
 # API REST CPFR (selon la spécification JSON)
 # ============================================================================
@@ -533,7 +646,7 @@ def api_summary_by_week_id(week_id):
     """KPI globaux pour une semaine par ID"""
     try:
         # Récupérer la semaine par ID
-        with sqlite3.connect("cpfr.db") as conn:
+        with get_db() as conn:
             cursor = conn.execute("""
                 SELECT w.week_label, w.week_start_date, ws.*
                 FROM weekly_summary ws
@@ -559,7 +672,7 @@ def api_summary():
         
         if week_start_date:
             # Récupérer par date
-            with sqlite3.connect("cpfr.db") as conn:
+            with get_db() as conn:
                 cursor = conn.execute("""
                     SELECT w.week_label, w.week_start_date, ws.*
                     FROM weekly_summary ws
@@ -589,7 +702,7 @@ def api_summary():
 def api_offers_by_week_id(week_id):
     """Données des offres pour une semaine par ID"""
     try:
-        with sqlite3.connect("cpfr.db") as conn:
+        with get_db() as conn:
             cursor = conn.execute("""
                 SELECT w.week_label, w.week_start_date, of.*
                 FROM offers_focus of
@@ -614,7 +727,7 @@ def api_offers():
         week_start_date = request.args.get('week_start_date')
         
         if week_start_date:
-            with sqlite3.connect("cpfr.db") as conn:
+            with get_db() as conn:
                 cursor = conn.execute("""
                     SELECT w.week_label, w.week_start_date, of.*
                     FROM offers_focus of
@@ -643,7 +756,7 @@ def api_offers():
 def api_bookings_by_week_id(week_id):
     """Détails des réservations pour une semaine par ID"""
     try:
-        with sqlite3.connect("cpfr.db") as conn:
+        with get_db() as conn:
             cursor = conn.execute("""
                 SELECT w.week_label, w.week_start_date, bd.*
                 FROM bookings_details bd
@@ -668,7 +781,7 @@ def api_bookings():
         week_start_date = request.args.get('week_start_date')
         
         if week_start_date:
-            with sqlite3.connect("cpfr.db") as conn:
+            with get_db() as conn:
                 cursor = conn.execute("""
                     SELECT w.week_label, w.week_start_date, bd.*
                     FROM bookings_details bd
@@ -697,7 +810,7 @@ def api_bookings():
 def api_acquisition_by_week_id(week_id):
     """Données d'acquisition pour une semaine par ID"""
     try:
-        with sqlite3.connect("cpfr.db") as conn:
+        with get_db() as conn:
             cursor = conn.execute("""
                 SELECT w.week_label, w.week_start_date, c.channel_code, c.channel_label, ac.*
                 FROM acquisition_channels ac
@@ -721,7 +834,7 @@ def api_acquisition():
         week_start_date = request.args.get('week_start_date')
         
         if week_start_date:
-            with sqlite3.connect("cpfr.db") as conn:
+            with get_db() as conn:
                 cursor = conn.execute("""
                     SELECT w.week_label, w.week_start_date, c.channel_code, c.channel_label, ac.*
                     FROM acquisition_channels ac
@@ -749,7 +862,7 @@ def api_acquisition():
 def api_campaign_notes_by_week_id(week_id):
     """Notes de campagne pour une semaine par ID"""
     try:
-        with sqlite3.connect("cpfr.db") as conn:
+        with get_db() as conn:
             cursor = conn.execute("""
                 SELECT w.week_label, c.channel_code, ccn.*
                 FROM channel_campaign_notes ccn
@@ -813,6 +926,93 @@ def api_ingest():
         return jsonify({'error': f'Erreur serveur : {str(e)}'}), 500
 
 
+@routes.route('/api/v1/jobs', methods=['GET'])
+def api_jobs():
+    """Liste des jobs d'import CPFR (?status=queued|running|done|failed, ?limit=)"""
+    try:
+        status = request.args.get('status')
+        limit = request.args.get('limit', 50, type=int)
+        return jsonify(list_jobs(status, limit))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@routes.route('/api/v1/jobs/<job_id>', methods=['GET'])
+def api_job(job_id):
+    """Statut et timings d'un job d'import CPFR"""
+    try:
+        job = get_job(job_id)
+        if not job:
+            return jsonify({'error': 'Job non trouvé'}), 404
+        return jsonify(job)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@routes.route('/api/v1/trace', methods=['GET'])
+def api_trace():
+    """Derniers événements de trace du processus (?prefix=pptx., ?limit=) ; vide si CPFR_TRACE est désactivé"""
+    try:
+        prefix = request.args.get('prefix')
+        limit = request.args.get('limit', 500, type=int)
+        return jsonify({'enabled': TRACER.enabled, 'events': TRACER.events(prefix, limit)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# Flux SSE : lecture de data_events toutes les EVENTS_POLL_INTERVAL secondes, commentaire
+# keep-alive après EVENTS_HEARTBEAT secondes sans événement, reconnexion (Last-Event-ID)
+# au bout de EVENTS_MAX_DURATION secondes pour libérer le worker
+EVENTS_POLL_INTERVAL = float(os.environ.get('CPFR_EVENTS_POLL', '1'))
+EVENTS_HEARTBEAT = 15
+EVENTS_MAX_DURATION = float(os.environ.get('CPFR_EVENTS_MAX_DURATION', '300'))
+
+
+def _sse(event_type, data, event_id=None):
+    head = f"id: {event_id}\n" if event_id is not None else ''
+    return f"{head}event: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@routes.route('/api/v1/events')
+def api_events():
+    """
+    Flux Server-Sent Events des modifications de données : week_ingested, cells_edited,
+    job_finished ({week_ids, sections, ...}). Les événements sont lus dans la table
+    data_events : ceux publiés par n'importe quel worker atteignent tous les clients.
+    Reprise après coupure via Last-Event-ID (ou ?since=) ; un événement `reset` signale
+    que des événements ont été purgés entre-temps (tout recharger).
+    """
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    if last_id is None:
+        last_id = request.args.get('since', type=int)
+    if last_id is None:
+        last_id = get_last_event_id()
+    
+    def stream(last_id):
+        yield f"retry: {int(EVENTS_POLL_INTERVAL * 3000)}\n\n"
+        started = idle = time.monotonic()
+        while time.monotonic() - started < EVENTS_MAX_DURATION:
+            events = get_events_since(last_id)
+            if events and events[0]['id'] > last_id + 1:
+                yield _sse('reset', {'since': last_id})
+            for event in events:
+                last_id = event['id']
+                yield _sse(event['type'], {**event['data'], 'created_at': event['created_at']}, event['id'])
+            now = time.monotonic()
+            if events:
+                idle = now
+            elif now - idle >= EVENTS_HEARTBEAT:
+                idle = now
+                yield ": keep-alive\n\n"
+            if len(events) < 100:
+                time.sleep(EVENTS_POLL_INTERVAL)
+    
+    response = Response(stream_with_context(stream(last_id)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # pas de mise en tampon par nginx
+    return response
+
+
 @routes.route('/cpfr/debug')
 def cpfr_debug():
     """Page de debug pour visualiser l'association des textes extraits"""
@@ -1038,251 +1238,74 @@ def data_history():
 
 @routes.route('/api/data-history/initial')
 def api_data_history_initial():
-    """Récupère les données consolidées depuis la vraie base CPFR avec valeurs historiques inférées"""
+    """
+    Timeline de la page Data History : valeurs stockées (pivot métrique × semaine)
+    et valeurs reconstituées à partir des variations vs LW / vs LY (history_engine).
+    Déterministe : même base, même réponse (ETag data_version).
+    
+    Query params:
+        weeks: Nombre de semaines de la timeline (défaut: 20, max: 156)
+        to: Dernière semaine affichée (YYYY-MM-DD, défaut: semaine la plus récente)
+        from: Première semaine affichée (YYYY-MM-DD) ; remplace `weeks`
+        sections: Sections à charger, séparées par des virgules (ex: SLIDE_31_GLOBAL,SEA)
+    """
     try:
-        # Récupérer toutes les semaines disponibles
-        weeks = get_weeks(52)  # Dernières 52 semaines
-        
-        if not weeks:
-            return jsonify({'weeks': [], 'data': {}})
-        
-        # Structurer les semaines pour Data History
-        formatted_weeks = []
-        for week in weeks:
-            formatted_weeks.append({
-                'id': f"week_{week['id']}",
-                'label': week['week_label'],
-                'startDate': week['week_start_date'],
-                'status': 'active' if week == weeks[0] else 'archived'
-            })
-        
-        # Récupérer toutes les données réelles disponibles
-        consolidated_data = {}
-        
-        # 1. Données Weekly Summary (Slide 31)
-        weekly_data = get_weekly_summary(52)
-        for week_data in weekly_data:
-            week_key = f"week_{week_data['week_id']}"
-            
-            # KPIs principaux
-            if 'SLIDE_31_GLOBAL' not in consolidated_data:
-                consolidated_data['SLIDE_31_GLOBAL'] = {}
-            
-            metrics_s31 = {
-                'Sessions': {week_key: format_number(week_data.get('sessions'))},
-                'Revenue B2C': {week_key: format_currency(week_data.get('revenue_b2c'))},
-                'Average Basket': {week_key: format_currency(week_data.get('average_basket_value'))},
-                'Conversion Rate': {week_key: format_percentage(week_data.get('conversion_rate'))},
-                'Bookings': {week_key: format_number(week_data.get('nb_bookings'))},
-                'Sessions vs LY': {week_key: format_percentage(week_data.get('vs_ly_sessions'))},
-                'Sessions vs LW': {week_key: format_percentage(week_data.get('vs_lw_sessions'))},
-                'Revenue vs LY': {week_key: format_percentage(week_data.get('vs_ly_revenue'))},
-                'Revenue vs LW': {week_key: format_percentage(week_data.get('vs_lw_revenue'))},
-                'ABV vs LY': {week_key: format_percentage(week_data.get('vs_ly_abv'))},
-                'ABV vs LW': {week_key: format_percentage(week_data.get('vs_lw_abv'))},
-                'CR vs LY': {week_key: format_percentage(week_data.get('vs_ly_cr'))},
-                'CR vs LW': {week_key: format_percentage(week_data.get('vs_lw_cr'))},
-                'Bookings vs LY': {week_key: format_percentage(week_data.get('vs_ly_bookings'))},
-                'Bookings vs LW': {week_key: format_percentage(week_data.get('vs_lw_bookings'))}
-            }
-            
-            for metric, value_dict in metrics_s31.items():
-                if metric not in consolidated_data['SLIDE_31_GLOBAL']:
-                    consolidated_data['SLIDE_31_GLOBAL'][metric] = {}
-                consolidated_data['SLIDE_31_GLOBAL'][metric].update(value_dict)
-        
-        # 2. Données Offers Focus
-        offers_data = get_offers_focus(52)
-        for offer_data in offers_data:
-            week_key = f"week_{offer_data['week_id']}"
-            
-            if 'SLIDE_31_OFFERS' not in consolidated_data:
-                consolidated_data['SLIDE_31_OFFERS'] = {}
-            
-            metrics_offers = {
-                'Last Minute %': {week_key: format_percentage(offer_data.get('last_minute_pct'))},
-                'Early Booking %': {week_key: format_percentage(offer_data.get('early_booking_pct'))},
-                'Summer Flash Revenue': {week_key: format_currency(offer_data.get('summer_flash_revenue'))},
-                'Summer Flash Bookings': {week_key: format_number(offer_data.get('summer_flash_bookings'))},
-                'Summer Flash ABV': {week_key: format_currency(offer_data.get('summer_flash_abv'))},
-                'Lead Gen Revenue': {week_key: format_currency(offer_data.get('lead_gen_revenue'))},
-                'Lead Gen Bookings': {week_key: format_number(offer_data.get('lead_gen_bookings'))}
-            }
-            
-            for metric, value_dict in metrics_offers.items():
-                if metric not in consolidated_data['SLIDE_31_OFFERS']:
-                    consolidated_data['SLIDE_31_OFFERS'][metric] = {}
-                consolidated_data['SLIDE_31_OFFERS'][metric].update(value_dict)
-        
-        # 3. Données Bookings Details
-        bookings_data = get_bookings_details(52)
-        for booking_data in bookings_data:
-            week_key = f"week_{booking_data['week_id']}"
-            
-            if 'SLIDE_31_BOOKINGS' not in consolidated_data:
-                consolidated_data['SLIDE_31_BOOKINGS'] = {}
-            
-            metrics_bookings = {
-                'July %': {week_key: format_percentage(booking_data.get('month_july_pct'))},
-                'August %': {week_key: format_percentage(booking_data.get('month_august_pct'))},
-                'September %': {week_key: format_percentage(booking_data.get('month_sept_pct'))},
-                'Stay 2N %': {week_key: format_percentage(booking_data.get('length_2n_pct'))},
-                'Stay 3N %': {week_key: format_percentage(booking_data.get('length_3n_pct'))},
-                'Stay 4N+ %': {week_key: format_percentage(booking_data.get('length_4n_pct'))}
-            }
-            
-            for metric, value_dict in metrics_bookings.items():
-                if metric not in consolidated_data['SLIDE_31_BOOKINGS']:
-                    consolidated_data['SLIDE_31_BOOKINGS'][metric] = {}
-                consolidated_data['SLIDE_31_BOOKINGS'][metric].update(value_dict)
-        
-        # 4. Données Acquisition Channels (Slide 32)
-        acquisition_data = get_acquisition_channels(52)
-        for acq_data in acquisition_data:
-            week_key = f"week_{acq_data['week_id']}"
-            channel = acq_data['channel_code']
-            
-            if channel not in consolidated_data:
-                consolidated_data[channel] = {}
-            
-            # Métriques communes à tous les canaux
-            base_metrics = {
-                'Sessions WoW': {week_key: format_percentage(acq_data.get('wow_sessions'))},
-                'Sessions YoY': {week_key: format_percentage(acq_data.get('yoy_sessions'))},
-                'Bookings WoW': {week_key: format_percentage(acq_data.get('wow_bookings'))},
-                'Bookings YoY': {week_key: format_percentage(acq_data.get('yoy_bookings'))},
-                'Revenue WoW': {week_key: format_percentage(acq_data.get('wow_revenue'))},
-                'Revenue YoY': {week_key: format_percentage(acq_data.get('yoy_revenue'))},
-                'Costs WoW': {week_key: format_percentage(acq_data.get('wow_costs'))},
-                'Costs YoY': {week_key: format_percentage(acq_data.get('yoy_costs'))},
-                'CVR vs LW': {week_key: format_percentage(acq_data.get('cvr_vs_lw'))},
-                'CVR vs LY': {week_key: format_percentage(acq_data.get('cvr_vs_ly'))}
-            }
-            
-            for metric, value_dict in base_metrics.items():
-                if metric not in consolidated_data[channel]:
-                    consolidated_data[channel][metric] = {}
-                consolidated_data[channel][metric].update(value_dict)
-        
-        # 5. Données SEO détails
-        with sqlite3.connect("cpfr.db") as conn:
-            cursor = conn.execute("""
-                SELECT w.id as week_id, seo.segment, seo.impressions_yoy, seo.clicks_yoy, 
-                       seo.ctr_yoy, seo.avg_position
-                FROM channel_seo_detail seo
-                JOIN dim_week w ON seo.week_id = w.id
-                ORDER BY w.week_start_date DESC
-            """)
-            
-            seo_details = cursor.fetchall()
-            
-            for seo_data in seo_details:
-                week_key = f"week_{seo_data[0]}"
-                segment = seo_data[1]  # 'brand' ou 'non_brand'
-                
-                if 'SEO_DETAIL' not in consolidated_data:
-                    consolidated_data['SEO_DETAIL'] = {}
-                
-                prefix = 'Brand' if segment == 'brand' else 'Non-Brand'
-                seo_metrics = {
-                    f'{prefix} Impressions YoY': {week_key: format_percentage(seo_data[2])},
-                    f'{prefix} Clicks YoY': {week_key: format_percentage(seo_data[3])},
-                    f'{prefix} CTR YoY': {week_key: format_percentage(seo_data[4])},
-                    f'{prefix} Avg Position': {week_key: format_number(seo_data[5])}
-                }
-                
-                for metric, value_dict in seo_metrics.items():
-                    if metric not in consolidated_data['SEO_DETAIL']:
-                        consolidated_data['SEO_DETAIL'][metric] = {}
-                    consolidated_data['SEO_DETAIL'][metric].update(value_dict)
-        
-        # Générer une timeline historique avec inférence des valeurs
-        from datetime import datetime, timedelta
-        
-        # Semaine actuelle (à partir de la base de données)
-        current_week = formatted_weeks[0] if formatted_weeks else None
-        if not current_week:
+        try:
+            date_from, date_to = (
+                datetime.strptime(request.args[name], '%Y-%m-%d').date() if request.args.get(name) else None
+                for name in ('from', 'to')
+            )
+        except ValueError:
+            return jsonify({'error': 'Dates from / to invalides (format YYYY-MM-DD attendu)'}), 400
+        if date_from and date_to and date_from > date_to:
+            return jsonify({'error': 'La date from doit précéder la date to'}), 400
+        sections = [x for x in (request.args.get('sections') or '').split(',') if x.strip()] or None
+        weeks_count = min(max(request.args.get('weeks', 20, type=int), 1), 156)
+        
+        latest_weeks = get_weeks(1)
+        if not latest_weeks:
             return jsonify({'weeks': [], 'data': {}})
-        
-        # Générer 20 semaines historiques
+        latest = datetime.strptime(latest_weeks[0]['week_start_date'], '%Y-%m-%d').date()
+        # Fenêtre ancrée sur la dernière semaine <= to (les semaines restent alignées sur la plus récente)
+        anchor = latest
+        if date_to and date_to < latest:
+            anchor = latest - timedelta(weeks=((latest - date_to).days + 6) // 7)
+        if date_from:
+            if date_from > anchor:
+                return jsonify({'weeks': [], 'data': {}})
+            weeks_count = (anchor - date_from).days // 7 + 1
+            if weeks_count > 156:
+                return jsonify({'error': 'Fenêtre limitée à 156 semaines'}), 400
+        
+        # Toutes les valeurs de la fenêtre (les semaines récentes servent à reconstituer les anciennes)
+        oldest = anchor - timedelta(weeks=weeks_count - 1)
+        rows = get_data_history_values(oldest.isoformat(), anchor.isoformat(), sections)
+        dates, keys, values, _ = build_timeline(rows, anchor, weeks_count, sections)
+        
+        # Au plus une ligne dim_week par semaine : ce nombre couvre toute la fenêtre
+        week_ids = {w['week_start_date']: w['id'] for w in get_weeks((latest - oldest).days // 7 + 1)}
         timeline_weeks = []
-        current_date = datetime.strptime(current_week['startDate'], '%Y-%m-%d')
-        
-        for i in range(20):
-            week_date = current_date - timedelta(weeks=i)
-            week_id = f"week_{i+1}"
-            
-            # Format français pour les dates
-            week_label = f"Semaine {week_date.strftime('%d/%m/%Y')}"
-            
+        columns = []
+        for i, week_date in enumerate(dates):
+            start = week_date.isoformat()
+            # Semaines connues : identifiant dim_week (sauvegardable) ; sinon la date
+            week_id = f"week_{week_ids[start]}" if start in week_ids else f"week_{start}"
             timeline_weeks.append({
                 'id': week_id,
-                'label': week_label,
-                'startDate': week_date.strftime('%Y-%m-%d'),
-                'status': 'active' if i == 0 else 'archived'
+                'label': f"Semaine {week_date.strftime('%d/%m/%Y')}",
+                'startDate': start,
+                'status': 'active' if week_date == latest else 'archived'
             })
+            columns.append((i, week_id))
         
-        # Générer les données avec inférence pour chaque semaine
+        # Formatage en sortie uniquement
         timeline_data = {}
-        
-        # Pour chaque section de données
-        for section_key, section_data in consolidated_data.items():
-            timeline_data[section_key] = {}
-            
-            # Pour chaque métrique
-            for metric_key, metric_data in section_data.items():
-                timeline_data[section_key][metric_key] = {}
-                
-                # Valeur actuelle (semaine 1)
-                current_value = metric_data.get('week_1', '')
-                timeline_data[section_key][metric_key]['week_1'] = current_value
-                
-                # Chercher les variations pour l'inférence
-                vs_ly_value = None
-                vs_lw_value = None
-                
-                # Patterns de variations
-                if 'Sessions' in metric_key and not 'vs' in metric_key:
-                    vs_ly_value = consolidated_data[section_key].get('Sessions vs LY', {}).get('week_1', '')
-                    vs_lw_value = consolidated_data[section_key].get('Sessions vs LW', {}).get('week_1', '')
-                elif 'Revenue' in metric_key and not 'vs' in metric_key:
-                    vs_ly_value = consolidated_data[section_key].get('Revenue vs LY', {}).get('week_1', '')
-                    vs_lw_value = consolidated_data[section_key].get('Revenue vs LW', {}).get('week_1', '')
-                elif 'Basket' in metric_key or 'ABV' in metric_key:
-                    vs_ly_value = consolidated_data[section_key].get('ABV vs LY', {}).get('week_1', '')
-                    vs_lw_value = consolidated_data[section_key].get('ABV vs LW', {}).get('week_1', '')
-                elif 'Conversion' in metric_key:
-                    vs_ly_value = consolidated_data[section_key].get('CR vs LY', {}).get('week_1', '')
-                    vs_lw_value = consolidated_data[section_key].get('CR vs LW', {}).get('week_1', '')
-                elif 'Bookings' in metric_key and not 'vs' in metric_key:
-                    vs_ly_value = consolidated_data[section_key].get('Bookings vs LY', {}).get('week_1', '')
-                    vs_lw_value = consolidated_data[section_key].get('Bookings vs LW', {}).get('week_1', '')
-                
-                # Inférer les valeurs historiques si on a les variations
-                if current_value and current_value != '' and vs_lw_value and vs_lw_value != '':
-                    try:
-                        # Calculer la valeur de la semaine dernière
-                        calc_result = calculate_historical_values(current_value, None, parse_percentage(vs_lw_value))
-                        if calc_result and calc_result['last_week'] is not None:
-                            timeline_data[section_key][metric_key]['week_2'] = format_value_like_original(calc_result['last_week'], current_value)
-                    except:
-                        pass
-                
-                # Inférer plus de semaines avec dégradation progressive
-                if current_value and current_value != '':
-                    try:
-                        for week_i in range(3, min(21, len(timeline_weeks)+1)):
-                            # Simulation d'une variation aléatoire légère (-5% à +5%)
-                            import random
-                            variation = random.uniform(-0.05, 0.05)
-                            prev_value = timeline_data[section_key][metric_key].get(f'week_{week_i-1}', current_value)
-                            
-                            if prev_value and prev_value != '':
-                                calc_result = calculate_historical_values(prev_value, None, variation)
-                                if calc_result and calc_result['last_week'] is not None:
-                                    timeline_data[section_key][metric_key][f'week_{week_i}'] = format_value_like_original(calc_result['last_week'], current_value)
-                    except:
-                        pass
+        for row, (section, metric) in enumerate(keys):
+            cells = timeline_data.setdefault(section, {}).setdefault(metric, {})
+            for i, week_id in columns:
+                value = values[row, i]
+                if value == value:  # NaN : cellule vide
+                    cells[week_id] = format_pivot_value(section, metric, float(value))
         
         return jsonify({
             'weeks': timeline_weeks,
@@ -1294,295 +1317,13 @@ def api_data_history_initial():
         return jsonify({'error': str(e)}), 500
 
 
-def format_number(value):
-    """Formate un nombre pour l'affichage"""
-    if value is None:
-        return ''
-    try:
-        if isinstance(value, (int, float)):
-            if value >= 1000000:
-                return f"{value/1000000:.1f}M"
-            elif value >= 1000:
-                return f"{value/1000:.1f}K"
-            else:
-                return str(int(value))
-        return str(value)
-    except:
-        return str(value)
-
-
-def format_currency(value):
-    """Formate une valeur monétaire"""
-    if value is None:
-        return ''
-    try:
-        if isinstance(value, (int, float)):
-            if value >= 1000000:
-                return f"{value/1000000:.1f}M€"
-            elif value >= 1000:
-                return f"{value/1000:.1f}K€"
-            else:
-                return f"{value:.0f}€"
-        return str(value)
-    except:
-        return str(value)
-
-
-def format_percentage(value):
-    """Formate un pourcentage"""
-    if value is None:
-        return ''
-    try:
-        if isinstance(value, (int, float)):
-            sign = '+' if value > 0 else ''
-            return f"{sign}{value*100:.1f}%"
-        return str(value)
-    except:
-        return str(value)
-
-
-def calculate_historical_values(current_value, vs_ly_pct, vs_lw_pct):
-    """
-    Calcule les valeurs historiques à partir de la valeur actuelle et des variations
-    
-    Args:
-        current_value: Valeur actuelle (peut être formatée avec K, M, €, etc.)
-        vs_ly_pct: Variation vs Last Year (ex: 0.11 pour +11%)
-        vs_lw_pct: Variation vs Last Week (ex: -0.12 pour -12%)
-    
-    Returns:
-        dict: {
-            'current': valeur actuelle parsée,
-            'last_year': valeur calculée pour l'année dernière,
-            'last_week': valeur calculée pour la semaine dernière
-        }
-    """
-    def parse_value(value_str):
-        """Parse une valeur formatée en nombre"""
-        if not value_str or value_str == '':
-            return None
-        
-        value_str = str(value_str).strip()
-        
-        # Enlever les symboles et multiplier par les facteurs
-        multiplier = 1
-        if 'M€' in value_str:
-            multiplier = 1000000
-            value_str = value_str.replace('M€', '')
-        elif 'K€' in value_str:
-            multiplier = 1000
-            value_str = value_str.replace('K€', '')
-        elif '€' in value_str:
-            value_str = value_str.replace('€', '')
-        elif 'M' in value_str:
-            multiplier = 1000000
-            value_str = value_str.replace('M', '')
-        elif 'K' in value_str:
-            multiplier = 1000
-            value_str = value_str.replace('K', '')
-        elif '%' in value_str:
-            # Si c'est déjà un pourcentage, le convertir en décimal
-            return float(value_str.replace('%', '').replace('+', '')) / 100
-        
-        try:
-            base_value = float(value_str.replace(',', '.'))
-            return base_value * multiplier
-        except:
-            return None
-    
-    current_parsed = parse_value(current_value)
-    if current_parsed is None:
-        return None
-    
-    result = {'current': current_parsed}
-    
-    # Calculer la valeur de l'année dernière
-    # Si current = last_year * (1 + vs_ly_pct) alors last_year = current / (1 + vs_ly_pct)
-    if vs_ly_pct is not None:
-        try:
-            vs_ly_decimal = float(vs_ly_pct)
-            result['last_year'] = current_parsed / (1 + vs_ly_decimal)
-        except:
-            result['last_year'] = None
-    else:
-        result['last_year'] = None
-    
-    # Calculer la valeur de la semaine dernière
-    if vs_lw_pct is not None:
-        try:
-            vs_lw_decimal = float(vs_lw_pct)
-            result['last_week'] = current_parsed / (1 + vs_lw_decimal)
-        except:
-            result['last_week'] = None
-    else:
-        result['last_week'] = None
-    
-    return result
-
-
-def generate_historical_weeks(base_week_data, num_weeks=52):
-    """
-    Génère des semaines historiques en inférant les valeurs à partir des variations
-    
-    Args:
-        base_week_data: Données de la semaine actuelle
-        num_weeks: Nombre de semaines historiques à générer
-    
-    Returns:
-        tuple: (weeks_list, historical_data)
-    """
-    from datetime import datetime, timedelta
-    
-    # Récupérer la semaine de base
-    base_week = base_week_data['weeks'][0]
-    base_date = datetime.strptime(base_week['startDate'], '%Y-%m-%d')
-    
-    # Générer les semaines historiques
-    weeks_list = []
-    for i in range(num_weeks):
-        week_date = base_date - timedelta(weeks=i)
-        week_id = f"week_{i+1}"
-        week_label = f"{week_date.year}-W{week_date.isocalendar()[1]:02d}"
-        
-        weeks_list.append({
-            'id': week_id,
-            'label': week_label,
-            'startDate': week_date.strftime('%Y-%m-%d'),
-            'status': 'active' if i == 0 else 'archived'
-        })
-    
-    # Calculer les valeurs historiques
-    historical_data = {}
-    
-    for section, metrics in base_week_data['data'].items():
-        historical_data[section] = {}
-        
-        for metric, week_values in metrics.items():
-            historical_data[section][metric] = {}
-            
-            # Valeur actuelle
-            current_value = week_values.get('week_1', '')
-            
-            # Chercher les variations correspondantes
-            vs_ly_metric = None
-            vs_lw_metric = None
-            
-            # Patterns de variations selon les métriques
-            if 'Sessions' in metric:
-                vs_ly_metric = metrics.get('Sessions vs LY', {}).get('week_1')
-                vs_lw_metric = metrics.get('Sessions vs LW', {}).get('week_1')
-            elif 'Revenue' in metric:
-                vs_ly_metric = metrics.get('Revenue vs LY', {}).get('week_1')
-                vs_lw_metric = metrics.get('Revenue vs LW', {}).get('week_1')
-            elif 'Basket' in metric or 'ABV' in metric:
-                vs_ly_metric = metrics.get('ABV vs LY', {}).get('week_1')
-                vs_lw_metric = metrics.get('ABV vs LW', {}).get('week_1')
-            elif 'Conversion' in metric:
-                vs_ly_metric = metrics.get('CR vs LY', {}).get('week_1')
-                vs_lw_metric = metrics.get('CR vs LW', {}).get('week_1')
-            elif 'Bookings' in metric:
-                vs_ly_metric = metrics.get('Bookings vs LY', {}).get('week_1')
-                vs_lw_metric = metrics.get('Bookings vs LW', {}).get('week_1')
-            
-            # Convertir les pourcentages en décimaux
-            vs_ly_pct = None
-            vs_lw_pct = None
-            
-            if vs_ly_metric and vs_ly_metric.strip():
-                try:
-                    vs_ly_pct = float(vs_ly_metric.replace('%', '').replace('+', '')) / 100
-                except:
-                    pass
-            
-            if vs_lw_metric and vs_lw_metric.strip():
-                try:
-                    vs_lw_pct = float(vs_lw_metric.replace('%', '').replace('+', '')) / 100
-                except:
-                    pass
-            
-            # Calculer les valeurs historiques
-            if current_value and current_value.strip():
-                calc_result = calculate_historical_values(current_value, vs_ly_pct, vs_lw_pct)
-                
-                if calc_result:
-                    # Semaine actuelle
-                    historical_data[section][metric]['week_1'] = current_value
-                    
-                    # Semaine dernière (week_2)
-                    if calc_result['last_week'] is not None:
-                        if 'K€' in current_value:
-                            historical_data[section][metric]['week_2'] = f"{calc_result['last_week']/1000:.1f}K€"
-                        elif 'M€' in current_value:
-                            historical_data[section][metric]['week_2'] = f"{calc_result['last_week']/1000000:.1f}M€"
-                        elif '€' in current_value:
-                            historical_data[section][metric]['week_2'] = f"{calc_result['last_week']:.0f}€"
-                        elif 'K' in current_value:
-                            historical_data[section][metric]['week_2'] = f"{calc_result['last_week']/1000:.0f}K"
-                        elif '%' in current_value:
-                            historical_data[section][metric]['week_2'] = f"{calc_result['last_week']*100:.1f}%"
-                        else:
-                            historical_data[section][metric]['week_2'] = f"{calc_result['last_week']:.0f}"
-                    
-                    # Année dernière (approximativement week_53)
-                    if calc_result['last_year'] is not None:
-                        if 'K€' in current_value:
-                            historical_data[section][metric]['week_53'] = f"{calc_result['last_year']/1000:.1f}K€"
-                        elif 'M€' in current_value:
-                            historical_data[section][metric]['week_53'] = f"{calc_result['last_year']/1000000:.1f}M€"
-                        elif '€' in current_value:
-                            historical_data[section][metric]['week_53'] = f"{calc_result['last_year']:.0f}€"
-                        elif 'K' in current_value:
-                            historical_data[section][metric]['week_53'] = f"{calc_result['last_year']/1000:.0f}K"
-                        elif '%' in current_value:
-                            historical_data[section][metric]['week_53'] = f"{calc_result['last_year']*100:.1f}%"
-                        else:
-                            historical_data[section][metric]['week_53'] = f"{calc_result['last_year']:.0f}"
-            else:
-                # Juste copier la valeur actuelle
-                historical_data[section][metric]['week_1'] = current_value
-    
-    return weeks_list, historical_data
-
-
-def parse_percentage(value):
-    """Parse une valeur de pourcentage en décimal"""
-    if not value or value == '':
-        return None
-    try:
-        # Enlever le % et le signe +
-        clean_value = value.replace('%', '').replace('+', '').strip()
-        return float(clean_value) / 100
-    except:
-        return None
-
-
-def format_value_like_original(calculated_value, original_value):
-    """Formate une valeur calculée dans le même format que l'original"""
-    if not original_value or original_value == '':
-        return ''
-    
-    try:
-        if 'M€' in original_value:
-            return f"{calculated_value/1000000:.1f}M€"
-        elif 'K€' in original_value:
-            return f"{calculated_value/1000:.1f}K€"
-        elif '€' in original_value:
-            return f"{calculated_value:.0f}€"
-        elif 'M' in original_value:
-            return f"{calculated_value/1000000:.1f}M"
-        elif 'K' in original_value:
-            return f"{calculated_value/1000:.0f}K"
-        elif '%' in original_value:
-            return f"{calculated_value*100:.1f}%"
-        else:
-            return f"{calculated_value:.0f}"
-    except:
-        return str(calculated_value)
-
-
 @routes.route('/api/data-history/save', methods=['POST'])
 def api_data_history_save():
-    """Sauvegarde les modifications vers SQLite"""
+    """
+    Sauvegarde un lot de modifications vers SQLite : cellules regroupées par ligne,
+    un UPSERT multi-colonnes par ligne, une transaction (save_data_history_cells).
+    Renvoie un résultat par cellule dans `results`.
+    """
     try:
         data = request.get_json()
         
@@ -1590,47 +1331,36 @@ def api_data_history_save():
             return jsonify({'error': 'Données de changements requises'}), 400
         
         changes = data['changes']
-        updated_count = 0
-        errors = []
+        cells = []
+        for change in changes:
+            week_id = str(change.get('week_id') or '')
+            try:
+                # Parse numeric week_id from "week_X" format
+                actual_week_id = int(week_id[5:] if week_id.startswith('week_') else week_id)
+            except ValueError:
+                actual_week_id = week_id
+            value = change.get('value')
+            cells.append({
+                'section': change.get('section'),
+                'metric': change.get('metric'),
+                'week_id': actual_week_id,
+                'value': parse_edited_value(value, change.get('metric')) if isinstance(value, str) else value
+            })
         
-        with sqlite3.connect("cpfr.db") as conn:
-            for change in changes:
-                try:
-                    section = change.get('section')
-                    metric = change.get('metric')
-                    week_id = change.get('week_id')
-                    value = change.get('value')
-                    
-                    # Parse numeric week_id from "week_X" format
-                    if week_id.startswith('week_'):
-                        actual_week_id = int(week_id.split('_')[1])
-                    else:
-                        actual_week_id = int(week_id)
-                    
-                    # Update appropriate table based on section
-                    if section == 'SLIDE_31_GLOBAL':
-                        update_weekly_summary(conn, actual_week_id, metric, value)
-                    elif section == 'SLIDE_31_OFFERS':
-                        update_offers_focus(conn, actual_week_id, metric, value)
-                    elif section == 'SLIDE_31_BOOKINGS':
-                        update_bookings_details(conn, actual_week_id, metric, value)
-                    elif section in ['SEA', 'SEO', 'OM', 'CRM']:
-                        update_acquisition_channel(conn, actual_week_id, section, metric, value)
-                    elif section == 'SEO_DETAIL':
-                        update_seo_detail(conn, actual_week_id, metric, value)
-                    
-                    updated_count += 1
-                    
-                except Exception as e:
-                    errors.append(f"Erreur pour {section}.{metric}: {str(e)}")
-            
-            conn.commit()
+        results = save_data_history_cells(cells, data.get('client_id'))
+        errors = []
+        for change, result in zip(changes, results):
+            result.update(section=change.get('section'), metric=change.get('metric'), week_id=change.get('week_id'))
+            if result['status'] == 'error':
+                errors.append(f"Erreur pour {change.get('section')}.{change.get('metric')}: {result.get('error')}")
+        updated_count = len(results) - len(errors)
         
         return jsonify({
             'success': True,
             'message': f'{updated_count} modifications sauvegardées',
             'updated_count': updated_count,
-            'errors': errors if errors else None
+            'errors': errors if errors else None,
+            'results': results
         })
         
     except Exception as e:
@@ -1683,168 +1413,206 @@ def parse_edited_value(value, metric):
         return value  # Retourner tel quel si pas numérique
 
 
-def update_weekly_summary(conn, week_id, metric, value):
-    """Met à jour une métrique dans weekly_summary"""
-    parsed_value = parse_edited_value(value, metric)
-    
-    column_map = {
-        'Sessions': 'sessions',
-        'Revenue B2C': 'revenue_b2c',
-        'Average Basket': 'average_basket_value',
-        'Conversion Rate': 'conversion_rate',
-        'Bookings': 'nb_bookings',
-        'Sessions vs LY': 'vs_ly_sessions',
-        'Sessions vs LW': 'vs_lw_sessions',
-        'Revenue vs LY': 'vs_ly_revenue',
-        'Revenue vs LW': 'vs_lw_revenue',
-        'ABV vs LY': 'vs_ly_abv',
-        'ABV vs LW': 'vs_lw_abv',
-        'CR vs LY': 'vs_ly_cr',
-        'CR vs LW': 'vs_lw_cr',
-        'Bookings vs LY': 'vs_ly_bookings',
-        'Bookings vs LW': 'vs_lw_bookings'
-    }
-    
-    if metric in column_map:
-        column = column_map[metric]
-        conn.execute(f"""
-            UPDATE weekly_summary 
-            SET {column} = ? 
-            WHERE week_id = ?
-        """, (parsed_value, week_id))
-
-
-def update_offers_focus(conn, week_id, metric, value):
-    """Met à jour une métrique dans offers_focus"""
-    parsed_value = parse_edited_value(value, metric)
-    
-    column_map = {
-        'Last Minute %': 'last_minute_pct',
-        'Early Booking %': 'early_booking_pct',
-        'Summer Flash Revenue': 'summer_flash_revenue',
-        'Summer Flash Bookings': 'summer_flash_bookings',
-        'Summer Flash ABV': 'summer_flash_abv',
-        'Lead Gen Revenue': 'lead_gen_revenue',
-        'Lead Gen Bookings': 'lead_gen_bookings'
-    }
-    
-    if metric in column_map:
-        column = column_map[metric]
-        conn.execute(f"""
-            UPDATE offers_focus 
-            SET {column} = ? 
-            WHERE week_id = ?
-        """, (parsed_value, week_id))
-
-
-def update_bookings_details(conn, week_id, metric, value):
-    """Met à jour une métrique dans bookings_details"""
-    parsed_value = parse_edited_value(value, metric)
-    
-    column_map = {
-        'July %': 'month_july_pct',
-        'August %': 'month_august_pct',
-        'September %': 'month_sept_pct',
-        'Stay 2N %': 'length_2n_pct',
-        'Stay 3N %': 'length_3n_pct',
-        'Stay 4N+ %': 'length_4n_pct'
-    }
+@routes.route('/api/data-history/documents/<doc_id>/updates', methods=['POST'])
+def api_document_append_update(doc_id):
+    """
+    Ajoute une mise à jour Yjs incrémentale au journal du document.
+    Corps: binaire brut (application/octet-stream, client via ?client_id=)
+    ou JSON {"update": "<base64>", "client_id": "..."}
+    """
+    try:
+        if request.is_json:
+            data = request.get_json() or {}
+            update = base64.b64decode(data.get('update') or '', validate=True)
+            client_id = data.get('client_id')
+        else:
+            update = request.get_data()
+            client_id = request.args.get('client_id')
+    except ValueError:
+        return jsonify({'error': 'Mise à jour base64 invalide'}), 400
+    if not update:
+        return jsonify({'error': 'Mise à jour vide'}), 400
     
-    if metric in column_map:
-        column = column_map[metric]
-        conn.execute(f"""
-            UPDATE bookings_details 
-            SET {column} = ? 
-            WHERE week_id = ?
-        """, (parsed_value, week_id))
-
-
-def update_acquisition_channel(conn, week_id, channel_code, metric, value):
-    """Met à jour une métrique dans acquisition_channels"""
-    parsed_value = parse_edited_value(value, metric)
+    seq = append_document_update(doc_id, update, client_id)
+    if seq is None:
+        return jsonify({'error': "Impossible d'enregistrer la mise à jour"}), 500
     
-    column_map = {
-        'Sessions WoW': 'wow_sessions',
-        'Sessions YoY': 'yoy_sessions',
-        'Bookings WoW': 'wow_bookings',
-        'Bookings YoY': 'yoy_bookings',
-        'Revenue WoW': 'wow_revenue',
-        'Revenue YoY': 'yoy_revenue',
-        'Costs WoW': 'wow_costs',
-        'Costs YoY': 'yoy_costs',
-        'CVR vs LW': 'cvr_vs_lw',
-        'CVR vs LY': 'cvr_vs_ly'
-    }
+    from modules.compactor import ensure_started
+    ensure_started()
+    return jsonify({'doc_id': doc_id, 'seq': seq}), 201
+
+
+@routes.route('/api/data-history/documents/<doc_id>/updates', methods=['GET'])
+def api_document_updates_since(doc_id):
+    """
+    Mises à jour postérieures à ?since=N (base64). Si le journal a été compacté
+    au-delà de N, l'état compacté est fourni dans `state`.
+    """
+    since = request.args.get('since', 0, type=int)
+    result = get_document_updates_since(doc_id, since)
+    if result is None:
+        return jsonify({'error': 'Document non trouvé'}), 404
     
-    if metric in column_map:
-        column = column_map[metric]
-        
-        # Get channel_id
-        cursor = conn.execute("SELECT id FROM dim_channel WHERE channel_code = ?", (channel_code,))
-        result = cursor.fetchone()
-        if result:
-            channel_id = result[0]
-            conn.execute(f"""
-                UPDATE acquisition_channels 
-                SET {column} = ? 
-                WHERE week_id = ? AND channel_id = ?
-            """, (parsed_value, week_id, channel_id))
-
-
-def update_seo_detail(conn, week_id, metric, value):
-    """Met à jour une métrique dans channel_seo_detail"""
-    parsed_value = parse_edited_value(value, metric)
+    encode = lambda blob: base64.b64encode(blob).decode('ascii') if blob else None
+    result['state'] = encode(result['state'])
+    for update in result['updates']:
+        update['update'] = encode(update['update'])
+    return jsonify(result)
+
+
+@routes.route('/api/data-history/documents/<doc_id>/versions')
+def api_document_versions(doc_id):
+    """Historique des versions d'un document (?limit=20, pagination ?before=<version>)"""
+    limit = min(request.args.get('limit', 20, type=int), 200)
+    before = request.args.get('before', type=int)
+    return jsonify({'doc_id': doc_id, 'versions': get_document_history(doc_id, limit, before)})
+
+
+@routes.route('/api/data-history/documents/<doc_id>/versions/<int:version>')
+def api_document_version(doc_id, version):
+    """État Yjs (base64) d'un document à une version donnée"""
+    from modules.compactor import merge_updates
+    if merge_updates is None:
+        return jsonify({'error': "pycrdt n'est pas installé : reconstruction impossible"}), 501
     
-    # Determine segment and column
-    if metric.startswith('Brand '):
-        segment = 'brand'
-        base_metric = metric.replace('Brand ', '')
-    elif metric.startswith('Non-Brand '):
-        segment = 'non_brand'
-        base_metric = metric.replace('Non-Brand ', '')
+    state = get_document_version(doc_id, version, merge_updates)
+    if state is None:
+        return jsonify({'error': 'Version non trouvée ou purgée'}), 404
+    return jsonify({'doc_id': doc_id, 'version': version,
+                    'state': base64.b64encode(state).decode('ascii')})
+
+
+# Export en flux : lignes lues par lots de EXPORT_CHUNK_ROWS, jamais tout le jeu en mémoire
+EXPORT_CHUNK_ROWS = 1000
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv', 'ndjson': 'application/x-ndjson', 'json': 'application/json',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+}
+
+
+def _encode_export(format, columns, chunks):
+    """Lots de lignes -> morceaux de texte CSV / NDJSON / tableau JSON"""
+    if format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for rows in chunks:
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
     else:
-        return
-    
-    column_map = {
-        'Impressions YoY': 'impressions_yoy',
-        'Clicks YoY': 'clicks_yoy',
-        'CTR YoY': 'ctr_yoy',
-        'Avg Position': 'avg_position'
-    }
-    
-    if base_metric in column_map:
-        column = column_map[base_metric]
-        conn.execute(f"""
-            UPDATE channel_seo_detail 
-            SET {column} = ? 
-            WHERE week_id = ? AND segment = ?
-        """, (parsed_value, week_id, segment))
+        separator = ''
+        if format == 'json':
+            yield '['
+        for rows in chunks:
+            records = [json.dumps(dict(zip(columns, row)), ensure_ascii=False) for row in rows]
+            if format == 'json':
+                yield separator + ','.join(records)
+                separator = ','
+            else:
+                yield '\n'.join(records) + '\n'
+        if format == 'json':
+            yield ']'
+
+
+def _history_sheet_rows(section, metrics, date_from, date_to):
+    """Une ligne par semaine (date, libellé, valeur de chaque métrique), lue en flux depuis le pivot"""
+    _, chunks = iter_export_rows('history', date_from, date_to, [section], EXPORT_CHUNK_ROWS)
+    column_of = {metric: i for i, metric in enumerate(metrics)}
+    current, row = None, None
+    for rows in chunks:
+        for week_start_date, week_label, _, metric, value, _ in rows:
+            if week_start_date != current:
+                if row is not None:
+                    yield row
+                current = week_start_date
+                row = [datetime.strptime(week_start_date, '%Y-%m-%d').date(), week_label] + [None] * len(metrics)
+            if metric in column_of:
+                row[2 + column_of[metric]] = value
+    if row is not None:
+        yield row
+
+
+def _xlsx_sheets(dataset, date_from, date_to, sections):
+    """Historique : une feuille par section (formats €/%/K) ; table de faits : une feuille brute"""
+    if dataset != 'history':
+        columns, chunks = iter_export_rows(dataset, date_from, date_to, sections, EXPORT_CHUNK_ROWS)
+        rows = ([datetime.strptime(row[0], '%Y-%m-%d').date(), *row[1:]] for batch in chunks for row in batch)
+        return [Sheet(dataset, columns, ['date'] + [None] * (len(columns) - 1), rows)]
+    check_export_sections(dataset, sections)
+    return [
+        Sheet(section,
+              ['Semaine', 'Label'] + [metric for metric, _, _ in metrics],
+              ['date', None] + [kind for _, _, kind in metrics],
+              _history_sheet_rows(section, [metric for metric, _, _ in metrics], date_from, date_to))
+        for section, (_, metrics) in DATA_HISTORY_SECTIONS.items()
+        if not sections or section in sections
+    ]
+
+
+def _gzip_stream(parts):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 : en-tête gzip
+    for part in parts:
+        data = compressor.compress(part.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
 
 
 @routes.route('/api/data-history/export/<format>')
 def api_data_history_export(format):
-    """Exporte les données en différents formats"""
+    """
+    Exporte en flux l'historique Data History (semaine × métrique) ou une table de faits brute.
+    Paramètres: ?dataset=history|weekly_summary|acquisition_channels|..., ?from=YYYY-MM-DD, ?to=,
+    ?sections=SLIDE_31_GLOBAL,SEA (codes canal pour les tables par canal, refusé pour les autres tables).
+    Dates ou sections invalides : 400. Compressé en gzip si le client l'accepte.
+    """
+    if format not in EXPORT_MIMETYPES:
+        return jsonify({'error': 'Format non supporté'}), 400
+    
+    dataset = request.args.get('dataset', 'history')
     try:
-        if format not in ['csv', 'json', 'xlsx']:
-            return jsonify({'error': 'Format non supporté'}), 400
-        
-        # TODO: Récupérer les données réelles depuis la base collaborative
-        # Pour l'instant, on retourne un exemple
-        
-        if format == 'json':
-            return jsonify({
-                'format': 'json',
-                'data': 'export_data_placeholder',
-                'generated_at': json.dumps(datetime.now(), default=str)
-            })
-        
-        return jsonify({
-            'format': format,
-            'message': f'Export {format.upper()} en cours de développement'
-        })
-        
+        date_from, date_to = (
+            datetime.strptime(request.args[name], '%Y-%m-%d').date().isoformat() if request.args.get(name) else None
+            for name in ('from', 'to')
+        )
+    except ValueError:
+        return jsonify({'error': 'Dates from / to invalides (format YYYY-MM-DD attendu)'}), 400
+    if date_from and date_to and date_from > date_to:
+        return jsonify({'error': 'La date from doit précéder la date to'}), 400
+    sections = None
+    if 'sections' in request.args:
+        sections = [s.strip() for s in request.args['sections'].split(',') if s.strip()]
+        if not sections:
+            return jsonify({'error': 'Paramètre sections vide'}), 400
+    try:
+        if format == 'xlsx':
+            sheets = _xlsx_sheets(dataset, date_from, date_to, sections)
+        else:
+            columns, chunks = iter_export_rows(dataset, date_from, date_to, sections, EXPORT_CHUNK_ROWS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    
+    filename = '_'.join(['cpfr', dataset] + [d for d in (date_from, date_to) if d])
+    headers = {
+        'Content-Disposition': f'attachment; filename="{filename}.{format}"',
+        'Cache-Control': 'no-cache',
+        'Vary': 'Accept-Encoding'
+    }
+    if format == 'xlsx':
+        # Déjà compressé (zip) : pas de gzip par-dessus
+        return Response(stream_with_context(stream_xlsx(sheets)), mimetype=EXPORT_MIMETYPES[format], headers=headers)
+    body = _encode_export(format, columns, chunks)
+    if 'gzip' in request.accept_encodings:
+        body = _gzip_stream(body)
+        headers['Content-Encoding'] = 'gzip'
+    else:
+        body = (part.encode('utf-8') for part in body)
+    return Response(stream_with_context(body), mimetype=EXPORT_MIMETYPES[format], headers=headers)
 
 
 # ============================================================================
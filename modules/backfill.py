@@ -0,0 +1,240 @@
+"""
+backfill.py
+
+Chargement en masse de decks CPFR historiques (un deck = une semaine).
+
+Pour chaque fichier, la semaine est déduite :
+    1. du nom de fichier (date 2025-07-14 / 20250714 / 14.07.2025, ou semaine ISO 2025-W29 / W29_2025)
+    2. à défaut, de la date de modification des propriétés du document
+puis ramenée au lundi. Le parsing tourne dans un pool de processus ; l'écriture
+reste séquentielle (un seul writer SQLite) via ingest_weekly_data, une semaine à la fois.
+Les decks déjà parsés à l'identique (parse_cache) ne sont pas re-parsés, mais toujours ré-ingérés.
+
+Usage:
+    python -m modules.backfill archives/cpfr/
+    python -m modules.backfill "archives/**/CPFR_*.pptx" --workers 8 --db cpfr.db
+    python -m modules.backfill archives/ --dry-run --pattern-stats
+"""
+
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from . import database
+
+_DATE_PATTERNS = [
+    # 2025-07-14, 2025_07_14, 2025.07.14, 20250714
+    (re.compile(r"(?<!\d)(20\d{2})[-_.]?(0[1-9]|1[0-2])[-_.]?(0[1-9]|[12]\d|3[01])(?!\d)"), ("y", "m", "d")),
+    # 14-07-2025, 14.07.2025, 14_07_2025
+    (re.compile(r"(?<!\d)(0[1-9]|[12]\d|3[01])[-_.](0[1-9]|1[0-2])[-_.](20\d{2})(?!\d)"), ("d", "m", "y")),
+]
+
+_ISO_WEEK_PATTERNS = [
+    # 2025-W29, 2025W29, 2025_S29
+    (re.compile(r"(?<!\d)(20\d{2})[-_ ]?[WwSs](0?[1-9]|[1-4]\d|5[0-3])(?!\d)"), ("y", "w")),
+    # W29_2025, S29-2025, W29 2025
+    (re.compile(r"(?<![A-Za-z0-9])[WwSs](0?[1-9]|[1-4]\d|5[0-3])[-_ ]?(20\d{2})(?!\d)"), ("w", "y")),
+]
+
+
+def monday_of(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def week_from_filename(filename: str) -> Optional[date]:
+    """Lundi de la semaine encodée dans le nom de fichier, ou None."""
+    stem = Path(filename).stem
+    for pattern, order in _DATE_PATTERNS:
+        m = pattern.search(stem)
+        if m:
+            parts = dict(zip(order, (int(g) for g in m.groups())))
+            try:
+                return monday_of(date(parts["y"], parts["m"], parts["d"]))
+            except ValueError:
+                continue
+    for pattern, order in _ISO_WEEK_PATTERNS:
+        m = pattern.search(stem)
+        if m:
+            parts = dict(zip(order, (int(g) for g in m.groups())))
+            try:
+                return date.fromisocalendar(parts["y"], parts["w"], 1)
+            except ValueError:
+                continue
+    return None
+
+
+def resolve_week(path: str, deck) -> Optional[str]:
+    """Semaine (YYYY-MM-DD, lundi) d'un deck : nom de fichier puis date de modification."""
+    week = week_from_filename(os.path.basename(path))
+    if week is None:
+        modified = deck.core_properties.modified
+        if isinstance(modified, datetime):
+            week = monday_of(modified.date())
+    return week.strftime("%Y-%m-%d") if week else None
+
+
+def collect_files(sources: List[str], recursive: bool = False) -> List[str]:
+    """Développe dossiers et motifs glob en une liste triée et dédoublonnée de .pptx."""
+    found = set()
+    for source in sources:
+        if os.path.isdir(source):
+            pattern = "**/*.pptx" if recursive else "*.pptx"
+            found.update(str(p) for p in Path(source).glob(pattern))
+        elif any(ch in source for ch in "*?["):
+            found.update(glob.glob(source, recursive=True))
+        elif os.path.isfile(source):
+            found.add(source)
+    # Fichiers de verrouillage Office (~$deck.pptx)
+    return sorted(f for f in found if f.lower().endswith(".pptx") and not os.path.basename(f).startswith("~$"))
+
+
+def parse_deck_file(path: str, slide_31: int = 31, slide_32: int = 32,
+                    db_path: Optional[str] = None) -> Dict[str, Any]:
+    """Exécuté dans le pool : déduit la semaine et parse le deck (la base n'est lue que pour le cache)."""
+    from .cpfr_unified_parser import PARSER_VERSION, parse_and_validate_cpfr
+    from .cpfr_patterns import PATTERNS
+    from .jobs import file_sha256
+    from .pptx_deck import open_deck
+
+    t0 = time.perf_counter()
+    outcome = {"path": path, "week_start_date": None, "payload": None, "error": None, "warnings": [],
+               "sha256": None, "cached": False, "pattern_counters": {}}
+    try:
+        outcome["sha256"] = file_sha256(path)
+        if db_path:
+            database.DB_PATH = Path(db_path)
+            cached = database.get_cached_parse(outcome["sha256"], slide_31, slide_32, PARSER_VERSION)
+            if cached is not None:
+                # Semaine du nom de fichier en priorité : une copie renommée vise une autre semaine
+                week = week_from_filename(os.path.basename(path))
+                week = week.strftime("%Y-%m-%d") if week else cached.get("week_start_date")
+                outcome.update(payload={**cached, "week_start_date": week}, week_start_date=week, cached=True)
+                return outcome
+
+        with open_deck(path, lite=True) as deck:
+            week = resolve_week(path, deck)
+            if not week:
+                outcome["error"] = "semaine introuvable (nom de fichier et propriétés du document)"
+                return outcome
+            outcome["week_start_date"] = week
+
+            # Compteurs de motifs du deck seul, fusionnés par le processus parent
+            PATTERNS.reset_stats()
+            result = parse_and_validate_cpfr(deck, slide_31, slide_32, week)
+            outcome["pattern_counters"] = PATTERNS.counters()
+            if result["success"]:
+                outcome["payload"] = result["db_payload"]
+                outcome["warnings"] = result["validation"].get("errors", [])
+            else:
+                outcome["error"] = result.get("error", "Erreur inconnue")
+    except Exception as e:
+        outcome["error"] = str(e)
+    finally:
+        outcome["parse_ms"] = (time.perf_counter() - t0) * 1000
+    return outcome
+
+
+def backfill(files: List[str], workers: Optional[int] = None, slide_31: int = 31, slide_32: int = 32,
+             dry_run: bool = False, out=sys.stdout) -> Dict[str, Any]:
+    """
+    Parse les fichiers en parallèle et ingère chaque semaine au fil de l'eau.
+
+    Returns:
+        Dict avec les compteurs (ok, failed), la durée et la liste des échecs
+    """
+    from .cpfr_patterns import PATTERNS
+    from .cpfr_unified_parser import PARSER_VERSION
+
+    PATTERNS.reset_stats()
+    stats = {"files": len(files), "ok": 0, "cached": 0, "failed": 0, "weeks": {}, "failures": [], "elapsed_s": 0.0}
+    t_start = time.perf_counter()
+    db_path = None if dry_run else str(Path(database.DB_PATH).resolve())
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(parse_deck_file, f, slide_31, slide_32, db_path) for f in files]
+        for future in as_completed(futures):
+            outcome = future.result()
+            path, week = outcome["path"], outcome["week_start_date"]
+            PATTERNS.merge(outcome["pattern_counters"])
+
+            if outcome["error"]:
+                stats["failed"] += 1
+                stats["failures"].append((path, outcome["error"]))
+                print(f"FAIL {path}: {outcome['error']}", file=out)
+                continue
+
+            ingest_ms = 0.0
+            if not dry_run:
+                t0 = time.perf_counter()
+                result = database.ingest_weekly_data(outcome["payload"])
+                ingest_ms = (time.perf_counter() - t0) * 1000
+                if not result.get("success"):
+                    error = ", ".join(map(str, result.get("errors") or [result.get("error", "Erreur inconnue")]))
+                    stats["failed"] += 1
+                    stats["failures"].append((path, f"ingestion: {error}"))
+                    print(f"FAIL {path}: ingestion: {error}", file=out)
+                    continue
+                if not outcome["cached"]:
+                    database.store_cached_parse(outcome["sha256"], slide_31, slide_32, PARSER_VERSION,
+                                                outcome["payload"])
+
+            if week in stats["weeks"]:
+                print(f"WARN {path}: semaine {week} déjà chargée depuis {stats['weeks'][week]} (écrasée)", file=out)
+            stats["weeks"][week] = path
+            stats["ok"] += 1
+            if outcome["cached"]:
+                stats["cached"] += 1
+            warnings = f" [{'; '.join(outcome['warnings'])}]" if outcome["warnings"] else ""
+            parse = "cache" if outcome["cached"] else f"parse {outcome['parse_ms']:.0f} ms"
+            print(f"OK   {week} {path} ({parse}, ingest {ingest_ms:.0f} ms){warnings}", file=out)
+
+    stats["elapsed_s"] = time.perf_counter() - t_start
+    return stats
+
+
+def cli(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Backfill de decks CPFR historiques dans la base.")
+    ap.add_argument("sources", nargs="+", help="Dossier(s), fichier(s) ou motif(s) glob de .pptx.")
+    ap.add_argument("--recursive", action="store_true", help="Parcourir les sous-dossiers.")
+    ap.add_argument("--workers", type=int, default=None, help="Processus de parsing (défaut: nb de CPU).")
+    ap.add_argument("--slide-summary", type=int, default=31, help="Slide de résumé (défaut: 31).")
+    ap.add_argument("--slide-acquisition", type=int, default=32, help="Slide d'acquisition (défaut: 32).")
+    ap.add_argument("--db", type=str, default=None, help="Base SQLite cible (défaut: DB_PATH).")
+    ap.add_argument("--dry-run", action="store_true", help="Parser uniquement, sans écrire en base.")
+    ap.add_argument("--pattern-stats", action="store_true",
+                    help="Afficher le coût des expressions régulières des parsers (appels, hits, temps).")
+    args = ap.parse_args(argv)
+
+    if args.db:
+        database.DB_PATH = Path(args.db)
+    files = collect_files(args.sources, recursive=args.recursive)
+    if not files:
+        print("Aucun fichier .pptx trouvé.", file=sys.stderr)
+        return 1
+
+    if not args.dry_run:
+        database.init_db()
+
+    stats = backfill(files, workers=args.workers, slide_31=args.slide_summary,
+                     slide_32=args.slide_acquisition, dry_run=args.dry_run)
+
+    rate = stats["files"] / stats["elapsed_s"] if stats["elapsed_s"] else 0.0
+    print(f"\n{stats['ok']}/{stats['files']} decks chargés ({len(stats['weeks'])} semaines), "
+          f"dont {stats['cached']} sans re-parsing, {stats['failed']} échecs en {stats['elapsed_s']:.1f} s ({rate:.1f} decks/s)")
+    for path, error in stats["failures"]:
+        print(f"  - {path}: {error}")
+    if args.pattern_stats:
+        from .cpfr_patterns import PATTERNS
+        print("\n" + PATTERNS.report())
+    return 0 if stats["failed"] == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
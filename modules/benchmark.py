@@ -0,0 +1,193 @@
+"""
+benchmark.py
+
+Banc de mesure des parsers et de l'ingestion sur des decks synthétiques (synthetic_deck).
+
+Pour chaque taille de deck, chronomètre :
+    - parse_cpfr_presentation (slides de résumé + acquisition)
+    - extract_cpfr_pptx (extraction legacy)
+    - get_slide_info (métadonnées du deck)
+    - ingest_weekly_data (écriture d'une semaine dans une base temporaire)
+et mesure le pic mémoire Python (tracemalloc, passe séparée pour ne pas fausser les temps).
+Le rapport JSON peut servir de référence : --baseline signale (code retour 1) les
+mesures plus lentes que la référence au-delà de --tolerance.
+
+Usage:
+    python -m modules.benchmark --slides 32,100,200 --repeat 5 --media-kb 2048 --out bench.json
+    python -m modules.benchmark --baseline bench.json --tolerance 0.25
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from . import database
+from .cpfr_unified_parser import build_unified_db_payload, parse_cpfr_presentation
+from .pptx_deck import open_deck
+from .pptx_utils import extract_cpfr_pptx, get_slide_info
+from .synthetic_deck import cpfr_positions, generate_deck
+
+BENCHMARKS = ("parse_cpfr_presentation", "extract_cpfr_pptx", "get_slide_info", "ingest_weekly_data")
+
+
+def _operations(path: str, summary: int, acquisition: int, lite: bool) -> Dict[str, Callable[[int], Any]]:
+    """Opérations mesurées ; chacune reçoit le numéro d'itération (semaine ingérée)."""
+    payload = build_unified_db_payload(parse_cpfr_presentation(path, summary, acquisition, "2025-01-06"))
+
+    def parse(i: int):
+        if not lite:
+            return parse_cpfr_presentation(path, summary, acquisition, "2025-01-06")
+        with open_deck(path, lite=True) as deck:
+            return parse_cpfr_presentation(deck, summary, acquisition, "2025-01-06")
+
+    def ingest(i: int):
+        week = (date(2025, 1, 6) + timedelta(weeks=i)).isoformat()
+        result = database.ingest_weekly_data(dict(payload, week_start_date=week))
+        if not result["success"]:
+            raise RuntimeError(result.get("error"))
+
+    return {
+        "parse_cpfr_presentation": parse,
+        "extract_cpfr_pptx": lambda i: extract_cpfr_pptx(path, summary, acquisition),
+        "get_slide_info": lambda i: get_slide_info(path),
+        "ingest_weekly_data": ingest,
+    }
+
+
+def _measure(operation: Callable[[int], Any], repeat: int, offset: int) -> Dict[str, float]:
+    timings = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        operation(offset + i)
+        timings.append((time.perf_counter() - t0) * 1000)
+
+    tracemalloc.start()
+    try:
+        operation(offset + repeat)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    mean_ms = statistics.fmean(timings)
+    return {
+        "runs": repeat,
+        "mean_ms": round(mean_ms, 3),
+        "min_ms": round(timings[0], 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        "ops_per_s": round(1000 / mean_ms, 2) if mean_ms else None,
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(slide_counts: List[int], repeat: int = 5, media_kb: int = 0, seed: int = 0,
+                   lite: bool = True, only: List[str] = None) -> Dict[str, Any]:
+    """
+    Génère un deck par taille puis mesure chaque opération.
+
+    Returns:
+        {"environment": {...}, "results": [{"benchmark", "slides", "deck_kb", "mean_ms", ...}]}
+    """
+    results = []
+    previous_db = database.DB_PATH
+    with tempfile.TemporaryDirectory(prefix="cpfr-bench-") as tmp:
+        database.DB_PATH = Path(tmp) / "bench.db"
+        try:
+            database.init_db()
+            for n, slides in enumerate(slide_counts):
+                summary, acquisition = cpfr_positions(slides)
+                path = os.path.join(tmp, f"deck_{slides}.pptx")
+                generate_deck(path, slides, summary, acquisition, media_kb, seed + n)
+                deck_kb = os.path.getsize(path) / 1024
+                operations = _operations(path, summary, acquisition, lite)
+                for name in only or BENCHMARKS:
+                    # Semaines distinctes d'une taille à l'autre : chaque ingestion insère
+                    stats = _measure(operations[name], repeat, offset=n * (repeat + 1))
+                    if name != "ingest_weekly_data" and stats["ops_per_s"]:
+                        stats["mb_per_s"] = round(deck_kb / 1024 * stats["ops_per_s"], 2)
+                    results.append({"benchmark": name, "slides": slides, "deck_kb": round(deck_kb, 1), **stats})
+        finally:
+            database.close_connections()
+            database.DB_PATH = previous_db
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "lite": lite,
+            "media_kb": media_kb,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.25) -> List[Dict[str, Any]]:
+    """Mesures dont le temps moyen dépasse celui de la référence de plus de `tolerance`."""
+    reference = {(r["benchmark"], r["slides"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in report["results"]:
+        ref = reference.get((result["benchmark"], result["slides"]))
+        if ref and ref["mean_ms"] and result["mean_ms"] > ref["mean_ms"] * (1 + tolerance):
+            regressions.append({
+                "benchmark": result["benchmark"],
+                "slides": result["slides"],
+                "baseline_ms": ref["mean_ms"],
+                "mean_ms": result["mean_ms"],
+                "ratio": round(result["mean_ms"] / ref["mean_ms"], 2),
+            })
+    return regressions
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def cli(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark des parsers CPFR et de l'ingestion (rapport JSON).")
+    ap.add_argument("--slides", type=_int_list, default=[32, 100, 200],
+                    help="Tailles de deck, séparées par des virgules (défaut: 32,100,200).")
+    ap.add_argument("--repeat", type=int, default=5, help="Itérations chronométrées par mesure (défaut: 5).")
+    ap.add_argument("--media-kb", type=int, default=0, help="Poids des images par deck (Ko).")
+    ap.add_argument("--seed", type=int, default=0, help="Graine des decks générés.")
+    ap.add_argument("--full", action="store_true", help="Parser avec python-pptx au lieu du lecteur allégé.")
+    ap.add_argument("--only", type=lambda v: v.split(","), default=None,
+                    help=f"Sous-ensemble de mesures parmi {','.join(BENCHMARKS)}.")
+    ap.add_argument("--out", type=str, default=None, help="Fichier JSON de sortie (défaut: stdout).")
+    ap.add_argument("--baseline", type=str, default=None, help="Rapport JSON de référence à comparer.")
+    ap.add_argument("--tolerance", type=float, default=0.25,
+                    help="Ralentissement toléré par rapport à la référence (défaut: 0.25 = +25%%).")
+    args = ap.parse_args(argv)
+
+    unknown = set(args.only or []) - set(BENCHMARKS)
+    if unknown:
+        ap.error(f"Mesures inconnues : {', '.join(sorted(unknown))}")
+
+    report = run_benchmarks(args.slides, args.repeat, args.media_kb, args.seed, not args.full, args.only)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            report["regressions"] = compare(report, json.load(fh), args.tolerance)
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+
+    if report.get("regressions"):
+        print(f"{len(report['regressions'])} régression(s) au-delà de +{args.tolerance:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(cli())
@@ -0,0 +1,229 @@
+"""
+collab_server.py
+
+Relais WebSocket (asyncio) pour l'édition collaborative de Data History.
+
+Service autonome lancé à côté de l'application Flask, compatible avec le
+provider `y-websocket` du navigateur : l'URL `ws://<hôte>:3001/<doc_id>` ouvre la
+salle du document `doc_id`. Le relais tient une copie pycrdt du document par salle :
+
+    - à la connexion : échange SYNC_STEP1 / SYNC_STEP2 (le client ne reçoit que ce
+      qui lui manque)
+    - chaque mise à jour reçue est appliquée puis diffusée aux autres clients de la
+      salle ; l'awareness (curseurs, présence) est relayée sans être stockée
+    - la persistance est regroupée : les mises à jour accumulées pendant
+      CPFR_COLLAB_FLUSH_MS sont fusionnées et ajoutées en une ligne au journal
+      `collaborative_document_updates` (append_document_update), replié ensuite
+      dans `collaborative_documents.state` par le compacteur
+
+L'état initial d'une salle est chargé depuis `collaborative_documents` (état
+compacté + journal). La salle est libérée, après un dernier flush, quand son
+dernier client se déconnecte ; un client qui arrive pendant ce flush attend
+qu'il soit écrit avant de recharger le document.
+
+Dépendances : websockets, pycrdt.
+
+Configuration (variables d'environnement):
+    CPFR_COLLAB_HOST      Adresse d'écoute (défaut: 127.0.0.1)
+    CPFR_COLLAB_PORT      Port d'écoute (défaut: 3001)
+    CPFR_COLLAB_FLUSH_MS  Intervalle d'écriture groupée en base (défaut: 250)
+
+Usage:
+    python -m modules.collab_server --port 3001 --db cpfr.db
+"""
+
+import argparse
+import asyncio
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from . import compactor, database
+
+try:
+    from pycrdt import (Doc, YMessageType, create_sync_message, create_update_message,
+                        handle_sync_message, merge_updates)
+    from websockets.asyncio.server import broadcast, serve
+except ImportError:  # service indisponible sans websockets / pycrdt
+    serve = None
+
+COLLAB_HOST = os.environ.get("CPFR_COLLAB_HOST", "127.0.0.1")
+COLLAB_PORT = int(os.environ.get("CPFR_COLLAB_PORT", "3001"))
+FLUSH_INTERVAL = int(os.environ.get("CPFR_COLLAB_FLUSH_MS", "250")) / 1000
+RELAY_CLIENT_ID = "collab-relay"
+
+
+class Room:
+    """Salle d'un document : copie pycrdt, clients connectés et mises à jour à persister."""
+
+    def __init__(self, doc_id: str):
+        self.doc_id = doc_id
+        self.doc = Doc()
+        self.clients: Set = set()
+        self.pending: List[bytes] = []
+        self.origin = None
+        self.ready = asyncio.Event()
+        self.failed = False
+        self.closing: Optional[asyncio.Event] = None  # posé au départ du dernier client, levé après le flush final
+        self._flusher: Optional[asyncio.Task] = None
+        self._subscription = None
+
+    async def load(self):
+        """Charge l'état persistant (état compacté + journal) puis écoute les modifications."""
+        stored = await asyncio.to_thread(database.get_document_updates_since, self.doc_id, 0)
+        if stored:
+            for update in ([stored["state"]] if stored["state"] else []) + [u["update"] for u in stored["updates"]]:
+                self.doc.apply_update(bytes(update))
+        self._subscription = self.doc.observe(self._on_update)
+        self._flusher = asyncio.create_task(self._flush_loop())
+        self.ready.set()
+
+    def _on_update(self, event):
+        # Une mise à jour déjà connue n'émet pas d'événement : rien n'est relayé deux fois
+        self.pending.append(event.update)
+        broadcast(self.clients - {self.origin}, create_update_message(event.update))
+
+    def handle(self, websocket, message: bytes):
+        if message[0] == YMessageType.SYNC:
+            self.origin = websocket
+            try:
+                reply = handle_sync_message(message[1:], self.doc)
+            finally:
+                self.origin = None
+            if reply is not None:
+                broadcast([websocket], reply)
+        elif message[0] == YMessageType.AWARENESS:
+            broadcast(self.clients - {websocket}, message)
+
+    async def flush(self) -> Optional[int]:
+        """Écrit les mises à jour en attente en une seule ligne du journal."""
+        if not self.pending:
+            return None
+        batch, self.pending = self.pending, []
+        merged = merge_updates(*batch) if len(batch) > 1 else batch[0]
+        seq = await asyncio.to_thread(database.append_document_update, self.doc_id, merged, RELAY_CLIENT_ID)
+        if seq is None:
+            self.pending[:0] = batch  # nouvel essai au prochain flush
+        return seq
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            await self.flush()
+
+    async def close(self):
+        if self._flusher:
+            self._flusher.cancel()
+        if self._subscription is not None:
+            self.doc.unobserve(self._subscription)
+        await self.flush()
+
+
+class CollabRelay:
+    """Salles ouvertes du processus, indexées par doc_id (chemin de l'URL)."""
+
+    def __init__(self):
+        self.rooms: Dict[str, Room] = {}
+
+    async def _join(self, doc_id: str, websocket) -> Room:
+        room = self.rooms.get(doc_id)
+        while room is not None and room.closing is not None:
+            # Salle en fermeture : ses dernières mises à jour doivent être en base avant le rechargement
+            await room.closing.wait()
+            room = self.rooms.get(doc_id)
+        if room is None:
+            room = self.rooms[doc_id] = Room(doc_id)
+            try:
+                await room.load()
+            except Exception:
+                # Libère les clients en attente ; la connexion suivante retente le chargement
+                if self.rooms.get(doc_id) is room:
+                    del self.rooms[doc_id]
+                room.failed = True
+                room.ready.set()
+                raise
+        await room.ready.wait()
+        if room.failed:
+            raise RuntimeError(f"chargement du document {doc_id} impossible")
+        room.clients.add(websocket)
+        return room
+
+    async def _leave(self, room: Room, websocket):
+        room.clients.discard(websocket)
+        if not room.clients and room.closing is None and self.rooms.get(room.doc_id) is room:
+            # La salle reste enregistrée pendant le flush final : un nouveau client l'attend
+            room.closing = asyncio.Event()
+            try:
+                await room.close()
+            finally:
+                if self.rooms.get(room.doc_id) is room:
+                    del self.rooms[room.doc_id]
+                room.closing.set()
+
+    async def handler(self, websocket):
+        doc_id = websocket.request.path.strip("/").split("?")[0]
+        if not doc_id:
+            await websocket.close(1008, "doc_id manquant")
+            return
+        try:
+            room = await self._join(doc_id, websocket)
+        except Exception as e:
+            print(f"Erreur lors de l'ouverture de la salle {doc_id}: {e}")
+            await websocket.close(1011, "document indisponible")
+            return
+        try:
+            await websocket.send(create_sync_message(room.doc))
+            async for message in websocket:
+                if isinstance(message, bytes) and message:
+                    room.handle(websocket, message)
+        finally:
+            await self._leave(room, websocket)
+
+    async def close(self):
+        for room in list(self.rooms.values()):
+            await room.close()
+        self.rooms.clear()
+
+
+async def run(host: str = COLLAB_HOST, port: int = COLLAB_PORT, stop: Optional[asyncio.Future] = None,
+              started: Optional[asyncio.Future] = None):
+    """
+    Sert le relais jusqu'à `stop` (ou indéfiniment), puis écrit les mises à jour en attente.
+    `started` reçoit le port effectivement ouvert (utile avec port=0).
+    """
+    relay = CollabRelay()
+    compactor.ensure_started()
+    async with serve(relay.handler, host, port) as server:
+        port = server.sockets[0].getsockname()[1]
+        print(f"Relais collaboratif sur ws://{host}:{port}/<doc_id>")
+        if started is not None:
+            started.set_result(port)
+        try:
+            await (stop if stop is not None else asyncio.get_running_loop().create_future())
+        finally:
+            await relay.close()
+
+
+def cli(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Relais WebSocket de l'édition collaborative Data History.")
+    ap.add_argument("--host", default=COLLAB_HOST, help=f"Adresse d'écoute (défaut: {COLLAB_HOST}).")
+    ap.add_argument("--port", type=int, default=COLLAB_PORT, help=f"Port d'écoute (défaut: {COLLAB_PORT}).")
+    ap.add_argument("--db", type=str, default=None, help="Base SQLite cible (défaut: DB_PATH).")
+    args = ap.parse_args(argv)
+
+    if serve is None:
+        print("websockets et pycrdt sont requis : pip install websockets pycrdt")
+        return 1
+    if args.db:
+        database.DB_PATH = Path(args.db)
+    database.init_db()
+
+    try:
+        asyncio.run(run(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(cli())
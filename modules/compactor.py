@@ -0,0 +1,119 @@
+"""
+compactor.py
+
+Compaction en arrière-plan du journal des documents collaboratifs.
+
+Chaque mise à jour Yjs est ajoutée à `collaborative_document_updates` (append_document_update).
+Un thread démon replie périodiquement le journal des documents qui dépassent
+un seuil dans `collaborative_documents.state` (pycrdt.merge_updates) et
+enregistre un snapshot tous les CPFR_SNAPSHOT_EVERY seq : toute version se
+reconstruit à partir du snapshot le plus proche et d'au plus N deltas. Les
+clients à jour continuent de ne lire que les deltas ; ceux qui ont pris du
+retard reçoivent l'état compacté. La rétention purge ensuite les anciens deltas
+et espace les anciens snapshots (prune_document_history).
+
+Sans pycrdt, la compaction est désactivée : le journal reste lisible et
+complet, il n'est simplement jamais replié.
+
+Configuration (variables d'environnement):
+    CPFR_COMPACT_THRESHOLD  Mises à jour par document avant compaction (défaut: 200)
+    CPFR_COMPACT_INTERVAL   Secondes entre deux passes (défaut: 30)
+    CPFR_SNAPSHOT_EVERY     Seq entre deux snapshots de l'historique (défaut: 100)
+    CPFR_HISTORY_SNAPSHOTS  Snapshots récents conservés avec tous leurs deltas (défaut: 10)
+    CPFR_HISTORY_THIN_EVERY Au-delà, un snapshot conservé sur N (défaut: 10)
+
+Usage:
+    python -m modules.compactor --once --threshold 1 --db cpfr.db
+"""
+
+import argparse
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from . import database
+
+try:
+    from pycrdt import merge_updates
+except ImportError:  # compaction désactivée
+    merge_updates = None
+
+COMPACT_THRESHOLD = int(os.environ.get("CPFR_COMPACT_THRESHOLD", "200"))
+COMPACT_INTERVAL = float(os.environ.get("CPFR_COMPACT_INTERVAL", "30"))
+SNAPSHOT_EVERY = int(os.environ.get("CPFR_SNAPSHOT_EVERY", "100"))
+HISTORY_SNAPSHOTS = int(os.environ.get("CPFR_HISTORY_SNAPSHOTS", "10"))
+HISTORY_THIN_EVERY = int(os.environ.get("CPFR_HISTORY_THIN_EVERY", "10"))
+
+_thread: Optional[threading.Thread] = None
+_stop = threading.Event()
+_lock = threading.Lock()
+
+
+def compact_once(threshold: int = COMPACT_THRESHOLD, merge=None) -> Dict[str, int]:
+    """Une passe (compaction puis rétention) : {doc_id: nombre de mises à jour repliées}."""
+    merge = merge or merge_updates
+    if merge is None:
+        return {}
+    folded = {}
+    for doc_id in database.documents_to_compact(threshold):
+        count = database.compact_document(doc_id, merge, SNAPSHOT_EVERY)
+        if count:
+            folded[doc_id] = count
+            database.prune_document_history(doc_id, HISTORY_SNAPSHOTS, HISTORY_THIN_EVERY, SNAPSHOT_EVERY)
+    return folded
+
+
+def _run(threshold: int, interval: float):
+    while not _stop.wait(interval):
+        compact_once(threshold)
+
+
+def ensure_started(threshold: int = COMPACT_THRESHOLD, interval: float = COMPACT_INTERVAL) -> bool:
+    """Démarre le thread de compaction du processus (une seule fois). False si pycrdt est absent."""
+    global _thread
+    if merge_updates is None:
+        return False
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _stop.clear()
+            _thread = threading.Thread(target=_run, args=(threshold, interval),
+                                       name="collab-compactor", daemon=True)
+            _thread.start()
+    return True
+
+
+def stop(timeout: Optional[float] = None):
+    """Arrête le thread (tests, arrêt propre du serveur)."""
+    global _thread
+    with _lock:
+        _stop.set()
+        if _thread is not None:
+            _thread.join(timeout)
+            _thread = None
+
+
+def cli(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Compaction du journal des documents collaboratifs.")
+    ap.add_argument("--once", action="store_true", help="Une seule passe puis sortie.")
+    ap.add_argument("--threshold", type=int, default=COMPACT_THRESHOLD,
+                    help=f"Mises à jour par document avant compaction (défaut: {COMPACT_THRESHOLD}).")
+    ap.add_argument("--interval", type=float, default=COMPACT_INTERVAL, help="Secondes entre deux passes.")
+    ap.add_argument("--db", type=str, default=None, help="Base SQLite cible (défaut: DB_PATH).")
+    args = ap.parse_args(argv)
+
+    if merge_updates is None:
+        print("pycrdt n'est pas installé : compaction impossible")
+        return 1
+    if args.db:
+        database.DB_PATH = Path(args.db)
+
+    while True:
+        for doc_id, count in compact_once(args.threshold).items():
+            print(f"{doc_id}: {count} mise(s) à jour repliée(s)")
+        if args.once or _stop.wait(args.interval):
+            return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(cli())
@@ -0,0 +1,248 @@
+"""
+cpfr_patterns.py
+
+Registry of every regular expression used by the CPFR parsers
+(cpfr_pptx_parser for the summary slide, cpfr_pptx_parser_acq for the
+acquisition slide). Patterns are declared once, compiled lazily on first use
+and shared by both modules.
+
+Each pattern keeps call / hit / timing counters so a batch run (backfill)
+can show which expressions dominate parse time:
+
+    from modules.cpfr_patterns import PATTERNS
+    PATTERNS.reset_stats()
+    ...  # parse decks
+    print(PATTERNS.report())
+"""
+
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+I = re.I
+IS = re.I | re.S
+
+# Building blocks
+PCT = r"([+-]?\d[\d.,]*)%"          # +50%  -14%  11,5%
+NUM = r"(\d[\d\s.,]*[KkMm]?)"        # 342K  2 475  1,4M
+AMOUNT = r"([\d\s.,]*[KkMm]?)"       # optional leading digit (Summer Flash Sale : 1,4M€)
+VS_VARIATION = r"([+-]\s*\d+[.,]?\d*)%\s*VS\s*(LY|LW)"
+# "label ... +X%": the first percentage following a label, across lines
+AFTER_LABEL_PCT = r".*?" + PCT
+DUAL_PCT = PCT + r"\s*\(WoW\).*?" + PCT + r"\s*\(YoY\)"
+TRIPLE_PCT = PCT + r"\s*visits[^%]*?" + PCT + r"\s*bookings[^%]*?" + PCT + r"\s*revenue"
+
+
+class Pattern:
+    """Compiled-on-demand regex with usage counters."""
+
+    __slots__ = ("name", "source", "flags", "_compiled", "calls", "hits", "total_ns")
+
+    def __init__(self, name: str, source: str, flags: int = 0):
+        self.name = name
+        self.source = source
+        self.flags = flags
+        self._compiled = None
+        self.calls = 0
+        self.hits = 0
+        self.total_ns = 0
+
+    @property
+    def compiled(self) -> "re.Pattern":
+        if self._compiled is None:
+            self._compiled = re.compile(self.source, self.flags)
+        return self._compiled
+
+    def _record(self, start_ns: int, hit: bool):
+        self.total_ns += time.perf_counter_ns() - start_ns
+        self.calls += 1
+        if hit:
+            self.hits += 1
+
+    def search(self, text: str, pos: int = 0) -> Optional["re.Match"]:
+        t0 = time.perf_counter_ns()
+        m = self.compiled.search(text, pos)
+        self._record(t0, m is not None)
+        return m
+
+    def findall(self, text: str) -> List[Any]:
+        t0 = time.perf_counter_ns()
+        found = self.compiled.findall(text)
+        self._record(t0, bool(found))
+        return found
+
+    def sub(self, repl: str, text: str) -> str:
+        t0 = time.perf_counter_ns()
+        out, n = self.compiled.subn(repl, text)
+        self._record(t0, n > 0)
+        return out
+
+    def split(self, text: str) -> List[str]:
+        t0 = time.perf_counter_ns()
+        parts = self.compiled.split(text)
+        self._record(t0, len(parts) > 1)
+        return parts
+
+    def reset(self):
+        self.calls = self.hits = self.total_ns = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "hits": self.hits,
+            "total_ms": self.total_ns / 1e6,
+            "avg_us": (self.total_ns / self.calls / 1e3) if self.calls else 0.0,
+        }
+
+
+class PatternRegistry:
+    """Name -> Pattern mapping shared by the parsers."""
+
+    def __init__(self):
+        self._patterns: Dict[str, Pattern] = {}
+
+    def register(self, name: str, source: str, flags: int = I) -> Pattern:
+        existing = self._patterns.get(name)
+        if existing is not None:
+            if (existing.source, existing.flags) != (source, flags):
+                raise ValueError(f"Pattern '{name}' already registered with a different regex")
+            return existing
+        pattern = self._patterns[name] = Pattern(name, source, flags)
+        return pattern
+
+    def __getitem__(self, name: str) -> Pattern:
+        return self._patterns[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._patterns
+
+    def __iter__(self):
+        return iter(self._patterns.values())
+
+    def compile_all(self):
+        """Force compilation (e.g. before forking workers)."""
+        for pattern in self._patterns.values():
+            pattern.compiled
+
+    def reset_stats(self):
+        for pattern in self._patterns.values():
+            pattern.reset()
+
+    def counters(self) -> Dict[str, Tuple[int, int, int]]:
+        """Raw counters {name: (calls, hits, total_ns)}, picklable (pool workers)."""
+        return {n: (p.calls, p.hits, p.total_ns) for n, p in self._patterns.items() if p.calls}
+
+    def merge(self, counters: Dict[str, Tuple[int, int, int]]):
+        """Add counters collected in another process."""
+        for name, (calls, hits, total_ns) in counters.items():
+            pattern = self._patterns.get(name)
+            if pattern is not None:
+                pattern.calls += calls
+                pattern.hits += hits
+                pattern.total_ns += total_ns
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-pattern counters, most expensive first."""
+        rows = [p.stats() for p in self._patterns.values() if p.calls]
+        return sorted(rows, key=lambda r: r["total_ms"], reverse=True)
+
+    def report(self, limit: int = 20) -> str:
+        lines = [f"{'pattern':<40} {'calls':>8} {'hits':>8} {'total ms':>10} {'avg us':>8}"]
+        for row in self.stats()[:limit]:
+            lines.append(f"{row['name']:<40} {row['calls']:>8} {row['hits']:>8} "
+                         f"{row['total_ms']:>10.2f} {row['avg_us']:>8.1f}")
+        return "\n".join(lines)
+
+
+PATTERNS = PatternRegistry()
+_r = PATTERNS.register
+
+# ------------------------------------------------------------
+# Shared numeric helpers
+# ------------------------------------------------------------
+_r("num.fragment", r"([+-]?\d+(?:[.,]\d+)?)([KkMm%€]?)", 0)
+_r("num.currency", r"([+-]?\d[\d\s.,]*[KkMm]?)(?:€|e)?", 0)
+_r("num.date_dmy", r"(\d{1,2})[./-](\d{1,2})(?:[./-](\d{2,4}))?", 0)
+_r("text.whitespace", r"\s+", 0)
+_r("text.list_sep", r"[;,]", 0)
+_r("text.csv_sep", r"[, ]+", 0)
+
+# ------------------------------------------------------------
+# Summary slide (cpfr_pptx_parser)
+# ------------------------------------------------------------
+_r("kpi.sessions", NUM + r"\s*Nb\s*of\s*sessions")
+_r("kpi.revenue_b2c", r"(\d[\d\s.,]*)(?:M)?\s*€\s*Web\s*B2C")
+_r("kpi.average_basket_value", r"Average\s*basket\s*value.*?(\d[\d\s.,]*)\s*€", IS)
+_r("kpi.conversion_rate", r"Conversion\s*rate.*?(\d[\d\s.,]*)\s*%", IS)
+_r("kpi.nb_bookings", r"(\d[\d\s.,]*)\s*Nb\s*of\s*bookings")
+_r("kpi.variation", VS_VARIATION)
+_r("kpi.label.sessions", r"Nb\s*of\s*sessions")
+_r("kpi.label.revenue", r"Web\s*B2C\s*Global\s*revenue")
+_r("kpi.label.abv", r"Average\s*basket\s*value")
+_r("kpi.label.cr", r"Conversion\s*rate")
+_r("kpi.label.bookings", r"Nb\s*of\s*bookings")
+
+_r("overview.best_day", r"Best\s*traffic\s*/?\s*revenue\s*day.*?(\d{1,2}\w*\s*\w+).*?" + NUM + r"\s*sessions.*?" + NUM + r"\s*€")
+_r("overview.best_day_fallback", r"Best.*?" + NUM + r".*?sessions.*?" + NUM + r"\s*€")
+
+_r("offers.last_minute", r"(\d+[.,]?\d*)%\s*bookings\s*on\s*Last\s*Minute")
+_r("offers.early_booking", r"(\d+[.,]?\d*)%\s*bookings\s*on\s*Early\s*Booking")
+_r("offers.summer_flash_revenue", r"Summer\s*Flash\s*Sale\s*:\s*" + AMOUNT + r"\s*€")
+_r("offers.summer_flash_bookings", r"Flash\s*Sale.*?" + AMOUNT + r"\s*book")
+_r("offers.summer_flash_abv", r"(\d[\d\s.,]*)\s*€\s*ABV")
+_r("offers.lead_gen_revenue", r"Lead\s*gen\s*:\s*" + AMOUNT + r"\s*€")
+_r("offers.lead_gen_bookings", r"Lead\s*gen.*?" + NUM + r"\s*book")
+
+_r("bookings.months", r"July\s*(\d+[.,]?\d*)%\D+August\s*(\d+[.,]?\d*)%\D+Sept(?:ember)?\s*(\d+[.,]?\d*)%")
+_r("bookings.top_dates_booked", r"Top\s*dates\s*booked\s*:\s*([^\n\r]+)")
+_r("bookings.top_dates_searched", r"Top\s*dates\s*searched\s*:\s*([^\n\r]+)")
+_r("bookings.top_parks", r"Top\s*parks\s*booked\s*:\s*([^\n\r]+)")
+_r("bookings.park_share", r"([A-Za-z]+)\s*(\d+[.,]?\d*)%", 0)
+_r("bookings.lengths_of_stay", r"Lengths?\s*of\s*stay\s*:\s*(.+)")
+_r("bookings.length_share", r"(\d+)\s*night[s]?\s*\((\d+[.,]?\d*)%\)")
+
+# ------------------------------------------------------------
+# Acquisition slide (cpfr_pptx_parser_acq)
+# ------------------------------------------------------------
+# SEA
+_r("sea.wow_sessions", r"Sessions" + AFTER_LABEL_PCT, IS)
+_r("sea.wow_bookings", r"Bookings" + AFTER_LABEL_PCT, IS)
+_r("sea.wow_revenue", r"Revenue" + AFTER_LABEL_PCT, IS)
+_r("sea.wow_costs", r"Costs" + AFTER_LABEL_PCT, IS)
+_r("sea.cvr_vs_lw", r"CVR\s*vs\s*Last\s*Week" + AFTER_LABEL_PCT, IS)
+_r("sea.cvr_vs_ly", r"vs\s*LY" + AFTER_LABEL_PCT, IS)
+_r("sea.promo_extension", r"Promo\s*Extension\s*:\s*(\d[\d\s.,KkMm]*)\s*Book")
+_r("sea.pmax_asset", r"Pmax\s*Asset\s*:\s*(\d[\d\s.,KkMm]*)\s*Book")
+_r("sea.sitelink", r"Sitelink\s*:\s*(\d[\d\s.,KkMm]*)\s*Book")
+
+# SEO
+_r("seo.non_brand_section", r"Traffic on Non-Brand")
+_r("seo.impressions_yoy", r"Impressions:\s*" + PCT + r"\s*\(YoY\)")
+_r("seo.clicks_yoy", r"Clicks:\s*" + PCT + r"\s*\(YoY\)")
+_r("seo.ctr_yoy", r"CTR:\s*" + PCT + r"\s*\(YoY\)")
+_r("seo.avg_position", r"Average\s*Position:\s*([\d.,]+)")
+_r("seo.top_branded", r"Top\s*branded\s*request\s*:\s*(.+)")
+_r("seo.top_non_branded", r"Top\s*non\s*branded\s*request\s*:\s*(.+)")
+_r("seo.top_specific_brand", r"Top\s*specific\s*brand\s*:\s*(.+)")
+
+# OM
+_r("om.traffic", r"Traffic\s*:\s*" + DUAL_PCT, IS)
+_r("om.transaction", r"Transaction\s*:\s*" + DUAL_PCT, IS)
+_r("om.revenue", r"Revenue\s*:\s*" + DUAL_PCT, IS)
+_r("om.affiliation_revenue", r"Affiliation\s*:\s*Revenue\s*" + DUAL_PCT, IS)
+_r("om.r_advertising_revenue", r"R-Advertising.*?\+?(-?\d[\d.,]*)%", IS)
+_r("om.retargeting_revenue", r"Retargeting\s*:\s*Revenue\s*" + DUAL_PCT, IS)
+_r("om.smp_sessions", r"SMP.*?Sessions\s*" + DUAL_PCT, IS)
+_r("om.display_native_sessions", r"Display\s*\+\s*Native.*?Sessions\s*" + DUAL_PCT, IS)
+
+# CRM
+_r("crm.general_vs_ly", r"General:\s*vs\s*LY\s*:\s*" + TRIPLE_PCT)
+_r("crm.general_vs_lw", r"vs\s*LW\s*:\s*" + TRIPLE_PCT)
+_r("crm.last_bookings", r"Booking\s*:\s*([\d\s.,KkMm]+)")
+_r("crm.last_turnover", r"Turnover\s*:\s*([\d\s.,KkMm]+)")
+_r("crm.strategic_booking_yoy", r"Booking\s*:\s*" + PCT + r"\s*vs\s*LY")
+_r("crm.strategic_nbr_yoy", r"NBR\s*:\s*" + PCT + r"\s*vs\s*LY")
+_r("crm.strategic_incremental", r"Incremental\s*:\s*([\d\s.,KkMm]+)")
+_r("crm.b2c_reminder", r"B2C\s*:\s*Reminder\s*Summer\s*flash\s*sales")
+_r("crm.b2b", r"B2B\s*:\s*")
@@ -7,29 +7,28 @@ Renvoie un dictionnaire structuré conforme à l'`ingest_payload_schema`
 défini pour l'app CPFR Weekly Dashboard.
 
 Usage direct (CLI):
-    python cpfr_pptx_parser.py path/to/file.pptx --slide 31 --week-start 2025-07-14
+    python -m modules.cpfr_pptx_parser path/to/file.pptx --slide 31 --week-start 2025-07-14
 
 Dans le code (import):
     from cpfr_pptx_parser import parse_cpfr_slide
     data = parse_cpfr_slide("deck.pptx", slide_number=31, week_start_date="2025-07-14")
 """
 
-import re
 import json
 import argparse
 from datetime import date
 from pathlib import Path
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Optional, List, Tuple, Union
 
-from pptx import Presentation
-from unidecode import unidecode
+from .cpfr_patterns import PATTERNS
+from .pptx_deck import DeckSession, open_deck
+from .slide_index import SlideTextIndex
+from .tracing import TRACER
 
 # -------------------------------
 # Helpers: numeric parsing
 # -------------------------------
 
-_NUM_RE = re.compile(r"([+-]?\d+(?:[.,]\d+)?)([KkMm%€]?)")
-
 def _normalize_number_fragment(raw: str) -> float:
     """Normalize a numeric fragment like '2,27M', '342K', '917', '0,53', '118k€' (case insensitive).
 
@@ -59,7 +58,7 @@ def _normalize_number_fragment(raw: str) -> float:
     return val
 
 def parse_currency(raw: str) -> Optional[float]:
-    m = _NUM_RE.search(raw.replace(" ", ""))
+    m = PATTERNS["num.fragment"].search(raw.replace(" ", ""))
     if not m:
         return None
     return _normalize_number_fragment(m.group(1) + (m.group(2) if m.group(2) in ("K","k","M","m") else ""))
@@ -87,23 +86,21 @@ def parse_number_like(raw: str) -> Optional[float]:
 # Text scanning utilities
 # -------------------------------
 
+def _text_index(slide) -> SlideTextIndex:
+    """Accept a slide or its prebuilt SlideTextIndex (see DeckSession.text_index)."""
+    return slide if isinstance(slide, SlideTextIndex) else SlideTextIndex(slide)
+
+
 def shape_text_iter(slide):
     """Yield (idx, text, norm_text) for each shape w/ text."""
-    for i, sh in enumerate(slide.shapes):
-        if not hasattr(sh, "text"):
-            continue
-        t = sh.text.strip()
-        if not t:
-            continue
-        yield i, t, unidecode(t).lower()
+    index = _text_index(slide)
+    for pos in range(len(index)):
+        yield index.shape_idx[pos], index.text(pos), index.folded(pos)
 
 
 def _find_shape(slide, contains_tokens: List[str]) -> Optional[str]:
-    toks = [unidecode(tok).lower() for tok in contains_tokens]
-    for _, t, norm in shape_text_iter(slide):
-        if all(tok in norm for tok in toks):
-            return t
-    return None
+    entry = _text_index(slide).find(*contains_tokens)
+    return entry.text if entry else None
 
 
 # -------------------------------
@@ -127,11 +124,11 @@ def parse_kpi_header(slide_text_all: str) -> Dict[str, Any]:
     data = {}
 
     # Sessions
-    m = re.search(r"(\d[\d\s.,]*[KkMm]?)\s*Nb\s*of\s*sessions", txt, flags=re.I)
+    m = PATTERNS["kpi.sessions"].search(txt)
     data["sessions"] = _normalize_number_fragment(m.group(1)) if m else None
 
     # Revenue
-    m = re.search(r"(\d[\d\s.,]*)(?:M)?\s*€\s*Web\s*B2C", txt, flags=re.I)
+    m = PATTERNS["kpi.revenue_b2c"].search(txt)
     if m:
         val = _normalize_number_fragment(m.group(1) + "M") if "M€" in txt[m.start():m.end()+2] else _normalize_number_fragment(m.group(1))
         # Heuristic: if number < 10k and "M€" around, multiply
@@ -142,25 +139,22 @@ def parse_kpi_header(slide_text_all: str) -> Dict[str, Any]:
         data["revenue_b2c"] = None
 
     # ABV
-    m = re.search(r"Average\s*basket\s*value.*?(\d[\d\s.,]*)\s*€", txt, flags=re.I|re.S)
+    m = PATTERNS["kpi.average_basket_value"].search(txt)
     data["average_basket_value"] = _normalize_number_fragment(m.group(1)) if m else None
 
     # CR
-    m = re.search(r"Conversion\s*rate.*?(\d[\d\s.,]*)\s*%", txt, flags=re.I|re.S)
+    m = PATTERNS["kpi.conversion_rate"].search(txt)
     data["conversion_rate"] = parse_percent(m.group(1)+"%") if m else None
 
     # Bookings
-    m = re.search(r"(\d[\d\s.,]*)\s*Nb\s*of\s*bookings", txt, flags=re.I)
+    m = PATTERNS["kpi.nb_bookings"].search(txt)
     if m:
         data["nb_bookings"] = int(_normalize_number_fragment(m.group(1)))
     else:
         data["nb_bookings"] = None
 
-    # Variation blocks: capture +6% VS LY etc.
-    # We'll pattern: ([+-]\s*\d+[.,]?\d*)%\s*VS\s*(LY|LW)
-    vs = re.findall(r"([+-]\s*\d+[.,]?\d*)%\s*VS\s*(LY|LW)", txt, flags=re.I)
-    # vs returns list in order; we need to map by KPI based on prox detection -> fallback: user populates later
-    # For robustness we parse per KPI region:
+    # Variation blocks (+6% VS LY etc.): a global findall cannot map them to a KPI,
+    # so they are parsed per KPI region:
     data.update(_parse_variations_per_kpi(txt))
 
     return data
@@ -178,22 +172,22 @@ def _parse_variations_per_kpi(txt: str) -> Dict[str, Any]:
         "vs_ly_bookings": None, "vs_lw_bookings": None,
     }
 
-    def grab_window(label_regex: str) -> str:
-        m = re.search(label_regex, txt, flags=re.I)
+    def grab_window(label_name: str) -> str:
+        m = PATTERNS[label_name].search(txt)
         if not m:
             return ""
         start = max(0, m.start()-40)
         end   = min(len(txt), m.end()+40)
         return txt[start:end]
 
-    win_sessions = grab_window(r"Nb\s*of\s*sessions")
-    win_revenue  = grab_window(r"Web\s*B2C\s*Global\s*revenue")
-    win_abv      = grab_window(r"Average\s*basket\s*value")
-    win_cr       = grab_window(r"Conversion\s*rate")
-    win_book     = grab_window(r"Nb\s*of\s*bookings")
+    win_sessions = grab_window("kpi.label.sessions")
+    win_revenue  = grab_window("kpi.label.revenue")
+    win_abv      = grab_window("kpi.label.abv")
+    win_cr       = grab_window("kpi.label.cr")
+    win_book     = grab_window("kpi.label.bookings")
 
     def cap_variations(window: str):
-        return re.findall(r"([+-]\s*\d+[.,]?\d*)%\s*VS\s*(LY|LW)", window, flags=re.I)
+        return PATTERNS["kpi.variation"].findall(window)
 
     for raw, tag in cap_variations(win_sessions):
         pc = parse_percent(raw+"%")
@@ -235,7 +229,7 @@ def parse_overview_block(txt: str) -> Dict[str, Any]:
     data = {"best_day_sessions": None, "best_day_revenue": None, "raw_overview_text": txt}
 
     # best day line
-    m = re.search(r"Best\s*traffic\s*/?\s*revenue\s*day.*?(\d{1,2}\w*\s*\w+).*?(\d[\d\s.,]*[KkMm]?)\s*sessions.*?(\d[\d\s.,]*[KkMm]?)\s*€", txt, flags=re.I)
+    m = PATTERNS["overview.best_day"].search(txt)
     if m:
         # date text m.group(1) ignored (we don't store date here in schema; could extend)
         data["best_day_sessions"] = int(_normalize_number_fragment(m.group(2)))
@@ -243,7 +237,7 @@ def parse_overview_block(txt: str) -> Dict[str, Any]:
         return data
 
     # fallback: capture 2 numbers K inside same line
-    m = re.search(r"Best.*?(\d[\d\s.,]*[KkMm]?).*?sessions.*?(\d[\d\s.,]*[KkMm]?)\s*€", txt, flags=re.I)
+    m = PATTERNS["overview.best_day_fallback"].search(txt)
     if m:
         data["best_day_sessions"] = int(_normalize_number_fragment(m.group(1)))
         data["best_day_revenue"] = _normalize_number_fragment(m.group(2))
@@ -270,32 +264,32 @@ def parse_offers_block(txt: str) -> Dict[str, Any]:
     }
 
     # Last Minute %
-    m = re.search(r"(\d+[.,]?\d*)%\s*bookings\s*on\s*Last\s*Minute", txt, flags=re.I)
+    m = PATTERNS["offers.last_minute"].search(txt)
     if m: data["last_minute_pct"] = parse_percent(m.group(1)+"%")
 
     # Early Booking %
-    m = re.search(r"(\d+[.,]?\d*)%\s*bookings\s*on\s*Early\s*Booking", txt, flags=re.I)
+    m = PATTERNS["offers.early_booking"].search(txt)
     if m: data["early_booking_pct"] = parse_percent(m.group(1)+"%")
 
     # Summer Flash Sale revenue
     # Example "Summer Flash Sale : 1,4M€ (60% of total revenue), 1,4K booking & 924€ ABV."
-    m = re.search(r"Summer\s*Flash\s*Sale\s*:\s*([\d\s.,]*[KkMm]?)\s*€", txt, flags=re.I)
+    m = PATTERNS["offers.summer_flash_revenue"].search(txt)
     if m: data["summer_flash_revenue"] = _normalize_number_fragment(m.group(1))
 
     # bookings
-    m = re.search(r"Flash\s*Sale.*?([\d\s.,]*[KkMm]?)\s*book", txt, flags=re.I)
+    m = PATTERNS["offers.summer_flash_bookings"].search(txt)
     if m: data["summer_flash_bookings"] = int(_normalize_number_fragment(m.group(1)))
 
     # ABV
-    m = re.search(r"(\d[\d\s.,]*)\s*€\s*ABV", txt, flags=re.I)
+    m = PATTERNS["offers.summer_flash_abv"].search(txt)
     if m: data["summer_flash_abv"] = _normalize_number_fragment(m.group(1))
 
     # Lead gen revenue
-    m = re.search(r"Lead\s*gen\s*:\s*([\d\s.,]*[KkMm]?)\s*€", txt, flags=re.I)
+    m = PATTERNS["offers.lead_gen_revenue"].search(txt)
     if m: data["lead_gen_revenue"] = _normalize_number_fragment(m.group(1))
 
     # Lead gen bookings not explicit -> derive 1% of total bookings? not safe; we skip unless pattern
-    m = re.search(r"Lead\s*gen.*?(\d[\d\s.,]*[KkMm]?)\s*book", txt, flags=re.I)
+    m = PATTERNS["offers.lead_gen_bookings"].search(txt)
     if m: data["lead_gen_bookings"] = int(_normalize_number_fragment(m.group(1)))
 
     return data
@@ -324,37 +318,37 @@ def parse_bookings_block(txt: str) -> Dict[str, Any]:
 
     # months
     # "July 46%, August 34% & September 7%"
-    m = re.search(r"July\s*(\d+[.,]?\d*)%\D+August\s*(\d+[.,]?\d*)%\D+Sept(?:ember)?\s*(\d+[.,]?\d*)%", txt, flags=re.I)
+    m = PATTERNS["bookings.months"].search(txt)
     if m:
         data["month_july_pct"] = parse_percent(m.group(1)+"%")
         data["month_august_pct"] = parse_percent(m.group(2)+"%")
         data["month_sept_pct"] = parse_percent(m.group(3)+"%")
 
     # top dates booked
-    m = re.search(r"Top\s*dates\s*booked\s*:\s*([^\n\r]+)", txt, flags=re.I)
+    m = PATTERNS["bookings.top_dates_booked"].search(txt)
     if m:
         data["top_dates_booked"] = _clean_csv_line(m.group(1))
 
     # top dates searched
-    m = re.search(r"Top\s*dates\s*searched\s*:\s*([^\n\r]+)", txt, flags=re.I)
+    m = PATTERNS["bookings.top_dates_searched"].search(txt)
     if m:
         data["top_dates_searched"] = _clean_csv_line(m.group(1))
 
     # top parks
     # "BF 22%, BD 15% & LA 13%"
-    m = re.search(r"Top\s*parks\s*booked\s*:\s*([^\n\r]+)", txt, flags=re.I)
+    m = PATTERNS["bookings.top_parks"].search(txt)
     if m:
         parks_line = m.group(1)
-        parts = re.findall(r"([A-Za-z]+)\s*(\d+[.,]?\d*)%", parks_line)
+        parts = PATTERNS["bookings.park_share"].findall(parks_line)
         if parts:
             data["top_parks_booked"] = ",".join(f"{code}:{parse_percent(num+'%'):.4f}" for code, num in parts)
 
     # lengths of stay
-    m = re.search(r"Lengths?\s*of\s*stay\s*:\s*(.+)", txt, flags=re.I)
+    m = PATTERNS["bookings.lengths_of_stay"].search(txt)
     if m:
         los_line = m.group(1)
         # 2 nights (33%), 3 nights (33%) & 4 nights (19%)
-        parts = re.findall(r"(\d+)\s*night[s]?\s*\((\d+[.,]?\d*)%\)", los_line, flags=re.I)
+        parts = PATTERNS["bookings.length_share"].findall(los_line)
         for n, pct in parts:
             val = parse_percent(pct+"%")
             if n == "2": data["length_2n_pct"] = val
@@ -368,7 +362,7 @@ def _clean_csv_line(line: str) -> str:
     # remove bullet separators like '&'
     line = line.strip().rstrip('.;')
     line = line.replace("&", ",")
-    line = re.sub(r"\s+", " ", line)
+    line = PATTERNS["text.whitespace"].sub(" ", line)
     line = line.replace(" ,", ",")
     line = line.replace(" , ", ",")
     line = line.replace(" ,", ",")
@@ -377,8 +371,7 @@ def _clean_csv_line(line: str) -> str:
     # we want date tokens like Jul12? Actually we store as raw tokens; user can map.
     # Replace French months? - not needed for given english month abbreviations.
     # Reintroduce comma separation robustly:
-    tokens = re.split(r"[;,]+", line)
-    tokens = [t for t in re.split(r"[, ]+", line) if t]
+    tokens = [t for t in PATTERNS["text.csv_sep"].split(line) if t]
     return ",".join(tokens)
 
 
@@ -387,7 +380,7 @@ def _clean_csv_line(line: str) -> str:
 # -------------------------------
 
 def parse_cpfr_slide(
-    pptx_path: str,
+    pptx_path: Union[str, DeckSession],
     slide_number: Optional[int] = None,
     slide_title_contains: Optional[str] = "Sum up and main insights",
     week_start_date: Optional[str] = None
@@ -395,26 +388,16 @@ def parse_cpfr_slide(
     """
     Extract structured data from the CPFR summary slide.
 
+    pptx_path: path to the deck, or an already opened DeckSession (shared between parsers).
     slide_number: 1-based human index; if None we auto-detect by title substring.
     """
-    prs = Presentation(pptx_path)
-    slide = None
+    deck = open_deck(pptx_path)
 
     if slide_number is not None:
-        idx = slide_number - 1  # python-pptx zero-based
-        if idx < 0 or idx >= len(prs.slides):
-            raise ValueError(f"Slide number {slide_number} out of range (1..{len(prs.slides)})")
-        slide = prs.slides[idx]
+        slide = deck.slide(slide_number)
     else:
         # scan titles
-        low = unidecode(slide_title_contains).lower()
-        for s in prs.slides:
-            title = ""
-            if s.shapes.title:
-                title = unidecode((s.shapes.title.text or "")).lower()
-            if low in title:
-                slide = s
-                break
+        slide = deck.find_slide_by_title(slide_title_contains)
         if slide is None:
             raise RuntimeError("Slide not found by title.")
 
@@ -424,14 +407,9 @@ def parse_cpfr_slide(
     overview_txt = ""
     offers_txt = ""
     bookings_txt = ""
-    for sh in slide.shapes:
-        if not hasattr(sh, "text"):
-            continue
-        t = sh.text.strip()
-        if not t:
-            continue
-        norm = unidecode(t).lower()
-        top = getattr(getattr(sh, "top", None), "emu", None)  # not needed
+    index = deck.text_index(slide)
+    for pos in range(len(index)):
+        t, norm = index.text(pos), index.folded(pos)
         # classify
         if "overview" in norm and "performances" in norm:
             overview_txt = t
@@ -445,10 +423,11 @@ def parse_cpfr_slide(
 
     kpi_header_txt = "\n".join(header_texts)
 
-    kpi_data = parse_kpi_header(kpi_header_txt)
-    ov_data = parse_overview_block(overview_txt)
-    of_data = parse_offers_block(offers_txt)
-    bk_data = parse_bookings_block(bookings_txt)
+    with TRACER.span("cpfr.summary_regex", slide=slide_number):
+        kpi_data = parse_kpi_header(kpi_header_txt)
+        ov_data = parse_overview_block(overview_txt)
+        of_data = parse_offers_block(offers_txt)
+        bk_data = parse_bookings_block(bookings_txt)
 
     # merge
     data = {
@@ -5,22 +5,24 @@ Parsing 'CPFR LW – Acquisition Channel Analysis' slide (4 colonnes : SEA, SEO,
 Segmentation spatiale -> extraction texte -> parsing sémantique -> payload structuré.
 
 Dépendances : python-pptx, unidecode, re.
+Les expressions régulières sont déclarées une seule fois dans cpfr_patterns.
 """
 
-import re
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Tuple, List, Optional
+from typing import Dict, Any, Tuple, List, Optional, Union
 
-from pptx import Presentation
-from unidecode import unidecode
+from .cpfr_patterns import PATTERNS
+from .pptx_deck import DeckSession, open_deck
+from .slide_index import SlideTextIndex
+from .tracing import TRACER
 
 # ============================================================
 # --------- Helpers: numeric parsing (shared logic) ----------
 # ============================================================
 
 def _clean_spaces(s: str) -> str:
-    return re.sub(r"\s+", " ", s.strip())
+    return PATTERNS["text.whitespace"].sub(" ", s.strip())
 
 def _normalize_number_fragment(raw: str) -> float:
     """
@@ -46,7 +48,7 @@ def _normalize_number_fragment(raw: str) -> float:
         return 0.0
 
 def parse_currency(raw: str) -> Optional[float]:
-    m = re.search(r"([+-]?\d[\d\s.,]*[KkMm]?)(?:€|e)?", raw)
+    m = PATTERNS["num.currency"].search(raw)
     if not m:
         return None
     return _normalize_number_fragment(m.group(1))
@@ -77,7 +79,7 @@ def parse_date_dmy_or_dmy_no_year(raw: str, ref_year: Optional[int] = None) -> O
     """
     Accept '15/07', '15-07', '15.07' -> iso date using ref_year (default: current year).
     """
-    m = re.search(r"(\d{1,2})[./-](\d{1,2})(?:[./-](\d{2,4}))?", raw)
+    m = PATTERNS["num.date_dmy"].search(raw)
     if not m:
         return None
     d = int(m.group(1)); mth = int(m.group(2))
@@ -97,61 +99,22 @@ def parse_date_dmy_or_dmy_no_year(raw: str, ref_year: Optional[int] = None) -> O
 # ------------ Slide segmentation (columns/rows) -------------
 # ============================================================
 
-def _assign_column(left_emu: int, width_emu: int, slide_width_emu: int) -> int:
+def _collect_slide_text_by_grid(slide, slide_width: int, slide_height: int, header_pct=0.2, footer_pct=0.8,
+                                columns: int = 4) -> Dict[Tuple[int,int], str]:
     """
-    Return column index 0..3 from shape center X.
+    Collect raw text lines grouped by (col,band), each group joined top-to-bottom.
+    slide may be a SlideTextIndex (see DeckSession.text_index) or a raw slide.
+    slide_width / slide_height come from the deck (presentation-level slide size).
+    Columns and bands are computed in one pass over the index geometry columns;
+    shapes are visited in reading order so no per-bucket sort is needed.
     """
-    center_x = left_emu + width_emu/2
-    col_width = slide_width_emu / 4.0
-    col = int(center_x // col_width)
-    return min(max(col,0),3)
+    index = slide if isinstance(slide, SlideTextIndex) else SlideTextIndex(slide)
+    cols, bands = index.grid(slide_width, slide_height, columns, header_pct, footer_pct)
 
-def _assign_band(top_emu: int, slide_height_emu: int, header_pct=0.2, footer_pct=0.8) -> int:
-    """
-    Return row band 0=header,1=body,2=footer.
-    """
-    top_ratio = top_emu / slide_height_emu
-    if top_ratio < header_pct:
-        return 0
-    elif top_ratio > footer_pct:
-        return 2
-    return 1
-
-def _collect_slide_text_by_grid(slide, header_pct=0.2, footer_pct=0.8) -> Dict[Tuple[int,int], List[str]]:
-    """
-    Collect raw text lines grouped by (col,band).
-    """
-    # simpler / stable:
-    try:
-        slide_width = slide.part.slide_width
-        slide_height = slide.part.slide_height
-    except AttributeError:
-        # fallback to presentation object
-        prs = slide.part.presentation_part.presentation
-        slide_width = prs.slide_width
-        slide_height = prs.slide_height
-
-    buckets = {(c,b):[] for c in range(4) for b in range(3)}
-
-    for sh in slide.shapes:
-        if not hasattr(sh, "text") or not sh.text:
-            continue
-        txt = sh.text.strip()
-        if not txt:
-            continue
-        col = _assign_column(sh.left, sh.width, slide_width)
-        band = _assign_band(sh.top, slide_height, header_pct, footer_pct)
-        buckets[(col,band)].append((sh.top, sh.left, txt))
-
-    # sort & join
-    out = {}
-    for k, arr in buckets.items():
-        if not arr:
-            continue
-        arr_sorted = sorted(arr, key=lambda r: (r[0], r[1]))
-        txt_join = "\n".join(x[2] for x in arr_sorted)
-        out[k] = txt_join
-    return out
+    buckets: Dict[Tuple[int,int], List[str]] = {}
+    for pos in index.reading_order():
+        buckets.setdefault((cols[pos], bands[pos]), []).append(index.text(pos))
+    return {k: "\n".join(lines) for k, lines in buckets.items()}
 
 
 # ============================================================
@@ -166,20 +129,20 @@ def _parse_sea_block(body_txt: str) -> Dict[str, Any]:
     t = body_txt
 
     # WoW GA4 block: -7% Sessions, -18% Bookings, -14% Revenue, -10% Costs
-    wow_sessions = _search_percent_after_label(t, r"Sessions")
-    wow_bookings = _search_percent_after_label(t, r"Bookings")
-    wow_revenue = _search_percent_after_label(t, r"Revenue")
-    wow_costs = _search_percent_after_label(t, r"Costs")
+    wow_sessions = _search_percent_after_label(t, "sea.wow_sessions")
+    wow_bookings = _search_percent_after_label(t, "sea.wow_bookings")
+    wow_revenue = _search_percent_after_label(t, "sea.wow_revenue")
+    wow_costs = _search_percent_after_label(t, "sea.wow_costs")
 
     # CVR vs Last Week & vs LY
-    cvr_vs_lw = _search_percent_after_label(t, r"CVR\s*vs\s*Last\s*Week")
+    cvr_vs_lw = _search_percent_after_label(t, "sea.cvr_vs_lw")
     # Within line you also see "vs LY : +60%" ; we grab that
-    cvr_vs_ly = _search_percent_after_label(t, r"vs\s*LY")
+    cvr_vs_ly = _search_percent_after_label(t, "sea.cvr_vs_ly")
 
     # Summer Sales bullet bookings
-    promo_ext = _search_int_after_label(t, r"Promo\s*Extension\s*:\s*(\d[\d\s.,KkMm]*)\s*Book")
-    pmax_asset = _search_int_after_label(t, r"Pmax\s*Asset\s*:\s*(\d[\d\s.,KkMm]*)\s*Book")
-    sitelink   = _search_int_after_label(t, r"Sitelink\s*:\s*(\d[\d\s.,KkMm]*)\s*Book")
+    promo_ext = _search_int_after_label(t, "sea.promo_extension")
+    pmax_asset = _search_int_after_label(t, "sea.pmax_asset")
+    sitelink   = _search_int_after_label(t, "sea.sitelink")
 
     return {
         "wow_sessions": wow_sessions,
@@ -199,22 +162,22 @@ def _parse_sea_block(body_txt: str) -> Dict[str, Any]:
 def _parse_seo_block(body_txt: str) -> Dict[str, Any]:
     t = body_txt
 
-    # Traffic on Brand
-    brand_impr  = _search_percent_after_label(t, r"Impressions:\s*([+-]?\d[\d.,]*)%\s*\(YoY\)", raw=True)
-    brand_click = _search_percent_after_label(t, r"Clicks:\s*([+-]?\d[\d.,]*)%\s*\(YoY\)", raw=True, nth=1)
-    brand_ctr   = _search_percent_after_label(t, r"CTR:\s*([+-]?\d[\d.,]*)%\s*\(YoY\)", raw=True, nth=2)
-    brand_pos   = _search_float_after_label_generic(t, r"Average\s*Position:\s*([\d.,]+)")
+    # Traffic on Brand (first occurrence of each label)
+    brand_impr  = _search_percent_after_label(t, "seo.impressions_yoy")
+    brand_click = _search_percent_after_label(t, "seo.clicks_yoy")
+    brand_ctr   = _search_percent_after_label(t, "seo.ctr_yoy")
+    brand_pos   = _search_float_after_label_generic(t, "seo.avg_position")
 
     # Traffic on Non-Brand
-    nb_impr  = _search_percent_after_label(t, r"Impressions:\s*([+-]?\d[\d.,]*)%\s*\(YoY\)", raw=True, start_after="Traffic on Non-Brand")
-    nb_click = _search_percent_after_label(t, r"Clicks:\s*([+-]?\d[\d.,]*)%\s*\(YoY\)", raw=True, start_after="Traffic on Non-Brand", nth=1)
-    nb_ctr   = _search_percent_after_label(t, r"CTR:\s*([+-]?\d[\d.,]*)%\s*\(YoY\)", raw=True, start_after="Traffic on Non-Brand", nth=2)
-    nb_pos   = _search_float_after_label_generic(t, r"Average\s*Position:\s*([\d.,]+)", start_after="Traffic on Non-Brand")
+    nb_impr  = _search_percent_after_label(t, "seo.impressions_yoy", start_after="seo.non_brand_section")
+    nb_click = _search_percent_after_label(t, "seo.clicks_yoy", start_after="seo.non_brand_section")
+    nb_ctr   = _search_percent_after_label(t, "seo.ctr_yoy", start_after="seo.non_brand_section")
+    nb_pos   = _search_float_after_label_generic(t, "seo.avg_position", start_after="seo.non_brand_section")
 
     # Top branded / non branded / specific
-    top_branded       = _list_after_label(t, r"Top\s*branded\s*request\s*:\s*(.+)")
-    top_non_branded   = _list_after_label(t, r"Top\s*non\s*branded\s*request\s*:\s*(.+)")
-    top_specific_brand= _list_after_label(t, r"Top\s*specific\s*brand\s*:\s*(.+)")
+    top_branded       = _list_after_label(t, "seo.top_branded")
+    top_non_branded   = _list_after_label(t, "seo.top_non_branded")
+    top_specific_brand= _list_after_label(t, "seo.top_specific_brand")
 
     return {
         "brand": {
@@ -239,20 +202,20 @@ def _parse_seo_block(body_txt: str) -> Dict[str, Any]:
 def _parse_om_block(body_txt: str) -> Dict[str, Any]:
     t = body_txt
     # headline: Traffic : +50% (WoW) // +74% (YoY)
-    traffic_wow, traffic_yoy = _parse_dual_pct_line(t, r"Traffic\s*:\s*")
-    trans_wow, trans_yoy     = _parse_dual_pct_line(t, r"Transaction\s*:\s*")
-    rev_wow, rev_yoy         = _parse_dual_pct_line(t, r"Revenue\s*:\s*")
+    traffic_wow, traffic_yoy = _parse_dual_pct_line(t, "om.traffic")
+    trans_wow, trans_yoy     = _parse_dual_pct_line(t, "om.transaction")
+    rev_wow, rev_yoy         = _parse_dual_pct_line(t, "om.revenue")
 
     # Affiliation line: Revenue -20% WoW / -44% YoY
-    aff_rev_wow, aff_rev_yoy = _parse_dual_pct_line(t, r"Affiliation\s*:\s*Revenue\s*")
+    aff_rev_wow, aff_rev_yoy = _parse_dual_pct_line(t, "om.affiliation_revenue")
     # R-Advertising revenue +68% WoW
-    radv_rev_wow = _search_percent_after_label(t, r"R-Advertising.*?\+?(-?\d[\d.,]*)%", allow_neg=True)
+    radv_rev_wow = _search_percent_after_label(t, "om.r_advertising_revenue")
     # Retargeting revenue +73% WoW / +145% YoY
-    ret_rev_wow, ret_rev_yoy = _parse_dual_pct_line(t, r"Retargeting\s*:\s*Revenue\s*")
+    ret_rev_wow, ret_rev_yoy = _parse_dual_pct_line(t, "om.retargeting_revenue")
     # SMP Sessions +25% WoW / +154% YoY
-    smp_ses_wow, smp_ses_yoy = _parse_dual_pct_line(t, r"SMP.*?Sessions\s*")
+    smp_ses_wow, smp_ses_yoy = _parse_dual_pct_line(t, "om.smp_sessions")
     # Display + Native Sessions +16% WoW // -8% YoY
-    dn_ses_wow, dn_ses_yoy   = _parse_dual_pct_line(t, r"Display\s*\+\s*Native.*?Sessions\s*")
+    dn_ses_wow, dn_ses_yoy   = _parse_dual_pct_line(t, "om.display_native_sessions")
 
     # Build notes
     camp_notes = []
@@ -289,21 +252,21 @@ def _parse_om_block(body_txt: str) -> Dict[str, Any]:
 def _parse_crm_block(body_txt: str) -> Dict[str, Any]:
     t = body_txt
     # General: vs LY : +23% visits, +7% bookings, +15% revenue
-    gen_ly_vis, gen_ly_book, gen_ly_rev = _parse_triple_pct_line(t, r"General:\s*vs\s*LY\s*:\s*")
+    gen_ly_vis, gen_ly_book, gen_ly_rev = _parse_triple_pct_line(t, "crm.general_vs_ly")
     # vs LW : +22% visits, +33% bookings, +40% revenue
-    gen_lw_vis, gen_lw_book, gen_lw_rev = _parse_triple_pct_line(t, r"vs\s*LW\s*:\s*")
+    gen_lw_vis, gen_lw_book, gen_lw_rev = _parse_triple_pct_line(t, "crm.general_vs_lw")
     # Tactical Last Week: Booking 115, Turnover 118k €
-    last_book = _search_int_after_label(t, r"Booking\s*:\s*([\d\s.,KkMm]+)")
-    last_turn = _search_currency_after_label(t, r"Turnover\s*:\s*([\d\s.,KkMm]+)")
+    last_book = _search_int_after_label(t, "crm.last_bookings")
+    last_turn = _search_currency_after_label(t, "crm.last_turnover")
     # Strategic JU25: Booking +32.4% vs LY; NBR +16.8% vs LY; Incremental : 526K€
-    ju25_book = _search_percent_after_label(t, r"Booking\s*:\s*([+-]?\d[\d.,]*)%\s*vs\s*LY")
-    ju25_nbr  = _search_percent_after_label(t, r"NBR\s*:\s*([+-]?\d[\d.,]*)%\s*vs\s*LY")
-    ju25_incr = _search_currency_after_label(t, r"Incremental\s*:\s*([\d\s.,KkMm]+)")
+    ju25_book = _search_percent_after_label(t, "crm.strategic_booking_yoy")
+    ju25_nbr  = _search_percent_after_label(t, "crm.strategic_nbr_yoy")
+    ju25_incr = _search_currency_after_label(t, "crm.strategic_incremental")
 
     # This week actions (just keep raw)
     # B2C / B2B bullet detection -> notes
-    b2c_flag = bool(re.search(r"B2C\s*:\s*Reminder\s*Summer\s*flash\s*sales", t, flags=re.I))
-    b2b_flag = bool(re.search(r"B2B\s*:\s*", t, flags=re.I))
+    b2c_flag = bool(PATTERNS["crm.b2c_reminder"].search(t))
+    b2b_flag = bool(PATTERNS["crm.b2b"].search(t))
 
     camp_notes = []
     if last_book is not None or last_turn is not None:
@@ -333,49 +296,40 @@ def _parse_crm_block(body_txt: str) -> Dict[str, Any]:
 # --------------- Regex utility sub-parsers ------------------
 # ============================================================
 
-def _search_percent_after_label(text: str, label_pattern: str, raw=False, start_after=None, nth=0, allow_neg=True) -> Optional[float]:
+def _search_space(text: str, start_after: Optional[str]) -> str:
+    """Restrict the search to the text following the first match of pattern `start_after`."""
+    if start_after:
+        idx = PATTERNS[start_after].search(text)
+        if idx:
+            return text[idx.end():]
+    return text
+
+def _search_percent_after_label(text: str, pattern_name: str, start_after=None, nth=0) -> Optional[float]:
     """
     Generic "label ... +X%" extraction.
-    If raw=True label_pattern is full regex w/ capture group -> we parse group directly.
-    start_after restricts search after first match of that token.
+    pattern_name is a registered pattern with a single capture group (the percentage).
+    start_after restricts search after first match of that pattern.
     nth selects nth occurrence if multiple.
     """
-    search_space = text
-    if start_after:
-        idx = re.search(start_after, text, flags=re.I)
-        if idx:
-            search_space = text[idx.end():]
-    if raw:
-        matches = re.findall(label_pattern, search_space, flags=re.I)
-        if not matches or nth >= len(matches):
-            return None
-        return parse_percent(matches[nth] + "%")
-    # simple case: find label then % following
-    pat = re.compile(label_pattern + r".*?([+-]?\d[\d.,]*)%", flags=re.I|re.S)
-    matches = pat.findall(search_space)
+    matches = PATTERNS[pattern_name].findall(_search_space(text, start_after))
     if not matches or nth >= len(matches):
         return None
     return parse_percent(matches[nth] + "%")
 
-def _search_int_after_label(text: str, regex_pattern: str) -> Optional[int]:
-    m = re.search(regex_pattern, text, flags=re.I)
+def _search_int_after_label(text: str, pattern_name: str) -> Optional[int]:
+    m = PATTERNS[pattern_name].search(text)
     if not m:
         return None
     return parse_int(m.group(1))
 
-def _search_currency_after_label(text: str, regex_pattern: str) -> Optional[float]:
-    m = re.search(regex_pattern, text, flags=re.I)
+def _search_currency_after_label(text: str, pattern_name: str) -> Optional[float]:
+    m = PATTERNS[pattern_name].search(text)
     if not m:
         return None
     return parse_currency(m.group(1))
 
-def _search_float_after_label_generic(text: str, regex_pattern: str, start_after=None) -> Optional[float]:
-    search_space = text
-    if start_after:
-        idx = re.search(start_after, text, flags=re.I)
-        if idx:
-            search_space = text[idx.end():]
-    m = re.search(regex_pattern, search_space, flags=re.I)
+def _search_float_after_label_generic(text: str, pattern_name: str, start_after=None) -> Optional[float]:
+    m = PATTERNS[pattern_name].search(_search_space(text, start_after))
     if not m:
         return None
     try:
@@ -383,33 +337,33 @@ def _search_float_after_label_generic(text: str, regex_pattern: str, start_after
     except ValueError:
         return None
 
-def _list_after_label(text: str, regex_pattern: str) -> List[str]:
-    m = re.search(regex_pattern, text, flags=re.I)
+def _list_after_label(text: str, pattern_name: str) -> List[str]:
+    m = PATTERNS[pattern_name].search(text)
     if not m:
         return []
     line = m.group(1).strip()
     line = line.strip('"')
     # split on comma or semicolon
-    parts = re.split(r"[;,]", line)
+    parts = PATTERNS["text.list_sep"].split(line)
     parts = [p.strip(' "').strip("'") for p in parts if p.strip()]
     return parts
 
-def _parse_dual_pct_line(text: str, prefix_pattern: str) -> Tuple[Optional[float], Optional[float]]:
+def _parse_dual_pct_line(text: str, pattern_name: str) -> Tuple[Optional[float], Optional[float]]:
     """
     Parse lines like 'Traffic : +50% (WoW) // +74% (YoY)'.
     Returns (wow, yoy).
     """
-    m = re.search(prefix_pattern + r"([+-]?\d[\d.,]*)%\s*\(WoW\).*?([+-]?\d[\d.,]*)%\s*\(YoY\)", text, flags=re.I|re.S)
+    m = PATTERNS[pattern_name].search(text)
     if not m:
         return None, None
     return parse_percent(m.group(1)+"%"), parse_percent(m.group(2)+"%")
 
-def _parse_triple_pct_line(text: str, prefix_pattern: str) -> Tuple[Optional[float], Optional[float], Optional[float]]:
+def _parse_triple_pct_line(text: str, pattern_name: str) -> Tuple[Optional[float], Optional[float], Optional[float]]:
     """
     Parse 'vs LY : +23% visits, +7% bookings, +15% revenue'.
     Returns tuple (visits, bookings, revenue).
     """
-    m = re.search(prefix_pattern + r"([+-]?\d[\d.,]*)%\s*visits[^%]*?([+-]?\d[\d.,]*)%\s*bookings[^%]*?([+-]?\d[\d.,]*)%\s*revenue", text, flags=re.I)
+    m = PATTERNS[pattern_name].search(text)
     if not m:
         return None, None, None
     return parse_percent(m.group(1)+"%"), parse_percent(m.group(2)+"%"), parse_percent(m.group(3)+"%")
@@ -420,7 +374,7 @@ def _parse_triple_pct_line(text: str, prefix_pattern: str) -> Tuple[Optional[flo
 # ============================================================
 
 def parse_acquisition_slide(
-    pptx_path: str,
+    pptx_path: Union[str, DeckSession],
     slide_number: int = 32,
     week_start_date: Optional[str] = None,
     header_pct: float = 0.2,
@@ -428,19 +382,20 @@ def parse_acquisition_slide(
 ) -> Dict[str, Any]:
     """
     Parse the Acquisition Channel Analysis slide.
+    pptx_path: path to the deck, or an already opened DeckSession (shared between parsers).
     Returns structured dict w/ SEA, SEO, OM, CRM blocks + last_update dates.
     """
-    prs = Presentation(pptx_path)
-    idx = slide_number - 1
-    if idx < 0 or idx >= len(prs.slides):
+    deck = open_deck(pptx_path)
+    if slide_number < 1 or slide_number > deck.slide_count:
         raise ValueError(f"Slide {slide_number} out of bounds.")
-    slide = prs.slides[idx]
+    slide = deck.slide(slide_number)
 
-    buckets = _collect_slide_text_by_grid(slide, header_pct=header_pct, footer_pct=footer_pct)
+    col_names = ["SEA","SEO","OM","CRM"]
+    buckets = _collect_slide_text_by_grid(deck.text_index(slide), deck.slide_width, deck.slide_height,
+                                          header_pct=header_pct, footer_pct=footer_pct, columns=len(col_names))
 
     # Build column text (header/body/footer)
     cols = {}
-    col_names = ["SEA","SEO","OM","CRM"]
     for ci, cname in enumerate(col_names):
         header_txt = buckets.get((ci,0), "")
         body_txt   = buckets.get((ci,1), "")
@@ -448,10 +403,11 @@ def parse_acquisition_slide(
         cols[cname] = {"header": header_txt, "body": body_txt, "footer": footer_txt}
 
     # Parse each column
-    sea_metrics = _parse_sea_block(cols["SEA"]["body"])
-    seo_metrics = _parse_seo_block(cols["SEO"]["body"])
-    om_metrics  = _parse_om_block(cols["OM"]["body"])
-    crm_metrics = _parse_crm_block(cols["CRM"]["body"])
+    with TRACER.span("cpfr.acquisition_regex", slide=slide_number):
+        sea_metrics = _parse_sea_block(cols["SEA"]["body"])
+        seo_metrics = _parse_seo_block(cols["SEO"]["body"])
+        om_metrics  = _parse_om_block(cols["OM"]["body"])
+        crm_metrics = _parse_crm_block(cols["CRM"]["body"])
 
     # parse last updates (footer lines)
     for cname in col_names:
@@ -7,23 +7,30 @@ et les combiner en un payload structuré pour la base de données.
 
 import json
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Union
 
 from .cpfr_pptx_parser import parse_cpfr_slide
 from .cpfr_pptx_parser_acq import parse_acquisition_slide, build_acquisition_db_payload
+from .pptx_deck import DeckSession, open_deck
+from .tracing import TRACER
+
+# Version du format produit par build_unified_db_payload : à incrémenter à chaque
+# changement des parsers pour invalider parse_cache
+PARSER_VERSION = "2"
 
 
 def parse_cpfr_presentation(
-    pptx_path: str,
+    pptx_path: Union[str, DeckSession],
     slide_31: int = 31,
     slide_32: int = 32,
     week_start_date: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Parse les slides 31 et 32 d'une présentation CPFR et combine les données.
+    Le deck n'est chargé qu'une fois et partagé entre les deux parsers.
     
     Args:
-        pptx_path: Chemin vers le fichier PowerPoint
+        pptx_path: Chemin vers le fichier PowerPoint ou DeckSession déjà ouverte
         slide_31: Numéro de la slide de résumé (défaut: 31)
         slide_32: Numéro de la slide d'acquisition (défaut: 32)
         week_start_date: Date de début de semaine (YYYY-MM-DD)
@@ -39,21 +46,23 @@ def parse_cpfr_presentation(
         monday = today - timedelta(days=days_since_monday)
         week_start_date = monday.strftime('%Y-%m-%d')
     
+    deck = open_deck(pptx_path)
+    
     # Parser la slide 31 (Summary)
-    print(f"Parsing slide {slide_31} (Summary)...")
-    summary_data = parse_cpfr_slide(
-        pptx_path, 
-        slide_number=slide_31, 
-        week_start_date=week_start_date
-    )
+    with TRACER.span("cpfr.parse_summary", slide=slide_31):
+        summary_data = parse_cpfr_slide(
+            deck, 
+            slide_number=slide_31, 
+            week_start_date=week_start_date
+        )
     
     # Parser la slide 32 (Acquisition)
-    print(f"Parsing slide {slide_32} (Acquisition)...")
-    acquisition_data = parse_acquisition_slide(
-        pptx_path, 
-        slide_number=slide_32, 
-        week_start_date=week_start_date
-    )
+    with TRACER.span("cpfr.parse_acquisition", slide=slide_32):
+        acquisition_data = parse_acquisition_slide(
+            deck, 
+            slide_number=slide_32, 
+            week_start_date=week_start_date
+        )
     
     # Combiner les données
     combined_data = {
@@ -174,7 +183,7 @@ def build_unified_db_payload(combined_data: Dict[str, Any]) -> Dict[str, Any]:
 
 
 def parse_and_validate_cpfr(
-    pptx_path: str,
+    pptx_path: Union[str, DeckSession],
     slide_31: int = 31,
     slide_32: int = 32,
     week_start_date: Optional[str] = None
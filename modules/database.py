@@ -1,15 +1,92 @@
 import sqlite3
 import json
+import os
+import threading
+import time
 from datetime import datetime, date
 from pathlib import Path
 import calendar
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
+
+from .tracing import TRACER
 
 DB_PATH = Path("cpfr.db")
 
+# ============================================================================
+# GESTION DES CONNEXIONS
+# ============================================================================
+
+# PRAGMAs appliqués à chaque connexion (foreign_keys et busy_timeout ne sont pas persistants)
+CONNECTION_PRAGMAS = (
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -20000",      # ~20 Mo de cache de pages
+    "PRAGMA mmap_size = 268435456",    # 256 Mo
+    "PRAGMA synchronous = NORMAL",
+)
+CACHED_STATEMENTS = 512
+
+_local = threading.local()
+
+
+def _open_connection(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=5.0, cached_statements=CACHED_STATEMENTS)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Connexion réutilisable du thread courant pour DB_PATH.
+    Une connexion par (processus, thread, base) : rien n'est partagé entre threads
+    ni hérité d'un fork (workers gunicorn). S'utilise comme sqlite3.connect :
+    `with get_connection() as conn:` commit en sortie, rollback sur exception.
+    """
+    path = str(DB_PATH)
+    pool = getattr(_local, 'connections', None)
+    if pool is None or getattr(_local, 'pid', None) != os.getpid():
+        pool = _local.connections = {}
+        _local.pid = os.getpid()
+    conn = pool.get(path)
+    if conn is None:
+        conn = pool[path] = _open_connection(path)
+    return conn
+
+
+def get_db() -> sqlite3.Connection:
+    """Connexion liée à la requête Flask courante (flask.g), ou au thread hors requête"""
+    from flask import g, has_app_context
+    
+    if not has_app_context():
+        return get_connection()
+    if 'db' not in g or g.db_path != str(DB_PATH):
+        g.db = get_connection()
+        g.db_path = str(DB_PATH)
+    return g.db
+
+
+def release_db(exception=None):
+    """Fin de requête : annule une transaction restée ouverte et rend la connexion au pool"""
+    from flask import g
+    
+    conn = g.pop('db', None)
+    g.pop('db_path', None)
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
+
+
+def close_connections():
+    """Ferme les connexions du thread courant (tests, fin de worker)"""
+    pool = getattr(_local, 'connections', None) or {}
+    for conn in pool.values():
+        conn.close()
+    pool.clear()
+
+
 def init_db():
     """Initialise la base de données avec la structure CPFR complète"""
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         # Configuration SQLite
         conn.execute("PRAGMA foreign_keys = ON")
         conn.execute("PRAGMA journal_mode = WAL")
@@ -136,6 +213,9 @@ def init_db():
                 clicks INTEGER,
                 ctr REAL,
                 avg_position REAL,
+                impressions_yoy REAL,
+                clicks_yoy REAL,
+                ctr_yoy REAL,
                 FOREIGN KEY (week_id) REFERENCES dim_week(id) ON DELETE CASCADE,
                 UNIQUE (week_id, segment)
             )
@@ -185,7 +265,144 @@ def init_db():
             )
         """)
         
+        # Journal des mises à jour incrémentales (Yjs) des documents collaboratifs :
+        # seq croissant par document, replié dans collaborative_documents.state par le compacteur
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS collaborative_document_updates (
+                doc_id TEXT NOT NULL REFERENCES collaborative_documents(doc_id) ON DELETE CASCADE,
+                seq INTEGER NOT NULL,
+                client_id TEXT,
+                update_data BLOB NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (doc_id, seq)
+            )
+        """)
+        
+        # Snapshots de l'état des documents tous les N seq (historique des versions)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS collaborative_document_snapshots (
+                doc_id TEXT NOT NULL REFERENCES collaborative_documents(doc_id) ON DELETE CASCADE,
+                seq INTEGER NOT NULL,
+                state BLOB NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (doc_id, seq)
+            )
+        """)
+        
+        # File d'attente des imports CPFR traités en arrière-plan
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cpfr_jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL DEFAULT 'queued'
+                    CHECK (status IN ('queued', 'running', 'done', 'failed')),
+                filename TEXT,
+                file_path TEXT NOT NULL,
+                slide_start INTEGER NOT NULL,
+                slide_end INTEGER NOT NULL,
+                week_start_date DATE,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP,
+                parse_ms REAL,
+                ingest_ms REAL,
+                result TEXT,
+                error TEXT
+            )
+        """)
+        
+        # Cache des parsings : un deck identique (même contenu, mêmes slides, même parser)
+        # n'est pas re-parsé ; son payload est ré-ingéré
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS parse_cache (
+                sha256 TEXT NOT NULL,
+                slide_start INTEGER NOT NULL,
+                slide_end INTEGER NOT NULL,
+                parser_version TEXT NOT NULL,
+                week_start_date DATE,
+                payload TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_hit_at TIMESTAMP,
+                PRIMARY KEY (sha256, slide_start, slide_end, parser_version)
+            )
+        """)
+        
+        # Document "dernière semaine" déjà assemblé et formaté (une seule ligne, id = 1),
+        # reconstruit par les chemins d'écriture (mark_data_changed)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS latest_week_snapshot (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                week_start_date DATE,
+                payload TEXT NOT NULL,
+                built_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # Compteur de modifications des données CPFR (une seule ligne, id = 1) :
+        # ETag / Last-Modified des API JSON (mark_data_changed)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS data_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL DEFAULT 0,
+                changed_at REAL NOT NULL
+            )
+        """)
+        conn.execute("INSERT OR IGNORE INTO data_version (id, version, changed_at) VALUES (1, 0, ?)", (time.time(),))
+        
+        # Journal des événements diffusés par /api/v1/events (SSE), lu par tous les workers
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS data_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                event_type TEXT NOT NULL,
+                data TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # Pivot de la page Data History : une cellule formatée par (semaine, section, métrique),
+        # mise à jour semaine par semaine par les chemins d'écriture (mark_data_changed)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS data_history_pivot (
+                week_id INTEGER NOT NULL REFERENCES dim_week(id),
+                section TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                value REAL,
+                display TEXT NOT NULL,
+                PRIMARY KEY (week_id, section, metric)
+            )
+        """)
+        
+        # Colonnes ajoutées après coup sur des bases existantes
+        # worker_pid / heartbeat_at : un job 'running' n'est repris que si son worker est mort
+        _ensure_columns(conn, "cpfr_jobs", {"sha256": "TEXT", "worker_pid": "INTEGER", "heartbeat_at": "TIMESTAMP"})
+        # last_seq : dernier seq attribué ; state_seq : dernier seq replié dans state
+        _ensure_columns(conn, "collaborative_documents", {
+            "last_seq": "INTEGER NOT NULL DEFAULT 0", "state_seq": "INTEGER NOT NULL DEFAULT 0"
+        })
+        _ensure_columns(conn, "weekly_summary", {"best_day": "TEXT"})
+        _ensure_columns(conn, "bookings_details", {"lengths_of_stay": "TEXT"})
+        _ensure_columns(conn, "channel_seo_detail", {
+            "impressions_yoy": "REAL", "clicks_yoy": "REAL", "ctr_yoy": "REAL"
+        })
+        # Résumé des extractions calculé à l'insertion (liste de l'historique sans les colonnes JSON)
+        _ensure_columns(conn, "extractions", {
+            "kpi_count": "INTEGER", "row_count": "INTEGER", "kpi_preview": "TEXT"
+        })
+        conn.execute("""
+            UPDATE extractions SET
+                kpi_count = CASE WHEN json_valid(kpi) THEN json_array_length(kpi) ELSE 0 END,
+                row_count = CASE WHEN json_valid(table_data) THEN COALESCE(json_array_length(table_data, '$.rows'), 0) ELSE 0 END,
+                kpi_preview = CASE WHEN json_valid(kpi) THEN (
+                    SELECT json_group_array(value) FROM (SELECT value FROM json_each(kpi) LIMIT ?)
+                ) ELSE '[]' END
+            WHERE kpi_count IS NULL
+        """, (KPI_PREVIEW_SIZE,))
+        
         # Indexes
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cpfr_jobs_status ON cpfr_jobs(status, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_extractions_status ON extractions(extraction_status)")
         conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_weekly_summary_week ON weekly_summary(week_id)")
         conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_offers_focus_week ON offers_focus(week_id)")
         conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_bookings_details_week ON bookings_details(week_id)")
@@ -242,34 +459,82 @@ def init_db():
                 VALUES (?, ?)
             """, (channel_code, channel_label))
         
+        # Base existante sans pivot : construction initiale
+        if not conn.execute("SELECT 1 FROM data_history_pivot LIMIT 1").fetchone():
+            _refresh_pivot_weeks(conn, [row[0] for row in conn.execute("SELECT id FROM dim_week")])
+        
         conn.commit()
 
 
+def _ensure_columns(conn: sqlite3.Connection, table: str, columns: Dict[str, str]):
+    """Ajoute les colonnes manquantes d'une table existante (migration légère)"""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for name, declaration in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {declaration}")
+
+
+def _resolve_week_id(conn: sqlite3.Connection, week_start_date: str) -> int:
+    """Id de la semaine dans dim_week, créée si besoin, sur la connexion fournie"""
+    date_obj = datetime.strptime(week_start_date, "%Y-%m-%d").date()
+    iso_year, iso_week, _ = date_obj.isocalendar()
+    # OR IGNORE : un autre worker a pu créer la semaine entre-temps
+    conn.execute(
+        "INSERT OR IGNORE INTO dim_week (week_start_date, iso_year, iso_week) VALUES (?, ?, ?)",
+        (week_start_date, iso_year, iso_week)
+    )
+    return conn.execute(
+        "SELECT id FROM dim_week WHERE week_start_date = ?",
+        (week_start_date,)
+    ).fetchone()[0]
+
+
+def _resolve_channel_id(channel_ids: Dict[str, int], channel_code: str) -> int:
+    channel_id = channel_ids.get(channel_code)
+    if channel_id is None:
+        raise ValueError(f"Canal {channel_code} non trouvé")
+    return channel_id
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _upsert_rows(conn: sqlite3.Connection, table: str, key_columns: tuple, rows: List[Dict[str, Any]]) -> int:
+    """
+    INSERT ... ON CONFLICT DO UPDATE en un seul executemany.
+    Seules les colonnes présentes dans les lignes ET dans la table sont écrites :
+    les clés de payload inconnues (week_start_date, channel_code...) sont ignorées.
+    """
+    if not rows:
+        return 0
+    table_columns = _table_columns(conn, table)
+    present = set().union(*(row.keys() for row in rows))
+    columns = [c for c in table_columns if c in present and c != 'id']
+    update_columns = [c for c in columns if c not in key_columns]
+    
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+    if key_columns:
+        conflict = ', '.join(key_columns)
+        if update_columns:
+            sql += f" ON CONFLICT({conflict}) DO UPDATE SET " + ', '.join(f"{c} = excluded.{c}" for c in update_columns)
+        else:
+            sql += f" ON CONFLICT({conflict}) DO NOTHING"
+    conn.executemany(sql, [tuple(row.get(c) for c in columns) for row in rows])
+    return len(rows)
+
+
 def get_or_create_week(week_start_date: str) -> int:
     """Récupère ou crée une semaine dans dim_week"""
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            # Vérifier si la semaine existe
-            cursor = conn.execute(
-                "SELECT id FROM dim_week WHERE week_start_date = ?",
-                (week_start_date,)
-            )
-            existing = cursor.fetchone()
-            
-            if existing:
-                return existing[0]
-            
-            # Calculer ISO year et week
-            date_obj = datetime.strptime(week_start_date, "%Y-%m-%d").date()
-            iso_year, iso_week, _ = date_obj.isocalendar()
-            
-            # Insérer la nouvelle semaine
-            cursor = conn.execute(
-                "INSERT INTO dim_week (week_start_date, iso_year, iso_week) VALUES (?, ?, ?)",
-                (week_start_date, iso_year, iso_week)
-            )
+        with get_connection() as conn:
+            changes = conn.total_changes
+            week_id = _resolve_week_id(conn, week_start_date)
+            if conn.total_changes != changes:
+                # Nouvelle semaine : elle peut devenir la plus récente
+                mark_data_changed(conn)
             conn.commit()
-            return cursor.lastrowid
+            return week_id
             
     except Exception as e:
         print(f"Erreur lors de la création/récupération de la semaine: {e}")
@@ -279,7 +544,7 @@ def get_or_create_week(week_start_date: str) -> int:
 def get_channel_id(channel_code: str) -> Optional[int]:
     """Récupère l'ID d'un canal par son code"""
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with get_connection() as conn:
             cursor = conn.execute(
                 "SELECT id FROM dim_channel WHERE channel_code = ?",
                 (channel_code,)
@@ -295,58 +560,27 @@ def get_channel_id(channel_code: str) -> Optional[int]:
 # FONCTIONS D'INSERTION CPFR
 # ============================================================================
 
+def _insert_week_rows(table: str, key_columns: tuple, data: Dict[str, Any], with_channel: bool = False) -> None:
+    """Écrit une ligne d'une table de faits hebdomadaire (une connexion, un commit)"""
+    with get_connection() as conn:
+        row = {**data, 'week_id': _resolve_week_id(conn, data['week_start_date'])}
+        if with_channel:
+            channel_ids = dict(conn.execute("SELECT channel_code, id FROM dim_channel"))
+            row['channel_id'] = _resolve_channel_id(channel_ids, data['channel_code'])
+        _upsert_rows(conn, table, key_columns, [row])
+        mark_data_changed(conn, [row['week_id']])
+        publish_event(conn, 'cells_edited', {
+            'week_ids': [row['week_id']],
+            'sections': _sections_for({table}, {data.get('channel_code')})
+        })
+        conn.commit()
+
+
 def insert_weekly_summary(data: Dict[str, Any]) -> bool:
     """Insère ou met à jour les données de résumé hebdomadaire"""
     try:
-        week_id = get_or_create_week(data['week_start_date'])
-        
-        with sqlite3.connect(DB_PATH) as conn:
-            # Vérifier si la semaine existe déjà
-            cursor = conn.execute(
-                "SELECT id FROM weekly_summary WHERE week_id = ?",
-                (week_id,)
-            )
-            existing = cursor.fetchone()
-            
-            if existing:
-                # Mise à jour
-                conn.execute("""
-                    UPDATE weekly_summary SET 
-                    sessions = ?, revenue_b2c = ?, average_basket_value = ?, 
-                    conversion_rate = ?, nb_bookings = ?, vs_ly_sessions = ?,
-                    vs_lw_sessions = ?, vs_ly_revenue = ?, vs_lw_revenue = ?,
-                    vs_ly_abv = ?, vs_lw_abv = ?, vs_ly_cr = ?, vs_lw_cr = ?,
-                    vs_ly_bookings = ?, vs_lw_bookings = ?, best_day = ?,
-                    best_day_sessions = ?, best_day_revenue = ?
-                    WHERE week_id = ?
-                """, (
-                    data.get('sessions'), data.get('revenue_b2c'), data.get('average_basket_value'),
-                    data.get('conversion_rate'), data.get('nb_bookings'), data.get('vs_ly_sessions'),
-                    data.get('vs_lw_sessions'), data.get('vs_ly_revenue'), data.get('vs_lw_revenue'),
-                    data.get('vs_ly_abv'), data.get('vs_lw_abv'), data.get('vs_ly_cr'), data.get('vs_lw_cr'),
-                    data.get('vs_ly_bookings'), data.get('vs_lw_bookings'), data.get('best_day'),
-                    data.get('best_day_sessions'), data.get('best_day_revenue'), week_id
-                ))
-            else:
-                # Insertion
-                conn.execute("""
-                    INSERT INTO weekly_summary 
-                    (week_id, sessions, revenue_b2c, average_basket_value, 
-                     conversion_rate, nb_bookings, vs_ly_sessions, vs_lw_sessions,
-                     vs_ly_revenue, vs_lw_revenue, vs_ly_abv, vs_lw_abv, vs_ly_cr,
-                     vs_lw_cr, vs_ly_bookings, vs_lw_bookings, best_day, best_day_sessions, best_day_revenue)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    week_id, data.get('sessions'), data.get('revenue_b2c'),
-                    data.get('average_basket_value'), data.get('conversion_rate'), data.get('nb_bookings'),
-                    data.get('vs_ly_sessions'), data.get('vs_lw_sessions'), data.get('vs_ly_revenue'),
-                    data.get('vs_lw_revenue'), data.get('vs_ly_abv'), data.get('vs_lw_abv'),
-                    data.get('vs_ly_cr'), data.get('vs_lw_cr'), data.get('vs_ly_bookings'),
-                    data.get('vs_lw_bookings'), data.get('best_day'), data.get('best_day_sessions'),
-                    data.get('best_day_revenue')
-                ))
-            conn.commit()
-            return True
+        _insert_week_rows('weekly_summary', ('week_id',), data)
+        return True
     except Exception as e:
         print(f"Erreur lors de l'insertion du résumé hebdomadaire: {e}")
         return False
@@ -355,41 +589,8 @@ def insert_weekly_summary(data: Dict[str, Any]) -> bool:
 def insert_offers_focus(data: Dict[str, Any]) -> bool:
     """Insère ou met à jour les données de focus des offres"""
     try:
-        week_id = get_or_create_week(data['week_start_date'])
-        
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.execute(
-                "SELECT id FROM offers_focus WHERE week_id = ?",
-                (week_id,)
-            )
-            existing = cursor.fetchone()
-            
-            if existing:
-                conn.execute("""
-                    UPDATE offers_focus SET 
-                    last_minute_pct = ?, early_booking_pct = ?, summer_flash_revenue = ?,
-                    summer_flash_bookings = ?, summer_flash_abv = ?, lead_gen_revenue = ?,
-                    lead_gen_bookings = ?
-                    WHERE week_id = ?
-                """, (
-                    data.get('last_minute_pct'), data.get('early_booking_pct'),
-                    data.get('summer_flash_revenue'), data.get('summer_flash_bookings'),
-                    data.get('summer_flash_abv'), data.get('lead_gen_revenue'),
-                    data.get('lead_gen_bookings'), week_id
-                ))
-            else:
-                conn.execute("""
-                    INSERT INTO offers_focus 
-                    (week_id, last_minute_pct, early_booking_pct, summer_flash_revenue,
-                     summer_flash_bookings, summer_flash_abv, lead_gen_revenue, lead_gen_bookings)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    week_id, data.get('last_minute_pct'), data.get('early_booking_pct'),
-                    data.get('summer_flash_revenue'), data.get('summer_flash_bookings'),
-                    data.get('summer_flash_abv'), data.get('lead_gen_revenue'), data.get('lead_gen_bookings')
-                ))
-            conn.commit()
-            return True
+        _insert_week_rows('offers_focus', ('week_id',), data)
+        return True
     except Exception as e:
         print(f"Erreur lors de l'insertion du focus des offres: {e}")
         return False
@@ -398,43 +599,8 @@ def insert_offers_focus(data: Dict[str, Any]) -> bool:
 def insert_bookings_details(data: Dict[str, Any]) -> bool:
     """Insère ou met à jour les détails des réservations"""
     try:
-        week_id = get_or_create_week(data['week_start_date'])
-        
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.execute(
-                "SELECT id FROM bookings_details WHERE week_id = ?",
-                (week_id,)
-            )
-            existing = cursor.fetchone()
-            
-            if existing:
-                conn.execute("""
-                    UPDATE bookings_details SET 
-                    month_july_pct = ?, month_august_pct = ?, month_sept_pct = ?,
-                    top_dates_booked = ?, top_dates_searched = ?, top_parks_booked = ?,
-                    lengths_of_stay = ?, length_2n_pct = ?, length_3n_pct = ?, length_4n_pct = ?
-                    WHERE week_id = ?
-                """, (
-                    data.get('month_july_pct'), data.get('month_august_pct'), data.get('month_sept_pct'),
-                    data.get('top_dates_booked'), data.get('top_dates_searched'), data.get('top_parks_booked'),
-                    data.get('lengths_of_stay'), data.get('length_2n_pct'), data.get('length_3n_pct'),
-                    data.get('length_4n_pct'), week_id
-                ))
-            else:
-                conn.execute("""
-                    INSERT INTO bookings_details 
-                    (week_id, month_july_pct, month_august_pct, month_sept_pct,
-                     top_dates_booked, top_dates_searched, top_parks_booked,
-                     lengths_of_stay, length_2n_pct, length_3n_pct, length_4n_pct)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    week_id, data.get('month_july_pct'), data.get('month_august_pct'),
-                    data.get('month_sept_pct'), data.get('top_dates_booked'), data.get('top_dates_searched'),
-                    data.get('top_parks_booked'), data.get('lengths_of_stay'), data.get('length_2n_pct'),
-                    data.get('length_3n_pct'), data.get('length_4n_pct')
-                ))
-            conn.commit()
-            return True
+        _insert_week_rows('bookings_details', ('week_id',), data)
+        return True
     except Exception as e:
         print(f"Erreur lors de l'insertion des détails des réservations: {e}")
         return False
@@ -443,54 +609,8 @@ def insert_bookings_details(data: Dict[str, Any]) -> bool:
 def insert_acquisition_channel(data: Dict[str, Any]) -> bool:
     """Insère ou met à jour les données d'un canal d'acquisition"""
     try:
-        week_id = get_or_create_week(data['week_start_date'])
-        channel_id = get_channel_id(data['channel_code'])
-        
-        if not channel_id:
-            print(f"Canal {data['channel_code']} non trouvé")
-            return False
-        
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.execute(
-                "SELECT id FROM acquisition_channels WHERE week_id = ? AND channel_id = ?",
-                (week_id, channel_id)
-            )
-            existing = cursor.fetchone()
-            
-            if existing:
-                conn.execute("""
-                    UPDATE acquisition_channels SET 
-                    sessions = ?, bookings = ?, revenue = ?, costs = ?,
-                    wow_sessions = ?, yoy_sessions = ?, wow_bookings = ?, yoy_bookings = ?,
-                    wow_revenue = ?, yoy_revenue = ?, wow_costs = ?, yoy_costs = ?,
-                    cvr_vs_lw = ?, cvr_vs_ly = ?, comments = ?
-                    WHERE week_id = ? AND channel_id = ?
-                """, (
-                    data.get('sessions'), data.get('bookings'), data.get('revenue'),
-                    data.get('costs'), data.get('wow_sessions'), data.get('yoy_sessions'),
-                    data.get('wow_bookings'), data.get('yoy_bookings'), data.get('wow_revenue'),
-                    data.get('yoy_revenue'), data.get('wow_costs'), data.get('yoy_costs'),
-                    data.get('cvr_vs_lw'), data.get('cvr_vs_ly'), data.get('comments'),
-                    week_id, channel_id
-                ))
-            else:
-                conn.execute("""
-                    INSERT INTO acquisition_channels 
-                    (week_id, channel_id, sessions, bookings, revenue, costs,
-                     wow_sessions, yoy_sessions, wow_bookings, yoy_bookings,
-                     wow_revenue, yoy_revenue, wow_costs, yoy_costs,
-                     cvr_vs_lw, cvr_vs_ly, comments)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    week_id, channel_id, data.get('sessions'), data.get('bookings'),
-                    data.get('revenue'), data.get('costs'), data.get('wow_sessions'),
-                    data.get('yoy_sessions'), data.get('wow_bookings'), data.get('yoy_bookings'),
-                    data.get('wow_revenue'), data.get('yoy_revenue'), data.get('wow_costs'),
-                    data.get('yoy_costs'), data.get('cvr_vs_lw'), data.get('cvr_vs_ly'),
-                    data.get('comments')
-                ))
-            conn.commit()
-            return True
+        _insert_week_rows('acquisition_channels', ('week_id', 'channel_id'), data, with_channel=True)
+        return True
     except Exception as e:
         print(f"Erreur lors de l'insertion du canal d'acquisition: {e}")
         return False
@@ -499,35 +619,8 @@ def insert_acquisition_channel(data: Dict[str, Any]) -> bool:
 def insert_seo_detail(data: Dict[str, Any]) -> bool:
     """Insère ou met à jour les détails SEO"""
     try:
-        week_id = get_or_create_week(data['week_start_date'])
-        
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.execute(
-                "SELECT id FROM channel_seo_detail WHERE week_id = ? AND segment = ?",
-                (week_id, data['segment'])
-            )
-            existing = cursor.fetchone()
-            
-            if existing:
-                conn.execute("""
-                    UPDATE channel_seo_detail SET 
-                    impressions = ?, clicks = ?, ctr = ?, avg_position = ?
-                    WHERE week_id = ? AND segment = ?
-                """, (
-                    data.get('impressions'), data.get('clicks'), data.get('ctr'),
-                    data.get('avg_position'), week_id, data['segment']
-                ))
-            else:
-                conn.execute("""
-                    INSERT INTO channel_seo_detail 
-                    (week_id, segment, impressions, clicks, ctr, avg_position)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (
-                    week_id, data['segment'], data.get('impressions'), data.get('clicks'),
-                    data.get('ctr'), data.get('avg_position')
-                ))
-            conn.commit()
-            return True
+        _insert_week_rows('channel_seo_detail', ('week_id', 'segment'), data)
+        return True
     except Exception as e:
         print(f"Erreur lors de l'insertion des détails SEO: {e}")
         return False
@@ -536,24 +629,8 @@ def insert_seo_detail(data: Dict[str, Any]) -> bool:
 def insert_campaign_note(data: Dict[str, Any]) -> bool:
     """Insère une note de campagne"""
     try:
-        week_id = get_or_create_week(data['week_start_date'])
-        channel_id = get_channel_id(data['channel_code'])
-        
-        if not channel_id:
-            print(f"Canal {data['channel_code']} non trouvé")
-            return False
-        
-        with sqlite3.connect(DB_PATH) as conn:
-            conn.execute("""
-                INSERT INTO channel_campaign_notes 
-                (week_id, channel_id, campaign_name, metric_bookings, metric_revenue, note)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                week_id, channel_id, data['campaign_name'], data.get('metric_bookings'),
-                data.get('metric_revenue'), data.get('note')
-            ))
-            conn.commit()
-            return True
+        _insert_week_rows('channel_campaign_notes', (), data, with_channel=True)
+        return True
     except Exception as e:
         print(f"Erreur lors de l'insertion de la note de campagne: {e}")
         return False
@@ -566,7 +643,7 @@ def insert_campaign_note(data: Dict[str, Any]) -> bool:
 def get_weeks(limit: int = 52) -> List[Dict[str, Any]]:
     """Récupère la liste des semaines disponibles"""
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with get_connection() as conn:
             cursor = conn.execute("""
                 SELECT id, week_start_date, iso_year, iso_week, week_label
                 FROM dim_week 
@@ -585,7 +662,7 @@ def get_weeks(limit: int = 52) -> List[Dict[str, Any]]:
 def get_weekly_summary(limit: int = 12) -> List[Dict[str, Any]]:
     """Récupère les données de résumé hebdomadaire avec jointure dim_week"""
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with get_connection() as conn:
             cursor = conn.execute("""
                 SELECT w.week_label, w.week_start_date, ws.*
                 FROM weekly_summary ws
@@ -605,7 +682,7 @@ def get_weekly_summary(limit: int = 12) -> List[Dict[str, Any]]:
 def get_offers_focus(limit: int = 12) -> List[Dict[str, Any]]:
     """Récupère les données de focus des offres avec jointure dim_week"""
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with get_connection() as conn:
             cursor = conn.execute("""
                 SELECT w.week_label, w.week_start_date, of.*
                 FROM offers_focus of
@@ -625,7 +702,7 @@ def get_offers_focus(limit: int = 12) -> List[Dict[str, Any]]:
 def get_bookings_details(limit: int = 12) -> List[Dict[str, Any]]:
     """Récupère les détails des réservations"""
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with get_connection() as conn:
             cursor = conn.execute("""
                 SELECT w.week_label, w.week_start_date, bd.*
                 FROM bookings_details bd
@@ -662,7 +739,7 @@ def get_bookings_details(limit: int = 12) -> List[Dict[str, Any]]:
 def get_acquisition_channels(limit: int = 12) -> List[Dict[str, Any]]:
     """Récupère les données des canaux d'acquisition avec jointures"""
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with get_connection() as conn:
             cursor = conn.execute("""
                 SELECT w.week_label, w.week_start_date, c.channel_code, c.channel_label, ac.*
                 FROM acquisition_channels ac
@@ -683,7 +760,7 @@ def get_acquisition_channels(limit: int = 12) -> List[Dict[str, Any]]:
 def get_campaign_notes(week_start_date: str = None) -> List[Dict[str, Any]]:
     """Récupère les notes de campagne"""
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with get_connection() as conn:
             if week_start_date:
                 week_id = get_or_create_week(week_start_date)
                 cursor = conn.execute("""
@@ -747,194 +824,923 @@ def format_kpi_value(value, metric_type):
         return str(value) if value is not None else None
 
 
+def _build_latest_weekly_data(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """Assemble et formate le document de la semaine la plus récente (5 requêtes)"""
+    # Résumé hebdomadaire
+    weekly_cursor = conn.execute("""
+        SELECT w.week_label, w.week_start_date, ws.*
+        FROM weekly_summary ws
+        JOIN dim_week w ON ws.week_id = w.id
+        ORDER BY w.week_start_date DESC LIMIT 1
+    """)
+    weekly = weekly_cursor.fetchone()
+    weekly_columns = [col[0] for col in weekly_cursor.description]
+    
+    # Focus des offres
+    offers_cursor = conn.execute("""
+        SELECT w.week_label, w.week_start_date, of.*
+        FROM offers_focus of
+        JOIN dim_week w ON of.week_id = w.id
+        ORDER BY w.week_start_date DESC LIMIT 1
+    """)
+    offers = offers_cursor.fetchone()
+    offers_columns = [col[0] for col in offers_cursor.description]
+    
+    # Détails des réservations
+    bookings_cursor = conn.execute("""
+        SELECT w.week_label, w.week_start_date, bd.*
+        FROM bookings_details bd
+        JOIN dim_week w ON bd.week_id = w.id
+        ORDER BY w.week_start_date DESC LIMIT 1
+    """)
+    bookings = bookings_cursor.fetchone()
+    bookings_columns = [col[0] for col in bookings_cursor.description]
+    
+    # Canaux d'acquisition
+    channels_cursor = conn.execute("""
+        SELECT w.week_label, w.week_start_date, c.channel_code, c.channel_label, ac.*
+        FROM acquisition_channels ac
+        JOIN dim_week w ON ac.week_id = w.id
+        JOIN dim_channel c ON ac.channel_id = c.id
+        WHERE w.week_start_date = (SELECT MAX(week_start_date) FROM dim_week)
+        ORDER BY c.channel_code
+    """)
+    channels = channels_cursor.fetchall()
+    channels_columns = [col[0] for col in channels_cursor.description]
+    
+    # Notes de campagne
+    campaign_notes_cursor = conn.execute("""
+        SELECT w.week_label, c.channel_code, ccn.*
+        FROM channel_campaign_notes ccn
+        JOIN dim_week w ON ccn.week_id = w.id
+        JOIN dim_channel c ON ccn.channel_id = c.id
+        WHERE w.week_start_date = (SELECT MAX(week_start_date) FROM dim_week)
+        ORDER BY c.channel_code, ccn.campaign_name
+    """)
+    campaign_notes = campaign_notes_cursor.fetchall()
+    campaign_notes_columns = [col[0] for col in campaign_notes_cursor.description]
+    
+    # Créer les dictionnaires avec les données brutes
+    weekly_data = dict(zip(weekly_columns, weekly)) if weekly else None
+    offers_data = dict(zip(offers_columns, offers)) if offers else None
+    bookings_data = dict(zip(bookings_columns, bookings)) if bookings else None
+    
+    # Formater les valeurs du résumé hebdomadaire
+    if weekly_data:
+        weekly_data['sessions'] = format_kpi_value(weekly_data['sessions'], 'sessions')
+        weekly_data['revenue_b2c'] = format_kpi_value(weekly_data['revenue_b2c'], 'revenue')
+        weekly_data['average_basket_value'] = format_kpi_value(weekly_data['average_basket_value'], 'basket_value')
+        weekly_data['conversion_rate'] = format_kpi_value(weekly_data['conversion_rate'], 'conversion_rate')
+        weekly_data['nb_bookings'] = format_kpi_value(weekly_data['nb_bookings'], 'bookings')
+    
+        # Formater les variations
+        weekly_data['vs_ly_sessions'] = format_kpi_value(weekly_data['vs_ly_sessions'], 'percentage')
+        weekly_data['vs_lw_sessions'] = format_kpi_value(weekly_data['vs_lw_sessions'], 'percentage')
+        weekly_data['vs_ly_revenue'] = format_kpi_value(weekly_data['vs_ly_revenue'], 'percentage')
+        weekly_data['vs_lw_revenue'] = format_kpi_value(weekly_data['vs_lw_revenue'], 'percentage')
+        weekly_data['vs_ly_abv'] = format_kpi_value(weekly_data['vs_ly_abv'], 'percentage')
+        weekly_data['vs_lw_abv'] = format_kpi_value(weekly_data['vs_lw_abv'], 'percentage')
+        weekly_data['vs_ly_cr'] = format_kpi_value(weekly_data['vs_ly_cr'], 'percentage')
+        weekly_data['vs_lw_cr'] = format_kpi_value(weekly_data['vs_lw_cr'], 'percentage')
+        weekly_data['vs_ly_bookings'] = format_kpi_value(weekly_data['vs_ly_bookings'], 'percentage')
+        weekly_data['vs_lw_bookings'] = format_kpi_value(weekly_data['vs_lw_bookings'], 'percentage')
+    
+    # Formater les valeurs des offres
+    if offers_data:
+        offers_data['last_minute_pct'] = format_kpi_value(offers_data['last_minute_pct'], 'percentage')
+        offers_data['early_booking_pct'] = format_kpi_value(offers_data['early_booking_pct'], 'percentage')
+        offers_data['summer_flash_revenue'] = format_kpi_value(offers_data['summer_flash_revenue'], 'revenue')
+        offers_data['summer_flash_bookings'] = format_kpi_value(offers_data['summer_flash_bookings'], 'bookings')
+        offers_data['summer_flash_abv'] = format_kpi_value(offers_data['summer_flash_abv'], 'basket_value')
+        offers_data['lead_gen_revenue'] = format_kpi_value(offers_data['lead_gen_revenue'], 'revenue')
+        offers_data['lead_gen_bookings'] = format_kpi_value(offers_data['lead_gen_bookings'], 'bookings')
+    
+    # Formater les valeurs des détails des réservations
+    if bookings_data:
+        bookings_data['month_july_pct'] = format_kpi_value(bookings_data['month_july_pct'], 'percentage')
+        bookings_data['month_august_pct'] = format_kpi_value(bookings_data['month_august_pct'], 'percentage')
+        bookings_data['month_sept_pct'] = format_kpi_value(bookings_data['month_sept_pct'], 'percentage')
+        bookings_data['length_2n_pct'] = format_kpi_value(bookings_data['length_2n_pct'], 'percentage')
+        bookings_data['length_3n_pct'] = format_kpi_value(bookings_data['length_3n_pct'], 'percentage')
+        bookings_data['length_4n_pct'] = format_kpi_value(bookings_data['length_4n_pct'], 'percentage')
+    
+    return {
+        'weekly_summary': weekly_data,
+        'offers_focus': offers_data,
+        'bookings_details': bookings_data,
+        'acquisition_channels': [dict(zip(channels_columns, row)) for row in channels],
+        'campaign_notes': [dict(zip(campaign_notes_columns, row)) for row in campaign_notes]
+    }
+
+
+def refresh_latest_snapshot(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """Reconstruit latest_week_snapshot dans la transaction de l'appelant"""
+    document = _build_latest_weekly_data(conn)
+    week_start_date = (document.get('weekly_summary') or {}).get('week_start_date')
+    conn.execute("""
+        INSERT INTO latest_week_snapshot (id, week_start_date, payload, built_at)
+        VALUES (1, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(id) DO UPDATE SET week_start_date = excluded.week_start_date,
+            payload = excluded.payload, built_at = excluded.built_at
+    """, (week_start_date, json.dumps(document, ensure_ascii=False, default=str)))
+    return document
+
+
+def mark_data_changed(conn: sqlite3.Connection, week_ids=()) -> int:
+    """
+    À appeler dans la transaction de tout chemin d'écriture des tables CPFR
+    (ingestion, saisie, sauvegarde data-history) : incrémente data_version,
+    recalcule le pivot Data History des semaines `week_ids` et reconstruit le
+    snapshot de la dernière semaine. Renvoie la nouvelle version.
+    """
+    conn.execute("UPDATE data_version SET version = version + 1, changed_at = ? WHERE id = 1", (time.time(),))
+    _refresh_pivot_weeks(conn, week_ids)
+    refresh_latest_snapshot(conn)
+    return conn.execute("SELECT version FROM data_version WHERE id = 1").fetchone()[0]
+
+
+def get_data_version() -> Optional[Tuple[int, float]]:
+    """(version, horodatage epoch de la dernière modification) des données CPFR"""
+    try:
+        row = get_connection().execute("SELECT version, changed_at FROM data_version WHERE id = 1").fetchone()
+        return (row[0], row[1]) if row else None
+    except Exception as e:
+        print(f"Erreur lors de la lecture de data_version: {e}")
+        return None
+
+
+# Nombre d'événements conservés dans data_events (les clients plus en retard rechargent tout)
+EVENT_RETENTION = 1000
+
+
+def publish_event(conn: sqlite3.Connection, event_type: str, data: Dict[str, Any]) -> int:
+    """
+    Enregistre un événement pour les flux SSE, dans la transaction de l'écriture
+    notifiée : il n'est visible des autres workers qu'une fois celle-ci validée.
+    Types: 'week_ingested', 'cells_edited', 'job_finished'
+    """
+    event_id = conn.execute("INSERT INTO data_events (event_type, data) VALUES (?, ?) RETURNING id",
+                            (event_type, json.dumps(data, ensure_ascii=False, default=str))).fetchone()[0]
+    conn.execute("DELETE FROM data_events WHERE id <= ?", (event_id - EVENT_RETENTION,))
+    return event_id
+
+
+def get_events_since(last_id: int, limit: int = 100) -> List[Dict[str, Any]]:
+    """Événements postérieurs à `last_id`, du plus ancien au plus récent"""
+    try:
+        cursor = get_connection().execute("""
+            SELECT id, event_type, data, created_at FROM data_events
+            WHERE id > ? ORDER BY id LIMIT ?
+        """, (last_id, limit))
+        return [
+            {'id': row[0], 'type': row[1], 'data': json.loads(row[2]), 'created_at': row[3]}
+            for row in cursor.fetchall()
+        ]
+    except Exception as e:
+        print(f"Erreur lors de la lecture des événements: {e}")
+        return []
+
+
+def get_last_event_id() -> int:
+    """Identifiant du dernier événement publié (0 si aucun)"""
+    try:
+        row = get_connection().execute("SELECT MAX(id) FROM data_events").fetchone()
+        return row[0] or 0
+    except Exception as e:
+        print(f"Erreur lors de la lecture du dernier événement: {e}")
+        return 0
+
+
+def _sections_for(tables, channel_codes=()) -> List[str]:
+    """Sections Data History alimentées par les tables (et canaux) écrits"""
+    return [
+        section for section, (table, _) in DATA_HISTORY_SECTIONS.items()
+        if table in tables and (table != 'acquisition_channels' or section in channel_codes)
+    ]
+
+
 def get_latest_weekly_data() -> Dict[str, Any]:
-    """Récupère les données de la semaine la plus récente"""
+    """
+    Données formatées de la semaine la plus récente, lues dans latest_week_snapshot
+    (une lecture par clé primaire). Le snapshot est construit au premier appel s'il manque.
+    """
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            # Résumé hebdomadaire
-            weekly_cursor = conn.execute("""
-                SELECT w.week_label, w.week_start_date, ws.*
-                FROM weekly_summary ws
-                JOIN dim_week w ON ws.week_id = w.id
-                ORDER BY w.week_start_date DESC LIMIT 1
-            """)
-            weekly = weekly_cursor.fetchone()
-            weekly_columns = [col[0] for col in weekly_cursor.description]
-            
-            # Focus des offres
-            offers_cursor = conn.execute("""
-                SELECT w.week_label, w.week_start_date, of.*
-                FROM offers_focus of
-                JOIN dim_week w ON of.week_id = w.id
-                ORDER BY w.week_start_date DESC LIMIT 1
-            """)
-            offers = offers_cursor.fetchone()
-            offers_columns = [col[0] for col in offers_cursor.description]
-            
-            # Détails des réservations
-            bookings_cursor = conn.execute("""
-                SELECT w.week_label, w.week_start_date, bd.*
-                FROM bookings_details bd
-                JOIN dim_week w ON bd.week_id = w.id
-                ORDER BY w.week_start_date DESC LIMIT 1
-            """)
-            bookings = bookings_cursor.fetchone()
-            bookings_columns = [col[0] for col in bookings_cursor.description]
-            
-            # Canaux d'acquisition
-            channels_cursor = conn.execute("""
-                SELECT w.week_label, w.week_start_date, c.channel_code, c.channel_label, ac.*
-                FROM acquisition_channels ac
-                JOIN dim_week w ON ac.week_id = w.id
-                JOIN dim_channel c ON ac.channel_id = c.id
-                WHERE w.week_start_date = (SELECT MAX(week_start_date) FROM dim_week)
-                ORDER BY c.channel_code
-            """)
-            channels = channels_cursor.fetchall()
-            channels_columns = [col[0] for col in channels_cursor.description]
-            
-            # Notes de campagne
-            campaign_notes_cursor = conn.execute("""
-                SELECT w.week_label, c.channel_code, ccn.*
-                FROM channel_campaign_notes ccn
-                JOIN dim_week w ON ccn.week_id = w.id
-                JOIN dim_channel c ON ccn.channel_id = c.id
-                WHERE w.week_start_date = (SELECT MAX(week_start_date) FROM dim_week)
-                ORDER BY c.channel_code, ccn.campaign_name
-            """)
-            campaign_notes = campaign_notes_cursor.fetchall()
-            campaign_notes_columns = [col[0] for col in campaign_notes_cursor.description]
-            
-            # Créer les dictionnaires avec les données brutes
-            weekly_data = dict(zip(weekly_columns, weekly)) if weekly else None
-            offers_data = dict(zip(offers_columns, offers)) if offers else None
-            bookings_data = dict(zip(bookings_columns, bookings)) if bookings else None
-            
-            # Formater les valeurs du résumé hebdomadaire
-            if weekly_data:
-                weekly_data['sessions'] = format_kpi_value(weekly_data['sessions'], 'sessions')
-                weekly_data['revenue_b2c'] = format_kpi_value(weekly_data['revenue_b2c'], 'revenue')
-                weekly_data['average_basket_value'] = format_kpi_value(weekly_data['average_basket_value'], 'basket_value')
-                weekly_data['conversion_rate'] = format_kpi_value(weekly_data['conversion_rate'], 'conversion_rate')
-                weekly_data['nb_bookings'] = format_kpi_value(weekly_data['nb_bookings'], 'bookings')
-                
-                # Formater les variations
-                weekly_data['vs_ly_sessions'] = format_kpi_value(weekly_data['vs_ly_sessions'], 'percentage')
-                weekly_data['vs_lw_sessions'] = format_kpi_value(weekly_data['vs_lw_sessions'], 'percentage')
-                weekly_data['vs_ly_revenue'] = format_kpi_value(weekly_data['vs_ly_revenue'], 'percentage')
-                weekly_data['vs_lw_revenue'] = format_kpi_value(weekly_data['vs_lw_revenue'], 'percentage')
-                weekly_data['vs_ly_abv'] = format_kpi_value(weekly_data['vs_ly_abv'], 'percentage')
-                weekly_data['vs_lw_abv'] = format_kpi_value(weekly_data['vs_lw_abv'], 'percentage')
-                weekly_data['vs_ly_cr'] = format_kpi_value(weekly_data['vs_ly_cr'], 'percentage')
-                weekly_data['vs_lw_cr'] = format_kpi_value(weekly_data['vs_lw_cr'], 'percentage')
-                weekly_data['vs_ly_bookings'] = format_kpi_value(weekly_data['vs_ly_bookings'], 'percentage')
-                weekly_data['vs_lw_bookings'] = format_kpi_value(weekly_data['vs_lw_bookings'], 'percentage')
-            
-            # Formater les valeurs des offres
-            if offers_data:
-                offers_data['last_minute_pct'] = format_kpi_value(offers_data['last_minute_pct'], 'percentage')
-                offers_data['early_booking_pct'] = format_kpi_value(offers_data['early_booking_pct'], 'percentage')
-                offers_data['summer_flash_revenue'] = format_kpi_value(offers_data['summer_flash_revenue'], 'revenue')
-                offers_data['summer_flash_bookings'] = format_kpi_value(offers_data['summer_flash_bookings'], 'bookings')
-                offers_data['summer_flash_abv'] = format_kpi_value(offers_data['summer_flash_abv'], 'basket_value')
-                offers_data['lead_gen_revenue'] = format_kpi_value(offers_data['lead_gen_revenue'], 'revenue')
-                offers_data['lead_gen_bookings'] = format_kpi_value(offers_data['lead_gen_bookings'], 'bookings')
-            
-            # Formater les valeurs des détails des réservations
-            if bookings_data:
-                bookings_data['month_july_pct'] = format_kpi_value(bookings_data['month_july_pct'], 'percentage')
-                bookings_data['month_august_pct'] = format_kpi_value(bookings_data['month_august_pct'], 'percentage')
-                bookings_data['month_sept_pct'] = format_kpi_value(bookings_data['month_sept_pct'], 'percentage')
-                bookings_data['length_2n_pct'] = format_kpi_value(bookings_data['length_2n_pct'], 'percentage')
-                bookings_data['length_3n_pct'] = format_kpi_value(bookings_data['length_3n_pct'], 'percentage')
-                bookings_data['length_4n_pct'] = format_kpi_value(bookings_data['length_4n_pct'], 'percentage')
-            
-            return {
-                'weekly_summary': weekly_data,
-                'offers_focus': offers_data,
-                'bookings_details': bookings_data,
-                'acquisition_channels': [dict(zip(channels_columns, row)) for row in channels],
-                'campaign_notes': [dict(zip(campaign_notes_columns, row)) for row in campaign_notes]
-            }
+        conn = get_connection()
+        row = conn.execute("SELECT payload FROM latest_week_snapshot WHERE id = 1").fetchone()
+        if row:
+            return json.loads(row[0])
+        with conn:
+            return refresh_latest_snapshot(conn)
     except Exception as e:
         print(f"Erreur lors de la récupération des données hebdomadaires: {e}")
         return {}
 
 
 # ============================================================================
-# FONCTIONS D'INGESTION COMPLÈTE
+# PIVOT DATA HISTORY (métrique × semaine)
 # ============================================================================
 
-def ingest_weekly_data(payload: Dict[str, Any]) -> Dict[str, Any]:
-    """Ingère un payload complet pour une semaine"""
+def format_number(value):
+    """Formate un nombre pour l'affichage"""
+    if value is None:
+        return ''
     try:
-        week_start_date = payload.get('week_start_date')
-        if not week_start_date:
-            return {'success': False, 'error': 'week_start_date requis'}
-        
-        results = {'success': True, 'inserted': [], 'errors': []}
-        
-        # Weekly Summary
-        if 'weekly_summary' in payload:
-            if insert_weekly_summary({**payload['weekly_summary'], 'week_start_date': week_start_date}):
-                results['inserted'].append('weekly_summary')
+        if isinstance(value, (int, float)):
+            if value >= 1000000:
+                return f"{value/1000000:.1f}M"
+            elif value >= 1000:
+                return f"{value/1000:.1f}K"
             else:
-                results['errors'].append('weekly_summary')
-                results['success'] = False
-        
-        # Offers Focus
-        if 'offers_focus' in payload:
-            if insert_offers_focus({**payload['offers_focus'], 'week_start_date': week_start_date}):
-                results['inserted'].append('offers_focus')
+                return str(int(value))
+        return str(value)
+    except:
+        return str(value)
+
+
+def format_currency(value):
+    """Formate une valeur monétaire"""
+    if value is None:
+        return ''
+    try:
+        if isinstance(value, (int, float)):
+            if value >= 1000000:
+                return f"{value/1000000:.1f}M€"
+            elif value >= 1000:
+                return f"{value/1000:.1f}K€"
             else:
-                results['errors'].append('offers_focus')
-                results['success'] = False
+                return f"{value:.0f}€"
+        return str(value)
+    except:
+        return str(value)
+
+
+def format_percentage(value):
+    """Formate un pourcentage"""
+    if value is None:
+        return ''
+    try:
+        if isinstance(value, (int, float)):
+            sign = '+' if value > 0 else ''
+            return f"{sign}{value*100:.1f}%"
+        return str(value)
+    except:
+        return str(value)
+
+
+_PIVOT_FORMATTERS = {'number': format_number, 'currency': format_currency, 'percentage': format_percentage}
+
+# Métriques affichées par la page Data History : (libellé, colonne, format)
+_ACQUISITION_PIVOT_METRICS = [
+    ('Sessions WoW', 'wow_sessions', 'percentage'),
+    ('Sessions YoY', 'yoy_sessions', 'percentage'),
+    ('Bookings WoW', 'wow_bookings', 'percentage'),
+    ('Bookings YoY', 'yoy_bookings', 'percentage'),
+    ('Revenue WoW', 'wow_revenue', 'percentage'),
+    ('Revenue YoY', 'yoy_revenue', 'percentage'),
+    ('Costs WoW', 'wow_costs', 'percentage'),
+    ('Costs YoY', 'yoy_costs', 'percentage'),
+    ('CVR vs LW', 'cvr_vs_lw', 'percentage'),
+    ('CVR vs LY', 'cvr_vs_ly', 'percentage'),
+]
+
+_SEO_PIVOT_METRICS = [
+    ('Impressions YoY', 'impressions_yoy', 'percentage'),
+    ('Clicks YoY', 'clicks_yoy', 'percentage'),
+    ('CTR YoY', 'ctr_yoy', 'percentage'),
+    ('Avg Position', 'avg_position', 'number'),
+]
+
+# Section -> (table source, métriques), dans l'ordre d'affichage
+DATA_HISTORY_SECTIONS = {
+    'SLIDE_31_GLOBAL': ('weekly_summary', [
+        ('Sessions', 'sessions', 'number'),
+        ('Revenue B2C', 'revenue_b2c', 'currency'),
+        ('Average Basket', 'average_basket_value', 'currency'),
+        ('Conversion Rate', 'conversion_rate', 'percentage'),
+        ('Bookings', 'nb_bookings', 'number'),
+        ('Sessions vs LY', 'vs_ly_sessions', 'percentage'),
+        ('Sessions vs LW', 'vs_lw_sessions', 'percentage'),
+        ('Revenue vs LY', 'vs_ly_revenue', 'percentage'),
+        ('Revenue vs LW', 'vs_lw_revenue', 'percentage'),
+        ('ABV vs LY', 'vs_ly_abv', 'percentage'),
+        ('ABV vs LW', 'vs_lw_abv', 'percentage'),
+        ('CR vs LY', 'vs_ly_cr', 'percentage'),
+        ('CR vs LW', 'vs_lw_cr', 'percentage'),
+        ('Bookings vs LY', 'vs_ly_bookings', 'percentage'),
+        ('Bookings vs LW', 'vs_lw_bookings', 'percentage'),
+    ]),
+    'SLIDE_31_OFFERS': ('offers_focus', [
+        ('Last Minute %', 'last_minute_pct', 'percentage'),
+        ('Early Booking %', 'early_booking_pct', 'percentage'),
+        ('Summer Flash Revenue', 'summer_flash_revenue', 'currency'),
+        ('Summer Flash Bookings', 'summer_flash_bookings', 'number'),
+        ('Summer Flash ABV', 'summer_flash_abv', 'currency'),
+        ('Lead Gen Revenue', 'lead_gen_revenue', 'currency'),
+        ('Lead Gen Bookings', 'lead_gen_bookings', 'number'),
+    ]),
+    'SLIDE_31_BOOKINGS': ('bookings_details', [
+        ('July %', 'month_july_pct', 'percentage'),
+        ('August %', 'month_august_pct', 'percentage'),
+        ('September %', 'month_sept_pct', 'percentage'),
+        ('Stay 2N %', 'length_2n_pct', 'percentage'),
+        ('Stay 3N %', 'length_3n_pct', 'percentage'),
+        ('Stay 4N+ %', 'length_4n_pct', 'percentage'),
+    ]),
+    'SEA': ('acquisition_channels', _ACQUISITION_PIVOT_METRICS),
+    'SEO': ('acquisition_channels', _ACQUISITION_PIVOT_METRICS),
+    'OM': ('acquisition_channels', _ACQUISITION_PIVOT_METRICS),
+    'CRM': ('acquisition_channels', _ACQUISITION_PIVOT_METRICS),
+    'SEO_DETAIL': ('channel_seo_detail', [
+        (f'{prefix} {label}', (segment, column), kind)
+        for segment, prefix in (('brand', 'Brand'), ('non_brand', 'Non-Brand'))
+        for label, column, kind in _SEO_PIVOT_METRICS
+    ]),
+}
+
+
+_PIVOT_KINDS = {
+    (section, metric): kind
+    for section, (_, metrics) in DATA_HISTORY_SECTIONS.items()
+    for metric, _, kind in metrics
+}
+
+
+# (section, métrique) -> (table, colonne, segment SEO ou None)
+_DATA_HISTORY_COLUMNS = {
+    (section, metric): (table, *column[::-1]) if isinstance(column, tuple) else (table, column, None)
+    for section, (table, metrics) in DATA_HISTORY_SECTIONS.items()
+    for metric, column, _ in metrics
+}
+
+
+def _pivot_cells(conn: sqlite3.Connection, week_id: int) -> List[tuple]:
+    """Cellules (week_id, section, metric, position, value, display) d'une semaine, depuis les tables de faits"""
+    def fetch(sql):
+        cursor = conn.execute(sql, (week_id,))
+        columns = [col[0] for col in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    
+    sources = {table: fetch(f"SELECT * FROM {table} WHERE week_id = ?")
+               for table in ('weekly_summary', 'offers_focus', 'bookings_details')}
+    channels = {row['channel_code']: row for row in fetch("""
+        SELECT c.channel_code, ac.* FROM acquisition_channels ac
+        JOIN dim_channel c ON ac.channel_id = c.id WHERE ac.week_id = ?
+    """)}
+    seo = {row['segment']: row for row in fetch("SELECT * FROM channel_seo_detail WHERE week_id = ?")}
+    
+    cells = []
+    position = 0
+    for section, (table, metrics) in DATA_HISTORY_SECTIONS.items():
+        if table == 'acquisition_channels':
+            row = channels.get(section)
+        elif table in sources:
+            row = sources[table][0] if sources[table] else None
+        for metric, column, kind in metrics:
+            position += 1
+            if table == 'channel_seo_detail':
+                segment, column = column
+                row = seo.get(segment)
+            if row is None:
+                continue
+            value = row.get(column)
+            cells.append((week_id, section, metric, position, value, _PIVOT_FORMATTERS[kind](value)))
+    return cells
+
+
+def _refresh_pivot_weeks(conn: sqlite3.Connection, week_ids) -> int:
+    """Recalcule les cellules du pivot des semaines modifiées (dans la transaction de l'appelant)"""
+    count = 0
+    for week_id in set(week_ids):
+        conn.execute("DELETE FROM data_history_pivot WHERE week_id = ?", (week_id,))
+        cells = _pivot_cells(conn, week_id)
+        conn.executemany("""
+            INSERT INTO data_history_pivot (week_id, section, metric, position, value, display)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, cells)
+        count += len(cells)
+    return count
+
+
+def save_data_history_cells(cells: List[Dict[str, Any]], client_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Écrit un lot de cellules Data History en une transaction.
+    
+    Les cellules sont regroupées par ligne cible (table, semaine[, canal | segment]) :
+    une ligne = un UPSERT multi-colonnes, exécutés par executemany (un par table et
+    jeu de colonnes). Le pivot, data_version et le snapshot sont mis à jour une fois.
+    
+    Args:
+        cells: [{'section', 'metric', 'week_id' (int), 'value'}] (valeurs déjà parsées)
+        client_id: Page à l'origine du lot, reprise dans l'événement cells_edited (ignoré par cette page)
+    
+    Returns:
+        Un résultat par cellule, dans l'ordre : {'index', 'status': 'updated' | 'inserted' | 'error', 'error'?}
+    """
+    results: List[Dict[str, Any]] = [{'index': i, 'status': 'error'} for i in range(len(cells))]
+    try:
+        conn = get_connection()
+        channel_ids = dict(conn.execute("SELECT channel_code, id FROM dim_channel"))
+        week_ids = {c['week_id'] for c in cells if isinstance(c.get('week_id'), int)}
+        known_weeks = set()
+        if week_ids:
+            known_weeks = {row[0] for row in conn.execute(
+                f"SELECT id FROM dim_week WHERE id IN ({', '.join('?' for _ in week_ids)})", list(week_ids))}
         
-        # Bookings Details
-        if 'bookings_details' in payload:
-            if insert_bookings_details({**payload['bookings_details'], 'week_start_date': week_start_date}):
-                results['inserted'].append('bookings_details')
+        # (table, clé de ligne) -> {colonne: valeur} et indices des cellules de la ligne
+        rows: Dict[tuple, Dict[str, Any]] = {}
+        members: Dict[tuple, List[int]] = {}
+        for i, cell in enumerate(cells):
+            target = _DATA_HISTORY_COLUMNS.get((cell.get('section'), cell.get('metric')))
+            if target is None:
+                results[i]['error'] = f"Métrique inconnue: {cell.get('section')}.{cell.get('metric')}"
+                continue
+            if cell.get('week_id') not in known_weeks:
+                results[i]['error'] = f"Semaine inconnue: {cell.get('week_id')}"
+                continue
+            table, column, segment = target
+            if table == 'acquisition_channels':
+                key = (('week_id', cell['week_id']), ('channel_id', channel_ids[cell['section']]))
+            elif table == 'channel_seo_detail':
+                key = (('week_id', cell['week_id']), ('segment', segment))
             else:
-                results['errors'].append('bookings_details')
-                results['success'] = False
-        
-        # Acquisition Channels
-        if 'acquisition_channels' in payload:
-            for channel_data in payload['acquisition_channels']:
-                if insert_acquisition_channel({**channel_data, 'week_start_date': week_start_date}):
-                    results['inserted'].append(f"acquisition_channel_{channel_data.get('channel_code', 'unknown')}")
-                else:
-                    results['errors'].append(f"acquisition_channel_{channel_data.get('channel_code', 'unknown')}")
-                    results['success'] = False
+                key = (('week_id', cell['week_id']),)
+            rows.setdefault((table, key), {})[column] = cell.get('value')
+            members.setdefault((table, key), []).append(i)
         
-        # Campaign Notes
-        if 'campaign_notes' in payload:
-            for note_data in payload['campaign_notes']:
-                if insert_campaign_note({**note_data, 'week_start_date': week_start_date}):
-                    results['inserted'].append(f"campaign_note_{note_data.get('campaign_name', 'unknown')}")
-                else:
-                    results['errors'].append(f"campaign_note_{note_data.get('campaign_name', 'unknown')}")
-                    results['success'] = False
+        if not rows:
+            return results
         
-        # SEO Details
-        if 'seo_detail' in payload:
-            for seo_data in payload['seo_detail']:
-                if insert_seo_detail({**seo_data, 'week_start_date': week_start_date}):
-                    results['inserted'].append(f"seo_detail_{seo_data.get('segment', 'unknown')}")
-                else:
-                    results['errors'].append(f"seo_detail_{seo_data.get('segment', 'unknown')}")
-                    results['success'] = False
+        with conn:
+            # Lignes existantes (statut updated / inserted)
+            existing = set()
+            for table in {table for table, _ in rows}:
+                key_columns = [name for name, _ in next(k for t, k in rows if t == table)]
+                for found in conn.execute(
+                        f"SELECT {', '.join(key_columns)} FROM {table} WHERE week_id IN "
+                        f"({', '.join('?' for _ in known_weeks)})", list(known_weeks)):
+                    existing.add((table, tuple(zip(key_columns, found))))
+            
+            # Un executemany par (table, jeu de colonnes) : les colonnes absentes ne sont pas écrasées
+            batches: Dict[tuple, List[Dict[str, Any]]] = {}
+            for (table, key), values in rows.items():
+                batches.setdefault((table, tuple(sorted(values))), []).append({**dict(key), **values})
+            for (table, _), batch in batches.items():
+                key_columns = tuple(name for name in ('week_id', 'channel_id', 'segment') if name in batch[0])
+                _upsert_rows(conn, table, key_columns, batch)
+            
+            week_ids = {key[0][1] for _, key in rows}
+            mark_data_changed(conn, week_ids)
+            event = {
+                'week_ids': sorted(week_ids),
+                'sections': sorted({cells[i]['section'] for indices in members.values() for i in indices})
+            }
+            if client_id:
+                event['client_id'] = client_id
+            publish_event(conn, 'cells_edited', event)
         
+        for row_key, indices in members.items():
+            status = 'updated' if row_key in existing else 'inserted'
+            for i in indices:
+                results[i] = {'index': i, 'status': status}
+        return results
+    except Exception as e:
+        print(f"Erreur lors de la sauvegarde Data History: {e}")
+        for result in results:
+            result.setdefault('error', str(e))
         return results
+
+
+def format_pivot_value(section: str, metric: str, value) -> str:
+    """Formate une valeur numérique comme la cellule du pivot de la même métrique"""
+    kind = _PIVOT_KINDS.get((section, metric), 'number')
+    return _PIVOT_FORMATTERS[kind](value)
+
+
+def get_data_history_values(date_from: Optional[str] = None, date_to: Optional[str] = None,
+                            sections: Optional[List[str]] = None) -> List[tuple]:
+    """Valeurs numériques du pivot : (section, métrique, week_start_date, valeur), dans l'ordre d'affichage"""
+    try:
+        sql = """
+            SELECT p.section, p.metric, w.week_start_date, p.value
+            FROM data_history_pivot p
+            JOIN dim_week w ON p.week_id = w.id
+            WHERE 1 = 1
+        """
+        params: List[Any] = []
+        if date_from:
+            sql += " AND w.week_start_date >= ?"
+            params.append(date_from)
+        if date_to:
+            sql += " AND w.week_start_date <= ?"
+            params.append(date_to)
+        if sections:
+            sql += f" AND p.section IN ({', '.join('?' for _ in sections)})"
+            params.extend(sections)
+        sql += " ORDER BY p.position, w.week_start_date DESC"
+        return get_connection().execute(sql, params).fetchall()
+    except Exception as e:
+        print(f"Erreur lors de la lecture des valeurs Data History: {e}")
+        return []
+
+
+# Jeux de données exportables : historique Data History (semaine × métrique) et tables de faits brutes
+EXPORT_DATASETS = ('history', 'weekly_summary', 'offers_focus', 'bookings_details',
+                   'acquisition_channels', 'channel_seo_detail', 'channel_campaign_notes')
+
+
+def check_export_sections(dataset: str, sections: Optional[List[str]]):
+    """
+    Vérifie le filtre `sections` d'un export : sections Data History pour 'history',
+    codes canal connus pour les tables par canal, aucun filtre pour les autres tables.
+    
+    Raises:
+        ValueError: section inconnue, ou filtre non applicable au jeu de données
+    """
+    if not sections:
+        return
+    if dataset == 'history':
+        known = set(DATA_HISTORY_SECTIONS)
+    elif 'channel_id' in _table_columns(get_connection(), dataset):
+        known = {row[0] for row in get_connection().execute("SELECT channel_code FROM dim_channel")}
+    else:
+        raise ValueError(f"Filtre sections non applicable au jeu de données {dataset}")
+    unknown = [section for section in sections if section not in known]
+    if unknown:
+        raise ValueError(f"Sections inconnues: {', '.join(unknown)}")
+
+
+def iter_export_rows(dataset: str = 'history', date_from: Optional[str] = None, date_to: Optional[str] = None,
+                     sections: Optional[List[str]] = None, chunk_size: int = 1000):
+    """
+    Export en flux d'un jeu de données : (colonnes, générateur de lots de lignes).
+    Les lignes sont lues par fetchmany(chunk_size) sur un curseur SQLite, le jeu
+    complet n'est jamais chargé en mémoire.
+    
+    Filtres: dates de semaine [date_from, date_to] ; sections Data History pour 'history',
+    codes canal (SEA, SEO, ...) pour les tables par canal.
+    
+    Raises:
+        ValueError: jeu de données inconnu, sections invalides (check_export_sections)
+    """
+    if dataset not in EXPORT_DATASETS:
+        raise ValueError(f"Jeu de données inconnu: {dataset}")
+    check_export_sections(dataset, sections)
+    
+    conn = get_connection()
+    where, params = [], []
+    if date_from:
+        where.append("w.week_start_date >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append("w.week_start_date <= ?")
+        params.append(date_to)
+    
+    if dataset == 'history':
+        if sections:
+            where.append(f"p.section IN ({', '.join('?' for _ in sections)})")
+            params.extend(sections)
+        sql = """
+            SELECT w.week_start_date, w.week_label, p.section, p.metric, p.value, p.display
+            FROM data_history_pivot p
+            JOIN dim_week w ON p.week_id = w.id
+        """
+        order = "w.week_start_date, p.position"
+    else:
+        table_columns = _table_columns(conn, dataset)
+        select = ', '.join(f"t.{c}" for c in table_columns if c not in ('id', 'week_id', 'channel_id'))
+        if 'channel_id' in table_columns:
+            if sections:
+                where.append(f"c.channel_code IN ({', '.join('?' for _ in sections)})")
+                params.extend(sections)
+            sql = f"""
+                SELECT w.week_start_date, w.week_label, c.channel_code, {select}
+                FROM {dataset} t
+                JOIN dim_week w ON t.week_id = w.id
+                JOIN dim_channel c ON t.channel_id = c.id
+            """
+            order = "w.week_start_date, c.channel_code"
+        else:
+            sql = f"""
+                SELECT w.week_start_date, w.week_label, {select}
+                FROM {dataset} t
+                JOIN dim_week w ON t.week_id = w.id
+            """
+            order = "w.week_start_date"
+    
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    cursor = conn.execute(f"{sql} ORDER BY {order}", params)
+    
+    def chunks():
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+    
+    return [col[0] for col in cursor.description], chunks()
+
+
+# ============================================================================
+# FONCTIONS D'INGESTION COMPLÈTE
+# ============================================================================
+
+def ingest_weekly_data(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Ingère un payload complet pour une semaine, en tout-ou-rien :
+    une connexion, dimensions résolues une fois, un executemany UPSERT par table,
+    un seul commit. En cas d'erreur, rien n'est écrit.
+    """
+    week_start_date = payload.get('week_start_date')
+    if not week_start_date:
+        return {'success': False, 'error': 'week_start_date requis'}
+    
+    inserted = []
+    conn = get_connection()
+    try:
+        with TRACER.span("db.ingest_week", week=week_start_date) as span, conn:  # commit unique, rollback complet
+            week_id = _resolve_week_id(conn, week_start_date)
+            channel_ids = dict(conn.execute("SELECT channel_code, id FROM dim_channel"))
+            
+            # Tables à une ligne par semaine
+            for table in ('weekly_summary', 'offers_focus', 'bookings_details'):
+                if table in payload:
+                    _upsert_rows(conn, table, ('week_id',), [{**payload[table], 'week_id': week_id}])
+                    inserted.append(table)
+            
+            # Acquisition Channels
+            channels = payload.get('acquisition_channels') or []
+            _upsert_rows(conn, 'acquisition_channels', ('week_id', 'channel_id'), [
+                {**row, 'week_id': week_id, 'channel_id': _resolve_channel_id(channel_ids, row['channel_code'])}
+                for row in channels
+            ])
+            inserted.extend(f"acquisition_channel_{row.get('channel_code', 'unknown')}" for row in channels)
+            
+            # SEO Details (clé historique 'seo_detail' ou clé du parser unifié)
+            seo_rows = payload.get('channel_seo_detail', payload.get('seo_detail')) or []
+            _upsert_rows(conn, 'channel_seo_detail', ('week_id', 'segment'), [
+                {**row, 'week_id': week_id} for row in seo_rows
+            ])
+            inserted.extend(f"seo_detail_{row.get('segment', 'unknown')}" for row in seo_rows)
+            
+            # Campaign Notes : pas de clé naturelle, les notes de la semaine sont remplacées
+            # (une ré-ingestion ne duplique plus les notes)
+            if 'channel_campaign_notes' in payload or 'campaign_notes' in payload:
+                notes = payload.get('channel_campaign_notes', payload.get('campaign_notes')) or []
+                conn.execute("DELETE FROM channel_campaign_notes WHERE week_id = ?", (week_id,))
+                _upsert_rows(conn, 'channel_campaign_notes', (), [
+                    {**row, 'week_id': week_id, 'channel_id': _resolve_channel_id(channel_ids, row['channel_code'])}
+                    for row in notes
+                ])
+                inserted.extend(f"campaign_note_{row.get('campaign_name', 'unknown')}" for row in notes)
+            mark_data_changed(conn, [week_id])
+            publish_event(conn, 'week_ingested', {
+                'week_ids': [week_id],
+                'week_start_date': week_start_date,
+                'sections': _sections_for(
+                    {table for table in ('weekly_summary', 'offers_focus', 'bookings_details') if table in payload}
+                    | ({'channel_seo_detail'} if seo_rows else set()),
+                    {row['channel_code'] for row in channels})
+            })
+            span.set(tables=len(inserted))
+        
+        return {'success': True, 'inserted': inserted, 'errors': [], 'week_id': week_id}
         
     except Exception as e:
-        return {'success': False, 'error': str(e)}
+        print(f"Erreur lors de l'ingestion de la semaine {week_start_date}: {e}")
+        return {'success': False, 'error': str(e), 'inserted': [], 'errors': [str(e)]}
+
+
+# ============================================================================
+# FONCTIONS FILE D'ATTENTE DES IMPORTS (cpfr_jobs)
+# ============================================================================
+
+JOB_COLUMNS = [
+    'id', 'status', 'filename', 'file_path', 'slide_start', 'slide_end', 'week_start_date',
+    'attempts', 'created_at', 'started_at', 'finished_at', 'parse_ms', 'ingest_ms', 'result', 'error',
+    'sha256', 'worker_pid', 'heartbeat_at'
+]
+
+
+def _job_row_to_dict(row) -> Dict[str, Any]:
+    job = dict(zip(JOB_COLUMNS, row))
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+
+def create_job(job_id: str, file_path: str, filename: str, slide_start: int, slide_end: int,
+               week_start_date: Optional[str] = None, sha256: Optional[str] = None) -> bool:
+    """Enregistre un nouveau job d'import à l'état 'queued'"""
+    try:
+        with get_connection() as conn:
+            conn.execute("""
+                INSERT INTO cpfr_jobs (id, status, filename, file_path, slide_start, slide_end, week_start_date, sha256)
+                VALUES (?, 'queued', ?, ?, ?, ?, ?, ?)
+            """, (job_id, filename, file_path, slide_start, slide_end, week_start_date, sha256))
+            conn.commit()
+            return True
+    except Exception as e:
+        print(f"Erreur lors de la création du job {job_id}: {e}")
+        return False
+
+
+def claim_job(job_id: str, worker_pid: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    Passe un job de 'queued' à 'running' de façon atomique, au nom du processus worker_pid.
+    Retourne None si le job a déjà été pris par un autre worker.
+    """
+    try:
+        with get_connection() as conn:
+            cursor = conn.execute("""
+                UPDATE cpfr_jobs
+                SET status = 'running', started_at = strftime('%Y-%m-%d %H:%M:%f', 'now'), attempts = attempts + 1,
+                    worker_pid = ?, heartbeat_at = strftime('%Y-%m-%d %H:%M:%f', 'now')
+                WHERE id = ? AND status = 'queued'
+            """, (worker_pid, job_id))
+            conn.commit()
+            if cursor.rowcount == 0:
+                return None
+            row = conn.execute(
+                f"SELECT {', '.join(JOB_COLUMNS)} FROM cpfr_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            return _job_row_to_dict(row) if row else None
+    except Exception as e:
+        print(f"Erreur lors de la prise en charge du job {job_id}: {e}")
+        return None
+
+
+def touch_job(job_id: str) -> bool:
+    """Heartbeat d'un job en cours : son worker est toujours vivant"""
+    try:
+        with get_connection() as conn:
+            conn.execute("""
+                UPDATE cpfr_jobs SET heartbeat_at = strftime('%Y-%m-%d %H:%M:%f', 'now')
+                WHERE id = ? AND status = 'running'
+            """, (job_id,))
+            conn.commit()
+            return True
+    except Exception as e:
+        print(f"Erreur lors du heartbeat du job {job_id}: {e}")
+        return False
+
+
+def finish_job(job_id: str, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None,
+               parse_ms: Optional[float] = None, ingest_ms: Optional[float] = None) -> bool:
+    """Clôture un job ('done' ou 'failed') avec son résultat et ses timings"""
+    try:
+        with get_connection() as conn:
+            conn.execute("""
+                UPDATE cpfr_jobs
+                SET status = ?, finished_at = strftime('%Y-%m-%d %H:%M:%f', 'now'),
+                    result = ?, error = ?, parse_ms = ?, ingest_ms = ?
+                WHERE id = ?
+            """, (
+                status,
+                json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+                error, parse_ms, ingest_ms, job_id
+            ))
+            publish_event(conn, 'job_finished', {
+                'job_id': job_id,
+                'status': status,
+                'week_ids': [result['week_id']] if result and result.get('week_id') else [],
+                'week_start_date': (result or {}).get('week_start_date')
+            })
+            conn.commit()
+            return True
+    except Exception as e:
+        print(f"Erreur lors de la clôture du job {job_id}: {e}")
+        return False
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Récupère un job d'import par son identifiant"""
+    try:
+        with get_connection() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(JOB_COLUMNS)} FROM cpfr_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            return _job_row_to_dict(row) if row else None
+    except Exception as e:
+        print(f"Erreur lors de la récupération du job {job_id}: {e}")
+        return None
+
+
+def list_jobs(status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+    """Liste les jobs d'import les plus récents (optionnellement filtrés par statut)"""
+    try:
+        with get_connection() as conn:
+            if status:
+                cursor = conn.execute(f"""
+                    SELECT {', '.join(JOB_COLUMNS)} FROM cpfr_jobs
+                    WHERE status = ? ORDER BY created_at DESC LIMIT ?
+                """, (status, limit))
+            else:
+                cursor = conn.execute(f"""
+                    SELECT {', '.join(JOB_COLUMNS)} FROM cpfr_jobs
+                    ORDER BY created_at DESC LIMIT ?
+                """, (limit,))
+            return [_job_row_to_dict(row) for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"Erreur lors de la récupération des jobs: {e}")
+        return []
+
+
+def _process_alive(pid: Optional[int]) -> bool:
+    """Le processus existe-t-il encore sur cette machine ? (inconnu : supposé vivant)"""
+    if not pid or os.name == 'nt':  # sous Windows, os.kill(pid, 0) envoie CTRL_C_EVENT
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def requeue_stale_jobs(stale_after_seconds: int = 120) -> List[str]:
+    """
+    Remet en file les jobs 'running' abandonnés et retourne les identifiants de
+    tous les jobs en attente, à resoumettre. Un job est abandonné si son worker
+    n'existe plus, ou s'il n'a plus donné de heartbeat depuis stale_after_seconds ;
+    un import lent mais vivant n'est jamais repris (ni parsé ni ingéré deux fois).
+    """
+    try:
+        with get_connection() as conn:
+            running = conn.execute("""
+                SELECT id, worker_pid, COALESCE(heartbeat_at, started_at) < datetime('now', ?)
+                FROM cpfr_jobs WHERE status = 'running'
+            """, (f"-{int(stale_after_seconds)} seconds",)).fetchall()
+            stale = [job_id for job_id, pid, expired in running if expired or not _process_alive(pid)]
+            if stale:
+                conn.execute(f"""
+                    UPDATE cpfr_jobs SET status = 'queued', worker_pid = NULL
+                    WHERE status = 'running' AND id IN ({', '.join('?' for _ in stale)})
+                """, stale)
+                conn.commit()
+            cursor = conn.execute(
+                "SELECT id FROM cpfr_jobs WHERE status = 'queued' ORDER BY created_at"
+            )
+            return [row[0] for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"Erreur lors de la reprise des jobs: {e}")
+        return []
+
+
+# ============================================================================
+# CACHE DES PARSINGS (parse_cache)
+# ============================================================================
+
+def get_cached_parse(sha256: str, slide_start: int, slide_end: int, parser_version: str) -> Optional[Dict[str, Any]]:
+    """Payload déjà parsé pour ce contenu de deck, ou None (à ré-ingérer par l'appelant)"""
+    try:
+        with get_connection() as conn:
+            row = conn.execute("""
+                SELECT payload FROM parse_cache
+                WHERE sha256 = ? AND slide_start = ? AND slide_end = ? AND parser_version = ?
+            """, (sha256, slide_start, slide_end, parser_version)).fetchone()
+            if not row:
+                return None
+            conn.execute("""
+                UPDATE parse_cache SET hits = hits + 1, last_hit_at = CURRENT_TIMESTAMP
+                WHERE sha256 = ? AND slide_start = ? AND slide_end = ? AND parser_version = ?
+            """, (sha256, slide_start, slide_end, parser_version))
+            conn.commit()
+            return json.loads(row[0])
+    except Exception as e:
+        print(f"Erreur lors de la lecture du cache de parsing: {e}")
+        return None
+
+
+def store_cached_parse(sha256: str, slide_start: int, slide_end: int, parser_version: str,
+                       payload: Dict[str, Any]) -> bool:
+    """Mémorise le payload d'un deck une fois ingéré avec succès"""
+    try:
+        with get_connection() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO parse_cache
+                (sha256, slide_start, slide_end, parser_version, week_start_date, payload)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (sha256, slide_start, slide_end, parser_version, payload.get('week_start_date'),
+                  json.dumps(payload, ensure_ascii=False, default=str)))
+            conn.commit()
+            return True
+    except Exception as e:
+        print(f"Erreur lors de l'écriture du cache de parsing: {e}")
+        return False
 
 
 # ============================================================================
 # FONCTIONS COMPATIBILITÉ (anciennes fonctions PowerPoint)
 # ============================================================================
 
+# KPIs conservés dans extractions.kpi_preview pour la liste de l'historique
+KPI_PREVIEW_SIZE = 2
+
+
 def insert_record(filename, slide_start, slide_end, kpi, table_data, file_info=None):
     """
     Insère un nouvel enregistrement d'extraction PowerPoint (compatibilité)
@@ -944,11 +1750,12 @@ def insert_record(filename, slide_start, slide_end, kpi, table_data, file_info=N
         table_data_json = json.dumps(table_data, ensure_ascii=False) if table_data is not None else "{}"
         file_info_json = json.dumps(file_info, ensure_ascii=False) if file_info is not None else None
         
-        with sqlite3.connect(DB_PATH) as conn:
+        with get_connection() as conn:
             conn.execute(
                 """INSERT INTO extractions 
-                   (timestamp, filename, slide_start, slide_end, kpi, table_data, file_info, extraction_status) 
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                   (timestamp, filename, slide_start, slide_end, kpi, table_data, file_info, extraction_status,
+                    kpi_count, row_count, kpi_preview) 
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
                 (
                     datetime.utcnow().isoformat(sep=" ", timespec="seconds"),
                     filename,
@@ -957,7 +1764,10 @@ def insert_record(filename, slide_start, slide_end, kpi, table_data, file_info=N
                     kpi_json,
                     table_data_json,
                     file_info_json,
-                    'success'
+                    'success',
+                    len(kpi or []),
+                    len((table_data or {}).get('rows') or []),
+                    json.dumps(list(kpi or [])[:KPI_PREVIEW_SIZE], ensure_ascii=False)
                 ),
             )
             conn.commit()
@@ -967,45 +1777,42 @@ def insert_record(filename, slide_start, slide_end, kpi, table_data, file_info=N
         return False
 
 
-def get_history(limit=50):
-    """Récupère l'historique des extractions PowerPoint (compatibilité)"""
+def get_history(limit=50, before_id=None):
+    """
+    Récupère l'historique des extractions PowerPoint (compatibilité), du plus récent au plus ancien.
+    Projection de liste : résumé calculé à l'insertion (kpi_count, row_count, kpi_preview),
+    sans lecture ni décodage de kpi / table_data / file_info (voir get_extraction_by_id).
+    
+    Args:
+        limit: Nombre d'extractions
+        before_id: Curseur de pagination, extractions d'id strictement inférieur
+    """
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.execute(
-                """SELECT timestamp, filename, slide_start, slide_end, kpi, table_data, file_info, extraction_status 
-                   FROM extractions 
-                   ORDER BY id DESC 
-                   LIMIT ?""",
-                (limit,)
-            )
-            rows = cursor.fetchall()
+        conn = get_connection()
+        cursor = conn.execute(
+            """SELECT id, timestamp, filename, slide_start, slide_end, extraction_status,
+                      kpi_count, row_count, kpi_preview
+               FROM extractions 
+               WHERE id < ?
+               ORDER BY id DESC 
+               LIMIT ?""",
+            (before_id if before_id is not None else 2 ** 62, limit)
+        )
         
-        history = []
-        for row in rows:
-            try:
-                history.append({
-                    "timestamp": row[0],
-                    "filename": row[1],
-                    "slide_start": row[2],
-                    "slide_end": row[3],
-                    "kpi": json.loads(row[4]) if row[4] else [],
-                    "table_data": json.loads(row[5]) if row[5] else {"headers": [], "rows": []},
-                    "file_info": json.loads(row[6]) if row[6] else {},
-                    "extraction_status": row[7]
-                })
-            except json.JSONDecodeError:
-                history.append({
-                    "timestamp": row[0],
-                    "filename": row[1],
-                    "slide_start": row[2],
-                    "slide_end": row[3],
-                    "kpi": [],
-                    "table_data": {"headers": [], "rows": []},
-                    "file_info": {},
-                    "extraction_status": row[7]
-                })
-        
-        return history
+        return [
+            {
+                "id": row[0],
+                "timestamp": row[1],
+                "filename": row[2],
+                "slide_start": row[3],
+                "slide_end": row[4],
+                "extraction_status": row[5],
+                "kpi_count": row[6] or 0,
+                "row_count": row[7] or 0,
+                "kpi_preview": json.loads(row[8]) if row[8] else []
+            }
+            for row in cursor.fetchall()
+        ]
     except Exception as e:
         print(f"Erreur lors de la récupération de l'historique: {e}")
         return []
@@ -1014,18 +1821,21 @@ def get_history(limit=50):
 def get_statistics():
     """Récupère des statistiques sur les extractions PowerPoint (compatibilité)"""
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            total = conn.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
-            success = conn.execute("SELECT COUNT(*) FROM extractions WHERE extraction_status = 'success'").fetchone()[0]
-            failed = conn.execute("SELECT COUNT(*) FROM extractions WHERE extraction_status != 'success'").fetchone()[0]
-            last_extraction = conn.execute("SELECT timestamp FROM extractions ORDER BY id DESC LIMIT 1").fetchone()
-            
-            return {
-                "total_extractions": total,
-                "successful_extractions": success,
-                "failed_extractions": failed,
-                "last_extraction": last_extraction[0] if last_extraction else None
-            }
+        conn = get_connection()
+        # Un seul parcours de l'index idx_extractions_status
+        total, success, failed = conn.execute("""
+            SELECT COUNT(*), COALESCE(SUM(extraction_status = 'success'), 0),
+                   COALESCE(SUM(extraction_status != 'success'), 0)
+            FROM extractions
+        """).fetchone()
+        last_extraction = conn.execute("SELECT timestamp FROM extractions ORDER BY id DESC LIMIT 1").fetchone()
+        
+        return {
+            "total_extractions": total,
+            "successful_extractions": success,
+            "failed_extractions": failed,
+            "last_extraction": last_extraction[0] if last_extraction else None
+        }
     except Exception as e:
         print(f"Erreur lors de la récupération des statistiques: {e}")
         return {
@@ -1039,7 +1849,7 @@ def get_statistics():
 def get_extraction_by_id(extraction_id):
     """Récupère une extraction spécifique par son ID (compatibilité)"""
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with get_connection() as conn:
             cursor = conn.execute(
                 """SELECT timestamp, filename, slide_start, slide_end, kpi, table_data, file_info, extraction_status 
                    FROM extractions 
@@ -1069,7 +1879,7 @@ def get_extraction_by_id(extraction_id):
 def delete_extraction(extraction_id):
     """Supprime une extraction par son ID (compatibilité)"""
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with get_connection() as conn:
             conn.execute("DELETE FROM extractions WHERE id = ?", (extraction_id,))
             conn.commit()
             return True
@@ -1085,7 +1895,7 @@ def delete_extraction(extraction_id):
 def get_or_create_document(doc_id: str, document_type: str = 'data-history') -> Optional[Dict[str, Any]]:
     """Récupère ou crée un document collaboratif"""
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with get_connection() as conn:
             cursor = conn.execute("""
                 SELECT doc_id, document_type, state, metadata, created_at, updated_at, version
                 FROM collaborative_documents 
@@ -1145,7 +1955,7 @@ def get_or_create_document(doc_id: str, document_type: str = 'data-history') ->
 def update_document_state(doc_id: str, state: bytes, metadata: Optional[Dict[str, Any]] = None) -> bool:
     """Met à jour l'état d'un document collaboratif"""
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with get_connection() as conn:
             if metadata:
                 conn.execute("""
                     UPDATE collaborative_documents 
@@ -1167,27 +1977,46 @@ def update_document_state(doc_id: str, state: bytes, metadata: Optional[Dict[str
         return False
 
 
-def get_document_history(doc_id: str, limit: int = 10) -> List[Dict[str, Any]]:
-    """Récupère l'historique des versions d'un document"""
+def get_document_history(doc_id: str, limit: int = 10, before_version: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Récupère l'historique des versions d'un document (une version par seq du journal).
+    Les versions purgées par la rétention ne subsistent que sous forme de snapshot.
+    
+    Returns:
+        [{'doc_id', 'version', 'updated_at', 'client_id', 'snapshot'}] du plus récent au plus ancien
+    """
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.execute("""
-                SELECT doc_id, version, updated_at, metadata
-                FROM collaborative_documents 
-                WHERE doc_id = ?
-                ORDER BY version DESC
-                LIMIT ?
-            """, (doc_id, limit))
-            
-            return [
-                {
-                    'doc_id': row[0],
-                    'version': row[1],
-                    'updated_at': row[2],
-                    'metadata': json.loads(row[3]) if row[3] else {}
-                }
-                for row in cursor.fetchall()
-            ]
+        before = before_version if before_version is not None else 2 ** 62
+        cursor = get_connection().execute("""
+            SELECT seq, MIN(created_at), MAX(client_id), MAX(is_snapshot)
+            FROM (
+                SELECT * FROM (
+                    SELECT seq, created_at, client_id, 0 AS is_snapshot
+                    FROM collaborative_document_updates
+                    WHERE doc_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?
+                )
+                UNION ALL
+                SELECT * FROM (
+                    SELECT seq, created_at, NULL, 1
+                    FROM collaborative_document_snapshots
+                    WHERE doc_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?
+                )
+            )
+            GROUP BY seq
+            ORDER BY seq DESC
+            LIMIT ?
+        """, (doc_id, before, limit, doc_id, before, limit, limit))
+        
+        return [
+            {
+                'doc_id': doc_id,
+                'version': row[0],
+                'updated_at': row[1],
+                'client_id': row[2],
+                'snapshot': bool(row[3])
+            }
+            for row in cursor.fetchall()
+        ]
             
     except Exception as e:
         print(f"Erreur lors de la récupération de l'historique du document {doc_id}: {e}")
@@ -1197,7 +2026,7 @@ def get_document_history(doc_id: str, limit: int = 10) -> List[Dict[str, Any]]:
 def list_collaborative_documents(document_type: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
     """Liste tous les documents collaboratifs"""
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with get_connection() as conn:
             if document_type:
                 cursor = conn.execute("""
                     SELECT doc_id, document_type, metadata, created_at, updated_at, last_accessed, version
@@ -1235,7 +2064,7 @@ def list_collaborative_documents(document_type: Optional[str] = None, limit: int
 def delete_collaborative_document(doc_id: str) -> bool:
     """Supprime un document collaboratif"""
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with get_connection() as conn:
             cursor = conn.execute("DELETE FROM collaborative_documents WHERE doc_id = ?", (doc_id,))
             conn.commit()
             return cursor.rowcount > 0
@@ -1243,3 +2072,226 @@ def delete_collaborative_document(doc_id: str) -> bool:
     except Exception as e:
         print(f"Erreur lors de la suppression du document {doc_id}: {e}")
         return False
+
+
+# ============================================================================
+# JOURNAL DES MISES À JOUR COLLABORATIVES (append-only + compaction)
+# ============================================================================
+
+def append_document_update(doc_id: str, update: bytes, client_id: Optional[str] = None) -> Optional[int]:
+    """
+    Ajoute une mise à jour incrémentale au journal du document (créé si besoin).
+    Seule la mise à jour est écrite, l'état complet n'est pas réécrit.
+    
+    Returns:
+        Numéro de séquence attribué, ou None en cas d'erreur
+    """
+    try:
+        with get_connection() as conn:
+            conn.execute("""
+                INSERT OR IGNORE INTO collaborative_documents (doc_id, metadata, version)
+                VALUES (?, ?, 1)
+            """, (doc_id, json.dumps({'title': f'Data History - {doc_id}', 'collaborators': [],
+                                      'permissions': 'public'})))
+            seq = conn.execute("""
+                UPDATE collaborative_documents
+                SET last_seq = last_seq + 1, updated_at = CURRENT_TIMESTAMP
+                WHERE doc_id = ?
+                RETURNING last_seq
+            """, (doc_id,)).fetchone()[0]
+            conn.execute("""
+                INSERT INTO collaborative_document_updates (doc_id, seq, client_id, update_data)
+                VALUES (?, ?, ?, ?)
+            """, (doc_id, seq, client_id, update))
+            return seq
+    except Exception as e:
+        print(f"Erreur lors de l'ajout d'une mise à jour au document {doc_id}: {e}")
+        return None
+
+
+def get_document_updates_since(doc_id: str, since_seq: int = 0) -> Optional[Dict[str, Any]]:
+    """
+    Mises à jour postérieures à `since_seq`.
+    Si une partie a déjà été repliée dans l'état (since_seq < state_seq), l'état
+    compacté est renvoyé avec les mises à jour suivantes : le client repart de l'état.
+    Avec since_seq = 0 (client vide), l'état est toujours fourni s'il existe, y compris
+    un état écrit directement par update_document_state.
+    
+    Returns:
+        {'doc_id', 'last_seq', 'state_seq', 'state' (bytes ou None), 'updates': [{'seq', 'client_id', 'update', 'created_at'}]}
+        ou None si le document n'existe pas
+    """
+    try:
+        conn = get_connection()
+        row = conn.execute("""
+            SELECT state, last_seq, state_seq FROM collaborative_documents WHERE doc_id = ?
+        """, (doc_id,)).fetchone()
+        if row is None:
+            return None
+        state, last_seq, state_seq = row
+        needs_state = since_seq < state_seq or (since_seq <= 0 and state is not None)
+        cursor = conn.execute("""
+            SELECT seq, client_id, update_data, created_at FROM collaborative_document_updates
+            WHERE doc_id = ? AND seq > ?
+            ORDER BY seq
+        """, (doc_id, state_seq if needs_state else since_seq))
+        return {
+            'doc_id': doc_id,
+            'last_seq': last_seq,
+            'state_seq': state_seq,
+            'state': state if needs_state else None,
+            'updates': [
+                {'seq': r[0], 'client_id': r[1], 'update': r[2], 'created_at': r[3]}
+                for r in cursor.fetchall()
+            ]
+        }
+    except Exception as e:
+        print(f"Erreur lors de la lecture des mises à jour du document {doc_id}: {e}")
+        return None
+
+
+def documents_to_compact(threshold: int) -> List[str]:
+    """Documents dont le journal compte au moins `threshold` mises à jour non repliées"""
+    try:
+        cursor = get_connection().execute("""
+            SELECT u.doc_id
+            FROM collaborative_document_updates u
+            JOIN collaborative_documents d ON d.doc_id = u.doc_id
+            WHERE u.seq > d.state_seq
+            GROUP BY u.doc_id HAVING COUNT(*) >= ?
+        """, (threshold,))
+        return [row[0] for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"Erreur lors de la recherche des documents à compacter: {e}")
+        return []
+
+
+def compact_document(doc_id: str, merge, snapshot_every: int = 100) -> int:
+    """
+    Replie les mises à jour non repliées dans l'état du document : state = merge(state, *updates).
+    Un snapshot est enregistré à chaque seq multiple de `snapshot_every` franchi, pour
+    que toute version se reconstruise avec au plus `snapshot_every` deltas.
+    Les deltas sont conservés pour l'historique ; leur purge relève de prune_document_history.
+    
+    Args:
+        merge: Fusion de mises à jour Yjs (ex: pycrdt.merge_updates)
+    
+    Returns:
+        Nombre de mises à jour repliées
+    """
+    try:
+        with get_connection() as conn:
+            current = conn.execute("SELECT state, state_seq FROM collaborative_documents WHERE doc_id = ?",
+                                   (doc_id,)).fetchone()
+            if current is None:
+                return 0
+            state, state_seq = current
+            rows = conn.execute("""
+                SELECT seq, update_data FROM collaborative_document_updates
+                WHERE doc_id = ? AND seq > ? ORDER BY seq
+            """, (doc_id, state_seq)).fetchall()
+            if not rows:
+                return 0
+            
+            # Repli par tranches, un snapshot à chaque frontière de snapshot_every
+            pending = [bytes(state)] if state else []
+            snapshots = []
+            for seq, update in rows:
+                pending.append(bytes(update))
+                if seq % snapshot_every == 0:
+                    pending = [merge(*pending)]
+                    snapshots.append((doc_id, seq, pending[0]))
+            folded = merge(*pending) if len(pending) > 1 else pending[0]
+            folded_seq = rows[-1][0]
+            
+            # Écriture conditionnelle : un autre compacteur a pu replier le journal entre-temps
+            cursor = conn.execute("""
+                UPDATE collaborative_documents
+                SET state = ?, state_seq = ?, version = version + 1, updated_at = CURRENT_TIMESTAMP
+                WHERE doc_id = ? AND state_seq = ?
+            """, (folded, folded_seq, doc_id, state_seq))
+            if cursor.rowcount == 0:
+                return 0
+            conn.executemany("""
+                INSERT OR IGNORE INTO collaborative_document_snapshots (doc_id, seq, state)
+                VALUES (?, ?, ?)
+            """, snapshots)
+            return len(rows)
+    except Exception as e:
+        print(f"Erreur lors de la compaction du document {doc_id}: {e}")
+        return 0
+
+
+def get_document_version(doc_id: str, version: int, merge) -> Optional[bytes]:
+    """
+    Reconstruit l'état d'un document à la version (seq) donnée : base la plus proche
+    (snapshot ou état compacté, seq <= version) puis rejeu des deltas suivants.
+    
+    Returns:
+        État Yjs de la version, ou None si elle n'existe pas ou a été purgée par la rétention
+    """
+    try:
+        conn = get_connection()
+        current = conn.execute("""
+            SELECT state, state_seq, last_seq FROM collaborative_documents WHERE doc_id = ?
+        """, (doc_id,)).fetchone()
+        if current is None or not 0 < version <= current[2]:
+            return None
+        state, state_seq, _ = current
+        
+        base_seq, base = 0, None
+        if state is not None and state_seq <= version:
+            base_seq, base = state_seq, state
+        snapshot = conn.execute("""
+            SELECT seq, state FROM collaborative_document_snapshots
+            WHERE doc_id = ? AND seq <= ? ORDER BY seq DESC LIMIT 1
+        """, (doc_id, version)).fetchone()
+        if snapshot is not None and snapshot[0] > base_seq:
+            base_seq, base = snapshot
+        
+        deltas = [bytes(row[0]) for row in conn.execute("""
+            SELECT update_data FROM collaborative_document_updates
+            WHERE doc_id = ? AND seq > ? AND seq <= ? ORDER BY seq
+        """, (doc_id, base_seq, version))]
+        if len(deltas) != version - base_seq:
+            return None  # deltas purgés : version disponible uniquement aux snapshots conservés
+        
+        parts = ([bytes(base)] if base is not None else []) + deltas
+        return merge(*parts) if len(parts) > 1 else parts[0]
+    except Exception as e:
+        print(f"Erreur lors de la reconstruction de la version {version} du document {doc_id}: {e}")
+        return None
+
+
+def prune_document_history(doc_id: str, keep_snapshots: int = 10, thin_every: int = 10,
+                           snapshot_every: int = 100) -> int:
+    """
+    Rétention de l'historique d'un document :
+        - les `keep_snapshots` derniers snapshots et tous les deltas qui les suivent sont conservés
+          (chaque version récente reste reconstructible)
+        - au-delà, les deltas sont supprimés et un snapshot sur `thin_every` est gardé
+          (seq multiple de snapshot_every * thin_every)
+    
+    Returns:
+        Nombre de lignes supprimées (deltas + snapshots)
+    """
+    try:
+        with get_connection() as conn:
+            cutoff = conn.execute("""
+                SELECT seq FROM collaborative_document_snapshots
+                WHERE doc_id = ? ORDER BY seq DESC LIMIT 1 OFFSET ?
+            """, (doc_id, keep_snapshots - 1)).fetchone()
+            if cutoff is None:
+                return 0
+            cutoff = cutoff[0]
+            deleted = conn.execute("""
+                DELETE FROM collaborative_document_updates WHERE doc_id = ? AND seq <= ?
+            """, (doc_id, cutoff)).rowcount
+            deleted += conn.execute("""
+                DELETE FROM collaborative_document_snapshots
+                WHERE doc_id = ? AND seq < ? AND seq % ? != 0
+            """, (doc_id, cutoff, snapshot_every * thin_every)).rowcount
+            return deleted
+    except Exception as e:
+        print(f"Erreur lors de la purge de l'historique du document {doc_id}: {e}")
+        return 0
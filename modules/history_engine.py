@@ -0,0 +1,140 @@
+"""
+history_engine.py
+
+Reconstitution déterministe de l'historique Data History (NumPy).
+
+Les valeurs réellement stockées (pivot Data History) sont chargées dans une
+matrice métriques × semaines (colonne 0 = semaine la plus récente, colonne t =
+t semaines plus tôt, NaN = inconnu). Les trous des métriques ayant des
+variations (Sessions, Revenue B2C, ...) sont comblés en une passe vectorisée :
+
+    - vs LW : valeur[t + 1] = valeur[t] / (1 + vs_lw[t]), enchaîné tant que les
+      variations sont connues (produit cumulé des facteurs)
+    - vs LY : valeur[t + 52] = valeur[t] / (1 + vs_ly[t])
+
+Les valeurs réelles ne sont jamais écrasées et rien n'est tiré au hasard : le
+même état de la base donne toujours la même timeline. Le formatage est laissé
+à l'appelant.
+
+Usage:
+    rows = get_data_history_values(date_from, date_to, sections)
+    dates, keys, values, inferred = build_timeline(rows, latest, weeks=20)
+"""
+
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+LY_OFFSET = 52
+
+# (section, métrique) -> (variation vs LW, variation vs LY), dans la même section
+CHAINED_METRICS: Dict[Tuple[str, str], Tuple[str, str]] = {
+    ('SLIDE_31_GLOBAL', 'Sessions'): ('Sessions vs LW', 'Sessions vs LY'),
+    ('SLIDE_31_GLOBAL', 'Revenue B2C'): ('Revenue vs LW', 'Revenue vs LY'),
+    ('SLIDE_31_GLOBAL', 'Average Basket'): ('ABV vs LW', 'ABV vs LY'),
+    ('SLIDE_31_GLOBAL', 'Conversion Rate'): ('CR vs LW', 'CR vs LY'),
+    ('SLIDE_31_GLOBAL', 'Bookings'): ('Bookings vs LW', 'Bookings vs LY'),
+}
+
+
+def _growth_factors(variations: np.ndarray) -> np.ndarray:
+    """1 / (1 + variation) ; NaN si la variation est inconnue ou <= -100 %."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factors = 1.0 / (1.0 + variations)
+    factors[~(1.0 + variations > 0)] = np.nan
+    return factors
+
+
+def chain_back(values: np.ndarray, factors: np.ndarray) -> np.ndarray:
+    """
+    Comble chaque trou à partir de la dernière valeur connue plus récente
+    (colonne inférieure) : valeur[t] = valeur[a] * facteur[a] * ... * facteur[t - 1].
+    Un facteur inconnu entre a et t interrompt la chaîne.
+    """
+    rows, cols = values.shape
+    known = ~np.isnan(values)
+    broken = np.isnan(factors)
+    column = np.broadcast_to(np.arange(cols), values.shape)
+
+    # Dernière colonne connue <= t (-1 si aucune)
+    anchor = np.maximum.accumulate(np.where(known, column, -1), axis=1)
+    safe_anchor = np.maximum(anchor, 0)
+
+    # Produits et nombres de ruptures cumulés, exclusifs : P[t] = prod(facteur[j], j < t)
+    ones = np.ones((rows, 1))
+    zeros = np.zeros((rows, 1), dtype=np.int64)
+    product = np.concatenate([ones, np.cumprod(np.where(broken, 1.0, factors), axis=1)[:, :-1]], axis=1)
+    breaks = np.concatenate([zeros, np.cumsum(broken, axis=1)[:, :-1]], axis=1)
+
+    base = np.take_along_axis(values, safe_anchor, axis=1)
+    chained = base * product / np.take_along_axis(product, safe_anchor, axis=1)
+    reachable = (anchor >= 0) & (breaks == np.take_along_axis(breaks, safe_anchor, axis=1))
+    return np.where(known, values, np.where(reachable, chained, np.nan))
+
+
+def back_calculate(values: np.ndarray, vs_lw: np.ndarray, vs_ly: np.ndarray) -> np.ndarray:
+    """
+    Matrices métriques × semaines (colonne 0 = la plus récente) : enchaînement
+    vs LW, report vs LY à 52 semaines, puis nouvel enchaînement vs LW depuis ces reports.
+    """
+    lw_factors = _growth_factors(vs_lw)
+    filled = chain_back(values, lw_factors)
+    if filled.shape[1] > LY_OFFSET:
+        from_ly = filled[:, :-LY_OFFSET] * _growth_factors(vs_ly[:, :-LY_OFFSET])
+        older = filled[:, LY_OFFSET:]
+        filled[:, LY_OFFSET:] = np.where(np.isnan(older), from_ly, older)
+        filled = chain_back(filled, lw_factors)
+    return filled
+
+
+def build_timeline(rows, latest: date, weeks: int = 20,
+                   sections: Optional[List[str]] = None):
+    """
+    Args:
+        rows: Valeurs stockées (section, métrique, week_start_date 'YYYY-MM-DD', valeur),
+              dans l'ordre d'affichage des métriques
+        latest: Lundi de la semaine la plus récente (colonne 0)
+        weeks: Nombre de semaines de la timeline
+
+    Returns:
+        (dates des semaines de la plus récente à la plus ancienne,
+         clés (section, métrique) des lignes, valeurs float64 (NaN = vide),
+         masque des valeurs inférées)
+    """
+    dates = [latest - timedelta(weeks=i) for i in range(weeks)]
+    column_of = {d.isoformat(): i for i, d in enumerate(dates)}
+
+    keys: List[Tuple[str, str]] = []
+    row_of: Dict[Tuple[str, str], int] = {}
+    cells = []
+    for section, metric, week_start_date, value in rows:
+        if sections and section not in sections:
+            continue
+        key = (section, metric)
+        if key not in row_of:
+            row_of[key] = len(keys)
+            keys.append(key)
+        column = column_of.get(week_start_date)
+        if column is not None and value is not None:
+            cells.append((row_of[key], column, value))
+
+    values = np.full((len(keys), weeks), np.nan)
+    if cells:
+        r, c, v = zip(*cells)
+        values[list(r), list(c)] = v
+    real = ~np.isnan(values)
+
+    # Lignes à enchaîner et lignes de variations correspondantes
+    targets, lw_rows, ly_rows = [], [], []
+    for key, (lw_metric, ly_metric) in CHAINED_METRICS.items():
+        section = key[0]
+        if key in row_of:
+            targets.append(row_of[key])
+            lw_rows.append(row_of.get((section, lw_metric), -1))
+            ly_rows.append(row_of.get((section, ly_metric), -1))
+    if targets:
+        padded = np.vstack([values, np.full((1, weeks), np.nan)])  # ligne -1 : variation absente
+        values[targets] = back_calculate(values[targets], padded[lw_rows], padded[ly_rows])
+
+    return dates, keys, values, ~real & ~np.isnan(values)
@@ -0,0 +1,260 @@
+"""
+jobs.py
+
+File d'attente des imports CPFR : l'upload dépose le fichier dans un répertoire
+de spool, crée un job dans la table `cpfr_jobs` et rend la main immédiatement.
+Un ProcessPoolExecutor exécute ensuite parse_and_validate_cpfr + ingest_weekly_data
+hors du processus Flask.
+
+Le fichier est haché (sha256) pendant son écriture sur disque : un deck identique
+déjà parsé (même contenu, mêmes slides, même PARSER_VERSION) reprend son payload
+depuis `parse_cache` sans re-parsing. L'ingestion est toujours rejouée, avec la
+semaine demandée : un ré-import écrase les éditions faites depuis dans Data History.
+
+L'état des jobs vit dans SQLite. Au démarrage de l'application puis toutes les
+CPFR_JOB_MONITOR_INTERVAL secondes (ensure_monitor), les jobs 'running' dont le
+processus a disparu (PID absent ou plus de heartbeat depuis STALE_JOB_SECONDS)
+sont remis en file, et les jobs 'queued' non encore soumis par ce processus sont
+soumis au pool.
+
+Configuration (variables d'environnement):
+    CPFR_JOB_WORKERS    Nombre de processus de parsing (défaut: 2)
+    CPFR_JOB_MONITOR_INTERVAL  Secondes entre deux reprises des jobs abandonnés (défaut: 60)
+    CPFR_JOB_SPOOL_DIR  Répertoire des fichiers en attente, relatif à la racine
+                        de l'application s'il n'est pas absolu (défaut: uploads/jobs)
+"""
+
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from . import database
+
+APP_ROOT = Path(__file__).resolve().parent.parent
+JOB_WORKERS = int(os.environ.get("CPFR_JOB_WORKERS", "2"))
+SPOOL_DIR = APP_ROOT / os.environ.get("CPFR_JOB_SPOOL_DIR", "uploads/jobs")
+HEARTBEAT_SECONDS = 30
+STALE_JOB_SECONDS = 120  # sans heartbeat depuis ce délai, le worker est considéré mort
+MONITOR_INTERVAL = float(os.environ.get("CPFR_JOB_MONITOR_INTERVAL", "60"))
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_submitted: Set[str] = set()  # jobs soumis au pool de ce processus, pas encore terminés
+_monitor: Optional[threading.Thread] = None
+_monitor_stop = threading.Event()
+
+
+def save_stream_with_hash(stream, dest_path: Path) -> str:
+    """Écrit le flux par blocs dans dest_path en calculant son sha256 au passage."""
+    digest = hashlib.sha256()
+    with open(dest_path, "wb") as f:
+        for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _heartbeat(job_id: str, stop: threading.Event):
+    while not stop.wait(HEARTBEAT_SECONDS):
+        database.touch_job(job_id)
+
+
+def run_cpfr_job(job_id: str, db_path: str) -> Dict[str, Any]:
+    """
+    Exécuté dans un processus du pool : parse le deck puis ingère la semaine.
+    Le chemin de la base est transmis explicitement (processus 'spawn').
+    """
+    from .cpfr_unified_parser import PARSER_VERSION, parse_and_validate_cpfr
+    from .pptx_deck import open_deck
+
+    database.DB_PATH = Path(db_path)
+    job = database.claim_job(job_id, os.getpid())
+    if job is None:
+        # Déjà pris (ou terminé) par un autre worker
+        return {"job_id": job_id, "status": "skipped"}
+
+    heartbeat_stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job_id, heartbeat_stop), name=f"job-heartbeat-{job_id}",
+                     daemon=True).start()
+    parse_ms = ingest_ms = None
+    try:
+        # Contenu déjà parsé : seul le parsing est évité, la semaine demandée est ré-ingérée
+        cached = None
+        if job["sha256"]:
+            cached = database.get_cached_parse(job["sha256"], job["slide_start"], job["slide_end"], PARSER_VERSION)
+        if cached is not None:
+            payload = {**cached, "week_start_date": job["week_start_date"] or cached.get("week_start_date")}
+            warnings, parse_ms = [], 0
+        else:
+            t0 = time.perf_counter()
+            with open_deck(job["file_path"], lite=True) as deck:
+                result = parse_and_validate_cpfr(deck, job["slide_start"], job["slide_end"], job["week_start_date"])
+            parse_ms = (time.perf_counter() - t0) * 1000
+
+            if not result["success"]:
+                database.finish_job(job_id, "failed", error=result.get("error", "Erreur inconnue"),
+                                    parse_ms=parse_ms)
+                return {"job_id": job_id, "status": "failed"}
+            payload, warnings = result["db_payload"], result["validation"].get("errors", [])
+
+        t0 = time.perf_counter()
+        ingest = database.ingest_weekly_data(payload)
+        ingest_ms = (time.perf_counter() - t0) * 1000
+
+        summary = {
+            "week_start_date": payload.get("week_start_date"),
+            "week_id": ingest.get("week_id"),
+            "inserted": ingest.get("inserted", []),
+            "warnings": warnings,
+        }
+        if cached is not None:
+            summary["cached"] = True
+        if ingest.get("success"):
+            if job["sha256"] and cached is None:
+                database.store_cached_parse(job["sha256"], job["slide_start"], job["slide_end"],
+                                            PARSER_VERSION, payload)
+            database.finish_job(job_id, "done", result=summary, parse_ms=parse_ms, ingest_ms=ingest_ms)
+            status = "done"
+        else:
+            errors = ingest.get("errors") or [ingest.get("error", "Erreur inconnue")]
+            database.finish_job(job_id, "failed", result=summary, error=", ".join(map(str, errors)),
+                                parse_ms=parse_ms, ingest_ms=ingest_ms)
+            status = "failed"
+        return {"job_id": job_id, "status": status}
+
+    except Exception as e:
+        database.finish_job(job_id, "failed", error=str(e), parse_ms=parse_ms, ingest_ms=ingest_ms)
+        return {"job_id": job_id, "status": "failed"}
+
+    finally:
+        heartbeat_stop.set()
+        if os.path.exists(job["file_path"]):
+            os.unlink(job["file_path"])
+
+
+def _db_path() -> str:
+    return str(Path(database.DB_PATH).resolve())
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Pool de processus partagé (créé à la demande)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=JOB_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def _reset_executor(broken: ProcessPoolExecutor):
+    """Abandonne un pool cassé (worker tué, OOM) : le prochain get_executor() en recrée un."""
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def submit_job(job_id: str) -> bool:
+    """Soumet un job au pool, recréé une fois s'il est cassé. False si la soumission échoue."""
+    for _ in range(2):
+        executor = get_executor()
+        try:
+            future = executor.submit(run_cpfr_job, job_id, _db_path())
+        except BrokenProcessPool:
+            _reset_executor(executor)
+            continue
+        _submitted.add(job_id)
+        future.add_done_callback(lambda _: _submitted.discard(job_id))
+        return True
+    return False
+
+
+def resubmit_pending_jobs() -> List[str]:
+    """
+    Remet en file les jobs de workers disparus, puis soumet les jobs 'queued'
+    que ce processus n'a pas déjà en cours (jobs d'avant un redémarrage, jobs
+    perdus avec un pool cassé). Retourne les identifiants soumis.
+    """
+    submitted = []
+    for job_id in database.requeue_stale_jobs(STALE_JOB_SECONDS):
+        if job_id not in _submitted and submit_job(job_id):
+            submitted.append(job_id)
+    return submitted
+
+
+def _monitor_loop(interval: float):
+    while not _monitor_stop.wait(interval):
+        try:
+            resubmit_pending_jobs()
+        except Exception as e:
+            print(f"Erreur lors de la reprise des jobs: {e}")
+
+
+def ensure_monitor(interval: float = MONITOR_INTERVAL):
+    """
+    Reprise des jobs au démarrage de l'application (passe synchrone), puis
+    périodique dans un thread démon (une seule fois par processus).
+    """
+    global _monitor
+    # Les workers 'spawn' réimportent le module principal : pas de monitor dans le pool
+    if multiprocessing.parent_process() is not None or (_monitor is not None and _monitor.is_alive()):
+        return
+    resubmit_pending_jobs()
+    _monitor_stop.clear()
+    _monitor = threading.Thread(target=_monitor_loop, args=(interval,), name="cpfr-job-monitor", daemon=True)
+    _monitor.start()
+
+
+def enqueue_cpfr_job(file_storage, filename: str, slide_start: int, slide_end: int,
+                     week_start_date: Optional[str] = None) -> Optional[str]:
+    """
+    Dépose le fichier uploadé dans le spool et soumet le job au pool.
+
+    Returns:
+        Identifiant du job, ou None si le job n'a pas pu être enregistré
+    """
+    SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+    job_id = uuid.uuid4().hex
+    file_path = SPOOL_DIR / f"{job_id}.pptx"
+    sha256 = save_stream_with_hash(file_storage.stream, file_path)
+
+    if not database.create_job(job_id, str(file_path.resolve()), filename, slide_start, slide_end,
+                               week_start_date, sha256):
+        file_path.unlink(missing_ok=True)
+        return None
+
+    if not submit_job(job_id):
+        database.finish_job(job_id, "failed", error="pool de workers indisponible")
+        file_path.unlink(missing_ok=True)
+        return None
+    return job_id
+
+
+def shutdown(wait: bool = True):
+    """Arrête le pool et le thread de reprise (tests, arrêt propre du serveur)."""
+    global _executor, _monitor
+    _monitor_stop.set()
+    _monitor = None
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
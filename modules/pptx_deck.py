@@ -0,0 +1,112 @@
+"""
+pptx_deck.py
+
+Session de lecture d'un deck PowerPoint : le package .pptx (zip + XML) est
+chargé une seule fois puis partagé entre tous les parsers
+(get_slide_info, parse_cpfr_slide, parse_acquisition_slide, extract_cpfr_pptx...).
+
+Usage:
+    from modules.pptx_deck import open_deck
+    deck = open_deck("deck.pptx")
+    info = get_slide_info(deck)
+    data = parse_cpfr_presentation(deck)
+
+    # Mode léger : seules les slides demandées (et leur layout) sont parsées
+    deck = open_deck("deck.pptx", lite=True)
+
+    # Texte des formes indexé une fois par slide, réutilisé par tous les parsers
+    index = deck.text_index(deck.slide(31))
+"""
+
+from typing import Any, Union
+
+from pptx import Presentation
+from unidecode import unidecode
+
+from .pptx_lite import LiteDeck
+from .slide_index import SlideTextIndex
+from .tracing import TRACER
+
+
+class DeckSession:
+    """Deck PowerPoint chargé une fois et distribuant ses slides aux parsers."""
+
+    def __init__(self, source: Any):
+        """
+        Args:
+            source: Chemin du fichier .pptx ou objet fichier (file-like)
+        """
+        self.source = source
+        self.presentation = Presentation(source)
+        self._text_indexes = {}
+
+    @property
+    def slides(self):
+        return self.presentation.slides
+
+    @property
+    def slide_count(self) -> int:
+        return len(self.presentation.slides)
+
+    @property
+    def slide_width(self) -> int:
+        return self.presentation.slide_width
+
+    @property
+    def slide_height(self) -> int:
+        return self.presentation.slide_height
+
+    @property
+    def core_properties(self):
+        return self.presentation.core_properties
+
+    def slide(self, slide_number: int):
+        """Retourne la slide `slide_number` (index humain, 1-based)."""
+        idx = slide_number - 1
+        if idx < 0 or idx >= self.slide_count:
+            raise ValueError(f"Slide number {slide_number} out of range (1..{self.slide_count})")
+        return self.slides[idx]
+
+    def text_index(self, slide) -> SlideTextIndex:
+        """Index texte de la slide (voir slide_index), construit au premier appel puis partagé."""
+        # La slide est conservée avec son index : son id() reste valide
+        entry = self._text_indexes.get(id(slide))
+        if entry is None:
+            entry = self._text_indexes[id(slide)] = (slide, SlideTextIndex(slide))
+        return entry[1]
+
+    def close(self):
+        """python-pptx lit tout le paquet à l'ouverture : aucun fichier à fermer (API commune avec LiteDeck)."""
+
+    def __enter__(self) -> "DeckSession":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def find_slide_by_title(self, title_contains: str):
+        """Retourne la première slide dont le titre contient `title_contains` (sans accents/casse)."""
+        low = unidecode(title_contains).lower()
+        for s in self.slides:
+            title = ""
+            if s.shapes.title:
+                title = unidecode((s.shapes.title.text or "")).lower()
+            if low in title:
+                return s
+        return None
+
+
+def open_deck(source: Union[str, Any, DeckSession, LiteDeck], lite: bool = False) -> Union[DeckSession, LiteDeck]:
+    """
+    Ouvre un deck, ou réutilise la session fournie telle quelle.
+
+    Args:
+        source: Chemin, objet fichier, DeckSession ou LiteDeck déjà ouvert
+        lite: Lecture sélective zip + lxml (voir pptx_lite) au lieu de python-pptx
+    """
+    if isinstance(source, (DeckSession, LiteDeck)):
+        return source
+    with TRACER.span("pptx.open_deck", lite=lite, source=source if isinstance(source, str) else type(source).__name__):
+        if lite:
+            return LiteDeck(source)
+        return DeckSession(source)
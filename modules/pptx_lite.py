@@ -0,0 +1,487 @@
+"""
+pptx_lite.py
+
+Lecteur PowerPoint « léger » : au lieu de charger tout le package avec
+python-pptx (toutes les slides, layouts, masters et médias), on ouvre le .pptx
+comme une archive zip et on ne parse que :
+    - ppt/presentation.xml (taille des slides + sldIdLst)
+    - la slide demandée, résolue via ses relations
+    - son layout (géométrie héritée des placeholders), et le master en dernier recours
+
+Les objets exposés reprennent le sous-ensemble de l'API python-pptx utilisé par
+les parsers (slide.shapes, shape.text, left/top/width/height, has_table, table.rows...).
+
+Usage:
+    from modules.pptx_deck import open_deck
+    deck = open_deck("deck.pptx", lite=True)
+    slide = deck.slide(32)
+"""
+
+import posixpath
+import zipfile
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from lxml import etree
+from unidecode import unidecode
+
+from .slide_index import SlideTextIndex
+
+NS = {
+    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
+    "p": "http://schemas.openxmlformats.org/presentationml/2006/main",
+    "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    "pr": "http://schemas.openxmlformats.org/package/2006/relationships",
+    "cp": "http://schemas.openxmlformats.org/package/2006/metadata/core-properties",
+    "dc": "http://purl.org/dc/elements/1.1/",
+    "dcterms": "http://purl.org/dc/terms/",
+}
+
+RT_SLIDE_LAYOUT = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/slideLayout"
+RT_SLIDE_MASTER = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/slideMaster"
+
+# Correspondance type de placeholder layout -> type du placeholder master (cf. python-pptx)
+MASTER_PH_TYPE = {
+    "ctrTitle": "title",
+    "subTitle": "body",
+    "obj": "body",
+    "chart": "body",
+    "clipArt": "body",
+    "dgm": "body",
+    "media": "body",
+    "pic": "body",
+    "tbl": "body",
+}
+
+TITLE_PH_TYPES = ("title", "ctrTitle")
+
+_A = "{%s}" % NS["a"]
+_P = "{%s}" % NS["p"]
+_R_ID = "{%s}id" % NS["r"]
+
+
+def _q(tag: str) -> str:
+    prefix, local = tag.split(":")
+    return "{%s}%s" % (NS[prefix], local)
+
+
+def _parse_w3cdtf(value: Optional[str]) -> Optional[datetime]:
+    """Convertit une date docProps (W3CDTF) en datetime naïf, comme python-pptx."""
+    if not value:
+        return None
+    value = value.strip().rstrip("Z")
+    for fmt in ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%d", "%Y-%m", "%Y"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+# -------------------------------
+# Texte
+# -------------------------------
+
+def _paragraph_text(p_el) -> str:
+    parts = []
+    for child in p_el:
+        if child.tag in (_A + "r", _A + "fld"):
+            t = child.find(_A + "t")
+            if t is not None and t.text:
+                parts.append(t.text)
+        elif child.tag == _A + "br":
+            parts.append("\v")
+    return "".join(parts)
+
+
+def _text_body_text(tx_body) -> str:
+    """Texte d'un txBody : paragraphes joints par '\\n' (même rendu que shape.text)."""
+    if tx_body is None:
+        return ""
+    return "\n".join(_paragraph_text(p) for p in tx_body.iterfind(_A + "p"))
+
+
+# -------------------------------
+# Formes
+# -------------------------------
+
+class LiteShape:
+    """Forme de premier niveau (sans texte : image, groupe, connecteur...)."""
+
+    has_table = False
+    has_text_frame = False
+    is_placeholder = False
+
+    def __init__(self, element, slide: "LiteSlide"):
+        self._element = element
+        self._slide = slide
+        self._xfrm_cache = None
+
+    @property
+    def name(self) -> str:
+        c_nv_pr = self._element.find(".//" + _P + "cNvPr")
+        return c_nv_pr.get("name", "") if c_nv_pr is not None else ""
+
+    @property
+    def shape_id(self) -> Optional[int]:
+        c_nv_pr = self._element.find(".//" + _P + "cNvPr")
+        return int(c_nv_pr.get("id")) if c_nv_pr is not None and c_nv_pr.get("id") else None
+
+    def _own_xfrm(self):
+        # sp/pic/cxnSp : spPr/a:xfrm ; grpSp : grpSpPr/a:xfrm ; graphicFrame : p:xfrm
+        for path in ("./p:spPr/a:xfrm", "./p:grpSpPr/a:xfrm", "./p:xfrm"):
+            found = self._element.find(path, NS)
+            if found is not None:
+                return found
+        return None
+
+    def _xfrm(self):
+        if self._xfrm_cache is None:
+            self._xfrm_cache = _read_xfrm(self._own_xfrm()) or (None, None, None, None)
+        return self._xfrm_cache
+
+    @property
+    def left(self) -> Optional[int]:
+        return self._xfrm()[0]
+
+    @property
+    def top(self) -> Optional[int]:
+        return self._xfrm()[1]
+
+    @property
+    def width(self) -> Optional[int]:
+        return self._xfrm()[2]
+
+    @property
+    def height(self) -> Optional[int]:
+        return self._xfrm()[3]
+
+
+class LiteTextShape(LiteShape):
+    """Forme p:sp (zone de texte, forme automatique ou placeholder)."""
+
+    has_text_frame = True
+
+    def __init__(self, element, slide: "LiteSlide"):
+        super().__init__(element, slide)
+        ph = element.find("./p:nvSpPr/p:nvPr/p:ph", NS)
+        self._ph = ph
+        self.is_placeholder = ph is not None
+
+    @property
+    def text(self) -> str:
+        return _text_body_text(self._element.find(_P + "txBody"))
+
+    @property
+    def placeholder_type(self) -> Optional[str]:
+        if self._ph is None:
+            return None
+        return self._ph.get("type", "obj")
+
+    @property
+    def placeholder_idx(self) -> Optional[int]:
+        if self._ph is None:
+            return None
+        return int(self._ph.get("idx", "0"))
+
+    def _xfrm(self):
+        if self._xfrm_cache is None:
+            own = _read_xfrm(self._own_xfrm())
+            if own is None and self.is_placeholder:
+                own = self._slide._inherited_xfrm(self.placeholder_idx, self.placeholder_type)
+            self._xfrm_cache = own or (None, None, None, None)
+        return self._xfrm_cache
+
+
+class _LiteCell:
+    def __init__(self, tc_el):
+        self._element = tc_el
+
+    @property
+    def text(self) -> str:
+        return _text_body_text(self._element.find(_A + "txBody"))
+
+
+class _LiteRow:
+    def __init__(self, tr_el):
+        self._element = tr_el
+        self.cells = [_LiteCell(tc) for tc in tr_el.iterfind(_A + "tc")]
+
+
+class LiteTable:
+    def __init__(self, tbl_el):
+        self._element = tbl_el
+        self.rows = [_LiteRow(tr) for tr in tbl_el.iterfind(_A + "tr")]
+        self.columns = list(tbl_el.iterfind("./a:tblGrid/a:gridCol", NS))
+
+    def cell(self, row_idx: int, col_idx: int) -> _LiteCell:
+        return self.rows[row_idx].cells[col_idx]
+
+
+class LiteGraphicFrame(LiteShape):
+    """Forme p:graphicFrame ; seuls les tableaux sont exposés."""
+
+    @property
+    def has_table(self) -> bool:
+        return self._element.find(".//a:tbl", NS) is not None
+
+    @property
+    def table(self) -> LiteTable:
+        tbl = self._element.find(".//a:tbl", NS)
+        if tbl is None:
+            raise ValueError("shape does not contain a table")
+        return LiteTable(tbl)
+
+
+def _read_xfrm(xfrm) -> Optional[tuple]:
+    if xfrm is None:
+        return None
+    off = xfrm.find(_A + "off")
+    ext = xfrm.find(_A + "ext")
+    if off is None or ext is None:
+        return None
+    return (int(off.get("x", 0)), int(off.get("y", 0)),
+            int(ext.get("cx", 0)), int(ext.get("cy", 0)))
+
+
+def _make_shape(element, slide: "LiteSlide") -> LiteShape:
+    if element.tag == _P + "sp":
+        return LiteTextShape(element, slide)
+    if element.tag == _P + "graphicFrame":
+        return LiteGraphicFrame(element, slide)
+    return LiteShape(element, slide)
+
+
+class LiteShapes:
+    """Formes de premier niveau d'une slide (même périmètre que slide.shapes)."""
+
+    SHAPE_TAGS = tuple(_P + t for t in ("sp", "grpSp", "graphicFrame", "cxnSp", "pic", "contentPart"))
+
+    def __init__(self, slide: "LiteSlide", sp_tree):
+        self._shapes = [_make_shape(el, slide) for el in sp_tree if el.tag in self.SHAPE_TAGS]
+
+    def __iter__(self):
+        return iter(self._shapes)
+
+    def __len__(self) -> int:
+        return len(self._shapes)
+
+    def __getitem__(self, idx):
+        return self._shapes[idx]
+
+    @property
+    def title(self) -> Optional[LiteTextShape]:
+        for sh in self._shapes:
+            if isinstance(sh, LiteTextShape) and sh.placeholder_type in TITLE_PH_TYPES:
+                return sh
+        return None
+
+
+# -------------------------------
+# Slides
+# -------------------------------
+
+class LiteSlide:
+    """Slide chargée seule ; layout et master ne sont lus qu'en cas d'héritage de géométrie."""
+
+    def __init__(self, deck: "LiteDeck", partname: str):
+        self._deck = deck
+        self.partname = partname
+        root = deck._xml(partname)
+        sp_tree = root.find("./p:cSld/p:spTree", NS)
+        self.shapes = LiteShapes(self, sp_tree if sp_tree is not None else [])
+        self._layout_partname = deck._related(partname, RT_SLIDE_LAYOUT)
+
+    def _inherited_xfrm(self, idx: Optional[int], ph_type: Optional[str]) -> Optional[tuple]:
+        """Géométrie du placeholder : layout (par idx) puis master (par type)."""
+        if not self._layout_partname:
+            return None
+        layout_phs = self._deck._placeholders(self._layout_partname)
+        layout_ph = layout_phs["by_idx"].get(idx)
+        if layout_ph is not None:
+            if layout_ph["xfrm"] is not None:
+                return layout_ph["xfrm"]
+            ph_type = layout_ph["type"]
+        master_partname = self._deck._related(self._layout_partname, RT_SLIDE_MASTER)
+        if not master_partname:
+            return None
+        master_phs = self._deck._placeholders(master_partname)
+        master_type = MASTER_PH_TYPE.get(ph_type, ph_type)
+        master_ph = master_phs["by_type"].get(master_type)
+        return master_ph["xfrm"] if master_ph is not None else None
+
+
+class LiteSlides:
+    """Séquence paresseuse : une slide n'est parsée qu'au premier accès."""
+
+    def __init__(self, deck: "LiteDeck", partnames: List[str]):
+        self._deck = deck
+        self._partnames = partnames
+        self._cache: Dict[int, LiteSlide] = {}
+
+    def __len__(self) -> int:
+        return len(self._partnames)
+
+    def __getitem__(self, idx: int) -> LiteSlide:
+        if idx < 0:
+            idx += len(self._partnames)
+        if idx < 0 or idx >= len(self._partnames):
+            raise IndexError("slide index out of range")
+        if idx not in self._cache:
+            self._cache[idx] = LiteSlide(self._deck, self._partnames[idx])
+        return self._cache[idx]
+
+    def __iter__(self):
+        for i in range(len(self._partnames)):
+            yield self[i]
+
+
+class LiteCoreProperties:
+    def __init__(self, root):
+        def text(tag):
+            el = root.find(tag, NS) if root is not None else None
+            return el.text if el is not None and el.text else ""
+
+        self.title = text("dc:title")
+        self.author = text("dc:creator")
+        self.subject = text("dc:subject")
+        self.last_modified_by = text("cp:lastModifiedBy")
+        self.created = _parse_w3cdtf(text("dcterms:created"))
+        self.modified = _parse_w3cdtf(text("dcterms:modified"))
+
+
+class LiteDeck:
+    """Équivalent léger de DeckSession, adossé directement à l'archive zip."""
+
+    def __init__(self, source: Any):
+        self.source = source
+        self._zip = zipfile.ZipFile(source)
+        self._rels_cache: Dict[str, Dict[str, tuple]] = {}
+        self._ph_cache: Dict[str, Dict[str, dict]] = {}
+
+        pres_part = self._main_presentation_part()
+        pres = self._xml(pres_part)
+        sld_sz = pres.find("p:sldSz", NS)
+        # Taille par défaut python-pptx (4:3) si sldSz absent
+        self.slide_width = int(sld_sz.get("cx")) if sld_sz is not None else 9144000
+        self.slide_height = int(sld_sz.get("cy")) if sld_sz is not None else 6858000
+
+        rels = self._rels(pres_part)
+        partnames = []
+        for sld_id in pres.iterfind("./p:sldIdLst/p:sldId", NS):
+            rel = rels.get(sld_id.get(_R_ID))
+            if rel:
+                partnames.append(rel[1])
+        self.slides = LiteSlides(self, partnames)
+        self._core = None
+        self._text_indexes: Dict[int, tuple] = {}
+
+    # --- accès au package ---
+
+    def _xml(self, partname: str):
+        with self._zip.open(partname) as f:
+            return etree.parse(f).getroot()
+
+    def _main_presentation_part(self) -> str:
+        for rel_type, target in self._rels("").values():
+            if rel_type.endswith("/officeDocument"):
+                return target
+        return "ppt/presentation.xml"
+
+    def _rels(self, partname: str) -> Dict[str, tuple]:
+        """rId -> (type, partname absolu) pour la part donnée ('' = package)."""
+        if partname in self._rels_cache:
+            return self._rels_cache[partname]
+        base_dir, filename = posixpath.split(partname)
+        rels_name = posixpath.join(base_dir, "_rels", filename + ".rels")
+        rels = {}
+        try:
+            root = self._xml(rels_name)
+        except KeyError:
+            root = None
+        if root is not None:
+            for rel in root.iterfind("pr:Relationship", NS):
+                if rel.get("TargetMode") == "External":
+                    continue
+                target = rel.get("Target", "")
+                if target.startswith("/"):
+                    target = target.lstrip("/")
+                else:
+                    target = posixpath.normpath(posixpath.join(base_dir, target))
+                rels[rel.get("Id")] = (rel.get("Type", ""), target)
+        self._rels_cache[partname] = rels
+        return rels
+
+    def _related(self, partname: str, rel_type: str) -> Optional[str]:
+        for r_type, target in self._rels(partname).values():
+            if r_type == rel_type:
+                return target
+        return None
+
+    def _placeholders(self, partname: str) -> Dict[str, dict]:
+        """Index des placeholders d'un layout/master : par idx et par type."""
+        if partname not in self._ph_cache:
+            by_idx, by_type = {}, {}
+            root = self._xml(partname)
+            for sp in root.iterfind("./p:cSld/p:spTree/p:sp", NS):
+                ph = sp.find("./p:nvSpPr/p:nvPr/p:ph", NS)
+                if ph is None:
+                    continue
+                entry = {
+                    "type": ph.get("type", "obj"),
+                    "xfrm": _read_xfrm(sp.find("./p:spPr/a:xfrm", NS)),
+                }
+                by_idx.setdefault(int(ph.get("idx", "0")), entry)
+                by_type.setdefault(entry["type"], entry)
+            self._ph_cache[partname] = {"by_idx": by_idx, "by_type": by_type}
+        return self._ph_cache[partname]
+
+    # --- API commune avec DeckSession ---
+
+    @property
+    def slide_count(self) -> int:
+        return len(self.slides)
+
+    @property
+    def core_properties(self) -> LiteCoreProperties:
+        if self._core is None:
+            try:
+                root = self._xml("docProps/core.xml")
+            except KeyError:
+                root = None
+            self._core = LiteCoreProperties(root)
+        return self._core
+
+    def slide(self, slide_number: int) -> LiteSlide:
+        """Retourne la slide `slide_number` (index humain, 1-based)."""
+        idx = slide_number - 1
+        if idx < 0 or idx >= self.slide_count:
+            raise ValueError(f"Slide number {slide_number} out of range (1..{self.slide_count})")
+        return self.slides[idx]
+
+    def find_slide_by_title(self, title_contains: str) -> Optional[LiteSlide]:
+        """Retourne la première slide dont le titre contient `title_contains` (sans accents/casse)."""
+        low = unidecode(title_contains).lower()
+        for s in self.slides:
+            title = ""
+            if s.shapes.title:
+                title = unidecode((s.shapes.title.text or "")).lower()
+            if low in title:
+                return s
+        return None
+
+    def text_index(self, slide: LiteSlide) -> SlideTextIndex:
+        """Index texte de la slide, construit au premier appel puis partagé."""
+        entry = self._text_indexes.get(id(slide))
+        if entry is None:
+            entry = self._text_indexes[id(slide)] = (slide, SlideTextIndex(slide))
+        return entry[1]
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self) -> "LiteDeck":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,6 +1,9 @@
-from pptx import Presentation
 import re
 
+from .pptx_deck import open_deck
+from .slide_index import SlideTextIndex
+from .tracing import TRACER
+
 
 def clean_text(text):
     """Nettoie et normalise le texte extrait"""
@@ -11,42 +14,23 @@ def clean_text(text):
     return text
 
 
-def parse_slide_text(slide):
-    """Extrait tous les textes d'une slide avec une meilleure organisation"""
-    texts = []
-    
-    print(f"[DEBUG] Parsing slide text - {len(slide.shapes)} formes trouvées")
-    
-    for i, shape in enumerate(slide.shapes):
-        try:
-            shape_type = type(shape).__name__
-            print(f"[DEBUG] Forme {i}: {shape_type}")
-            
-            if hasattr(shape, "text") and shape.text:
-                # Vérification que le texte est bien une chaîne
-                if isinstance(shape.text, str):
-                    text = clean_text(shape.text)
-                    if text and len(text) > 2:  # Ignore les textes trop courts
-                        texts.append(text)
-                        print(f"[DEBUG] Texte extrait forme {i}: '{text}'")
-                    else:
-                        print(f"[DEBUG] Texte trop court ignoré forme {i}: '{text}'")
-                else:
-                    print(f"[DEBUG] Texte non-string forme {i}: {type(shape.text)}")
-            else:
-                print(f"[DEBUG] Forme {i} n'a pas de texte")
-        except Exception as e:
-            # Ignore les erreurs sur les formes problématiques
-            print(f"[DEBUG] Erreur lors de l'extraction du texte forme {i}: {e}")
-            continue
-    
-    # Trie par ordre d'apparition et supprime les doublons
-    unique_texts = []
-    for text in texts:
-        if text not in unique_texts:
-            unique_texts.append(text)
-    
-    print(f"[DEBUG] Textes finaux extraits: {unique_texts}")
+def parse_slide_text(slide, index=None):
+    """
+    Extrait tous les textes d'une slide avec une meilleure organisation
+
+    Args:
+        index: SlideTextIndex déjà construit (deck.text_index) pour ne pas relire les formes
+    """
+    with TRACER.span("pptx.slide_text") as span:
+        if index is None:
+            index = SlideTextIndex(slide)
+
+        # Ordre d'apparition, sans doublons ; ignore les textes trop courts
+        unique_texts = index.clean_texts(min_length=3)
+
+        span.set(shapes=index.shape_count, text_shapes=len(index), texts=len(unique_texts))
+        if TRACER.enabled:
+            TRACER.event("pptx.slide_texts", texts=unique_texts)
     return unique_texts
 
 
@@ -60,162 +44,89 @@ def parse_table(slide):
         "shape_types": [],
         "errors": []
     }
-    
-    print(f"[DEBUG] Analyse de la slide - Nombre total de formes: {len(slide.shapes)}")
-    
-    for i, shape in enumerate(slide.shapes):
-        try:
-            shape_type = type(shape).__name__
-            debug_info["shape_types"].append(shape_type)
-            print(f"[DEBUG] Forme {i}: {shape_type}")
-            
-            if hasattr(shape, 'has_table'):
-                print(f"[DEBUG] Forme {i} a l'attribut has_table: {shape.has_table}")
-                
-                if shape.has_table:
-                    debug_info["table_shapes_found"] += 1
-                    print(f"[DEBUG] Tableau trouvé dans la forme {i}")
-                    
-                    try:
-                        table = shape.table
-                        print(f"[DEBUG] Objet table créé avec succès")
-                    except Exception as e:
-                        print(f"[DEBUG] Erreur création objet table: {e}")
-                        debug_info["errors"].append(f"Erreur création table forme {i}: {str(e)}")
-                        continue
-                    
-                    try:
-                        rows_count = len(table.rows)
-                        print(f"[DEBUG] Tableau - Nombre de lignes: {rows_count}")
-                    except Exception as e:
-                        print(f"[DEBUG] Erreur accès table.rows: {e}")
-                        debug_info["errors"].append(f"Erreur accès rows forme {i}: {str(e)}")
-                        continue
-                    
-                    try:
-                        cols_count = len(table.columns)
-                        print(f"[DEBUG] Tableau - Nombre de colonnes: {cols_count}")
-                    except Exception as e:
-                        print(f"[DEBUG] Erreur accès table.columns: {e}")
-                        debug_info["errors"].append(f"Erreur accès columns forme {i}: {str(e)}")
-                        continue
-                    
-                    if not table.rows:
-                        print(f"[DEBUG] Tableau sans lignes - ignoré")
-                        continue
-                    
-                    debug_info["tables_with_rows"] += 1
-                        
-                    # Extraction des en-têtes
-                    headers = []
+
+    with TRACER.span("pptx.parse_table", shapes=debug_info["total_shapes"]) as span:
+        for i, shape in enumerate(slide.shapes):
+            try:
+                debug_info["shape_types"].append(type(shape).__name__)
+
+                if not getattr(shape, 'has_table', False):
+                    continue
+
+                debug_info["table_shapes_found"] += 1
+                try:
+                    table = shape.table
+                    rows_count = len(table.rows)
+                    cols_count = len(table.columns)
+                except Exception as e:
+                    debug_info["errors"].append(f"Erreur accès tableau forme {i}: {str(e)}")
+                    TRACER.event("pptx.table_error", shape=i, error=str(e))
+                    continue
+
+                if TRACER.enabled:
+                    TRACER.event("pptx.table_found", shape=i, rows=rows_count, columns=cols_count)
+                if not rows_count:
+                    continue
+
+                debug_info["tables_with_rows"] += 1
+
+                # Extraction des en-têtes
+                headers = []
+                try:
+                    for j, cell in enumerate(table.rows[0].cells):
+                        try:
+                            cell_text = cell.text if hasattr(cell, 'text') else ""
+                            header_text = clean_text(cell_text) if isinstance(cell_text, str) else ""
+                            headers.append(header_text if header_text else f"Colonne {len(headers) + 1}")
+                        except Exception as e:
+                            headers.append(f"Colonne {len(headers) + 1}")
+                            debug_info["errors"].append(f"Erreur en-tête {j}: {str(e)}")
+                except Exception as e:
+                    debug_info["errors"].append(f"Erreur accès première ligne: {str(e)}")
+                    continue
+
+                # Pas de lignes de données (seulement en-têtes)
+                if rows_count <= 1:
+                    continue
+
+                # Extraction des données : ne garde que les lignes qui ont au moins une donnée
+                rows = []
+                for row_idx in range(1, rows_count):
                     try:
-                        first_row = table.rows[0]
-                        print(f"[DEBUG] Première ligne obtenue, {len(first_row.cells)} cellules")
-                        
-                        for j, cell in enumerate(first_row.cells):
+                        row_data = []
+                        for cell in table.rows[row_idx].cells:
                             try:
-                                print(f"[DEBUG] Traitement en-tête cellule {j}")
-                                cell_text = cell.text if hasattr(cell, 'text') else ""
-                                print(f"[DEBUG] En-tête {j} - Texte brut: '{cell_text}' (type: {type(cell_text)})")
-                                
-                                if isinstance(cell_text, str):
-                                    header_text = clean_text(cell_text)
-                                else:
-                                    header_text = ""
-                                    
-                                headers.append(header_text if header_text else f"Colonne {len(headers) + 1}")
-                                print(f"[DEBUG] En-tête {j}: '{header_text}'")
-                            except Exception as e:
-                                headers.append(f"Colonne {len(headers) + 1}")
-                                print(f"[DEBUG] Erreur en-tête {j}: {e}")
-                                debug_info["errors"].append(f"Erreur en-tête {j}: {str(e)}")
-                    except Exception as e:
-                        print(f"[DEBUG] Erreur accès première ligne: {e}")
-                        debug_info["errors"].append(f"Erreur accès première ligne: {str(e)}")
-                        continue
-                    
-                    # Extraction des données
-                    rows = []
-                    try:
-                        total_data_rows = len(table.rows) - 1
-                        print(f"[DEBUG] Traitement des lignes de données (total: {total_data_rows})")
-                        
-                        if total_data_rows <= 0:
-                            print(f"[DEBUG] Pas de lignes de données (seulement en-têtes)")
-                            continue
+                                raw_text = cell.text if hasattr(cell, 'text') else ""
+                                row_data.append(clean_text(raw_text) if isinstance(raw_text, str) else "")
+                            except Exception:
+                                row_data.append("")
+
+                        if any(cell.strip() for cell in row_data):
+                            rows.append(row_data)
+                        if TRACER.enabled:
+                            TRACER.event("pptx.table_row", shape=i, row=row_idx, cells=row_data)
                     except Exception as e:
-                        print(f"[DEBUG] Erreur calcul nombre lignes données: {e}")
-                        debug_info["errors"].append(f"Erreur calcul lignes données: {str(e)}")
+                        # Ignore les lignes problématiques
+                        debug_info["errors"].append(f"Erreur ligne {row_idx}: {str(e)}")
                         continue
-                    
-                    # Itération directe sur les lignes sans slice
-                    for row_idx in range(1, len(table.rows)):
-                        try:
-                            row = table.rows[row_idx]
-                            row_data = []
-                            print(f"[DEBUG] Traitement ligne {row_idx} avec {len(row.cells)} cellules")
-                            
-                            for cell_idx, cell in enumerate(row.cells):
-                                try:
-                                    raw_text = cell.text if hasattr(cell, 'text') else ""
-                                    print(f"[DEBUG] Ligne {row_idx}, Cellule {cell_idx} - Texte brut: '{raw_text}' (type: {type(raw_text)})")
-                                    
-                                    if isinstance(raw_text, str):
-                                        cell_text = clean_text(raw_text)
-                                        print(f"[DEBUG] Ligne {row_idx}, Cellule {cell_idx} - Texte nettoyé: '{cell_text}'")
-                                    else:
-                                        cell_text = ""
-                                        print(f"[DEBUG] Ligne {row_idx}, Cellule {cell_idx} - Texte non-string converti en vide")
-                                    
-                                    row_data.append(cell_text if cell_text else "")
-                                except Exception as e:
-                                    row_data.append("")
-                                    print(f"[DEBUG] Erreur cellule {row_idx},{cell_idx}: {e}")
-                            
-                            print(f"[DEBUG] Ligne {row_idx} - Données complètes: {row_data}")
-                            
-                            # Ne garde que les lignes qui ont au moins une donnée
-                            has_valid_data = False
-                            for cell in row_data:
-                                if isinstance(cell, str) and cell.strip():
-                                    has_valid_data = True
-                                    print(f"[DEBUG] Ligne {row_idx} - Données valides trouvées: '{cell.strip()}'")
-                                    break
-                            
-                            if has_valid_data:
-                                rows.append(row_data)
-                                print(f"[DEBUG] Ligne {row_idx} ajoutée au résultat")
-                            else:
-                                print(f"[DEBUG] Ligne {row_idx} ignorée (toutes cellules vides)")
-                        except Exception as e:
-                            # Ignore les lignes problématiques
-                            print(f"[DEBUG] Erreur ligne {row_idx}: {e}")
-                            debug_info["errors"].append(f"Erreur ligne {row_idx}: {str(e)}")
-                            continue
-                    
-                    if rows:
-                        debug_info["tables_with_valid_data"] += 1
-                        print(f"[DEBUG] Tableau valide trouvé avec {len(rows)} lignes de données")
-                        
-                        return {
-                            "headers": headers,
-                            "rows": rows,
-                            "total_rows": len(rows),
-                            "total_columns": len(headers),
-                            "debug": debug_info
-                        }
-                    else:
-                        print(f"[DEBUG] Tableau trouvé mais sans données valides")
-            else:
-                print(f"[DEBUG] Forme {i} n'a pas d'attribut has_table")
-        except Exception as e:
-            error_msg = f"Erreur forme {i}: {str(e)}"
-            debug_info["errors"].append(error_msg)
-            print(f"[DEBUG] {error_msg}")
-            continue
-    
-    print(f"[DEBUG] Résumé: {debug_info['table_shapes_found']} tableaux trouvés, {debug_info['tables_with_valid_data']} avec données valides")
-    
+
+                if rows:
+                    debug_info["tables_with_valid_data"] += 1
+                    span.set(table_shape=i, rows=len(rows), columns=len(headers))
+                    return {
+                        "headers": headers,
+                        "rows": rows,
+                        "total_rows": len(rows),
+                        "total_columns": len(headers),
+                        "debug": debug_info
+                    }
+            except Exception as e:
+                debug_info["errors"].append(f"Erreur forme {i}: {str(e)}")
+                TRACER.event("pptx.shape_error", shape=i, error=str(e))
+                continue
+
+        span.set(tables=debug_info["table_shapes_found"], rows=0)
+
     return {
         "headers": [],
         "rows": [],
@@ -248,11 +159,14 @@ def extract_kpis_from_text(texts):
     return kpis
 
 
-def extract_cpfr_data_from_slide31(slide):
+def extract_cpfr_data_from_slide31(slide, index=None):
     """
     Extrait spécifiquement les données CPFR de la slide 31
     Format attendu: KPI principal + variations LY/LW
     Ex: "342K sessions +6% vs LY, -4% vs LW"
+
+    Args:
+        index: SlideTextIndex de la slide, partagé avec l'aperçu structuré
     """
     cpfr_data = {
         'sessions': None,
@@ -289,330 +203,316 @@ def extract_cpfr_data_from_slide31(slide):
     }
     
     # Extraction de tous les textes de la slide
-    texts = parse_slide_text(slide)
-    
-    print(f"[DEBUG] Début extraction CPFR slide 31")
+    texts = parse_slide_text(slide, index)
     
-    for i, text in enumerate(texts):
-        text_lower = text.lower()
-        print(f"[DEBUG] Analyse texte {i}: '{text}'")
-        
-        # SESSIONS avec variations - Pattern: "342K sessions +6% vs LY, -4% vs LW"
-        if 'session' in text_lower:
-            # Extraire la valeur principale
-            session_match = re.search(r'(\d+(?:[\s,\.]\d+)*)\s*k.*session', text_lower)
-            if session_match:
-                try:
-                    value = session_match.group(1).replace(' ', '').replace(',', '').replace('.', '')
-                    if value.isdigit():
-                        cpfr_data['sessions'] = int(value) * 1000
-                        print(f"[DEBUG] Sessions trouvées: {cpfr_data['sessions']}")
-                except:
-                    pass
-            
-            # Extraire les variations LY/LW avec patterns plus précis
-            ly_match = re.search(r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+(?:vs\s+)?ly', text_lower)
-            if ly_match:
-                try:
-                    cpfr_data['vs_ly_sessions'] = float(ly_match.group(1).replace(',', '.')) / 100
-                    print(f"[DEBUG] Sessions vs LY: {cpfr_data['vs_ly_sessions']}")
-                except:
-                    pass
-            
-            lw_match = re.search(r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+(?:vs\s+)?lw', text_lower)
-            if lw_match:
-                try:
-                    cpfr_data['vs_lw_sessions'] = float(lw_match.group(1).replace(',', '.')) / 100
-                    print(f"[DEBUG] Sessions vs LW: {cpfr_data['vs_lw_sessions']}")
-                except:
-                    pass
+    with TRACER.span("pptx.cpfr31_regex", texts=len(texts)) as span:
+        for i, text in enumerate(texts):
+            text_lower = text.lower()
         
-        # REVENUE - traiter séparément la valeur et les variations
-        # Pattern pour la valeur: "2,27M€"
-        if ('€' in text_lower and 'm' in text_lower) and not 'revenue' in text_lower:
-            print(f"[DEBUG] Texte contenant €M (valeur): '{text}'")
-            
-            # Extraire la valeur principale - patterns simples pour capturer 2,27M
-            revenue_patterns = [
-                r'(\d+(?:[,\.]\d+)*)\s*m\s*€',              # "2,27M €"
-                r'(\d+(?:[,\.]\d+)*)\s*m€',                 # "2,27M€"
-                r'€\s*(\d+(?:[,\.]\d+)*)\s*m',              # "€ 2,27M"
-            ]
-            
-            for pattern in revenue_patterns:
-                revenue_match = re.search(pattern, text_lower)
-                if revenue_match:
+            # SESSIONS avec variations - Pattern: "342K sessions +6% vs LY, -4% vs LW"
+            if 'session' in text_lower:
+                # Extraire la valeur principale
+                session_match = re.search(r'(\d+(?:[\s,\.]\d+)*)\s*k.*session', text_lower)
+                if session_match:
                     try:
-                        value = revenue_match.group(1).replace(',', '.')
-                        if value.replace('.', '').isdigit():
-                            new_value = float(value) * 1000000
-                            print(f"[DEBUG] Revenue CANDIDAT: {new_value} (pattern: {pattern}, value: {value})")
-                            # Vérifier si c'est un écrasement
-                            if 'revenue_b2c' in cpfr_data:
-                                print(f"[DEBUG] ATTENTION: Ecrasement revenue_b2c {cpfr_data['revenue_b2c']} par {new_value}")
-                            cpfr_data['revenue_b2c'] = new_value
-                            print(f"[DEBUG] Revenue FINAL: {cpfr_data['revenue_b2c']}")
-                            break
-                    except Exception as e:
-                        print(f"[DEBUG] Erreur parsing revenue: {e}")
-                        continue
-            
-        # REVENUE - traiter les variations LY/LW: "Web B2C Global revenue +11% VS LY -12% VS LW"
-        if 'revenue' in text_lower:
-            print(f"[DEBUG] Texte contenant revenue (variations): '{text}'")
-            # Pattern LY plus flexible - capturer le % directement avant "VS LY"
-            ly_patterns = [
-                r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+vs\s+ly',      # "+11% VS LY"
-                r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+ly',           # "+11% LY"
-                r'vs\s+ly[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',   # "VS LY: +11%"
-                r'ly[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',        # "LY +11%"
-            ]
+                        value = session_match.group(1).replace(' ', '').replace(',', '').replace('.', '')
+                        if value.isdigit():
+                            cpfr_data['sessions'] = int(value) * 1000
+                            TRACER.event("pptx.cpfr31.value", field="sessions", value=cpfr_data['sessions'])
+                    except:
+                        pass
             
-            for pattern in ly_patterns:
-                ly_match = re.search(pattern, text_lower)
+                # Extraire les variations LY/LW avec patterns plus précis
+                ly_match = re.search(r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+(?:vs\s+)?ly', text_lower)
                 if ly_match:
                     try:
-                        cpfr_data['vs_ly_revenue'] = float(ly_match.group(1).replace(',', '.')) / 100
-                        print(f"[DEBUG] Revenue vs LY: {cpfr_data['vs_ly_revenue']} (pattern: {pattern})")
-                        break
-                    except Exception as e:
-                        print(f"[DEBUG] Erreur parsing LY: {e}")
-                        continue
+                        cpfr_data['vs_ly_sessions'] = float(ly_match.group(1).replace(',', '.')) / 100
+                        TRACER.event("pptx.cpfr31.value", field="vs_ly_sessions", value=cpfr_data['vs_ly_sessions'])
+                    except:
+                        pass
             
-            # Pattern LW plus flexible - capturer le % directement avant "VS LW"
-            lw_patterns = [
-                r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+vs\s+lw',      # "-12% VS LW"
-                r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+lw',           # "-12% LW"
-                r'vs\s+lw[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',   # "VS LW: -12%"
-                r'lw[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',        # "LW -12%"
-            ]
-            
-            for pattern in lw_patterns:
-                lw_match = re.search(pattern, text_lower)
+                lw_match = re.search(r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+(?:vs\s+)?lw', text_lower)
                 if lw_match:
                     try:
-                        cpfr_data['vs_lw_revenue'] = float(lw_match.group(1).replace(',', '.')) / 100
-                        print(f"[DEBUG] Revenue vs LW: {cpfr_data['vs_lw_revenue']} (pattern: {pattern})")
-                        break
-                    except Exception as e:
-                        print(f"[DEBUG] Erreur parsing LW: {e}")
-                        continue
+                        cpfr_data['vs_lw_sessions'] = float(lw_match.group(1).replace(',', '.')) / 100
+                        TRACER.event("pptx.cpfr31.value", field="vs_lw_sessions", value=cpfr_data['vs_lw_sessions'])
+                    except:
+                        pass
         
-        # AVERAGE BASKET VALUE - traiter séparément la valeur et les variations
-        # Pattern pour la valeur: "917€"
-        if '€' in text_lower and not 'basket' in text_lower and not 'panier' in text_lower and not 'm' in text_lower:
-            print(f"[DEBUG] Texte contenant € (valeur ABV): '{text}'")
-            
-            # Extraire la valeur principale - patterns pour capturer 917€
-            abv_patterns = [
-                r'(\d+(?:[\s,\.]\d+)*)\s*€',                         # "917€"
-                r'€\s*(\d+(?:[\s,\.]\d+)*)',                         # "€ 917"
-            ]
-            
-            for pattern in abv_patterns:
-                abv_match = re.search(pattern, text_lower)
-                if abv_match:
-                    try:
-                        value = abv_match.group(1).replace(' ', '').replace(',', '.')
-                        if value.replace('.', '').isdigit():
-                            # Vérifier que c'est une valeur cohérente pour un panier moyen (100-2000€)
-                            amount = float(value)
-                            if 100 <= amount <= 2000:
-                                cpfr_data['average_basket_value'] = amount
-                                print(f"[DEBUG] ABV trouvé: {cpfr_data['average_basket_value']} (pattern: {pattern})")
+            # REVENUE - traiter séparément la valeur et les variations
+            # Pattern pour la valeur: "2,27M€"
+            if ('€' in text_lower and 'm' in text_lower) and not 'revenue' in text_lower:
+            
+                # Extraire la valeur principale - patterns simples pour capturer 2,27M
+                revenue_patterns = [
+                    r'(\d+(?:[,\.]\d+)*)\s*m\s*€',              # "2,27M €"
+                    r'(\d+(?:[,\.]\d+)*)\s*m€',                 # "2,27M€"
+                    r'€\s*(\d+(?:[,\.]\d+)*)\s*m',              # "€ 2,27M"
+                ]
+            
+                for pattern in revenue_patterns:
+                    revenue_match = re.search(pattern, text_lower)
+                    if revenue_match:
+                        try:
+                            value = revenue_match.group(1).replace(',', '.')
+                            if value.replace('.', '').isdigit():
+                                new_value = float(value) * 1000000
+                                TRACER.event("pptx.cpfr31.value", field="revenue_b2c", value=new_value, pattern=pattern,
+                                             previous=cpfr_data['revenue_b2c'])
+                                cpfr_data['revenue_b2c'] = new_value
                                 break
-                    except Exception as e:
-                        print(f"[DEBUG] Erreur parsing ABV: {e}")
-                        continue
-            
-        # AVERAGE BASKET VALUE - traiter les variations: "Average basket value -15% VS LY +8% VS LW"
-        if 'basket' in text_lower or 'panier' in text_lower:
-            print(f"[DEBUG] Texte contenant basket/panier (variations): '{text}'")
-            # Extraire les variations LY/LW avec patterns plus robustes
-            # Pattern LY plus flexible - capturer le % directement avant "VS LY"
-            ly_patterns = [
-                r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+vs\s+ly',      # "-15% VS LY"
-                r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+ly',           # "-15% LY"
-                r'vs\s+ly[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',   # "VS LY: -15%"
-                r'ly[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',        # "LY -15%"
-            ]
-            
-            for pattern in ly_patterns:
-                ly_match = re.search(pattern, text_lower)
-                if ly_match:
-                    try:
-                        cpfr_data['vs_ly_abv'] = float(ly_match.group(1).replace(',', '.')) / 100
-                        print(f"[DEBUG] ABV vs LY: {cpfr_data['vs_ly_abv']} (pattern: {pattern})")
-                        break
-                    except Exception as e:
-                        print(f"[DEBUG] Erreur parsing LY: {e}")
-                        continue
+                        except Exception as e:
+                            TRACER.event("pptx.cpfr31.error", field="revenue_b2c", error=str(e))
+                            continue
             
-            # Pattern LW plus flexible - capturer le % directement avant "VS LW"  
-            lw_patterns = [
-                r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+vs\s+lw',      # "+8% VS LW"
-                r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+lw',           # "+8% LW"
-                r'vs\s+lw[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',   # "VS LW: +8%"
-                r'lw[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',        # "LW +8%"
-            ]
+            # REVENUE - traiter les variations LY/LW: "Web B2C Global revenue +11% VS LY -12% VS LW"
+            if 'revenue' in text_lower:
+                # Pattern LY plus flexible - capturer le % directement avant "VS LY"
+                ly_patterns = [
+                    r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+vs\s+ly',      # "+11% VS LY"
+                    r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+ly',           # "+11% LY"
+                    r'vs\s+ly[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',   # "VS LY: +11%"
+                    r'ly[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',        # "LY +11%"
+                ]
+            
+                for pattern in ly_patterns:
+                    ly_match = re.search(pattern, text_lower)
+                    if ly_match:
+                        try:
+                            cpfr_data['vs_ly_revenue'] = float(ly_match.group(1).replace(',', '.')) / 100
+                            TRACER.event("pptx.cpfr31.value", field="vs_ly_revenue", value=cpfr_data['vs_ly_revenue'], pattern=pattern)
+                            break
+                        except Exception as e:
+                            TRACER.event("pptx.cpfr31.error", field="vs_ly_revenue", error=str(e))
+                            continue
             
-            for pattern in lw_patterns:
-                lw_match = re.search(pattern, text_lower)
-                if lw_match:
-                    try:
-                        cpfr_data['vs_lw_abv'] = float(lw_match.group(1).replace(',', '.')) / 100
-                        print(f"[DEBUG] ABV vs LW: {cpfr_data['vs_lw_abv']} (pattern: {pattern})")
-                        break
-                    except Exception as e:
-                        print(f"[DEBUG] Erreur parsing LW: {e}")
-                        continue
+                # Pattern LW plus flexible - capturer le % directement avant "VS LW"
+                lw_patterns = [
+                    r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+vs\s+lw',      # "-12% VS LW"
+                    r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+lw',           # "-12% LW"
+                    r'vs\s+lw[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',   # "VS LW: -12%"
+                    r'lw[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',        # "LW -12%"
+                ]
+            
+                for pattern in lw_patterns:
+                    lw_match = re.search(pattern, text_lower)
+                    if lw_match:
+                        try:
+                            cpfr_data['vs_lw_revenue'] = float(lw_match.group(1).replace(',', '.')) / 100
+                            TRACER.event("pptx.cpfr31.value", field="vs_lw_revenue", value=cpfr_data['vs_lw_revenue'], pattern=pattern)
+                            break
+                        except Exception as e:
+                            TRACER.event("pptx.cpfr31.error", field="vs_lw_revenue", error=str(e))
+                            continue
         
-        # CONVERSION RATE - traiter séparément la valeur et les variations
-        # Pattern pour la valeur: "0,53%"
-        if '%' in text and not 'conversion' in text_lower and not 'taux' in text_lower and not 'basket' in text_lower and not 'panier' in text_lower and not 'session' in text_lower and not 'booking' in text_lower and not 'revenue' in text_lower:
-            print(f"[DEBUG] Texte contenant % (valeur conversion): '{text}'")
-            
-            # Extraire la valeur principale - patterns pour capturer 0,53%
-            conv_patterns = [
-                r'(\d+[,\.]\d+)\s*%',                               # "0,53%"
-                r'(\d+[,\.]\d+)\s*%\s*$',                           # "0,53%" en fin de ligne
-            ]
-            
-            for pattern in conv_patterns:
-                conv_match = re.search(pattern, text_lower)
-                if conv_match:
-                    try:
-                        value = conv_match.group(1).replace(',', '.')
-                        if value.replace('.', '').isdigit():
-                            # Vérifier que c'est une valeur cohérente pour un taux de conversion (0.1% à 5%)
-                            amount = float(value)
-                            if 0.1 <= amount <= 5.0:
-                                cpfr_data['conversion_rate'] = amount / 100
-                                print(f"[DEBUG] Conversion Rate trouvé: {cpfr_data['conversion_rate']} (pattern: {pattern})")
-                                break
-                    except Exception as e:
-                        print(f"[DEBUG] Erreur parsing conversion: {e}")
-                        continue
-            
-        # CONVERSION RATE - traiter les variations: "Conversion rate +12% VS LY -14% VS LW"
-        if 'conversion' in text_lower or 'taux' in text_lower:
-            print(f"[DEBUG] Texte contenant conversion/taux (variations): '{text}'")
-            # Extraire les variations LY/LW avec patterns plus robustes
-            # Pattern LY plus flexible - capturer le % directement avant "VS LY"
-            ly_patterns = [
-                r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+vs\s+ly',      # "+12% VS LY"
-                r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+ly',           # "+12% LY"
-                r'vs\s+ly[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',   # "VS LY: +12%"
-                r'ly[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',        # "LY +12%"
-            ]
-            
-            for pattern in ly_patterns:
-                ly_match = re.search(pattern, text_lower)
-                if ly_match:
-                    try:
-                        cpfr_data['vs_ly_cr'] = float(ly_match.group(1).replace(',', '.')) / 100
-                        print(f"[DEBUG] Conversion vs LY: {cpfr_data['vs_ly_cr']} (pattern: {pattern})")
-                        break
-                    except Exception as e:
-                        print(f"[DEBUG] Erreur parsing LY: {e}")
-                        continue
+            # AVERAGE BASKET VALUE - traiter séparément la valeur et les variations
+            # Pattern pour la valeur: "917€"
+            if '€' in text_lower and not 'basket' in text_lower and not 'panier' in text_lower and not 'm' in text_lower:
+            
+                # Extraire la valeur principale - patterns pour capturer 917€
+                abv_patterns = [
+                    r'(\d+(?:[\s,\.]\d+)*)\s*€',                         # "917€"
+                    r'€\s*(\d+(?:[\s,\.]\d+)*)',                         # "€ 917"
+                ]
+            
+                for pattern in abv_patterns:
+                    abv_match = re.search(pattern, text_lower)
+                    if abv_match:
+                        try:
+                            value = abv_match.group(1).replace(' ', '').replace(',', '.')
+                            if value.replace('.', '').isdigit():
+                                # Vérifier que c'est une valeur cohérente pour un panier moyen (100-2000€)
+                                amount = float(value)
+                                if 100 <= amount <= 2000:
+                                    cpfr_data['average_basket_value'] = amount
+                                    TRACER.event("pptx.cpfr31.value", field="average_basket_value", value=cpfr_data['average_basket_value'], pattern=pattern)
+                                    break
+                        except Exception as e:
+                            TRACER.event("pptx.cpfr31.error", field="average_basket_value", error=str(e))
+                            continue
             
-            # Pattern LW plus flexible - capturer le % directement avant "VS LW"
-            lw_patterns = [
-                r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+vs\s+lw',      # "-14% VS LW"
-                r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+lw',           # "-14% LW"
-                r'vs\s+lw[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',   # "VS LW: -14%"
-                r'lw[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',        # "LW -14%"
-            ]
+            # AVERAGE BASKET VALUE - traiter les variations: "Average basket value -15% VS LY +8% VS LW"
+            if 'basket' in text_lower or 'panier' in text_lower:
+                # Extraire les variations LY/LW avec patterns plus robustes
+                # Pattern LY plus flexible - capturer le % directement avant "VS LY"
+                ly_patterns = [
+                    r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+vs\s+ly',      # "-15% VS LY"
+                    r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+ly',           # "-15% LY"
+                    r'vs\s+ly[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',   # "VS LY: -15%"
+                    r'ly[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',        # "LY -15%"
+                ]
+            
+                for pattern in ly_patterns:
+                    ly_match = re.search(pattern, text_lower)
+                    if ly_match:
+                        try:
+                            cpfr_data['vs_ly_abv'] = float(ly_match.group(1).replace(',', '.')) / 100
+                            TRACER.event("pptx.cpfr31.value", field="vs_ly_abv", value=cpfr_data['vs_ly_abv'], pattern=pattern)
+                            break
+                        except Exception as e:
+                            TRACER.event("pptx.cpfr31.error", field="vs_ly_abv", error=str(e))
+                            continue
             
-            for pattern in lw_patterns:
-                lw_match = re.search(pattern, text_lower)
-                if lw_match:
-                    try:
-                        cpfr_data['vs_lw_cr'] = float(lw_match.group(1).replace(',', '.')) / 100
-                        print(f"[DEBUG] Conversion vs LW: {cpfr_data['vs_lw_cr']} (pattern: {pattern})")
-                        break
-                    except Exception as e:
-                        print(f"[DEBUG] Erreur parsing LW: {e}")
-                        continue
+                # Pattern LW plus flexible - capturer le % directement avant "VS LW"  
+                lw_patterns = [
+                    r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+vs\s+lw',      # "+8% VS LW"
+                    r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+lw',           # "+8% LW"
+                    r'vs\s+lw[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',   # "VS LW: +8%"
+                    r'lw[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',        # "LW +8%"
+                ]
+            
+                for pattern in lw_patterns:
+                    lw_match = re.search(pattern, text_lower)
+                    if lw_match:
+                        try:
+                            cpfr_data['vs_lw_abv'] = float(lw_match.group(1).replace(',', '.')) / 100
+                            TRACER.event("pptx.cpfr31.value", field="vs_lw_abv", value=cpfr_data['vs_lw_abv'], pattern=pattern)
+                            break
+                        except Exception as e:
+                            TRACER.event("pptx.cpfr31.error", field="vs_lw_abv", error=str(e))
+                            continue
         
-        # BOOKINGS - traiter séparément la valeur et les variations
-        # Pattern pour la valeur: "2 475"
-        if text.strip().replace(' ', '').isdigit() and len(text.strip().replace(' ', '')) >= 3 and not any(word in text_lower for word in ['€', '%', 'k', 'm']):
-            print(f"[DEBUG] Texte contenant nombre (valeur bookings): '{text}'")
-            
-            # Extraire la valeur principale - patterns pour capturer 2475 ou "2 475"
-            booking_patterns = [
-                r'(\d+(?:\s+\d+)*)',                            # "2 475" ou "2475"
-                r'(\d{3,5})',                                   # nombre entre 3-5 chiffres
-            ]
-            
-            for pattern in booking_patterns:
-                booking_match = re.search(pattern, text.strip())
-                if booking_match:
-                    try:
-                        value = booking_match.group(1).replace(' ', '')
-                        if value.isdigit():
-                            # Vérifier que c'est une valeur cohérente pour des bookings (100-10000)
-                            amount = int(value)
-                            if 100 <= amount <= 10000:
-                                cpfr_data['nb_bookings'] = amount
-                                print(f"[DEBUG] Bookings trouvés: {cpfr_data['nb_bookings']} (pattern: {pattern})")
-                                break
-                    except Exception as e:
-                        print(f"[DEBUG] Erreur parsing bookings: {e}")
-                        continue
+            # CONVERSION RATE - traiter séparément la valeur et les variations
+            # Pattern pour la valeur: "0,53%"
+            if '%' in text and not 'conversion' in text_lower and not 'taux' in text_lower and not 'basket' in text_lower and not 'panier' in text_lower and not 'session' in text_lower and not 'booking' in text_lower and not 'revenue' in text_lower:
+            
+                # Extraire la valeur principale - patterns pour capturer 0,53%
+                conv_patterns = [
+                    r'(\d+[,\.]\d+)\s*%',                               # "0,53%"
+                    r'(\d+[,\.]\d+)\s*%\s*$',                           # "0,53%" en fin de ligne
+                ]
+            
+                for pattern in conv_patterns:
+                    conv_match = re.search(pattern, text_lower)
+                    if conv_match:
+                        try:
+                            value = conv_match.group(1).replace(',', '.')
+                            if value.replace('.', '').isdigit():
+                                # Vérifier que c'est une valeur cohérente pour un taux de conversion (0.1% à 5%)
+                                amount = float(value)
+                                if 0.1 <= amount <= 5.0:
+                                    cpfr_data['conversion_rate'] = amount / 100
+                                    TRACER.event("pptx.cpfr31.value", field="conversion_rate", value=cpfr_data['conversion_rate'], pattern=pattern)
+                                    break
+                        except Exception as e:
+                            TRACER.event("pptx.cpfr31.error", field="conversion_rate", error=str(e))
+                            continue
             
-        # BOOKINGS - traiter les variations: "Nb of bookings +29% VS LY -18% VS LW"
-        if 'booking' in text_lower or 'réservation' in text_lower:
-            print(f"[DEBUG] Texte contenant booking/réservation (variations): '{text}'")
-            # Extraire les variations LY/LW avec patterns plus robustes
-            # Pattern LY plus flexible - capturer le % directement avant "VS LY"
-            ly_patterns = [
-                r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+vs\s+ly',      # "+29% VS LY"
-                r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+ly',           # "+29% LY"
-                r'vs\s+ly[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',   # "VS LY: +29%"
-                r'ly[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',        # "LY +29%"
-            ]
+            # CONVERSION RATE - traiter les variations: "Conversion rate +12% VS LY -14% VS LW"
+            if 'conversion' in text_lower or 'taux' in text_lower:
+                # Extraire les variations LY/LW avec patterns plus robustes
+                # Pattern LY plus flexible - capturer le % directement avant "VS LY"
+                ly_patterns = [
+                    r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+vs\s+ly',      # "+12% VS LY"
+                    r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+ly',           # "+12% LY"
+                    r'vs\s+ly[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',   # "VS LY: +12%"
+                    r'ly[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',        # "LY +12%"
+                ]
+            
+                for pattern in ly_patterns:
+                    ly_match = re.search(pattern, text_lower)
+                    if ly_match:
+                        try:
+                            cpfr_data['vs_ly_cr'] = float(ly_match.group(1).replace(',', '.')) / 100
+                            TRACER.event("pptx.cpfr31.value", field="vs_ly_cr", value=cpfr_data['vs_ly_cr'], pattern=pattern)
+                            break
+                        except Exception as e:
+                            TRACER.event("pptx.cpfr31.error", field="vs_ly_cr", error=str(e))
+                            continue
             
-            for pattern in ly_patterns:
-                ly_match = re.search(pattern, text_lower)
-                if ly_match:
-                    try:
-                        cpfr_data['vs_ly_bookings'] = float(ly_match.group(1).replace(',', '.')) / 100
-                        print(f"[DEBUG] Bookings vs LY: {cpfr_data['vs_ly_bookings']} (pattern: {pattern})")
-                        break
-                    except Exception as e:
-                        print(f"[DEBUG] Erreur parsing LY: {e}")
-                        continue
+                # Pattern LW plus flexible - capturer le % directement avant "VS LW"
+                lw_patterns = [
+                    r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+vs\s+lw',      # "-14% VS LW"
+                    r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+lw',           # "-14% LW"
+                    r'vs\s+lw[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',   # "VS LW: -14%"
+                    r'lw[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',        # "LW -14%"
+                ]
+            
+                for pattern in lw_patterns:
+                    lw_match = re.search(pattern, text_lower)
+                    if lw_match:
+                        try:
+                            cpfr_data['vs_lw_cr'] = float(lw_match.group(1).replace(',', '.')) / 100
+                            TRACER.event("pptx.cpfr31.value", field="vs_lw_cr", value=cpfr_data['vs_lw_cr'], pattern=pattern)
+                            break
+                        except Exception as e:
+                            TRACER.event("pptx.cpfr31.error", field="vs_lw_cr", error=str(e))
+                            continue
+        
+            # BOOKINGS - traiter séparément la valeur et les variations
+            # Pattern pour la valeur: "2 475"
+            if text.strip().replace(' ', '').isdigit() and len(text.strip().replace(' ', '')) >= 3 and not any(word in text_lower for word in ['€', '%', 'k', 'm']):
+            
+                # Extraire la valeur principale - patterns pour capturer 2475 ou "2 475"
+                booking_patterns = [
+                    r'(\d+(?:\s+\d+)*)',                            # "2 475" ou "2475"
+                    r'(\d{3,5})',                                   # nombre entre 3-5 chiffres
+                ]
+            
+                for pattern in booking_patterns:
+                    booking_match = re.search(pattern, text.strip())
+                    if booking_match:
+                        try:
+                            value = booking_match.group(1).replace(' ', '')
+                            if value.isdigit():
+                                # Vérifier que c'est une valeur cohérente pour des bookings (100-10000)
+                                amount = int(value)
+                                if 100 <= amount <= 10000:
+                                    cpfr_data['nb_bookings'] = amount
+                                    TRACER.event("pptx.cpfr31.value", field="nb_bookings", value=cpfr_data['nb_bookings'], pattern=pattern)
+                                    break
+                        except Exception as e:
+                            TRACER.event("pptx.cpfr31.error", field="nb_bookings", error=str(e))
+                            continue
             
-            # Pattern LW plus flexible - capturer le % directement avant "VS LW"
-            lw_patterns = [
-                r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+vs\s+lw',      # "-18% VS LW"
-                r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+lw',           # "-18% LW"
-                r'vs\s+lw[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',   # "VS LW: -18%"
-                r'lw[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',        # "LW -18%"
-            ]
+            # BOOKINGS - traiter les variations: "Nb of bookings +29% VS LY -18% VS LW"
+            if 'booking' in text_lower or 'réservation' in text_lower:
+                # Extraire les variations LY/LW avec patterns plus robustes
+                # Pattern LY plus flexible - capturer le % directement avant "VS LY"
+                ly_patterns = [
+                    r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+vs\s+ly',      # "+29% VS LY"
+                    r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+ly',           # "+29% LY"
+                    r'vs\s+ly[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',   # "VS LY: +29%"
+                    r'ly[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',        # "LY +29%"
+                ]
+            
+                for pattern in ly_patterns:
+                    ly_match = re.search(pattern, text_lower)
+                    if ly_match:
+                        try:
+                            cpfr_data['vs_ly_bookings'] = float(ly_match.group(1).replace(',', '.')) / 100
+                            TRACER.event("pptx.cpfr31.value", field="vs_ly_bookings", value=cpfr_data['vs_ly_bookings'], pattern=pattern)
+                            break
+                        except Exception as e:
+                            TRACER.event("pptx.cpfr31.error", field="vs_ly_bookings", error=str(e))
+                            continue
             
-            for pattern in lw_patterns:
-                lw_match = re.search(pattern, text_lower)
-                if lw_match:
-                    try:
-                        cpfr_data['vs_lw_bookings'] = float(lw_match.group(1).replace(',', '.')) / 100
-                        print(f"[DEBUG] Bookings vs LW: {cpfr_data['vs_lw_bookings']} (pattern: {pattern})")
-                        break
-                    except Exception as e:
-                        print(f"[DEBUG] Erreur parsing LW: {e}")
-                        continue
+                # Pattern LW plus flexible - capturer le % directement avant "VS LW"
+                lw_patterns = [
+                    r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+vs\s+lw',      # "-18% VS LW"
+                    r'([+-]?\d+(?:[,\.]\d+)*)\s*%\s+lw',           # "-18% LW"
+                    r'vs\s+lw[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',   # "VS LW: -18%"
+                    r'lw[:\s]*([+-]?\d+(?:[,\.]\d+)*)\s*%',        # "LW -18%"
+                ]
+            
+                for pattern in lw_patterns:
+                    lw_match = re.search(pattern, text_lower)
+                    if lw_match:
+                        try:
+                            cpfr_data['vs_lw_bookings'] = float(lw_match.group(1).replace(',', '.')) / 100
+                            TRACER.event("pptx.cpfr31.value", field="vs_lw_bookings", value=cpfr_data['vs_lw_bookings'], pattern=pattern)
+                            break
+                        except Exception as e:
+                            TRACER.event("pptx.cpfr31.error", field="vs_lw_bookings", error=str(e))
+                            continue
         
-        # Extraire tout nombre avec K, M, %, € pour analyse générale
-        all_numbers = re.findall(r'(\d+(?:[,\.]\d+)*)\s*([km%€]?)', text_lower)
-        if all_numbers:
-            print(f"[DEBUG] Tous les nombres trouvés: {all_numbers}")
+            # Tout nombre avec K, M, %, € (analyse générale, uniquement en trace)
+            if TRACER.enabled:
+                TRACER.event("pptx.cpfr31.numbers", text=i,
+                             numbers=re.findall(r'(\d+(?:[,\.]\d+)*)\s*([km%€]?)', text_lower))
     
-    print(f"[DEBUG] === RESULTAT FINAL CPFR ===")
-    print(f"[DEBUG] Revenue final: {cpfr_data.get('revenue_b2c', 'NON DEFINI')}")
-    print(f"[DEBUG] Résultat final CPFR: {cpfr_data}")
+        if TRACER.enabled:
+            span.set(found=sorted(k for k, v in cpfr_data.items() if v not in (None, [])))
     return cpfr_data
 
 
@@ -668,10 +568,13 @@ def extract_cpfr_pptx(path, slide_start=31, slide_end=32):
     """
     Extrait spécifiquement les données CPFR des slides 31 et 32
     et les structure pour l'affichage groupé
+    
+    Args:
+        path: Chemin vers le fichier .pptx ou DeckSession déjà ouverte
     """
     try:
-        prs = Presentation(path)
-        slides = prs.slides
+        deck = open_deck(path)
+        slides = deck.slides
         
         # Validation des indices de slides
         if slide_start < 1 or slide_end < 1:
@@ -688,7 +591,8 @@ def extract_cpfr_pptx(path, slide_start=31, slide_end=32):
         slide32 = slides[slide_end - 1]
         
         # Extraction spécifique CPFR
-        cpfr_data = extract_cpfr_data_from_slide31(slide31)
+        index31 = deck.text_index(slide31)
+        cpfr_data = extract_cpfr_data_from_slide31(slide31, index31)
         table_data = extract_cpfr_data_from_slide32(slide32)
         
         # Fusion des données
@@ -744,7 +648,7 @@ def extract_cpfr_pptx(path, slide_start=31, slide_end=32):
         }
         
         # Ajouter les textes bruts trouvés pour debug - améliorer l'association
-        all_texts = parse_slide_text(slide31)
+        all_texts = index31.clean_texts(min_length=3)
         for text in all_texts:
             text_lower = text.lower()
             
@@ -800,7 +704,7 @@ def extract_pptx(path, slide_start, slide_end):
     Extrait les données d'un fichier PowerPoint
     
     Args:
-        path: Chemin vers le fichier .pptx
+        path: Chemin vers le fichier .pptx ou DeckSession déjà ouverte
         slide_start: Numéro de la slide de début (1-indexed)
         slide_end: Numéro de la slide de fin (1-indexed)
     
@@ -808,8 +712,8 @@ def extract_pptx(path, slide_start, slide_end):
         tuple: (kpis, table_data)
     """
     try:
-        prs = Presentation(path)
-        slides = prs.slides
+        deck = open_deck(path)
+        slides = deck.slides
         
         # Validation des indices de slides
         if slide_start < 1 or slide_end < 1:
@@ -826,7 +730,7 @@ def extract_pptx(path, slide_start, slide_end):
         table_slide = slides[slide_end - 1]
         
         # Extraction des textes
-        raw_texts = parse_slide_text(kpi_slide)
+        raw_texts = parse_slide_text(kpi_slide, deck.text_index(kpi_slide))
         kpis = extract_kpis_from_text(raw_texts)
         
         # Extraction du tableau
@@ -839,22 +743,23 @@ def extract_pptx(path, slide_start, slide_end):
 
 
 def get_slide_info(path):
-    """Retourne des informations sur le fichier PowerPoint"""
+    """Retourne des informations sur le fichier PowerPoint (chemin ou DeckSession)"""
     try:
-        prs = Presentation(path)
+        deck = open_deck(path)
+        core = deck.core_properties
         
         # Conversion des dates en chaînes pour la sérialisation JSON
-        created_date = prs.core_properties.created
-        modified_date = prs.core_properties.modified
+        created_date = core.created
+        modified_date = core.modified
         
         # Conversion en chaîne ISO si la date existe
         created_str = created_date.isoformat() if created_date else None
         modified_str = modified_date.isoformat() if modified_date else None
         
         return {
-            "total_slides": len(prs.slides),
-            "title": prs.core_properties.title or "Sans titre",
-            "author": prs.core_properties.author or "Auteur inconnu",
+            "total_slides": deck.slide_count,
+            "title": core.title or "Sans titre",
+            "author": core.author or "Auteur inconnu",
             "created": created_str,
             "modified": modified_str
         }
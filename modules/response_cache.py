@@ -0,0 +1,98 @@
+"""
+response_cache.py
+
+Cache mémoire des réponses JSON déjà encodées et compressées.
+
+Les API versionnées par data_version (GET /api/v1/*, /cpfr/api/*,
+/api/data-history/initial) renvoient la même réponse tant que les données ne
+changent pas. Le corps JSON est donc conservé tel qu'envoyé, avec ses variantes
+gzip et brotli (si le paquet `brotli` est installé), sous la clé
+(version des données, chemin, paramètres). Une requête répétée est servie sans
+lecture des tables, sans jsonify et sans compression.
+
+Une nouvelle version des données change la clé : les entrées obsolètes ne sont
+jamais resservies et sortent du cache par LRU.
+
+Configuration (variables d'environnement):
+    CPFR_RESPONSE_CACHE_ENTRIES  Nombre maximal de réponses en cache (défaut: 256)
+"""
+
+import gzip
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, NamedTuple, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # variante br indisponible
+    brotli = None
+
+CACHE_MAX_ENTRIES = int(os.environ.get("CPFR_RESPONSE_CACHE_ENTRIES", "256"))
+MAX_BODY_BYTES = 8 * 1024 * 1024   # au-delà, la réponse n'est pas mise en cache
+MIN_COMPRESS_BYTES = 512           # en deçà, la compression ne fait rien gagner
+
+# Par ordre de préférence
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+class CachedResponse(NamedTuple):
+    mimetype: str
+    variants: Dict[str, bytes]  # 'identity', 'gzip', 'br'
+
+
+def encode_variants(body: bytes) -> Dict[str, bytes]:
+    """Corps brut et variantes compressées (si elles sont plus petites)"""
+    variants = {"identity": body}
+    if len(body) >= MIN_COMPRESS_BYTES:
+        candidates = {"gzip": gzip.compress(body, compresslevel=6, mtime=0)}
+        if brotli is not None:
+            candidates["br"] = brotli.compress(body, quality=5)
+        variants.update((name, data) for name, data in candidates.items() if len(data) < len(body))
+    return variants
+
+
+def negotiate(entry: CachedResponse, accept_encodings) -> Tuple[Optional[str], bytes]:
+    """(Content-Encoding, corps) selon Accept-Encoding ; encoding None = non compressé"""
+    for encoding in ENCODINGS:
+        if encoding in entry.variants and accept_encodings[encoding] > 0:
+            return encoding, entry.variants[encoding]
+    return None, entry.variants["identity"]
+
+
+class ResponseCache:
+    """LRU thread-safe de réponses encodées"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, body: bytes, mimetype: str) -> Optional[CachedResponse]:
+        if len(body) > MAX_BODY_BYTES:
+            return None
+        entry = CachedResponse(mimetype, encode_variants(body))  # compression hors verrou
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,227 @@
+"""
+slide_index.py
+
+Index du texte d'une slide, construit en une seule passe sur ses formes puis
+partagé par tous les parsers (cpfr_pptx_parser, cpfr_pptx_parser_acq, pptx_utils).
+
+Pour chaque forme contenant du texte : texte brut (strip), texte replié
+(unidecode + minuscules), index de la forme dans la slide et géométrie.
+Un index inversé mot replié -> formes transforme les recherches du type
+"la forme qui contient 'focus' et 'offer'" en accès dictionnaire.
+
+Stockage compact (table de formes) : la géométrie et les positions des textes
+sont des colonnes parallèles array('q') (8 octets par valeur, pas d'objet par
+forme) et les textes sont concaténés dans deux buffers (brut / replié).
+L'affectation colonne/bande (grid) se fait en une passe sur ces colonnes,
+pour un nombre de colonnes quelconque.
+
+Usage:
+    deck = open_deck("deck.pptx", lite=True)
+    index = deck.text_index(deck.slide(31))   # construit une seule fois par slide
+    entry = index.find("focus", "offer")
+    cols, bands = index.grid(deck.slide_width, deck.slide_height, columns=4)
+"""
+
+import re
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from unidecode import unidecode
+
+from .tracing import TRACER
+
+_TOKEN_RE = re.compile(r"\w+")
+_SPACES_RE = re.compile(r"\s+")
+
+BAND_HEADER, BAND_BODY, BAND_FOOTER = 0, 1, 2
+
+
+def fold(text: str) -> str:
+    """Texte sans accents et en minuscules (comparaisons insensibles)."""
+    return unidecode(text).lower()
+
+
+def _emu(value) -> int:
+    # Forme sans géométrie (xfrm absent et non hérité) : placée à l'origine
+    return int(value) if value is not None else 0
+
+
+class ShapeText:
+    """Vue sur une ligne de la table (aucune donnée copiée)."""
+
+    __slots__ = ("_index", "pos")
+
+    def __init__(self, index: "SlideTextIndex", pos: int):
+        self._index = index
+        self.pos = pos
+
+    @property
+    def shape_idx(self) -> int:
+        return self._index.shape_idx[self.pos]
+
+    @property
+    def text(self) -> str:
+        return self._index.text(self.pos)
+
+    @property
+    def folded(self) -> str:
+        return self._index.folded(self.pos)
+
+    @property
+    def clean(self) -> str:
+        """Texte sur une ligne (espaces multiples et retours à la ligne réduits)."""
+        return _SPACES_RE.sub(" ", self.text)
+
+    @property
+    def left(self) -> int:
+        return self._index.left[self.pos]
+
+    @property
+    def top(self) -> int:
+        return self._index.top[self.pos]
+
+    @property
+    def width(self) -> int:
+        return self._index.width[self.pos]
+
+    @property
+    def height(self) -> int:
+        return self._index.height[self.pos]
+
+    def __repr__(self):
+        return f"ShapeText({self.shape_idx}, {self.text[:30]!r})"
+
+
+class SlideTextIndex:
+    """Formes texte d'une slide (ordre du document) + index inversé des mots repliés."""
+
+    def __init__(self, slide):
+        self.shape_count = 0
+        self.shape_idx = array("q")
+        self.left = array("q")
+        self.top = array("q")
+        self.width = array("q")
+        self.height = array("q")
+        # Texte de la ligne p : buffer[offsets[p]:offsets[p + 1]]
+        self.text_offsets = array("q", [0])
+        self.folded_offsets = array("q", [0])
+        self.tokens: Dict[str, List[int]] = {}
+        self._substring_postings: Dict[str, List[int]] = {}
+        self._entries: Optional[List[ShapeText]] = None
+        self._reading_order: Optional[List[int]] = None
+
+        raw_parts, folded_parts = [], []
+        raw_len = folded_len = 0
+        with TRACER.span("pptx.walk_shapes") as span:
+            for i, sh in enumerate(slide.shapes):
+                self.shape_count += 1
+                text = getattr(sh, "text", None)
+                if not isinstance(text, str):
+                    continue
+                text = text.strip()
+                if not text:
+                    continue
+                pos = len(self.shape_idx)
+                folded = fold(text)
+                self.shape_idx.append(i)
+                self.left.append(_emu(sh.left))
+                self.top.append(_emu(sh.top))
+                self.width.append(_emu(sh.width))
+                self.height.append(_emu(sh.height))
+                raw_parts.append(text)
+                folded_parts.append(folded)
+                raw_len += len(text)
+                folded_len += len(folded)
+                self.text_offsets.append(raw_len)
+                self.folded_offsets.append(folded_len)
+                for token in set(_TOKEN_RE.findall(folded)):
+                    self.tokens.setdefault(token, []).append(pos)
+            span.set(shapes=self.shape_count, text_shapes=len(self.shape_idx))
+
+        self._text = "".join(raw_parts)
+        self._folded = "".join(folded_parts)
+
+    def __len__(self) -> int:
+        return len(self.shape_idx)
+
+    def __iter__(self) -> Iterator[ShapeText]:
+        return iter(self.entries)
+
+    @property
+    def entries(self) -> List[ShapeText]:
+        """Vues ShapeText (créées au premier accès seulement)."""
+        if self._entries is None:
+            self._entries = [ShapeText(self, p) for p in range(len(self))]
+        return self._entries
+
+    def text(self, pos: int) -> str:
+        return self._text[self.text_offsets[pos]:self.text_offsets[pos + 1]]
+
+    def folded(self, pos: int) -> str:
+        return self._folded[self.folded_offsets[pos]:self.folded_offsets[pos + 1]]
+
+    # --- recherche ---
+
+    def _postings(self, word: str) -> List[int]:
+        """Formes contenant `word` (mot replié) dans l'un de leurs mots, mémorisé par mot."""
+        postings = self._substring_postings.get(word)
+        if postings is None:
+            positions = set()
+            for token, token_postings in self.tokens.items():
+                if word in token:
+                    positions.update(token_postings)
+            postings = self._substring_postings[word] = sorted(positions)
+        return postings
+
+    def find_all(self, *needles: str) -> List[ShapeText]:
+        """
+        Formes dont le texte replié contient toutes les sous-chaînes `needles`.
+        Une sous-chaîne d'un seul mot ne peut apparaître qu'à l'intérieur d'un mot :
+        elle est résolue par l'index inversé. Les autres (espaces, ponctuation)
+        sont vérifiées sur les candidats restants.
+        """
+        folded = [fold(n) for n in needles]
+        candidates = None
+        for needle in folded:
+            if _TOKEN_RE.fullmatch(needle):
+                postings = self._postings(needle)
+                if candidates is None:
+                    candidates = postings
+                else:
+                    allowed = set(postings)
+                    candidates = [p for p in candidates if p in allowed]
+        positions = range(len(self)) if candidates is None else candidates
+        return [self.entries[p] for p in positions if all(n in self.folded(p) for n in folded)]
+
+    def find(self, *needles: str) -> Optional[ShapeText]:
+        """Première forme (ordre du document) contenant toutes les sous-chaînes `needles`."""
+        found = self.find_all(*needles)
+        return found[0] if found else None
+
+    def clean_texts(self, min_length: int = 3) -> List[str]:
+        """Textes sur une ligne, dédoublonnés dans l'ordre d'apparition."""
+        cleaned = (_SPACES_RE.sub(" ", self.text(p)) for p in range(len(self)))
+        return list(dict.fromkeys(t for t in cleaned if len(t) >= min_length))
+
+    # --- mise en page ---
+
+    def reading_order(self) -> List[int]:
+        """Positions triées de haut en bas puis de gauche à droite (tri stable, calculé une fois)."""
+        if self._reading_order is None:
+            top, left = self.top, self.left
+            self._reading_order = sorted(range(len(self)), key=lambda p: (top[p], left[p]))
+        return self._reading_order
+
+    def grid(self, slide_width: int, slide_height: int, columns: int = 4,
+             header_pct: float = 0.2, footer_pct: float = 0.8) -> Tuple[array, array]:
+        """
+        Colonne (centre X, `columns` colonnes de même largeur) et bande
+        (BAND_HEADER / BAND_BODY / BAND_FOOTER selon le haut de la forme) de chaque ligne.
+        """
+        col_width = slide_width / float(columns)
+        last_col = columns - 1
+        cols = array("q", (min(max(int((l + w / 2) // col_width), 0), last_col)
+                           for l, w in zip(self.left, self.width)))
+        bands = array("q", (BAND_HEADER if r < header_pct else BAND_FOOTER if r > footer_pct else BAND_BODY
+                            for r in (t / slide_height for t in self.top)))
+        return cols, bands
@@ -0,0 +1,268 @@
+"""
+synthetic_deck.py
+
+Génération de decks CPFR synthétiques (python-pptx) pour les benchmarks et les tests :
+    - slide de résumé "Sum up and main insights" (KPIs, overview, offers, bookings)
+    - slide d'acquisition en 4 colonnes SEA / SEO / OM / CRM (+ lignes "Last update")
+    - slides de remplissage, avec images (bruit PNG incompressible) pour simuler
+      le poids des médias d'un vrai deck
+
+Les valeurs sont tirées au hasard (graine reproductible) ; generate_deck renvoie
+les valeurs attendues après parsing pour vérifier les parsers.
+
+Usage:
+    python -m modules.synthetic_deck out/ --count 12 --slides 10-200 --media-kb 512 --seed 1
+    # -> out/CPFR_2025-01-06.pptx, out/CPFR_2025-01-13.pptx ... (une semaine par deck, prêt pour le backfill)
+"""
+
+import argparse
+import os
+import random
+import struct
+import zlib
+from datetime import date, timedelta
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from pptx import Presentation
+from pptx.util import Inches
+
+SUMMARY_TITLE = "Sum up and main insights"
+ACQUISITION_TITLE = "CPFR LW - Acquisition Channel Analysis"
+CHANNELS = ["SEA", "SEO", "OM", "CRM"]
+
+
+def _noise_png(rng: random.Random, size_kb: int) -> bytes:
+    """PNG RGB de bruit aléatoire d'environ size_kb Ko (ne se compresse pas)."""
+    width = 128
+    height = max(1, size_kb * 1024 // (width * 3))
+    raw = b"".join(b"\x00" + rng.randbytes(width * 3) for _ in range(height))
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b"")
+
+
+def _textbox(slide, left: float, top: float, width: float, height: float, text: str):
+    lines = text.split("\n")
+    frame = slide.shapes.add_textbox(Inches(left), Inches(top), Inches(width), Inches(height)).text_frame
+    frame.text = lines[0]
+    for line in lines[1:]:
+        frame.add_paragraph().text = line
+
+
+def _pct(rng: random.Random, low: int = -30, high: int = 80) -> int:
+    value = 0
+    while value == 0:
+        value = rng.randint(low, high)
+    return value
+
+
+def _fmt_pct(value: int) -> str:
+    return f"{value:+d}%"
+
+
+def _fr_decimal(value: float, digits: int = 2) -> str:
+    return f"{value:.{digits}f}".replace(".", ",")
+
+
+def _thousands(value: int) -> str:
+    return f"{value:,}".replace(",", " ")
+
+
+def random_cpfr_values(rng: random.Random) -> Dict[str, Any]:
+    """Tire un jeu de KPIs cohérent avec les formats des slides."""
+    return {
+        "sessions_k": rng.randint(150, 900),
+        "revenue_m": round(rng.uniform(0.8, 4.5), 2),
+        "abv": rng.randint(500, 1500),
+        "cr": round(rng.uniform(0.2, 1.5), 2),
+        "bookings": rng.randint(1000, 9999),
+        "variations": {kpi: (_pct(rng), _pct(rng)) for kpi in ("sessions", "revenue", "abv", "cr", "bookings")},
+        "best_day_sessions_k": rng.randint(20, 120),
+        "best_day_revenue_k": rng.randint(100, 900),
+        "last_minute": rng.randint(10, 60),
+        "early_booking": rng.randint(5, 40),
+        "months": (rng.randint(20, 50), rng.randint(10, 40), rng.randint(1, 15)),
+        "sea_wow": [_pct(rng) for _ in range(4)],
+        "seo": [(_pct(rng), _pct(rng), _pct(rng)) for _ in range(2)],
+        "om_traffic": (_pct(rng), _pct(rng)),
+        "crm_vs_ly": [_pct(rng) for _ in range(3)],
+        "crm_bookings": rng.randint(50, 500),
+    }
+
+
+def _add_summary_slide(prs, v: Dict[str, Any]):
+    slide = prs.slides.add_slide(prs.slide_layouts[5])
+    slide.shapes.title.text = SUMMARY_TITLE
+    var = {k: f"{_fmt_pct(ly)} VS LY {_fmt_pct(lw)} VS LW" for k, (ly, lw) in v["variations"].items()}
+    _textbox(slide, 0.2, 0.5, 2, 0.5, f"{v['sessions_k']}K Nb of sessions {var['sessions']}")
+    _textbox(slide, 2.5, 0.5, 2.5, 0.5, f"{_fr_decimal(v['revenue_m'])}M€ Web B2C Global revenue {var['revenue']}")
+    _textbox(slide, 5.2, 0.5, 2, 0.5, f"Average basket value {v['abv']}€ {var['abv']}")
+    _textbox(slide, 7.4, 0.5, 2, 0.5, f"Conversion rate {_fr_decimal(v['cr'])}% {var['cr']}")
+    _textbox(slide, 9.6, 0.5, 2, 0.5, f"{_thousands(v['bookings'])} Nb of bookings {var['bookings']}")
+    _textbox(slide, 0.2, 2, 4, 2,
+             "OVERVIEW PERFORMANCES\n"
+             f"Best traffic / revenue day: 14th July with {v['best_day_sessions_k']}K sessions "
+             f"and {v['best_day_revenue_k']}K€")
+    _textbox(slide, 4.5, 2, 4, 2,
+             "FOCUS OFFERS\n"
+             f"{v['last_minute']}% bookings on Last Minute\n"
+             f"{v['early_booking']}% bookings on Early Booking\n"
+             "Summer Flash Sale : 1,4M€ (60% of total revenue), 1,4K booking & 924€ ABV.\n"
+             "Lead gen : 118K€ with 120 bookings")
+    july, august, september = v["months"]
+    _textbox(slide, 8.8, 2, 4, 2,
+             "BOOKINGS DETAILS\n"
+             f"July {july}%, August {august}% & September {september}%\n"
+             "Top dates booked : Jul12, Jul19 & Aug2\n"
+             "Top dates searched : Jul19, Aug9\n"
+             "Top parks booked : BF 22%, BD 15% & LA 13%\n"
+             "Lengths of stay : 2 nights (33%), 3 nights (33%) & 4 nights (19%)")
+
+
+def _add_acquisition_slide(prs, v: Dict[str, Any]):
+    slide = prs.slides.add_slide(prs.slide_layouts[5])
+    slide.shapes.title.text = ACQUISITION_TITLE
+    s_wow = v["sea_wow"]
+    (b_imp, b_clk, b_ctr), (n_imp, n_clk, n_ctr) = v["seo"]
+    om_wow, om_yoy = v["om_traffic"]
+    c_vis, c_book, c_rev = v["crm_vs_ly"]
+    columns = [
+        f"WoW GA4 : Sessions {_fmt_pct(s_wow[0])}, Bookings {_fmt_pct(s_wow[1])}, "
+        f"Revenue {_fmt_pct(s_wow[2])}, Costs {_fmt_pct(s_wow[3])}\n"
+        "CVR vs Last Week : +5% vs LY : +60%\n"
+        "Promo Extension : 120 Bookings\nPmax Asset : 80 Bookings\nSitelink : 45 Bookings",
+        f"Traffic on Brand\nImpressions: {_fmt_pct(b_imp)} (YoY)\nClicks: {_fmt_pct(b_clk)} (YoY)\n"
+        f"CTR: {_fmt_pct(b_ctr)} (YoY)\nAverage Position: 1,2\n"
+        f"Traffic on Non-Brand\nImpressions: {_fmt_pct(n_imp)} (YoY)\nClicks: {_fmt_pct(n_clk)} (YoY)\n"
+        f"CTR: {_fmt_pct(n_ctr)} (YoY)\nAverage Position: 8,4\n"
+        "Top branded request : center parcs, center parc\n"
+        "Top non branded request : location vacances, week end\nTop specific brand : de haan",
+        f"Traffic : {_fmt_pct(om_wow)} (WoW) // {_fmt_pct(om_yoy)} (YoY)\n"
+        "Transaction : +20% (WoW) // +30% (YoY)\nRevenue : +25% (WoW) // +35% (YoY)\n"
+        "Affiliation : Revenue -20% (WoW) / -44% (YoY)\nR-Advertising revenue +68% WoW",
+        f"General: vs LY : {_fmt_pct(c_vis)} visits, {_fmt_pct(c_book)} bookings, {_fmt_pct(c_rev)} revenue\n"
+        "vs LW : +22% visits, +33% bookings, +40% revenue\n"
+        f"Booking : {v['crm_bookings']}\nTurnover : 118k €\nNBR : +16,8% vs LY\nIncremental : 526K€\n"
+        "B2C : Reminder Summer flash sales\nB2B : Petits prix",
+    ]
+    for c, (name, text) in enumerate(zip(CHANNELS, columns)):
+        _textbox(slide, 0.2 + c * 3.3, 2, 3, 4, text)
+        _textbox(slide, 0.2 + c * 3.3, 6.8, 3, 0.4, f"Last update {name} : 15/07")
+
+
+def _add_filler_slide(prs, n: int, image: Optional[bytes]):
+    slide = prs.slides.add_slide(prs.slide_layouts[5])
+    slide.shapes.title.text = f"Slide {n}"
+    _textbox(slide, 1, 2, 6, 2, f"Filler text {n}\nWeekly commentary placeholder")
+    if image:
+        slide.shapes.add_picture(BytesIO(image), Inches(7.5), Inches(2), Inches(4), Inches(3))
+
+
+def expected_payload(v: Dict[str, Any]) -> Dict[str, Any]:
+    """Valeurs que parse_and_validate_cpfr doit extraire du deck généré (sous-ensemble du db_payload)."""
+    summary = {
+        "sessions": v["sessions_k"] * 1000.0,
+        "revenue_b2c": round(v["revenue_m"] * 1_000_000, 2),
+        "average_basket_value": float(v["abv"]),
+        "conversion_rate": round(v["cr"] / 100, 6),
+        "nb_bookings": v["bookings"],
+        "best_day_sessions": v["best_day_sessions_k"] * 1000,
+        "best_day_revenue": v["best_day_revenue_k"] * 1000.0,
+    }
+    for kpi, (ly, lw) in v["variations"].items():
+        summary[f"vs_ly_{kpi}"] = ly / 100
+        summary[f"vs_lw_{kpi}"] = lw / 100
+    (b_imp, b_clk, b_ctr), (n_imp, n_clk, n_ctr) = v["seo"]
+    return {
+        "weekly_summary": summary,
+        "offers_focus": {"last_minute_pct": v["last_minute"] / 100, "early_booking_pct": v["early_booking"] / 100},
+        "SEA": dict(zip(("wow_sessions", "wow_bookings", "wow_revenue", "wow_costs"), (x / 100 for x in v["sea_wow"]))),
+        "OM": {"wow_sessions": v["om_traffic"][0] / 100, "yoy_sessions": v["om_traffic"][1] / 100},
+        "CRM": dict(zip(("yoy_sessions", "yoy_bookings", "yoy_revenue"), (x / 100 for x in v["crm_vs_ly"]))),
+        "seo_brand": {"impressions_yoy": b_imp / 100, "clicks_yoy": b_clk / 100, "ctr_yoy": b_ctr / 100},
+        "seo_non_brand": {"impressions_yoy": n_imp / 100, "clicks_yoy": n_clk / 100, "ctr_yoy": n_ctr / 100},
+    }
+
+
+def generate_deck(path, slides: int = 32, summary_slide: int = 31, acquisition_slide: int = 32,
+                  media_kb: int = 0, seed: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Écrit un deck CPFR synthétique.
+
+    Args:
+        path: Fichier .pptx de sortie (ou objet fichier)
+        slides: Nombre total de slides
+        summary_slide / acquisition_slide: Positions (1-based) des deux slides CPFR
+        media_kb: Poids total approximatif des images réparties sur les slides de remplissage
+        seed: Graine du tirage des valeurs et du bruit des images
+
+    Returns:
+        Valeurs attendues après parsing (voir expected_payload)
+    """
+    if not (1 <= summary_slide <= slides and 1 <= acquisition_slide <= slides) or summary_slide == acquisition_slide:
+        raise ValueError(f"Positions de slides invalides ({summary_slide}, {acquisition_slide}) pour {slides} slides")
+
+    rng = random.Random(seed)
+    values = random_cpfr_values(rng)
+
+    prs = Presentation()
+    prs.slide_width, prs.slide_height = Inches(13.333), Inches(7.5)
+    fillers = slides - 2
+    images = min(fillers, max(1, media_kb // 256)) if media_kb else 0
+    per_image_kb = media_kb // images if images else 0
+
+    filler_no = 0
+    for n in range(1, slides + 1):
+        if n == summary_slide:
+            _add_summary_slide(prs, values)
+        elif n == acquisition_slide:
+            _add_acquisition_slide(prs, values)
+        else:
+            image = _noise_png(rng, per_image_kb) if filler_no < images else None
+            _add_filler_slide(prs, n, image)
+            filler_no += 1
+    prs.save(path)
+    return expected_payload(values)
+
+
+def cpfr_positions(slides: int):
+    """Positions des slides CPFR : 31/32 comme les vrais decks, en fin de deck s'il est plus court."""
+    return (31, 32) if slides >= 32 else (slides - 1, slides)
+
+
+def _slide_range(value: str):
+    low, _, high = value.partition("-")
+    return int(low), int(high or low)
+
+
+def cli(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Génère des decks CPFR synthétiques (une semaine par deck).")
+    ap.add_argument("out_dir", help="Dossier de sortie.")
+    ap.add_argument("--count", type=int, default=1, help="Nombre de decks (défaut: 1).")
+    ap.add_argument("--slides", type=_slide_range, default=(32, 32),
+                    help="Nombre de slides, fixe (32) ou intervalle tiré au hasard (10-200).")
+    ap.add_argument("--media-kb", type=int, default=0, help="Poids des images de remplissage par deck (Ko).")
+    ap.add_argument("--start-week", type=date.fromisoformat, default=date(2025, 1, 6),
+                    help="Lundi de la première semaine (défaut: 2025-01-06).")
+    ap.add_argument("--seed", type=int, default=None, help="Graine (decks reproductibles).")
+    args = ap.parse_args(argv)
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    rng = random.Random(args.seed)
+    for i in range(args.count):
+        slides = rng.randint(*args.slides)
+        summary, acquisition = cpfr_positions(slides)
+        week = args.start_week + timedelta(weeks=i)
+        path = Path(args.out_dir) / f"CPFR_{week.isoformat()}.pptx"
+        generate_deck(path, slides, summary, acquisition, args.media_kb, rng.randrange(2 ** 32))
+        print(f"{path} ({slides} slides, {path.stat().st_size // 1024} Ko)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(cli())
@@ -0,0 +1,156 @@
+"""
+tracing.py
+
+Traces structurées des parsers et de l'ingestion, sans coût quand elles sont désactivées.
+
+    - span(name, **attrs) : bloc chronométré (ouverture du deck, parcours des formes,
+      parsing d'un tableau, étape regex, écriture en base...)
+    - event(name, **attrs) : événement ponctuel (ancien print [DEBUG])
+
+Désactivé (défaut), span() renvoie un contexte vide partagé et les appels
+event() sont protégés par `if TRACER.enabled:` dans les boucles chaudes : ni
+formatage, ni écriture sur stdout. Activé, chaque span/événement est sérialisé
+en JSON dans un buffer circulaire en mémoire (les plus anciens sont écrasés).
+
+Configuration (variables d'environnement):
+    CPFR_TRACE           1 pour activer au démarrage (défaut: désactivé)
+    CPFR_TRACE_CAPACITY  Taille du buffer circulaire (défaut: 5000 événements)
+
+Usage:
+    from modules.tracing import TRACER
+
+    with TRACER.span("pptx.parse_table", slide=32):
+        ...
+        if TRACER.enabled:
+            TRACER.event("pptx.table_row", row=i, cells=len(row))
+
+    TRACER.enable(); ...; TRACER.events()
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+DEFAULT_CAPACITY = int(os.environ.get("CPFR_TRACE_CAPACITY", "5000"))
+
+
+class _NullSpan:
+    """Contexte vide partagé, renvoyé quand le traçage est désactivé."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """Bloc chronométré ; émis à la sortie du contexte."""
+
+    __slots__ = ("tracer", "name", "attrs", "span_id", "parent_id", "_t0", "_ts")
+
+    def __init__(self, tracer: "Tracer", name: str, attrs: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.span_id = next(tracer._ids)
+        self.parent_id = None
+
+    def set(self, **attrs):
+        """Ajoute des attributs connus en cours de span (nombre de lignes, etc.)."""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = self.tracer._stack()
+        self.parent_id = stack[-1] if stack else None
+        stack.append(self.span_id)
+        self._ts = time.time()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration_ms = (time.perf_counter() - self._t0) * 1000
+        self.tracer._stack().pop()
+        record = {"type": "span", "name": self.name, "ts": self._ts, "dur_ms": round(duration_ms, 3),
+                  "span_id": self.span_id, "parent_id": self.parent_id}
+        if exc_type is not None:
+            record["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer._emit(record, self.attrs)
+        return False
+
+
+class Tracer:
+    """Point d'entrée unique (TRACER) : spans, événements et buffer circulaire."""
+
+    def __init__(self, enabled: bool = False, capacity: int = DEFAULT_CAPACITY):
+        self.enabled = enabled
+        self._buffer: deque = deque(maxlen=capacity)
+        self._ids = itertools.count(1)
+        self._local = threading.local()
+
+    def enable(self, capacity: Optional[int] = None):
+        if capacity is not None and capacity != self._buffer.maxlen:
+            self._buffer = deque(self._buffer, maxlen=capacity)
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def span(self, name: str, **attrs):
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, attrs)
+
+    def event(self, name: str, **attrs):
+        if not self.enabled:
+            return
+        stack = self._stack()
+        self._emit({"type": "event", "name": name, "ts": time.time(),
+                    "parent_id": stack[-1] if stack else None}, attrs)
+
+    def _stack(self) -> List[int]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _emit(self, record: Dict[str, Any], attrs: Dict[str, Any]):
+        record["pid"] = os.getpid()
+        record["thread"] = threading.current_thread().name
+        if attrs:
+            record["attrs"] = attrs
+        # deque.append est atomique : pas de verrou nécessaire entre threads
+        self._buffer.append(json.dumps(record, ensure_ascii=False, default=str))
+
+    # --- lecture du buffer ---
+
+    def events(self, name_prefix: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Événements du buffer (plus anciens d'abord), filtrés par préfixe de nom."""
+        records = [json.loads(line) for line in list(self._buffer)]
+        if name_prefix:
+            records = [r for r in records if r["name"].startswith(name_prefix)]
+        if limit is not None:
+            records = records[-limit:]
+        return records
+
+    def dump(self) -> str:
+        """Contenu du buffer en NDJSON (une ligne JSON par événement)."""
+        return "\n".join(list(self._buffer))
+
+    def clear(self):
+        self._buffer.clear()
+
+
+TRACER = Tracer(enabled=os.environ.get("CPFR_TRACE", "") not in ("", "0"))
@@ -0,0 +1,217 @@
+"""
+xlsx_writer.py
+
+Écriture en flux de classeurs XLSX (Office Open XML), sans dépendance externe.
+
+Le classeur est produit par zipfile sur un tampon non seekable : chaque ligne
+est sérialisée en XML directement dans la partie de la feuille (compressée au
+fil de l'eau), et les octets produits sont rendus dès qu'ils sont disponibles.
+La mémoire reste constante quel que soit le nombre de lignes, et le premier
+octet part avant que la première requête SQL ne soit terminée.
+
+Les chaînes sont écrites en ligne (inlineStr) : pas de table sharedStrings à
+garder en mémoire. Les dates sont converties en numéros de série Excel.
+
+Usage:
+    sheets = [Sheet('SEA', ['Semaine', 'Sessions WoW'], ['date', 'percentage'], rows)]
+    for chunk in stream_xlsx(sheets):
+        response.write(chunk)
+"""
+
+import math
+import re
+import zipfile
+from datetime import date, datetime
+from typing import Any, Iterable, Iterator, List, NamedTuple, Optional, Sequence
+from xml.sax.saxutils import escape
+
+# Formats de nombre Excel (mêmes conventions que format_number / format_currency / format_percentage)
+NUMBER_FORMATS = {
+    'number': '[>=1000000]0.0,,"M";[>=1000]0.0,"K";0',
+    'currency': '[>=1000000]0.0,,"M€";[>=1000]0.0,"K€";0"€"',
+    'percentage': '+0.0%;-0.0%;0.0%',
+    'date': 'yyyy-mm-dd',
+}
+_STYLE_IDS = {kind: i + 1 for i, kind in enumerate(NUMBER_FORMATS)}  # 0 : style par défaut
+
+_EXCEL_EPOCH = date(1899, 12, 30)
+_INVALID_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_SHEET_NAME = re.compile(r'[\[\]:*?/\\]')
+
+
+class Sheet(NamedTuple):
+    """Une feuille : nom, en-têtes, format par colonne (clé de NUMBER_FORMATS ou None), lignes (itérable paresseux)"""
+    name: str
+    columns: Sequence[str]
+    formats: Sequence[Optional[str]]
+    rows: Iterable[Sequence[Any]]
+
+
+class _Sink:
+    """Tampon en écriture seule (ni seek ni relecture) : zipfile passe en mode flux."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._offset = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _cell(value: Any, style: int) -> str:
+    if value is None or value == '':
+        return '<c/>'
+    s = f' s="{style}"' if style else ''
+    if isinstance(value, bool):
+        return f'<c t="b"{s}><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        if isinstance(value, float) and not math.isfinite(value):
+            return '<c/>'
+        return f'<c{s}><v>{value!r}</v></c>'
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return f'<c{s}><v>{(value - _EXCEL_EPOCH).days}</v></c>'
+    text = escape(_INVALID_XML.sub('', str(value)))
+    return f'<c t="inlineStr"{s}><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _row(values: Sequence[Any], styles: Sequence[int]) -> str:
+    return '<row>' + ''.join(_cell(v, st) for v, st in zip(values, styles)) + '</row>'
+
+
+def _sheet_names(sheets: Sequence[Sheet]) -> List[str]:
+    """Noms valides pour Excel : 31 caractères, sans []:*?/\\, uniques"""
+    names: List[str] = []
+    for sheet in sheets:
+        base = _SHEET_NAME.sub('_', sheet.name)[:31] or 'Sheet'
+        name, n = base, 1
+        while name.lower() in (existing.lower() for existing in names):
+            n += 1
+            name = f"{base[:31 - len(str(n)) - 1]}_{n}"
+        names.append(name)
+    return names
+
+
+def _workbook_parts(names: Sequence[str]):
+    sheets_xml = ''.join(
+        f'<sheet name="{escape(name, {chr(34): "&quot;"})}" sheetId="{i}" r:id="rId{i}"/>'
+        for i, name in enumerate(names, 1)
+    )
+    overrides = ''.join(
+        f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+        f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        for i in range(1, len(names) + 1)
+    )
+    sheet_rels = ''.join(
+        f'<Relationship Id="rId{i}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        f'Target="worksheets/sheet{i}.xml"/>'
+        for i in range(1, len(names) + 1)
+    )
+    num_fmts = ''.join(
+        f'<numFmt numFmtId="{163 + style}" formatCode="{escape(NUMBER_FORMATS[kind], {chr(34): "&quot;"})}"/>'
+        for kind, style in _STYLE_IDS.items()
+    )
+    xfs = ''.join(
+        f'<xf numFmtId="{163 + style}" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        for style in _STYLE_IDS.values()
+    )
+    ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    rel_ns = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+    return {
+        '[Content_Types].xml': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            f'{overrides}</Types>'
+        ),
+        '_rels/.rels': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="xl/workbook.xml"/></Relationships>'
+        ),
+        'xl/workbook.xml': (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><workbook {ns} {rel_ns}>'
+            f'<sheets>{sheets_xml}</sheets></workbook>'
+        ),
+        'xl/_rels/workbook.xml.rels': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'{sheet_rels}<Relationship Id="rId{len(names) + 1}" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+            '</Relationships>'
+        ),
+        'xl/styles.xml': (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><styleSheet {ns}>'
+            f'<numFmts count="{len(_STYLE_IDS)}">{num_fmts}</numFmts>'
+            '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+            '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+            '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+            '<fill><patternFill patternType="gray125"/></fill></fills>'
+            '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+            '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+            f'<cellXfs count="{len(_STYLE_IDS) + 2}">'
+            f'<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>{xfs}'
+            '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+            '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+            '</styleSheet>'
+        ),
+    }
+
+
+def stream_xlsx(sheets: Sequence[Sheet], flush_rows: int = 500) -> Iterator[bytes]:
+    """
+    Produit le classeur morceau par morceau. Les lignes de chaque feuille ne sont
+    consommées qu'au moment de l'écrire ; les octets compressés sont rendus toutes
+    les `flush_rows` lignes.
+    """
+    sink = _Sink()
+    header_style = len(_STYLE_IDS) + 1
+    names = _sheet_names(sheets)
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for part, xml in _workbook_parts(names).items():
+            archive.writestr(part, xml)
+        yield sink.drain()
+
+        for i, sheet in enumerate(sheets, 1):
+            styles = [_STYLE_IDS.get(kind, 0) for kind in sheet.formats]
+            with archive.open(f'xl/worksheets/sheet{i}.xml', 'w', force_zip64=True) as part:
+                part.write(
+                    b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                    b'<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" '
+                    b'activePane="bottomLeft" state="frozen"/></sheetView></sheetViews><sheetData>'
+                )
+                part.write(_row(sheet.columns, [header_style] * len(sheet.columns)).encode('utf-8'))
+                buffered = []
+                for row in sheet.rows:
+                    buffered.append(_row(row, styles))
+                    if len(buffered) >= flush_rows:
+                        part.write(''.join(buffered).encode('utf-8'))
+                        buffered.clear()
+                        data = sink.drain()
+                        if data:
+                            yield data
+                part.write(''.join(buffered).encode('utf-8'))
+                part.write(b'</sheetData></worksheet>')
+            yield sink.drain()
+    yield sink.drain()
@@ -15,6 +15,170 @@ def test_history_get(tmp_path, monkeypatch):
     test_db = tmp_path / "test.db"
     monkeypatch.setattr(database, "DB_PATH", test_db)
     database.init_db()
+    database.insert_record("deck.pptx", 31, 32, ["Sessions: 342K", "Revenue: 2.27M€", "Bookings: 17.5K"],
+                           {"headers": [], "rows": []})
     client = app.test_client()
     response = client.get('/history')
     assert response.status_code == 200
+    assert "KPIs extraits (aperçu)" in response.get_data(as_text=True)
+    assert "+1 autres KPIs" in response.get_data(as_text=True)
+    for limit in (0, -1):
+        assert client.get(f'/history?limit={limit}').status_code == 200
+        page = client.get(f'/api/history?limit={limit}')
+        assert page.status_code == 200 and len(page.get_json()) == 1
+
+
+def test_api_conditional_get(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "test.db")
+    database.init_db()
+    client = app.test_client()
+
+    first = client.get('/api/v1/weeks')
+    assert first.status_code == 200 and first.headers['ETag'] and first.headers['Last-Modified']
+    etag = first.headers['ETag']
+    assert client.get('/api/v1/weeks', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/cpfr/api/weekly-summary', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/api/v1/weeks', headers={'If-Modified-Since': first.headers['Last-Modified']}).status_code == 304
+    assert 'ETag' not in client.get('/api/v1/jobs').headers
+
+    database.ingest_weekly_data({"week_start_date": "2025-07-14", "weekly_summary": {"sessions": 1000}})
+    changed = client.get('/api/v1/weeks', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+
+
+def test_data_history_save_batches_cells(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "test.db")
+    database.init_db()
+    week_id = database.ingest_weekly_data({
+        "week_start_date": "2025-07-14", "weekly_summary": {"sessions": 1000, "nb_bookings": 10},
+    })["week_id"]
+    key = f"week_{week_id}"
+    changes = [
+        {"section": "SLIDE_31_GLOBAL", "metric": "Sessions", "week_id": key, "value": "342K"},
+        {"section": "SLIDE_31_GLOBAL", "metric": "Sessions vs LW", "week_id": key, "value": "-4%"},
+        {"section": "SEA", "metric": "Sessions WoW", "week_id": key, "value": "+12%"},
+        {"section": "SEO_DETAIL", "metric": "Brand Avg Position", "week_id": key, "value": "1.5"},
+        {"section": "SLIDE_31_GLOBAL", "metric": "Unknown", "week_id": key, "value": "1"},
+        {"section": "SLIDE_31_GLOBAL", "metric": "Sessions", "week_id": "week_999", "value": "1"},
+    ]
+    body = app.test_client().post('/api/data-history/save', json={"changes": changes, "client_id": "page-1"}).get_json()
+
+    assert [r["status"] for r in body["results"]] == ["updated", "updated", "inserted", "inserted", "error", "error"]
+    assert body["updated_count"] == 4 and len(body["errors"]) == 2
+    with database.get_connection() as conn:
+        assert conn.execute("SELECT sessions, vs_lw_sessions, nb_bookings FROM weekly_summary").fetchone() == (342000, -0.04, 10)
+        assert conn.execute("SELECT wow_sessions FROM acquisition_channels").fetchone() == (0.12,)
+        assert conn.execute("SELECT segment, avg_position FROM channel_seo_detail").fetchone() == ("brand", 1.5)
+    event = database.get_events_since(0)[-1]
+    assert event["type"] == "cells_edited" and event["data"]["client_id"] == "page-1"
+    pivot = app.test_client().get('/api/data-history/initial').get_json()["data"]
+    assert pivot["SLIDE_31_GLOBAL"]["Sessions"][key] == "342.0K"
+
+
+def test_data_history_initial_window_follows_from_and_to(tmp_path, monkeypatch):
+    from datetime import date, timedelta
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "test.db")
+    database.init_db()
+    for i in range(40):
+        week = (date(2025, 1, 6) + timedelta(weeks=i)).isoformat()
+        database.ingest_weekly_data({"week_start_date": week, "weekly_summary": {"sessions": 1000 + i}})
+    client = app.test_client()
+
+    body = client.get('/api/data-history/initial?to=2025-03-05&weeks=4').get_json()
+    assert [w["startDate"] for w in body["weeks"]] == ["2025-03-03", "2025-02-24", "2025-02-17", "2025-02-10"]
+    assert {w["status"] for w in body["weeks"]} == {"archived"}
+    assert body["data"]["SLIDE_31_GLOBAL"]["Sessions"][body["weeks"][0]["id"]] == "1.0K"
+
+    body = client.get('/api/data-history/initial?from=2025-01-06&to=2025-01-20').get_json()
+    assert [w["startDate"] for w in body["weeks"]] == ["2025-01-20", "2025-01-13", "2025-01-06"]
+    assert len(client.get('/api/data-history/initial?from=2025-01-06').get_json()["weeks"]) == 40
+
+    assert client.get('/api/data-history/initial?from=bad').status_code == 400
+    assert client.get('/api/data-history/initial?from=2025-03-03&to=2025-01-06').status_code == 400
+    assert client.get('/api/data-history/initial?from=2020-01-06').status_code == 400
+
+
+def test_events_stream_replays_since_last_event_id(tmp_path, monkeypatch):
+    import handlers.routes as routes_module
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "test.db")
+    monkeypatch.setattr(routes_module, "EVENTS_MAX_DURATION", 0.05)
+    monkeypatch.setattr(routes_module, "EVENTS_POLL_INTERVAL", 0.01)
+    database.init_db()
+    week_id = database.ingest_weekly_data({"week_start_date": "2025-07-14", "weekly_summary": {"sessions": 1000}})["week_id"]
+    database.insert_acquisition_channel({"week_start_date": "2025-07-14", "channel_code": "SEA", "wow_sessions": 0.1})
+
+    response = app.test_client().get('/api/v1/events', headers={'Last-Event-ID': '0'})
+    assert response.mimetype == 'text/event-stream' and 'ETag' not in response.headers
+    body = response.get_data(as_text=True)
+    assert 'id: 1\nevent: week_ingested\n' in body and 'id: 2\nevent: cells_edited\n' in body
+    assert f'"week_ids": [{week_id}]' in body and '"sections": ["SEA"]' in body
+    assert '"sections": ["SLIDE_31_GLOBAL"]' in body
+
+
+def test_data_history_export_streams_filtered_rows(tmp_path, monkeypatch):
+    import csv
+    import gzip
+    import io
+    import json
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "test.db")
+    database.init_db()
+    for week, sessions in (("2025-07-07", 1000), ("2025-07-14", 2000)):
+        database.ingest_weekly_data({"week_start_date": week, "weekly_summary": {"sessions": sessions},
+                                     "acquisition_channels": [{"channel_code": "SEA", "wow_sessions": 0.1}]})
+    client = app.test_client()
+
+    response = client.get('/api/data-history/export/csv?from=2025-07-10&sections=SLIDE_31_GLOBAL',
+                          headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip' and response.is_streamed
+    rows = list(csv.reader(io.StringIO(gzip.decompress(response.data).decode())))
+    assert rows[0] == ['week_start_date', 'week_label', 'section', 'metric', 'value', 'display']
+    assert ['2025-07-14', '2025-W29', 'SLIDE_31_GLOBAL', 'Sessions', '2000.0', '2.0K'] in rows
+    assert {row[0] for row in rows[1:]} == {'2025-07-14'}
+
+    lines = client.get('/api/data-history/export/ndjson?dataset=acquisition_channels&sections=SEA').data.splitlines()
+    assert [json.loads(line)['channel_code'] for line in lines] == ['SEA', 'SEA']
+    assert client.get('/api/data-history/export/ndjson?dataset=sqlite_master').status_code == 400
+
+    import zipfile
+    workbook = zipfile.ZipFile(io.BytesIO(client.get('/api/data-history/export/xlsx?sections=SEA,SEO').data))
+    assert '<sheet name="SEA" sheetId="1"' in workbook.read('xl/workbook.xml').decode()
+    assert workbook.read('xl/worksheets/sheet1.xml').decode().count('<row>') == 3  # en-tête + 2 semaines
+
+    for query in ('format=csv&from=bad', 'from=2025-07-14&to=2025-07-07', 'sections=', 'sections=NOPE',
+                  'dataset=weekly_summary&sections=SEA', 'dataset=acquisition_channels&sections=SLIDE_31_GLOBAL'):
+        assert client.get(f'/api/data-history/export/xlsx?{query}').status_code == 400, query
+    response = client.get('/api/data-history/export/csv?from=2025-07-14&to=2025-07-14')
+    assert response.headers['Content-Disposition'] == 'attachment; filename="cpfr_history_2025-07-14_2025-07-14.csv"'
+
+
+def test_versioned_json_served_from_encoded_cache(tmp_path, monkeypatch):
+    import gzip
+    import handlers.routes as routes_module
+    from modules.response_cache import ResponseCache
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "test.db")
+    monkeypatch.setattr(routes_module, "RESPONSE_CACHE", ResponseCache())
+    database.init_db()
+    from datetime import date, timedelta
+    for i in range(12):
+        week = (date(2025, 5, 5) + timedelta(weeks=i)).isoformat()
+        database.ingest_weekly_data({"week_start_date": week, "weekly_summary": {"sessions": 1000}})
+    client = app.test_client()
+
+    first = client.get('/api/v1/weeks?limit=10')
+    monkeypatch.setattr(routes_module, "get_weeks", lambda limit: pytest.fail("tables relues"))
+    again = client.get('/api/v1/weeks?limit=10')
+    assert again.data == first.data and again.headers['ETag'] == first.headers['ETag']
+    assert 'Accept-Encoding' in again.headers['Vary']
+
+    compressed = client.get('/api/v1/weeks?limit=10', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == first.data
+    assert compressed.headers['ETag'] != first.headers['ETag']
+    for etag in (first.headers['ETag'], compressed.headers['ETag']):
+        revalidated = client.get('/api/v1/weeks?limit=10', headers={'If-None-Match': etag, 'Accept-Encoding': 'gzip'})
+        assert revalidated.status_code == 304 and revalidated.headers['ETag'] == etag
+
+    # Nouvelle version des données : nouvelle clé, la vue est rappelée
+    database.ingest_weekly_data({"week_start_date": "2025-08-25", "weekly_summary": {"sessions": 1000}})
+    with pytest.raises(pytest.fail.Exception):
+        client.get('/api/v1/weeks?limit=10')
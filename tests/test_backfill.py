@@ -0,0 +1,18 @@
+from datetime import date
+
+from modules.backfill import collect_files, week_from_filename
+
+
+def test_week_from_filename():
+    assert week_from_filename("CPFR_2025-07-16.pptx") == date(2025, 7, 14)
+    assert week_from_filename("CPFR 20250714 final.pptx") == date(2025, 7, 14)
+    assert week_from_filename("cpfr 16.07.2025.pptx") == date(2025, 7, 14)
+    assert week_from_filename("CPFR_W29_2025.pptx") == date(2025, 7, 14)
+    assert week_from_filename("2025-W29.pptx") == date(2025, 7, 14)
+    assert week_from_filename("CPFR final v2.pptx") is None
+
+
+def test_collect_files_skips_lock_files(tmp_path):
+    for name in ("a.pptx", "~$a.pptx", "notes.txt"):
+        (tmp_path / name).write_bytes(b"")
+    assert collect_files([str(tmp_path)]) == [str(tmp_path / "a.pptx")]
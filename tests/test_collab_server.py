@@ -0,0 +1,150 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("websockets")
+pycrdt = pytest.importorskip("pycrdt")
+
+import modules.database as database
+from modules import collab_server
+
+
+async def _sync_client(url):
+    from websockets.asyncio.client import connect
+    doc = pycrdt.Doc()
+    websocket = await connect(url)
+    await websocket.send(pycrdt.create_sync_message(doc))
+
+    async def receive(timeout=1.0):
+        message = await asyncio.wait_for(websocket.recv(), timeout)
+        reply = pycrdt.handle_sync_message(message[1:], doc)
+        if reply is not None:
+            await websocket.send(reply)
+        return message
+
+    return doc, websocket, receive
+
+
+def test_relay_broadcasts_and_persists_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "test.db")
+    monkeypatch.setattr(collab_server, "FLUSH_INTERVAL", 60)
+    monkeypatch.setattr(collab_server.compactor, "ensure_started", lambda: True)
+    database.init_db()
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        stop, started = loop.create_future(), loop.create_future()
+        server = asyncio.create_task(collab_server.run("127.0.0.1", 0, stop, started))
+        url = f"ws://127.0.0.1:{await started}/doc-1"
+        alice, alice_ws, alice_recv = await _sync_client(url)
+        bob, bob_ws, bob_recv = await _sync_client(url)
+        for receive in (alice_recv, alice_recv, bob_recv, bob_recv):
+            await receive()  # SYNC_STEP1 du relais + SYNC_STEP2 en réponse
+
+        text = alice.get("cells", type=pycrdt.Text)
+        updates = []
+        alice.observe(lambda event: updates.append(event.update))
+        for char in "342K":
+            text += char
+        for update in updates:
+            await alice_ws.send(pycrdt.create_update_message(update))
+        for _ in updates:
+            await bob_recv()
+        assert str(bob.get("cells", type=pycrdt.Text)) == "342K"
+
+        assert database.get_document_updates_since("doc-1", 0) is None  # rien d'écrit avant le flush
+        await alice_ws.close()
+        await bob_ws.close()
+        await asyncio.sleep(0.1)  # dernier client parti : flush de la salle
+        stop.set_result(None)
+        await server
+
+    asyncio.run(scenario())
+    persisted = database.get_document_updates_since("doc-1", 0)
+    assert len(persisted["updates"]) == 1  # 4 mises à jour, une seule écriture
+    restored = pycrdt.Doc()
+    restored.apply_update(persisted["updates"][0]["update"])
+    assert str(restored.get("cells", type=pycrdt.Text)) == "342K"
+
+
+def test_failed_room_load_does_not_block_later_clients(tmp_path, monkeypatch):
+    from websockets.asyncio.client import connect
+    from websockets.exceptions import ConnectionClosed
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "test.db")
+    monkeypatch.setattr(collab_server.compactor, "ensure_started", lambda: True)
+    database.init_db()
+    load = collab_server.Room.load
+    calls = []
+
+    async def flaky_load(room):
+        calls.append(room.doc_id)
+        if len(calls) == 1:
+            await asyncio.sleep(0.05)  # le second client attend la même salle
+            raise ValueError("état corrompu")
+        await load(room)
+
+    monkeypatch.setattr(collab_server.Room, "load", flaky_load)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        stop, started = loop.create_future(), loop.create_future()
+        server = asyncio.create_task(collab_server.run("127.0.0.1", 0, stop, started))
+        url = f"ws://127.0.0.1:{await started}/doc-1"
+
+        async def first_message():
+            async with connect(url) as websocket:
+                try:
+                    return await asyncio.wait_for(websocket.recv(), 1.0)
+                except ConnectionClosed as e:
+                    return e.rcvd.code
+
+        assert await asyncio.gather(first_message(), first_message()) == [1011, 1011]
+        # Salle libérée : un nouveau client recharge le document
+        assert isinstance(await first_message(), bytes) and calls == ["doc-1", "doc-1"]
+        stop.set_result(None)
+        await server
+
+    asyncio.run(scenario())
+
+
+def test_client_joining_during_final_flush_sees_flushed_updates(tmp_path, monkeypatch):
+    import time
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "test.db")
+    monkeypatch.setattr(collab_server, "FLUSH_INTERVAL", 60)
+    monkeypatch.setattr(collab_server.compactor, "ensure_started", lambda: True)
+    database.init_db()
+    append = database.append_document_update
+
+    def slow_append(*args, **kwargs):
+        time.sleep(0.2)  # flush final lent : le nouveau client arrive pendant l'écriture
+        return append(*args, **kwargs)
+
+    monkeypatch.setattr(database, "append_document_update", slow_append)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        stop, started = loop.create_future(), loop.create_future()
+        server = asyncio.create_task(collab_server.run("127.0.0.1", 0, stop, started))
+        url = f"ws://127.0.0.1:{await started}/doc-1"
+
+        alice, alice_ws, alice_recv = await _sync_client(url)
+        await alice_recv()
+        await alice_recv()
+        updates = []
+        alice.observe(lambda event: updates.append(event.update))
+        alice.get("cells", type=pycrdt.Text).insert(0, "342K")
+        await alice_ws.send(pycrdt.create_update_message(updates[0]))
+        await asyncio.sleep(0.05)
+        await alice_ws.close()
+        await asyncio.sleep(0.05)  # flush final en cours
+
+        bob, bob_ws, bob_recv = await _sync_client(url)
+        await bob_recv(timeout=2.0)
+        await bob_recv(timeout=2.0)
+        assert str(bob.get("cells", type=pycrdt.Text)) == "342K"
+        await bob_ws.close()
+        await asyncio.sleep(0.1)
+        stop.set_result(None)
+        await server
+
+    asyncio.run(scenario())
@@ -0,0 +1,42 @@
+import pytest
+
+from modules.cpfr_patterns import PATTERNS, PatternRegistry
+from modules.cpfr_pptx_parser_acq import _parse_crm_block, _parse_om_block, _parse_seo_block
+
+
+def test_registry_counts_calls_and_hits():
+    registry = PatternRegistry()
+    p = registry.register("t.pct", r"([+-]?\d+)%")
+    assert registry.register("t.pct", r"([+-]?\d+)%") is p
+    with pytest.raises(ValueError):
+        registry.register("t.pct", r"\d+")
+
+    assert p.findall("+6% VS LY, -2% VS LW") == ["+6", "-2"]
+    assert p.search("no figure") is None
+    stats = registry.stats()[0]
+    assert (stats["name"], stats["calls"], stats["hits"]) == ("t.pct", 2, 1)
+
+    other = PatternRegistry()
+    other.register("t.pct", r"([+-]?\d+)%")
+    other.merge(registry.counters())
+    assert other["t.pct"].calls == 2
+    registry.reset_stats()
+    assert registry.stats() == []
+
+
+def test_seo_brand_and_non_brand_sections():
+    seo = _parse_seo_block(
+        "Traffic on Brand\nImpressions: +5% (YoY)\nClicks: +3% (YoY)\nCTR: -2% (YoY)\nAverage Position: 1,2\n"
+        "Traffic on Non-Brand\nImpressions: +20% (YoY)\nClicks: +13% (YoY)\nCTR: -1% (YoY)\nAverage Position: 8,4"
+    )
+    assert seo["brand"] == {"impressions_yoy": 0.05, "clicks_yoy": 0.03, "ctr_yoy": -0.02, "avg_position": 1.2}
+    assert seo["non_brand"] == {"impressions_yoy": 0.2, "clicks_yoy": 0.13, "ctr_yoy": -0.01, "avg_position": 8.4}
+
+
+def test_single_group_percent_patterns():
+    om = _parse_om_block("R-Advertising : Revenue +68% WoW")
+    assert om["campaign_notes"] == [{"campaign_name": "R-Advertising", "note": "Flash sale & LM activations"}]
+    crm = _parse_crm_block("Strategic JU25: Booking : +32.4% vs LY ; NBR : +16.8% vs LY")
+    assert crm["strategic_booking_yoy"] == pytest.approx(0.324)
+    assert crm["strategic_nbr_yoy"] == pytest.approx(0.168)
+    assert PATTERNS["crm.strategic_nbr_yoy"].hits >= 1
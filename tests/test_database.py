@@ -0,0 +1,161 @@
+import sqlite3
+
+import modules.database as database
+
+
+def _payload(week="2025-07-14", channel_code="SEA"):
+    return {
+        "week_start_date": week,
+        "weekly_summary": {"sessions": 342000, "revenue_b2c": 2270000.0, "nb_bookings": 2475},
+        "acquisition_channels": [{"channel_code": channel_code, "wow_sessions": -0.07}],
+        "channel_seo_detail": [{"segment": "brand", "impressions_yoy": 0.05, "avg_position": 1.2}],
+        "channel_campaign_notes": [{"channel_code": "SEA", "campaign_name": "Sitelink", "metric_bookings": 45}],
+    }
+
+
+def _count(table):
+    with sqlite3.connect(database.DB_PATH) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_ingest_is_idempotent(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "test.db")
+    database.init_db()
+
+    for _ in range(2):
+        assert database.ingest_weekly_data(_payload())["success"]
+
+    assert _count("weekly_summary") == 1
+    assert _count("acquisition_channels") == 1
+    assert _count("channel_seo_detail") == 1
+    # Les notes de la semaine sont remplacées, pas dupliquées
+    assert _count("channel_campaign_notes") == 1
+
+
+def test_ingest_is_all_or_nothing(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "test.db")
+    database.init_db()
+
+    result = database.ingest_weekly_data(_payload(channel_code="UNKNOWN"))
+    assert not result["success"]
+    assert _count("dim_week") == 0
+    assert _count("weekly_summary") == 0
+
+
+def test_connection_reused_per_thread_with_pragmas(tmp_path, monkeypatch):
+    import threading
+
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "test.db")
+    conn = database.get_connection()
+    assert database.get_connection() is conn
+    assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(database.get_connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+
+def test_latest_snapshot_follows_writes(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "test.db")
+    database.init_db()
+    assert database.get_latest_weekly_data()["weekly_summary"] is None
+
+    database.ingest_weekly_data(_payload("2025-07-07"))
+    database.ingest_weekly_data(_payload("2025-07-14"))
+    latest = database.get_latest_weekly_data()
+    assert latest["weekly_summary"]["week_start_date"] == "2025-07-14"
+    assert latest["weekly_summary"]["sessions"] == "342K"
+    assert [c["channel_code"] for c in latest["acquisition_channels"]] == ["SEA"]
+
+    database.insert_weekly_summary({"week_start_date": "2025-07-14", "sessions": 500000})
+    assert database.get_latest_weekly_data()["weekly_summary"]["sessions"] == "500K"
+    assert _count("latest_week_snapshot") == 1
+
+
+def test_data_history_pivot_is_maintained_per_week(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "test.db")
+    database.init_db()
+    database.ingest_weekly_data(_payload("2025-07-07"))
+    week_b = database.ingest_weekly_data(_payload("2025-07-14"))["week_id"]
+    database.insert_weekly_summary({"week_start_date": "2025-07-14", "sessions": 500000})
+
+    values = {(section, metric, week): value for section, metric, week, value in database.get_data_history_values()}
+    assert values[("SLIDE_31_GLOBAL", "Sessions", "2025-07-14")] == 500000
+    assert values[("SLIDE_31_GLOBAL", "Sessions", "2025-07-07")] == 342000
+    assert database.format_pivot_value("SEA", "Sessions WoW", values[("SEA", "Sessions WoW", "2025-07-07")]) == "-7.0%"
+    assert database.format_pivot_value("SEO_DETAIL", "Brand Avg Position",
+                                       values[("SEO_DETAIL", "Brand Avg Position", "2025-07-07")]) == "1"
+    with database.get_connection() as conn:
+        assert conn.execute("SELECT display FROM data_history_pivot WHERE week_id = ? AND metric = 'Sessions'"
+                            " AND section = 'SLIDE_31_GLOBAL'", (week_b,)).fetchone() == ("500.0K",)
+
+    filtered = database.get_data_history_values(date_from="2025-07-10", sections=["SEA"])
+    assert {(section, week) for section, _, week, _ in filtered} == {("SEA", "2025-07-14")}
+
+
+def test_document_update_log_and_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "test.db")
+    database.init_db()
+    for i in range(3):
+        assert database.append_document_update("doc-1", b"u%d" % i, client_id="alice") == i + 1
+
+    since = database.get_document_updates_since("doc-1", 1)
+    assert since["state"] is None
+    assert [(u["seq"], u["update"]) for u in since["updates"]] == [(2, b"u1"), (3, b"u2")]
+
+    assert database.documents_to_compact(3) == ["doc-1"]
+    assert database.compact_document("doc-1", lambda *updates: b"".join(updates)) == 3
+    database.append_document_update("doc-1", b"u3")
+
+    # Un client en retard repart de l'état compacté, un client à jour ne lit que le delta
+    behind = database.get_document_updates_since("doc-1", 1)
+    assert behind["state"] == b"u0u1u2" and behind["state_seq"] == 3
+    assert [u["seq"] for u in behind["updates"]] == [4]
+    assert database.get_document_updates_since("doc-1", 3)["state"] is None
+    assert database.get_document_updates_since("missing") is None
+
+
+def test_document_versions_rebuild_from_snapshots(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "test.db")
+    database.init_db()
+    concat = lambda *parts: b"".join(parts)
+    for i in range(1, 26):
+        database.append_document_update("doc-1", b"%02d" % i)
+    assert database.compact_document("doc-1", concat, snapshot_every=5) == 25
+
+    assert database.get_document_version("doc-1", 7, concat) == b"01020304050607"
+    assert database.get_document_version("doc-1", 26, concat) is None
+    history = database.get_document_history("doc-1", limit=3)
+    assert [(v["version"], v["snapshot"]) for v in history] == [(25, True), (24, False), (23, False)]
+
+    # Rétention : 2 snapshots complets (20, 25), au-delà un snapshot sur 2 (seq multiple de 10)
+    database.prune_document_history("doc-1", keep_snapshots=2, thin_every=2, snapshot_every=5)
+    assert database.get_document_version("doc-1", 22, concat) == concat(*(b"%02d" % i for i in range(1, 23)))
+    assert database.get_document_version("doc-1", 10, concat) == concat(*(b"%02d" % i for i in range(1, 11)))
+    assert database.get_document_version("doc-1", 7, concat) is None
+    assert database.get_document_version("doc-1", 15, concat) is None
+
+
+def test_history_keyset_pagination_uses_precomputed_summary(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "test.db")
+    database.init_db()
+    for i in range(5):
+        kpis = [f"Sessions: {i}", "Revenue: 2.27M€", "Bookings: 17.5K"][: i % 3 + 1]
+        database.insert_record(f"deck_{i}.pptx", 31, 32, kpis, {"headers": ["a"], "rows": [["1"]] * i})
+
+    page = database.get_history(limit=2)
+    assert [item["filename"] for item in page] == ["deck_4.pptx", "deck_3.pptx"]
+    assert page[0]["kpi_count"] == 2 and page[0]["row_count"] == 4 and "table_data" not in page[0]
+    older = database.get_history(limit=2, before_id=page[-1]["id"])
+    assert [item["filename"] for item in older] == ["deck_2.pptx", "deck_1.pptx"]
+    assert older[0]["kpi_preview"] == ["Sessions: 2", "Revenue: 2.27M€"]  # 3 KPIs, 2 en aperçu
+
+    # Lignes antérieures au résumé : calculé par init_db
+    with sqlite3.connect(database.DB_PATH) as conn:
+        conn.execute("UPDATE extractions SET kpi_count = NULL, row_count = NULL, kpi_preview = NULL")
+    database.init_db()
+    assert database.get_history(limit=1)[0]["kpi_count"] == 2
+    assert database.get_history(limit=5, before_id=older[0]["id"])[0]["row_count"] == 1
@@ -0,0 +1,41 @@
+from datetime import date
+
+import numpy as np
+
+from modules.history_engine import back_calculate, build_timeline, chain_back
+
+nan = np.nan
+
+
+def test_chain_back_stops_at_unknown_variation():
+    values = np.array([[100.0, nan, nan, nan, 50.0, nan]])
+    factors = np.array([[0.5, 0.5, nan, 0.5, 2.0, 1.0]])
+    assert np.allclose(chain_back(values, factors), [[100.0, 50.0, 25.0, nan, 50.0, 100.0]], equal_nan=True)
+
+
+def test_back_calculate_uses_last_year_offset():
+    values = np.full((1, 60), nan)
+    values[0, 0] = 110.0
+    vs_lw = np.full((1, 60), nan)
+    vs_ly = np.full((1, 60), nan)
+    vs_ly[0, 0] = 0.10
+    vs_lw[0, 52] = 0.0
+    filled = back_calculate(values, vs_lw, vs_ly)
+    assert np.isclose(filled[0, 52], 100.0) and np.isclose(filled[0, 53], 100.0)
+    assert np.isnan(filled[0, 1]) and np.isnan(filled[0, 54])
+
+
+def test_build_timeline_is_deterministic_and_keeps_real_values():
+    rows = [
+        ("SLIDE_31_GLOBAL", "Sessions", "2025-07-14", 342000.0),
+        ("SLIDE_31_GLOBAL", "Sessions", "2025-06-30", 300000.0),
+        ("SLIDE_31_GLOBAL", "Sessions vs LW", "2025-07-14", -0.05),
+        ("SEA", "Sessions WoW", "2025-07-14", -0.07),
+    ]
+    first = build_timeline(rows, date(2025, 7, 14), weeks=4)
+    dates, keys, values, inferred = first
+    assert dates[1] == date(2025, 7, 7)
+    assert keys == [("SLIDE_31_GLOBAL", "Sessions"), ("SLIDE_31_GLOBAL", "Sessions vs LW"), ("SEA", "Sessions WoW")]
+    assert np.isclose(values[0, 1], 360000.0) and values[0, 2] == 300000.0 and np.isnan(values[0, 3])
+    assert inferred[0].tolist() == [False, True, False, False]
+    assert np.array_equal(build_timeline(rows, date(2025, 7, 14), weeks=4)[2], values, equal_nan=True)
@@ -0,0 +1,165 @@
+from pptx import Presentation
+from pptx.util import Inches
+
+import modules.database as database
+import modules.jobs as jobs
+from app import app
+
+
+def _make_deck(path):
+    prs = Presentation()
+    summary = prs.slides.add_slide(prs.slide_layouts[6])
+    box = summary.shapes.add_textbox(Inches(0.2), Inches(0.5), Inches(3), Inches(1))
+    box.text_frame.text = "342K Nb of sessions +6% VS LY -4% VS LW"
+    prs.slides.add_slide(prs.slide_layouts[6])
+    prs.save(path)
+
+
+def test_job_lifecycle(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "test.db")
+    database.init_db()
+    deck = tmp_path / "deck.pptx"
+    _make_deck(deck)
+
+    assert database.create_job("job1", str(deck), "deck.pptx", 1, 2, "2025-07-14")
+    assert database.get_job("job1")["status"] == "queued"
+
+    # Exécution directe dans le processus de test (sans pool)
+    assert jobs.run_cpfr_job("job1", str(database.DB_PATH))["status"] == "done"
+    job = database.get_job("job1")
+    assert job["status"] == "done"
+    assert job["parse_ms"] is not None and job["ingest_ms"] is not None
+    assert job["result"]["week_start_date"] == "2025-07-14"
+    assert not deck.exists()
+
+    # Un job déjà terminé n'est jamais repris
+    assert jobs.run_cpfr_job("job1", str(database.DB_PATH))["status"] == "skipped"
+
+    client = app.test_client()
+    assert client.get('/api/v1/jobs/job1').get_json()["status"] == "done"
+    assert client.get('/api/v1/jobs/unknown').status_code == 404
+    assert [j["id"] for j in client.get('/api/v1/jobs?status=done').get_json()] == ["job1"]
+
+
+def test_identical_deck_served_from_parse_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "test.db")
+    database.init_db()
+    deck = tmp_path / "deck.pptx"
+    _make_deck(deck)
+    sha256 = jobs.file_sha256(str(deck))
+    content = deck.read_bytes()
+    deck_copy = tmp_path / "copy.pptx"
+    deck_copy.write_bytes(content)
+
+    assert database.create_job("first", str(deck), "deck.pptx", 1, 2, "2025-07-14", sha256)
+    jobs.run_cpfr_job("first", str(database.DB_PATH))
+    assert database.get_job("first")["result"].get("cached") is None
+
+    # Même contenu, même plage de slides : pas de re-parsing, mais ingestion pour la semaine demandée
+    assert database.create_job("second", str(deck_copy), "copy.pptx", 1, 2, "2025-07-21", sha256)
+    assert jobs.run_cpfr_job("second", str(database.DB_PATH))["status"] == "done"
+    result = database.get_job("second")["result"]
+    assert result["cached"] is True and result["week_start_date"] == "2025-07-21"
+    assert result["inserted"] and database.get_job("second")["parse_ms"] == 0
+    assert sorted(w["week_start_date"] for w in database.get_weeks()) == ["2025-07-14", "2025-07-21"]
+
+    # Un ré-import du même deck restaure les valeurs éditées depuis
+    query = "SELECT ws.sessions FROM weekly_summary ws JOIN dim_week w ON w.id = ws.week_id WHERE w.week_start_date = ?"
+    with database.get_connection() as conn:
+        sessions = conn.execute(query, ("2025-07-14",)).fetchone()[0]
+        conn.execute("UPDATE weekly_summary SET sessions = 1")
+        conn.commit()
+    deck_copy.write_bytes(content)
+    assert database.create_job("third", str(deck_copy), "copy.pptx", 1, 2, "2025-07-14", sha256)
+    assert jobs.run_cpfr_job("third", str(database.DB_PATH))["status"] == "done"
+    with database.get_connection() as conn:
+        assert conn.execute(query, ("2025-07-14",)).fetchone()[0] == sessions
+
+
+def test_only_jobs_of_dead_workers_are_requeued(tmp_path, monkeypatch):
+    import os
+    import subprocess
+    import sys
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "test.db")
+    database.init_db()
+    finished = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                              capture_output=True, text=True, check=True)
+    dead_pid = int(finished.stdout)
+
+    for job_id in ("alive", "dead", "silent"):
+        assert database.create_job(job_id, str(tmp_path / f"{job_id}.pptx"), "deck.pptx", 1, 2)
+    database.claim_job("alive", os.getpid())
+    database.claim_job("dead", dead_pid)
+    database.claim_job("silent", os.getpid())
+    with database.get_connection() as conn:
+        conn.execute("UPDATE cpfr_jobs SET heartbeat_at = datetime('now', '-1 hour') WHERE id = 'silent'")
+        conn.commit()
+
+    # Un import lent mais vivant (heartbeat récent) n'est pas repris
+    assert sorted(database.requeue_stale_jobs(120)) == ["dead", "silent"]
+    assert database.get_job("alive")["status"] == "running"
+    assert database.get_job("dead")["worker_pid"] is None
+    assert jobs.SPOOL_DIR.is_absolute()
+
+
+def test_broken_pool_is_recreated_then_job_failed(tmp_path, monkeypatch):
+    import io
+    from concurrent.futures import Future
+    from concurrent.futures.process import BrokenProcessPool
+    from types import SimpleNamespace
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "test.db")
+    monkeypatch.setattr(jobs, "SPOOL_DIR", tmp_path / "spool")
+    database.init_db()
+
+    submitted = []
+
+    class Pool:
+        def __init__(self, broken):
+            self.broken = broken
+
+        def submit(self, fn, *args):
+            if self.broken:
+                raise BrokenProcessPool("worker tué")
+            submitted.append(args[0])
+            return Future()
+
+        def shutdown(self, wait=True, cancel_futures=False):
+            pass
+
+    # Pool cassé (workers tués) : recréé, le job est soumis au nouveau pool
+    pools = iter([Pool(True), Pool(False)])
+    monkeypatch.setattr(jobs, "get_executor", lambda: next(pools))
+    job_id = jobs.enqueue_cpfr_job(SimpleNamespace(stream=io.BytesIO(b"deck")), "deck.pptx", 1, 2)
+    assert submitted == [job_id] and database.get_job(job_id)["status"] == "queued"
+
+    # Toujours cassé : job en échec, fichier du spool supprimé
+    monkeypatch.setattr(jobs, "get_executor", lambda: Pool(True))
+    assert jobs.enqueue_cpfr_job(SimpleNamespace(stream=io.BytesIO(b"deck")), "deck.pptx", 1, 2) is None
+    failed = database.list_jobs("failed")
+    assert len(failed) == 1 and not (tmp_path / "spool" / f"{failed[0]['id']}.pptx").exists()
+    assert [p.name for p in (tmp_path / "spool").iterdir()] == [f"{job_id}.pptx"]
+
+
+def test_monitor_resubmits_queued_and_abandoned_jobs_once(tmp_path, monkeypatch):
+    from concurrent.futures import Future
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "test.db")
+    database.init_db()
+    futures = {}
+
+    class Pool:
+        def submit(self, fn, job_id, db_path):
+            futures[job_id] = Future()
+            return futures[job_id]
+
+    monkeypatch.setattr(jobs, "get_executor", lambda: Pool())
+    monkeypatch.setattr(jobs, "_submitted", set())
+    assert database.create_job("before-restart", str(tmp_path / "a.pptx"), "a.pptx", 1, 2)
+    assert database.create_job("dead-worker", str(tmp_path / "b.pptx"), "b.pptx", 1, 2)
+    database.claim_job("dead-worker", 2 ** 22 + 1)  # au-delà de pid_max : processus inexistant
+
+    assert sorted(jobs.resubmit_pending_jobs()) == ["before-restart", "dead-worker"]
+    assert database.get_job("dead-worker")["status"] == "queued"
+    # Déjà soumis par ce processus : pas de doublon au passage suivant
+    assert jobs.resubmit_pending_jobs() == []
+    futures["before-restart"].set_result(None)
+    assert jobs.resubmit_pending_jobs() == ["before-restart"]
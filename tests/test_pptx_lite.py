@@ -0,0 +1,60 @@
+import pytest
+from pptx import Presentation
+from pptx.util import Inches
+
+from modules.pptx_deck import DeckSession, open_deck
+from modules.pptx_lite import LiteDeck
+
+
+@pytest.fixture
+def deck_path(tmp_path):
+    prs = Presentation()
+    prs.slide_width = Inches(13.333)
+    prs.slide_height = Inches(7.5)
+    prs.core_properties.title = "CPFR W29"
+    for i in range(3):
+        slide = prs.slides.add_slide(prs.slide_layouts[5])
+        slide.shapes.title.text = f"Slide {i + 1}"
+        box = slide.shapes.add_textbox(Inches(1), Inches(2), Inches(4), Inches(1))
+        box.text_frame.text = "342K Nb of sessions"
+        box.text_frame.add_paragraph().text = "+6% VS LY"
+    table = prs.slides[2].shapes.add_table(2, 2, Inches(6), Inches(2), Inches(4), Inches(1)).table
+    table.cell(0, 0).text = "KPI"
+    table.cell(1, 0).text = "Sessions"
+    path = tmp_path / "deck.pptx"
+    prs.save(path)
+    return path
+
+
+def _shape_view(slide):
+    return [
+        (getattr(sh, "text", None), sh.left, sh.top, sh.width, sh.height, sh.has_table)
+        for sh in slide.shapes
+    ]
+
+
+def test_lite_deck_matches_python_pptx(deck_path):
+    full = open_deck(deck_path)
+    lite = open_deck(str(deck_path), lite=True)
+    assert isinstance(full, DeckSession) and isinstance(lite, LiteDeck)
+
+    assert lite.slide_count == full.slide_count == 3
+    assert (lite.slide_width, lite.slide_height) == (full.slide_width, full.slide_height)
+    assert lite.core_properties.title == "CPFR W29"
+    for n in range(1, 4):
+        # Le titre hérite sa géométrie du layout : doit être identique
+        assert _shape_view(lite.slide(n)) == _shape_view(full.slide(n))
+
+    lite_table = [sh for sh in lite.slide(3).shapes if sh.has_table][0].table
+    assert [c.text for c in lite_table.rows[1].cells] == ["Sessions", ""]
+    assert lite.find_slide_by_title("slide 2") is lite.slide(2)
+    with pytest.raises(ValueError):
+        lite.slide(4)
+
+
+def test_lite_deck_context_manager_closes_zip(deck_path):
+    with open_deck(str(deck_path), lite=True) as deck:
+        assert deck.slide(1).shapes.title.text == "Slide 1"
+    assert deck._zip.fp is None
+    with open_deck(str(deck_path)) as deck:
+        assert isinstance(deck, DeckSession) and deck.slide(1).shapes.title.text == "Slide 1"
@@ -0,0 +1,60 @@
+from pptx import Presentation
+from pptx.util import Inches
+
+from modules.cpfr_pptx_parser_acq import _collect_slide_text_by_grid
+from modules.pptx_deck import open_deck
+from modules.slide_index import SlideTextIndex
+
+
+def _deck(tmp_path):
+    prs = Presentation()
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    for i, text in enumerate(["FOCUS OFFERS\nLast Minute 12%", "Bookings  details", "Détails réservations", "  "]):
+        slide.shapes.add_textbox(Inches(1), Inches(1 + i), Inches(4), Inches(1)).text_frame.text = text
+    path = tmp_path / "deck.pptx"
+    prs.save(path)
+    return path
+
+
+def test_index_lookups_match_substring_semantics(tmp_path):
+    deck = open_deck(str(_deck(tmp_path)), lite=True)
+    index = deck.text_index(deck.slide(1))
+    assert deck.text_index(deck.slide(1)) is index
+
+    assert [e.shape_idx for e in index] == [0, 1, 2]
+    assert index.find("focus", "offer").text.startswith("FOCUS OFFERS")
+    assert index.find("booking", "detail").shape_idx == 1
+    assert index.find("details reservations").shape_idx == 2
+    assert index.find("focus", "booking") is None
+    assert index.find_all("detail") == [index.entries[1], index.entries[2]]
+    assert index.clean_texts() == ["FOCUS OFFERS Last Minute 12%", "Bookings details", "Détails réservations"]
+    assert "reservations" in index.tokens
+
+
+def test_index_geometry_matches_python_pptx(tmp_path):
+    path = _deck(tmp_path)
+    full, lite = open_deck(path), open_deck(str(path), lite=True)
+    view = lambda idx: [(e.text, e.left, e.top, e.width, e.height) for e in idx]
+    assert view(SlideTextIndex(full.slide(1))) == view(lite.text_index(lite.slide(1)))
+
+
+def test_grid_assigns_any_number_of_columns(tmp_path):
+    prs = Presentation()
+    prs.slide_width, prs.slide_height = Inches(12), Inches(10)
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    # (left, top) en pouces, largeur 1 pouce
+    for left, top, text in [(0.5, 5, "A body"), (10.5, 1, "C header"), (4.5, 9, "B footer"), (0.5, 3, "A first")]:
+        slide.shapes.add_textbox(Inches(left), Inches(top), Inches(1), Inches(1)).text_frame.text = text
+    path = tmp_path / "grid.pptx"
+    prs.save(path)
+
+    deck = open_deck(str(path), lite=True)
+    index = deck.text_index(deck.slide(1))
+    cols, bands = index.grid(deck.slide_width, deck.slide_height, columns=3)
+    assert list(cols) == [0, 2, 1, 0]
+    assert list(bands) == [1, 0, 2, 1]
+    assert list(index.grid(deck.slide_width, deck.slide_height, columns=6)[0]) == [0, 5, 2, 0]
+    assert [index.text(p) for p in index.reading_order()] == ["C header", "A first", "A body", "B footer"]
+
+    grid = _collect_slide_text_by_grid(index, deck.slide_width, deck.slide_height, columns=3)
+    assert grid == {(2, 0): "C header", (0, 1): "A first\nA body", (1, 2): "B footer"}
@@ -0,0 +1,33 @@
+import pytest
+
+from modules.benchmark import BENCHMARKS, compare, run_benchmarks
+from modules.cpfr_unified_parser import parse_and_validate_cpfr
+from modules.synthetic_deck import generate_deck
+
+
+def test_parser_recovers_generated_values(tmp_path):
+    path = tmp_path / "deck.pptx"
+    expected = generate_deck(path, slides=12, summary_slide=3, acquisition_slide=4, media_kb=64, seed=7)
+    payload = parse_and_validate_cpfr(str(path), 3, 4, "2025-01-06")["db_payload"]
+
+    for section in ("weekly_summary", "offers_focus"):
+        for key, value in expected[section].items():
+            assert payload[section][key] == pytest.approx(value), key
+    channels = {c["channel_code"]: c for c in payload["acquisition_channels"]}
+    for code in ("SEA", "OM", "CRM"):
+        for key, value in expected[code].items():
+            assert channels[code][key] == pytest.approx(value), (code, key)
+    seo = {row["segment"]: row for row in payload["channel_seo_detail"]}
+    for segment in ("brand", "non_brand"):
+        for key, value in expected[f"seo_{segment}"].items():
+            assert seo[segment][key] == pytest.approx(value), (segment, key)
+
+
+def test_benchmark_report_and_regressions():
+    report = run_benchmarks([10], repeat=1)
+    assert [r["benchmark"] for r in report["results"]] == list(BENCHMARKS)
+    assert all(r["mean_ms"] > 0 and r["peak_kb"] > 0 for r in report["results"])
+
+    baseline = {"results": [dict(r, mean_ms=r["mean_ms"] / 10) for r in report["results"]]}
+    assert len(compare(report, baseline, tolerance=0.5)) == len(BENCHMARKS)
+    assert compare(report, report) == []
@@ -0,0 +1,65 @@
+import json
+
+from modules.cpfr_unified_parser import parse_and_validate_cpfr
+from modules.pptx_deck import open_deck
+from modules.pptx_utils import extract_cpfr_pptx
+from pptx import Presentation
+from pptx.util import Inches
+
+from modules.tracing import TRACER, Tracer
+
+
+def _deck(path):
+    prs = Presentation()
+    summary = prs.slides.add_slide(prs.slide_layouts[6])
+    summary.shapes.add_textbox(Inches(0.2), Inches(0.5), Inches(3), Inches(1)).text_frame.text = \
+        "342K Nb of sessions +6% VS LY -4% VS LW"
+    acquisition = prs.slides.add_slide(prs.slide_layouts[6])
+    table = acquisition.shapes.add_table(2, 2, Inches(1), Inches(2), Inches(4), Inches(1)).table
+    table.cell(0, 0).text, table.cell(1, 0).text, table.cell(1, 1).text = "KPI", "Last minute", "12%"
+    prs.save(path)
+    return path
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer(enabled=False)
+    with tracer.span("x") as span:
+        span.set(a=1)
+        tracer.event("y", b=2)
+    assert tracer.events() == []
+
+
+def test_spans_nest_and_ring_buffer_is_bounded():
+    tracer = Tracer(enabled=True, capacity=3)
+    with tracer.span("outer", deck="a.pptx") as outer:
+        tracer.event("inner.event", n=1)
+        with tracer.span("inner"):
+            pass
+        outer.set(rows=2)
+    events = tracer.events()
+    assert [e["name"] for e in events] == ["inner.event", "inner", "outer"]
+    assert events[1]["parent_id"] == events[2]["span_id"] == events[0]["parent_id"]
+    assert events[2]["attrs"] == {"deck": "a.pptx", "rows": 2}
+    assert all(json.loads(line) for line in tracer.dump().splitlines())
+
+    for i in range(5):
+        tracer.event("e", i=i)
+    assert [e["attrs"]["i"] for e in tracer.events()] == [2, 3, 4]
+    assert tracer.events("inner") == []
+
+
+def test_parsers_emit_spans_instead_of_printing(tmp_path, capsys):
+    path = _deck(tmp_path / "deck.pptx")
+    TRACER.clear()
+    TRACER.enable()
+    try:
+        deck = open_deck(str(path), lite=True)
+        parse_and_validate_cpfr(deck, 1, 2, "2025-07-14")
+        extract_cpfr_pptx(deck, 1, 2)
+    finally:
+        TRACER.disable()
+    names = {e["name"] for e in TRACER.events()}
+    assert {"pptx.open_deck", "pptx.walk_shapes", "cpfr.parse_summary", "cpfr.summary_regex",
+            "cpfr.acquisition_regex", "pptx.parse_table", "pptx.cpfr31_regex"} <= names
+    assert capsys.readouterr().out == ""
+    TRACER.clear()
@@ -0,0 +1,34 @@
+import io
+import zipfile
+from datetime import date, timedelta
+from xml.etree import ElementTree
+
+from modules.xlsx_writer import Sheet, stream_xlsx
+
+NS = {"m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+def test_stream_xlsx_writes_one_part_per_sheet_with_formats():
+    rows = ([date(2025, 1, 6) + timedelta(weeks=i), f"W{i}", 342000.0 + i, -0.07] for i in range(1200))
+    sheets = [
+        Sheet("SLIDE_31_GLOBAL", ["Semaine", "Label", "Sessions", "Sessions vs LW"],
+              ["date", None, "number", "percentage"], rows),
+        Sheet("SEA", ["Semaine", "Note"], ["date", None], iter([[date(2025, 1, 6), "<Brand & Co>"], [None, None]])),
+    ]
+    chunks = list(stream_xlsx(sheets, flush_rows=100))
+    assert len(chunks) > 3  # rendu au fil de l'eau, pas en un bloc
+
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    assert archive.testzip() is None
+    workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    assert [s.get("name") for s in workbook.iterfind(".//m:sheet", NS)] == ["SLIDE_31_GLOBAL", "SEA"]
+    assert 'formatCode="+0.0%;-0.0%;0.0%"' in archive.read("xl/styles.xml").decode()
+
+    sheet = ElementTree.fromstring(archive.read("xl/worksheets/sheet1.xml"))
+    data_rows = sheet.findall(".//m:row", NS)
+    assert len(data_rows) == 1201
+    first = data_rows[1].findall("m:c", NS)
+    assert first[0].find("m:v", NS).text == "45663"  # 2025-01-06 en numéro de série Excel
+    assert first[2].find("m:v", NS).text == "342000.0" and first[2].get("s")
+    notes = archive.read("xl/worksheets/sheet2.xml").decode()
+    assert "&lt;Brand &amp; Co&gt;" in notes and "<row><c/><c/></row>" in notes